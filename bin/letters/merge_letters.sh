@@ -0,0 +1,9 @@
+pushd ..
+INDIR=letters/letters_edited
+MRGDIR=letters/letters_merged
+filterfile=../letters/2023-09-12_letters.xlsx
+start=$(date +%s)
+mkdir -p $MRGDIR
+python src/web/merge_letters.py $INDIR $MRGDIR -f $filterfile --jobs 4
+end=`date +%s`
+echo Execution time was `expr $end - $start` seconds.
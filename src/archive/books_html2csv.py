@@ -14,14 +14,14 @@ import os.path
 import re
 import sys
 
-from bs4 import BeautifulSoup as Bs
+from utl.htmltables import TableParser, cell_text
 
 HEADING = 'Serial,Title,Author,Publisher,Date,Notes,Location'.split(',')
 
 
 DEFAULT_HTML_ENCODING = 'utf-8'
 VALID_LOCATIONS = ('FRAMED', 'UNKNOWN', 'QUARANTINE')
-LOCATION_PATTERN = r'[A-Z]+(\d+)?\*?\??$'
+LOCATION_PAT = re.compile(r'[A-Z]+(\d+)?\*?\??$')
 SERIAL_COLUMN = 0
 TITLE_COLUMN = 1
 PUBLISHER_COLUMN = 3
@@ -49,7 +49,7 @@ def getloc(row):
         cell = cell.upper().strip().replace(' ', '')
         if cell in VALID_LOCATIONS:
             return True, cell
-        if re.match(LOCATION_PATTERN, cell):
+        if LOCATION_PAT.match(cell):
             return True, cell
         else:
             return False, cell
@@ -57,20 +57,7 @@ def getloc(row):
 
 
 def handle_one_row(row):
-    csvrow = []
-    details = row.find_all('td')
-    for td in details:
-        paras = td.find_all('p')
-        detail = ''
-        for para in paras:
-            # replace whitespace with a single space
-            text = ' '.join(para.text.split())
-            detail += text + ' '
-
-        if not detail:  # if there were no <p> tag(s)
-            detail = td.text
-        detail = detail.strip()  # remove trailing NL
-        csvrow.append(detail)
+    csvrow = [cell_text(cell) for cell in row.cells]
 
     if not csvrow:
         return 1, csvrow
@@ -95,20 +82,17 @@ def opencsvwriter(filename):
     return outcsv
 
 
-def one_table(table, outcsv):
-    global rowcount, tablenumber, outrowcount
-    rows = table.find_all('tr')
-    trace(1, 'table {}, rows: {}', tablenumber, len(rows))
-    for row in rows:
-        rowcount += 1
-        error, outrow = handle_one_row(row)
-        # ignore empty rows and title rows
-        if not error:
-            outrowcount += 1
-            outcsv.writerow(outrow)
-        else: # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
-            trace(1, '----error {}: table {}, row {}, len={} {}',
-                  error, tablenumber, rowcount, len(outrow), outrow)
+def one_row(row, outcsv):
+    global rowcount, outrowcount
+    rowcount += 1
+    error, outrow = handle_one_row(row)
+    # ignore empty rows and title rows
+    if not error:
+        outrowcount += 1
+        outcsv.writerow(outrow)
+    else: # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
+        trace(1, '----error {}: table {}, row {}, len={} {}',
+              error, row.table, rowcount, len(outrow), outrow)
 
 
 def main():
@@ -116,11 +100,12 @@ def main():
     outcsv = opencsvwriter(_args.outfile)
     trace(1, '        input: {}', _args.infile)
     htmlfile = codecs.open(_args.infile, encoding=_args.encoding)
-    soup = Bs(htmlfile, 'html.parser')  # , 'html5lib')
-    tables = soup.find_all('table')
-    for table in tables:
-        tablenumber += 1
-        one_table(table, outcsv)
+    parser = TableParser('td')
+    for row in parser.rows(htmlfile):
+        if row.table != tablenumber:
+            trace(1, 'table {}', row.table)
+            tablenumber = row.table
+        one_row(row, outcsv)
     htmlfile.close()
 
 
@@ -14,11 +14,11 @@ import os.path
 import re
 import sys
 
-from bs4 import BeautifulSoup as Bs
+from utl.htmltables import TableParser, cell_text
 
 DEFAULT_HTML_ENCODING = 'utf-8'
 VALID_LOCATIONS = ('FRAMED', 'UNKNOWN', 'LOANED')
-LOCATION_PATTERN = r'[A-Z]+\d+\*?\??$'
+LOCATION_PAT = re.compile(r'[A-Z]+\d+\*?\??$')
 
 
 def trace(level, template, *args):
@@ -43,7 +43,7 @@ def getloc(row):
         ucell = ' '.join(cell.split())
         if ucell in VALID_LOCATIONS:
             return True, cell
-        if re.match(LOCATION_PATTERN, ucell):
+        if LOCATION_PAT.match(ucell):
             return True, cell
         else:
             return False, cell
@@ -51,20 +51,7 @@ def getloc(row):
 
 
 def handle_one_row(row):
-    csvrow = []
-    details = row.find_all('td')
-    for td in details:
-        paras = td.find_all('p')
-        detail = ''
-        for para in paras:
-            # replace whitespace with a single space
-            ptext = para.text
-            text = ' '.join(ptext.split())
-            detail += text + '\n'
-        if not detail:  # if there was no <p> tag
-            detail = td.text
-        detail = detail.strip()  # remove trailing NL
-        csvrow.append(detail)
+    csvrow = [cell_text(cell, '\n') for cell in row.cells]
 
     if not csvrow:
         return False, csvrow
@@ -96,22 +83,19 @@ def opencsvwriter(filename):
     return outcsv
 
 
-def one_table(table, outcsv):
-    global rowcount, tablenumber, outrowcount
-    rows = table.find_all('tr')
-    trace(1, 'table {}, rows: {}', tablenumber, len(rows))
-    for row in rows:
-        trace(3,'----trace: {}', row)
-        rowcount += 1
-        goodrow, outrow = handle_one_row(row)
-        # ignore empty rows and title rows
-        if goodrow:
-            trace(2,'---- goodrow: {}', outrow)
-            outrowcount += 1
-            outcsv.writerow(outrow)
-        else: # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
-            trace(1, '----skipping table {}, row {}, len={} {}',
-                  tablenumber, rowcount, len(outrow), outrow)
+def one_row(row, outcsv):
+    global rowcount, outrowcount
+    trace(3,'----trace: {}', row)
+    rowcount += 1
+    goodrow, outrow = handle_one_row(row)
+    # ignore empty rows and title rows
+    if goodrow:
+        trace(2,'---- goodrow: {}', outrow)
+        outrowcount += 1
+        outcsv.writerow(outrow)
+    else: # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
+        trace(1, '----skipping table {}, row {}, len={} {}',
+              row.table, rowcount, len(outrow), outrow)
 
 
 def main():
@@ -119,11 +103,12 @@ def main():
     outcsv = opencsvwriter(_args.outfile)
     trace(1, '        input: {}', _args.infile)
     htmlfile = codecs.open(_args.infile, encoding=_args.encoding)
-    soup = Bs(htmlfile, 'html.parser')  # , 'html5lib')
-    tables = soup.find_all('table')
-    for table in tables:
-        tablenumber += 1
-        one_table(table, outcsv)
+    parser = TableParser('td')
+    for row in parser.rows(htmlfile):
+        if row.table != tablenumber:
+            trace(1, 'table {}', row.table)
+            tablenumber = row.table
+        one_row(row, outcsv)
     htmlfile.close()
 
 
@@ -3,7 +3,7 @@
 
 """
 import argparse
-from colorama import Fore
+from utl.colors import Fore
 from datetime import date
 import copy
 import os.path
@@ -17,8 +17,9 @@ from utl.cfgutil import Config, Stmt, Cmd, new_subelt, process_if_other_column
 from utl.normalize import modesdatefrombritishdate, sphinxify, if_not_sphinx
 from utl.normalize import DEFAULT_MDA_CODE, normalize_id, denormalize_id
 from utl.normalize import modes_person, modesdate
+from utl.profiler import add_profile_arguments, start_profile
 from utl.readers import row_dict_reader
-from utl.trace import trace_sub
+from utl.trace import RunStats, add_stats_argument, trace_sub
 
 
 def trace(level, template, *args, color=None):
@@ -186,67 +187,72 @@ def main():
     if ifcolumneq_doc:
         ifcolumneq_title = ifcolumneq_doc[Stmt.TITLE]
         ifcolumneq_value = ifcolumneq_doc[Stmt.VALUE]
-    for row in row_dict_reader(_args.incsvfile, _args.verbose,
-                               _args.skiprows):
-        if ifcolumneq_doc:
-            if row[ifcolumneq_title] != ifcolumneq_value:
-                trace(2, 'skipping {} row: {}',
-                      row[ifcolumneq_title], row[config.serial])
-                continue
-        emit = True
-        if global_object_template is not None:
-            template = copy.deepcopy(global_object_template)
-        else:
-            template = get_template_from_csv(row)
-        if template is None:  # template not found but nostrict is True
-            continue
-        elt = template.find(config.record_id_xpath)
-        if _args.acc_num:
-            accnum = next(accnumgen)
-            trace(2, 'Serial generated: {}', accnum)
-        else:
-            trace(3, '{}', row)
-            accnum = row[config.serial]
-            if not accnum:
-                trace(1, '\n*** Serial number empty, row skipped: {}', ','.
-                      join(row.values()), color=Fore.RED)
-                continue
-            if config.add_mda_code and accnum[0].isnumeric():
-                accnum = _args.mdacode + '.' + accnum
-        accnum = clean_accnum(accnum)
-        elt.text = accnum
-        for doc in config.col_docs:
-            cmd = doc[Stmt.CMD]
-            # print(f'cmd: {doc[Stmt.CMD]}')
-            title = doc[Stmt.TITLE]
-            column_title = doc[Stmt.COLUMN_TITLE]
-            if cmd == Cmd.REPRODUCTION:
-                text = accnum + '.jpg'
-            elif cmd == Cmd.CONSTANT:
-                text = doc[Stmt.VALUE]
+    with stats.phase('transform'):
+        for row in stats.timed('parse', row_dict_reader(
+                _args.incsvfile, _args.verbose, _args.skiprows)):
+            if ifcolumneq_doc:
+                if row[ifcolumneq_title] != ifcolumneq_value:
+                    trace(2, 'skipping {} row: {}',
+                          row[ifcolumneq_title], row[config.serial])
+                    continue
+            emit = True
+            if global_object_template is not None:
+                template = copy.deepcopy(global_object_template)
             else:
-                text = row[column_title]
-            trace(4, 'column="{}", text="{}"', column_title, text)
-            if not process_if_other_column(row, doc, accnum, _args.verbose):
+                template = get_template_from_csv(row)
+            if template is None:  # template not found but nostrict is True
                 continue
-            if cmd != Cmd.CONSTANT and not text:
-                trace(3, '{}: cell empty {}', accnum, title)
-                if Stmt.REQUIRED in doc:
-                    print(f'*** Required column “{title}” is missing from'
-                          f' {accnum}. Object excluded.')
-                    emit = False
-                continue
-            if text == '{{clear}}':
-                text = ''
-            elif text == '{{today}}':
-                text = _args.date
-            xpath = doc[Stmt.XPATH]
-            store(xpath, doc, template, accnum, text)
-            if Stmt.XPATH2 in doc:
-                store(doc[Stmt.XPATH2], doc, template, accnum, text)
-        if emit:
-            nrows += 1
-            outfile.write(ET.tostring(template))
+            elt = template.find(config.record_id_xpath)
+            if _args.acc_num:
+                accnum = next(accnumgen)
+                trace(2, 'Serial generated: {}', accnum)
+            else:
+                trace(3, '{}', row)
+                accnum = row[config.serial]
+                if not accnum:
+                    trace(1, '\n*** Serial number empty, row skipped: {}', ','.
+                          join(row.values()), color=Fore.RED)
+                    continue
+                if config.add_mda_code and accnum[0].isnumeric():
+                    accnum = _args.mdacode + '.' + accnum
+            accnum = clean_accnum(accnum)
+            elt.text = accnum
+            for doc in config.col_docs:
+                cmd = doc[Stmt.CMD]
+                # print(f'cmd: {doc[Stmt.CMD]}')
+                title = doc[Stmt.TITLE]
+                column_title = doc[Stmt.COLUMN_TITLE]
+                if cmd == Cmd.REPRODUCTION:
+                    text = accnum + '.jpg'
+                elif cmd == Cmd.CONSTANT:
+                    text = doc[Stmt.VALUE]
+                else:
+                    text = row[column_title]
+                trace(4, 'column="{}", text="{}"', column_title, text)
+                if not process_if_other_column(row, doc, accnum, _args.verbose):
+                    continue
+                if cmd != Cmd.CONSTANT and not text:
+                    trace(3, '{}: cell empty {}', accnum, title)
+                    if Stmt.REQUIRED in doc:
+                        print(f'*** Required column “{title}” is missing from'
+                              f' {accnum}. Object excluded.')
+                        emit = False
+                    continue
+                if text == '{{clear}}':
+                    text = ''
+                elif text == '{{today}}':
+                    text = _args.date
+                xpath = doc[Stmt.XPATH]
+                store(xpath, doc, template, accnum, text)
+                if Stmt.XPATH2 in doc:
+                    store(doc[Stmt.XPATH2], doc, template, accnum, text)
+            if emit:
+                nrows += 1
+                with stats.phase('serialize'):
+                    xml = ET.tostring(template)
+                with stats.phase('write'):
+                    outfile.write(xml)
+    stats.count('rows', nrows)
     if not _args.noprolog:
         outfile.write(b'</Interchange>')
         trace(2, 'Writing </Interchange>')
@@ -320,10 +326,12 @@ def getparser():
         Only process one object. For debugging.''')
     parser.add_argument('--skiprows', type=int, default=0, help='''
         Skip rows at the beginning of the CSV file.''')
+    add_stats_argument(parser)
     parser.add_argument('-t', '--template', help=sphinxify('''
         The XML file that is the template for creating the output XML.
         Specify this or template-related statements in the configuration.
         ''', calledfromsphinx))
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -376,6 +384,7 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'csv2xml')
     outfile = open(_args.outfile, 'wb')
     trace(1, 'Input file: {}', _args.incsvfile)
     trace(1, 'Creating file: {}', _args.outfile)
@@ -387,6 +396,9 @@ if __name__ == '__main__':
     trace(1, 'Begin csv2xml.', color=Fore.GREEN)
     if not config.serial:
         config.serial = _args.serial
+    stats = RunStats()
     main()
     trace(1, 'End csv2xml. {} object{} written.', nrows,
           '' if nrows == 1 else 's', color=Fore.GREEN)
+    stats.report(_args.stats)
+    profiler.stop(nrows)
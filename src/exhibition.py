@@ -19,6 +19,14 @@ The format of the exhibition list is::
 
 If ``Place`` is omitted, it is taken to be "HRM"
 
+Several mapfiles can be applied in one pass, either by repeating ``--mapfile``
+if they have the same columns or by listing them in a batch file given with
+``--batch``::
+
+    mapfile,exhibition,col_acc,col_ex,col_cat,skiprows
+    advertising.csv,6,5,,0,0
+    watercolours.csv,14,1,,0,1
+
 In the CSV file, the exhibition number is optional and is ignored if the ``--exhibition``
 parameter is given. The accession number in the CSV file or specified as a parameter
 may contain a string
@@ -46,7 +54,7 @@ The Exhibition group template is::
 import argparse
 import os
 import sys
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 from utl.exhibition_list import (get_exhibition_dict,
@@ -56,7 +64,9 @@ from utl.excel_cols import col2num
 from utl.location_sub import update_current_loc
 from utl.normalize import modesdate, normalize_id, denormalize_id, datefrommodes
 from utl.normalize import sphinxify, vdate, isoformatfrommodesdate
-from utl.readers import row_list_reader, object_reader
+from utl.profiler import add_profile_arguments, start_profile
+from utl.readers import row_dict_reader, row_list_reader, object_reader
+from utl.xmlscan import VerbatimWriter
 
 
 def trace(level, template, *args, color=None):
@@ -241,13 +251,18 @@ def one_object(objelt, idnum, exhibition: ExhibitionTuple, catalog_num=''):
         objelt.insert(firstexix, exhib)
 
 
-def get_mapfile_dict(mapfile):
+def get_mapfile_dict(mapfile, mapdict=None, spec=None):
     """
-    :param: mapfile: A CSV or XLSX file containing the accession number specified by --col_acc,
-    optionally the exhibition number in the column specified by --col_ex,
-    and optionally the catalog number specified by --col_cat.
+    :param: mapfile: A CSV or XLSX file containing the accession number
+            specified by --col_acc, optionally the exhibition number in the
+            column specified by --col_ex, and optionally the catalog number
+            specified by --col_cat.
+    :param mapdict: the dict to add to. If None, a new dict is created.
+    :param spec: an object with the attributes exhibition, col_acc, col_ex,
+                 col_cat and skiprows, normally a row of the batch file. If
+                 None, the command line arguments are used.
     :return: A dict with the key of the accession number and the value being
-             a tuple of (exhibition number, catalogue number).
+             a list of tuples of (exhibition number, catalogue number).
     """
     def one_accession_number(accno):
         # print(f'{row=}')
@@ -256,11 +271,13 @@ def get_mapfile_dict(mapfile):
         except ValueError:
             print(f"Skipping badly formed accession # in csv: {accno}")
             return
-        if norm_accno in mapdict:
-            raise KeyError(f'Duplicate accession number: {norm_accno}')
+        exhibitions = mapdict.setdefault(norm_accno, [])
+        if exhibition in (exnum for exnum, _ in exhibitions):
+            raise KeyError(f'Duplicate accession number: {norm_accno} in '
+                           f'exhibition {exhibition}')
         cataloguenumber = None
-        if _args.col_cat is not None:
-            cataloguenumber = row[_args.col_cat]
+        if spec.col_cat is not None:
+            cataloguenumber = row[spec.col_cat]
             try:
                 # convert "33." to 33
                 cataloguenumber = int(float(cataloguenumber))
@@ -268,17 +285,20 @@ def get_mapfile_dict(mapfile):
                 pass  # ok, doesn't have to be an integer
         # print(row)
         # print(exhibition, cataloguenumber)
-        mapdict[norm_accno] = (exhibition, cataloguenumber)
-
-    mapdict = {}
-    for row in row_list_reader(mapfile, skiprows=_args.skiprows):
-        accnumber = row[_args.col_acc]
+        exhibitions.append((exhibition, cataloguenumber))
+
+    if mapdict is None:
+        mapdict = {}
+    if spec is None:
+        spec = _args
+    for row in row_list_reader(mapfile, skiprows=spec.skiprows):
+        accnumber = row[spec.col_acc]
         if not accnumber:
             continue  # blank accession number
-        if _args.exhibition:
-            exhibition = _args.exhibition
+        if spec.exhibition:
+            exhibition = spec.exhibition
         else:
-            col_ex = _args.col_ex
+            col_ex = spec.col_ex
             try:
                 exhibition = int(row[col_ex])
             except (IndexError, ValueError) as e:
@@ -297,48 +317,85 @@ def get_mapfile_dict(mapfile):
     return mapdict
 
 
+def get_batch_dict(batchfile):
+    """
+    :param batchfile: A CSV or XLSX file with a heading row containing the
+           columns mapfile, exhibition, col_acc, col_ex, col_cat and skiprows.
+           Each row describes one mapfile in the same way as the command line
+           arguments of the same names. Blank cells take the default values.
+           A relative mapfile path is relative to the folder containing the
+           batch file.
+    :return: the dict returned by get_mapfile_dict for all of the mapfiles.
+    """
+    mapdict = {}
+    batchdir = os.path.dirname(batchfile)
+    for row in row_dict_reader(batchfile):
+        if not row.get('mapfile'):
+            continue
+        mapfile = os.path.join(batchdir, row['mapfile'])
+        spec = argparse.Namespace(
+            exhibition=int(row['exhibition']) if row.get('exhibition')
+            else None,
+            col_acc=col2num(row.get('col_acc') or '0'),
+            col_ex=col2num(row['col_ex']) if row.get('col_ex') else None,
+            col_cat=col2num(row['col_cat']) if row.get('col_cat') else None,
+            skiprows=int(row.get('skiprows') or 0))
+        if (spec.exhibition is None) == (spec.col_ex is None):
+            raise ValueError(f'{mapfile}: You must specify one of exhibition'
+                             f' and col_ex in the batch file.')
+        trace(1, 'Reading mapfile: {}', mapfile)
+        get_mapfile_dict(mapfile, mapdict, spec)
+    return mapdict
+
+
+def verify_object(idnum, elem, exhibition_inv_dict):
+    """
+    Check that each Exhibition element of the object matches an exhibition
+    in exhibition_list.py.
+
+    :return: the number of Exhibition elements that don't match
+    """
+    ninvalid = 0
+    for element in elem.findall('./Exhibition'):
+        datebegin = element.find('./Date/DateBegin')
+        if datebegin is None or not datebegin.text:
+            datebegin = None
+        else:
+            datebegin, _ = datefrommodes(datebegin.text)
+        dateend = element.find('./Date/DateEnd')
+        if dateend is None or not dateend.text:
+            dateend = None
+        else:
+            dateend, _ = datefrommodes(dateend.text)
+        exhibname = element.find('./ExhibitionName')
+        if exhibname is not None:
+            exhibname = exhibname.text
+        placeelt = element.find('./Place')
+        place = None
+        if placeelt is not None:
+            placename = placeelt.find('./PlaceName')
+            if placename is not None:
+                place = placename.text
+        # print(f'{idnum=}:{datebegin=}')
+        if datebegin is None and dateend is None and exhibname is None and place is None:
+            # it's an empty Exhibition
+            continue
+        exhibition = ExhibitionTuple(DateBegin=datebegin,
+                                     DateEnd=dateend,
+                                     ExhibitionName=exhibname,
+                                     Place=place
+                                     )
+        exhibnum = exhibition_inv_dict.get(exhibition)
+        if exhibnum is None:
+            print(f'{idnum}: invalid exhibition: {exhibition}')
+            ninvalid += 1
+    return ninvalid
+
+
 def verify():
     exhibition_inv_dict = get_inverted_exhibition_dict()
     for idnum, elem in object_reader(_args.infile, verbos=_args.verbose):
-        elements = elem.findall('./Exhibition')
-        # print(f'{elements=}')
-        selected = False
-        if elements is None:
-            return selected
-        for element in elements:
-            datebegin = element.find('./Date/DateBegin')
-            if datebegin is None or not datebegin.text:
-                datebegin = None
-            else:
-                datebegin, _ = datefrommodes(datebegin.text)
-            dateend = element.find('./Date/DateEnd')
-            if dateend is None or not dateend.text:
-                dateend = None
-            else:
-                dateend, _ = datefrommodes(dateend.text)
-            exhibname = element.find('./ExhibitionName')
-            if exhibname is not None:
-                exhibname = exhibname.text
-            placeelt = element.find('./Place')
-            place = None
-            if placeelt is not None:
-                placename = placeelt.find('./PlaceName')
-                if placename is not None:
-                    place = placename.text
-            # print(f'{idnum=}:{datebegin=}')
-            if datebegin is None and dateend is None and exhibname is None and place is None:
-                # it's an empty Exhibition
-                continue
-            exhibition = ExhibitionTuple(DateBegin=datebegin,
-                                         DateEnd=dateend,
-                                         ExhibitionName=exhibname,
-                                         Place=place
-                                         )
-            # print(cfg.exhibition_inv_dict)
-            # print('ifexhib: {idnum}: {exhibition}')
-            exhibnum = exhibition_inv_dict.get(exhibition)
-            if exhibnum is None:
-                print(f'{idnum}: invalid exhibition: {exhibition}')
+        verify_object(idnum, elem, exhibition_inv_dict)
 
 
 def main():
@@ -349,32 +406,45 @@ def main():
     if _args.object:
         objlist = expand_idnum(_args.object)  # JB001-002 -> JB001, JB002
         exmap = {normalize_id(obj):  # JB001 -> JB00000001
-                 (_args.exhibition, _args.catalogue) for obj in objlist}
+                 [(_args.exhibition, _args.catalogue)] for obj in objlist}
+    elif _args.batch:
+        exmap = get_batch_dict(_args.batch)
     else:
-        exmap = get_mapfile_dict(_args.mapfile)  # acc # -> (exhibition #, catalog #)
+        exmap = {}
+        for mapfile in _args.mapfile:
+            # acc # -> [(exhibition #, catalog #), ...]
+            get_mapfile_dict(mapfile, exmap)
     exdict = get_exhibition_dict()  # exhibition # -> Exhibition tuple
+    exhibition_inv_dict = get_inverted_exhibition_dict() if _args.verify else None
     written_to_main = 0
     numupdated = 0
+    numinvalid = 0
 
     for idnum, nidnum, elem in object_reader(_args.infile, normalize=True, verbos=_args.verbose):
         trace(3, 'idnum: {}', idnum)
         if nidnum and nidnum in exmap:
-            exnum, cataloguenumber = exmap[nidnum]
-            exhibition = exdict[exnum]
-            one_object(elem, nidnum, exhibition, cataloguenumber)
-            if _args.move_to_location:
-                place = exhibition.Place
-                if place == 'HRM':
-                    place = 'Joan Brinsmead Gallery'
-                update_current_loc(elem, idnum, place, modesdate(exhibition.DateBegin),
-                                   'Exhibition: ' + exhibition.ExhibitionName, trace)
+            # Apply the exhibitions in date order so that with
+            # --move_to_location the latest one becomes the current location.
+            exhibitions = [(exdict[exnum], cataloguenumber)
+                           for exnum, cataloguenumber in exmap[nidnum]]
+            exhibitions.sort(key=lambda ex: ex[0].DateBegin)
+            for exhibition, cataloguenumber in exhibitions:
+                one_object(elem, nidnum, exhibition, cataloguenumber)
+                if _args.move_to_location:
+                    place = exhibition.Place
+                    if place == 'HRM':
+                        place = 'Joan Brinsmead Gallery'
+                    update_current_loc(elem, idnum, place, modesdate(exhibition.DateBegin),
+                                       'Exhibition: ' + exhibition.ExhibitionName, trace)
             del exmap[nidnum]
             updated = True
             numupdated += 1
         else:
             updated = False
+        if exhibition_inv_dict is not None:
+            numinvalid += verify_object(idnum, elem, exhibition_inv_dict)
         if outfile:
-            outfile.write(ET.tostring(elem, encoding='utf-8'))
+            objwriter.write(elem, updated)
             written_to_main += 1
         if updated:
             if deltafile:
@@ -394,6 +464,11 @@ def main():
         trace(1, f' {numupdated} object'
                  f'{"s" if numupdated != 1 else ""} written to delta: ',
                  color=Fore.GREEN)
+    if exhibition_inv_dict is not None:
+        trace(1, ' {} invalid exhibition{} found.', numinvalid,
+              '' if numinvalid == 1 else 's',
+              color=Fore.YELLOW if numinvalid else Fore.GREEN)
+    return written_to_main
 
 
 def getparser():
@@ -412,6 +487,11 @@ def getparser():
         argument. If you need to process a single object, you can omit the
         --mapfile argument and specify a single object wth the --object
         argument. See also the --catalogue argument.
+
+        To load many exhibitions in one pass, repeat the --mapfile argument
+        or list the mapfiles in a file given with the --batch argument. An
+        object may then be added to several exhibitions. With --verify, the
+        updated file is checked against exhibition_list.py in the same pass.
         ''', called_from_sphinx))
     exgroup = parser.add_mutually_exclusive_group()
     objgroup = parser.add_mutually_exclusive_group()
@@ -451,9 +531,20 @@ def getparser():
         The exhibition number
         to apply to all objects in the CSV file. Do not specify this if
         --col_ex is specified.''', called_from_sphinx))
-    objgroup.add_argument('-m', '--mapfile', help=sphinxify('''
+    objgroup.add_argument('-m', '--mapfile', action='append',
+                          help=sphinxify('''
         The CSV  or XLSX file mapping the accession number to the catalog number and
         exhibition number. (but see --exhibition). There must be a heading row.
+        This argument may be repeated to apply several files with the same
+        columns in one pass. An object may be in several exhibitions.
+        ''', called_from_sphinx))
+    objgroup.add_argument('-b', '--batch', help=sphinxify('''
+        A CSV or XLSX file listing mapfiles to apply in one pass, one per row,
+        for when the mapfiles have different columns. The heading row must
+        contain "mapfile" and may contain "exhibition", "col_acc", "col_ex",
+        "col_cat" and "skiprows", which have the same meaning as the
+        arguments of the same names. Do not specify those arguments with
+        --batch.
         ''', called_from_sphinx))
     parser.add_argument('-l', '--move_to_location', action='store_true',
                         help=sphinxify('''
@@ -486,9 +577,18 @@ def getparser():
         Number of lines to skip at the start of the CSV file''')
     parser.add_argument('--short', action='store_true', help='''
         Only process one object. For debugging.''')
-    parser.add_argument('--verify', action='store_true', help='''
-        Compare the exhibition values in the XML file the values in exhibition_list.py.
+    parser.add_argument('--verbatim', action='store_true', help='''
+        Copy objects that are not updated to the output file exactly as they
+        are in the input file instead of re-serializing them. This is faster
+        when only a few objects are updated.
         ''')
+    parser.add_argument('--verify', action='store_true', help=sphinxify('''
+        Compare the exhibition values in the XML file the values in exhibition_list.py.
+        If --mapfile, --batch or --object is also given, the objects are
+        checked after they are updated, in the same pass. Otherwise only the
+        check is done.
+        ''', called_from_sphinx))
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -498,13 +598,20 @@ def getparser():
 def getargs(argv):
     parser = getparser()
     args = parser.parse_args(args=argv[1:])
-    if args.verify:
+    if args.verify and not (args.mapfile or args.batch or args.object):
         return args  # ignore all other options
     if args.outfile is None and args.deltafile is None:
         raise ValueError('You must specify --outfile or --deltafile.')
-    if (args.mapfile is None) == (args.object is None):
-        raise ValueError('You must specify one of --mapfile and --object')
-    if (args.exhibition is None) == (args.col_ex is None):
+    if not (args.mapfile or args.batch or args.object):
+        raise ValueError('You must specify one of --mapfile, --batch and'
+                         ' --object')
+    if args.batch:
+        if (args.exhibition or args.col_ex or args.col_acc or args.col_cat
+                or args.skiprows or args.old_name or args.delete):
+            raise ValueError('With --batch, specify the exhibition and columns'
+                             ' in the batch file. --old_name and --delete are'
+                             ' not allowed.')
+    elif (args.exhibition is None) == (args.col_ex is None):
         raise ValueError('You must specify one of --exhibition and --col_ex')
     if (args.object or args.old_name) and not args.exhibition:
         raise (ValueError('You specified the object id or old name. You must'
@@ -540,23 +647,26 @@ if __name__ == '__main__':
         sys.argv.append('-h')
     found_old_key = False
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'exhibition')
     trace(1, f'Begin exhibition.py.', color=Fore.GREEN)
     _oldname = _args.old_name
     _oldplace = _args.old_place
     _olddate = _args.old_date
     trace(1, 'Input file: {}', _args.infile)
-    if _args.verify:
+    if _args.verify and not (_args.mapfile or _args.batch or _args.object):
         verify()
     else:
         outfile = deltafile = None
         if _args.outfile:
             outfile = open(_args.outfile, 'wb')
             trace(1, 'Creating output file: {}', _args.outfile)
+            objwriter = VerbatimWriter(_args.infile, outfile, _args.verbatim)
         if _args.deltafile:
             deltafile = open(_args.deltafile, 'wb')
             trace(1, 'Creating delta file: {}', _args.outfile)
-        main()
+        profiler.objects = main()
         if (_oldname or _oldplace or _olddate) and not found_old_key:
             trace(0, "Warning: Old name/place/date specified but no"
                      " old key found.",
                   color=Fore.YELLOW)
+    profiler.stop()
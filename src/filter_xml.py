@@ -10,11 +10,13 @@ import sys
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 from utl.cfgutil import Config
-from utl.cfgutil import expand_idnum
+from utl.cfgutil import expand_idnum, select_includes
 from utl.readers import read_include_dict
 from utl.excel_cols import col2num
 from utl.normalize import normalize_id, sphinxify, DEFAULT_MDA_CODE
 from utl.normalize import if_not_sphinx
+from utl.xmlscan import read_source, scan_objects, source_encoding
+from utl.xmlscan import VERBATIM_ENCODINGS
 
 
 def trace(level, template, *args):
@@ -48,14 +50,8 @@ def main():
         objcount += 1
         if selected:
             selcount += 1
-            outstring = ET.tostring(oldobject, encoding=_args.encoding)
-            if _args.directory:
-                objfilename = os.path.join(_args.outfile, idnum + '.xml')
-                objfile = open(objfilename, 'wb')
-                objfile.write(outstring)
-                objfile.close()
-            else:
-                outfile.write(outstring)
+            write_selected(idnum, ET.tostring(oldobject,
+                                              encoding=_args.encoding))
         oldobject.clear()
         if _args.short:
             break
@@ -63,6 +59,67 @@ def main():
         outfile.write(b'</Interchange>')
 
 
+def write_selected(idnum, objbytes):
+    if _args.directory:
+        objfilename = os.path.join(_args.outfile, idnum + '.xml')
+        with open(objfilename, 'wb') as objfile:
+            objfile.write(objbytes)
+    else:
+        outfile.write(objbytes)
+
+
+def main_verbatim(buf):
+    """
+    Select objects without re-serializing them. The selected objects are
+    sliced from the input buffer so the output is byte-for-byte the same as
+    the input. An Object is only parsed if the config file contains control
+    statements; otherwise, only the accession number is extracted.
+    """
+    global objcount, selcount
+    if not _args.directory:
+        outfile.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+        outfile.write(b'<Interchange>\n')
+    must_parse = bool(config.ctrl_docs)
+    for idnum, start, end in scan_objects(buf, config.record_tag,
+                                          config.record_id_xpath):
+        objcount += 1
+        if must_parse:
+            selected = config.select(ET.fromstring(buf[start:end]), includes,
+                                     _args.exclude)
+        else:
+            nidnum = normalize_id(idnum) if idnum else None
+            selected = select_includes(nidnum, includes, _args.exclude)
+        if selected:
+            selcount += 1
+            if _args.normalize:
+                idnum = normalize_id(idnum)
+            write_selected(idnum, buf[start:end])
+        if _args.short:
+            break
+    if not _args.directory:
+        outfile.write(b'</Interchange>')
+
+
+def can_copy_verbatim():
+    """
+    :return: the input file as a buffer if --verbatim is set and the input
+             and output encodings allow the objects to be copied, else None.
+    """
+    if not _args.verbatim:
+        return None
+    buf = read_source(_args.infile)
+    if (source_encoding(buf) not in VERBATIM_ENCODINGS
+            or _args.encoding.lower() not in VERBATIM_ENCODINGS):
+        print('--verbatim ignored: input and output must be utf-8.')
+        return None
+    try:
+        scan_objects(buf, config.record_tag, config.record_id_xpath)
+    except ValueError as e:
+        print(f'--verbatim ignored: {e}')
+        return None
+    return buf
+
+
 def getparser():
     parser = argparse.ArgumentParser(description=sphinxify('''
         Copy a selected set of objects to a new XML file based on the config
@@ -117,6 +174,10 @@ def getparser():
         ''')
     parser.add_argument('-s', '--short', action='store_true', help='''
         Only process one object.''')
+    parser.add_argument('--verbatim', action='store_true', help='''
+        Copy the selected objects exactly as they are in the input file
+        instead of re-serializing them. This is much faster. The input file
+        and output encoding must be utf-8 or ASCII.''')
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -162,7 +223,11 @@ if __name__ == '__main__':
     else:
         includes = read_include_dict(_args.include, _args.include_column,
                                      _args.include_skip, _args.verbose)
-    main()
+    verbatim_buf = can_copy_verbatim()
+    if verbatim_buf is not None:
+        main_verbatim(verbatim_buf)
+    else:
+        main()
     basename = os.path.basename(sys.argv[0])
     print(f'{selcount} object{"" if selcount == 1 else "s"} selected from {objcount}.')
     print(f'End {basename.split(".")[0]}')
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    Flatten a whole Modes XML file into one table per repeating group so that
+    the collection can be analysed with pyarrow, duckdb or pandas without
+    reading the XML again.
+
+    The tables are:
+
+    objects:      one row per Object with the commonly used single fields
+    locations:    one row per ObjectLocation
+    exhibitions:  one row per Exhibition
+    items:        one row per Item under ItemList, with a column for each tag
+                  found under any Item
+    production:   one row per Person under Production
+    measurements: one row per Measurement
+
+    The columns are defined in utl/flatten.py. Every table starts with the
+    column "serial", the accession number as in the XML file. The objects
+    table also has "sortkey", the normalized accession number, and the other
+    tables have "seq", the position of the row within its Object. Dates are
+    written twice, as a date column that is null if the text isn't a valid
+    Modes date and as a text column with the suffix "_text". Partial dates
+    like "1910" become the first day of the period.
+
+    The tables are written to the output folder as <table>.parquet, .arrow,
+    .feather or .csv. The columnar formats need the pyarrow package.
+"""
+import argparse
+import os
+import sys
+import time
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.colors import Fore, Style
+from utl.columnar import FORMATS, SUFFIXES, check_format, write_table
+from utl.flatten import TABLES, object_rows
+from utl.normalize import if_not_sphinx, DEFAULT_MDA_CODE
+from utl.zipmagic import openfile
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+class Table:
+    """
+    Collect the rows of one table as a dict of columns.
+    """
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = {}
+        self.types = {}
+        self.nrows = 0
+        self.add_column('serial', 'string')
+        self.add_column('sortkey' if name == 'objects' else 'seq',
+                        'string' if name == 'objects' else 'int')
+        if columns is not None:
+            for colname, (_, coltype) in columns.items():
+                self.add_column(colname, coltype)
+
+    def add_column(self, colname, coltype):
+        self.columns[colname] = [None] * self.nrows
+        self.types[colname] = coltype
+        if coltype == 'date':
+            self.add_column(colname + '_text', 'string')
+
+    def append(self, row: dict):
+        """
+        :param row: a dict of column name -> value. Missing columns are null.
+                    A new column is added when its first non-null value is
+                    seen, as an int column if that value is an int and
+                    otherwise as a string column.
+        """
+        for colname, value in row.items():
+            if colname not in self.columns and value is not None:
+                self.add_column(colname,
+                                'int' if isinstance(value, int) else 'string')
+        for colname, values in self.columns.items():
+            values.append(row.get(colname))
+        self.nrows += 1
+
+
+def one_object(elem, tables):
+    rows = object_rows(elem, _args.mdacode)
+    if rows is None:
+        trace(1, 'Object without an accession number skipped.',
+              color=Fore.YELLOW)
+        return False
+    for name, tablerows in rows.items():
+        for row in tablerows:
+            tables[name].append(row)
+    return True
+
+
+def main():
+    tables = {name: Table(name, columns)
+              for name, (_, columns) in TABLES.items()}
+    nobjects = 0
+    objectlevel = 0
+    infile = openfile(_args.infile)
+    for event, elem in ET.iterparse(infile, events=('start', 'end')):
+        if elem.tag != 'Object':
+            continue
+        if event == 'start':
+            objectlevel += 1
+            continue
+        objectlevel -= 1
+        if objectlevel:
+            continue  # It's not a top level Object.
+        if one_object(elem, tables):
+            nobjects += 1
+        elem.clear()
+        if _args.short:
+            break
+    infile.close()
+    os.makedirs(_args.outdir, exist_ok=True)
+    for name, table in tables.items():
+        filename = os.path.join(_args.outdir, name + SUFFIXES[_args.format])
+        write_table(filename, table.columns, _args.format, table.types)
+        trace(1, '{}: {} rows written to {}', name, table.nrows, filename)
+    return nobjects
+
+
+def getparser():  # called either by getargs or sphinx
+    parser = argparse.ArgumentParser(description='''
+    Write the objects, locations, exhibitions, items, production persons and
+    measurements in an XML file to one table each in the output folder.
+        ''')
+    parser.add_argument('infile', help='''
+        The XML file saved from Modes. It may be compressed.''')
+    parser.add_argument('outdir', help='''
+        The folder to write the tables to. It is created if it doesn't
+        exist.''')
+    parser.add_argument('--format', choices=FORMATS, default='parquet',
+                        help='''
+        The format of the tables. All but csv need the pyarrow package.''' +
+                        if_not_sphinx(''' The default is parquet.''',
+                                      calledfromsphinx))
+    parser.add_argument('-m', '--mdacode', default=DEFAULT_MDA_CODE, help='''
+        Specify the MDA code, used in normalizing the accession number.''' +
+                        if_not_sphinx(f''' The default is
+                        "{DEFAULT_MDA_CODE}".''', calledfromsphinx))
+    parser.add_argument('-s', '--short', action='store_true', help='''
+        Only process one object. For debugging.''')
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary information.
+        ''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    try:
+        check_format(args.format)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    return args
+
+
+calledfromsphinx = True
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 10)
+    calledfromsphinx = False
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    trace(1, 'Begin flatten_xml.', color=Fore.GREEN)
+    n_objects = main()
+    trace(1, 'End flatten_xml. {} objects. Elapsed: {:5.2f} seconds.',
+          n_objects, time.perf_counter() - t1, color=Fore.GREEN)
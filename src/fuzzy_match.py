@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+    Match the titles in a CSV or XLSX file against the Title and
+    BriefDescription of the objects in a Modes XML file and write a copy of
+    the file with the best matching accession numbers and their scores added
+    to each row.
+
+    For each of the --matches best matches three columns are appended:
+    "Match n", the accession number, "Score n", the similarity from 0 to 100,
+    and "Text n", the title or brief description that matched. Rows with no
+    match scoring at least --minscore have empty cells.
+
+    Matching uses the trigram index in utl/fuzzyindex.py. Building the index
+    for the whole collection takes a few seconds; with --index it is saved
+    and reused until the XML file changes.
+"""
+import argparse
+import csv
+import sys
+import time
+
+from utl.fuzzyindex import load_or_build
+from utl.readers import get_heading, row_dict_reader
+from utl.normalize import if_not_sphinx, sphinxify
+
+
+def trace(level, template, *args):
+    if _args.verbose >= level:
+        print(template.format(*args))
+
+
+def match_row(index, row) -> list:
+    # DictReader fills the missing cells of a short row with None.
+    title = ' '.join((row.get(_args.column) or '').split())
+    matches = index.query(title, k=_args.matches,
+                          minscore=_args.minscore / 100) if title else []
+    cells = []
+    for idnum, score, _, text in matches:
+        cells += [idnum, round(score * 100), text]
+    cells += [''] * (3 * _args.matches - len(cells))
+    if matches:
+        trace(2, '{} -> {} ({})', title, matches[0][0],
+              round(matches[0][1] * 100))
+    else:
+        trace(2, '{} -> no match', title)
+    return cells
+
+
+def write_rows(heading, rows):
+    if _args.outfile.lower().endswith('.xlsx'):
+        from openpyxl.workbook import Workbook  # slow to import
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(heading)
+        for row in rows:
+            ws.append(row)
+        wb.save(_args.outfile)
+    else:
+        with open(_args.outfile, 'w', encoding='utf-8-sig',
+                  newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(heading)
+            writer.writerows(rows)
+
+
+def main():
+    index = load_or_build(_args.xmlfile, _args.index, verbose=_args.verbose)
+    heading = get_heading(_args.infile, verbos=0, skiprows=_args.skiprows)
+    if _args.column not in heading:
+        print(f'Column "{_args.column}" is not in the heading of '
+              f'{_args.infile}.')
+        sys.exit(1)
+    heading = [str(h) for h in heading]
+    for n in range(1, _args.matches + 1):
+        heading += [f'Match {n}', f'Score {n}', f'Text {n}']
+    rows = []
+    nmatched = 0
+    for row in row_dict_reader(_args.infile, verbos=0,
+                               skiprows=_args.skiprows):
+        cells = match_row(index, row)
+        nmatched += bool(cells[0])
+        rows.append(list(row.values()) + cells)
+    write_rows(heading, rows)
+    return len(rows), nmatched
+
+
+def getparser():  # called either by getargs or sphinx
+    parser = argparse.ArgumentParser(description=sphinxify('''
+    Add the accession numbers of the objects whose title or brief description
+    best match a column in a CSV or XLSX file.
+        ''', calledfromsphinx))
+    parser.add_argument('xmlfile', help='''
+        The XML file saved from Modes. It may be compressed.''')
+    parser.add_argument('infile', help='''
+        The CSV or XLSX file containing the titles to match. The first row
+        is the heading.''')
+    parser.add_argument('outfile', help='''
+        The CSV or XLSX file to write. XLSX is written if the name ends
+        with ".xlsx".''')
+    parser.add_argument('-c', '--column', default='Title', help='''
+        The heading of the column containing the titles.''' +
+                        if_not_sphinx(''' The default is "Title".''',
+                                      calledfromsphinx))
+    parser.add_argument('-i', '--index', help='''
+        The file to save the index in. If it exists and was built from the
+        current XML file, it is used instead of reading the XML file.''')
+    parser.add_argument('-k', '--matches', type=int, default=3, help='''
+        The number of matches to write for each row.''' +
+                        if_not_sphinx(''' The default is 3.''',
+                                      calledfromsphinx))
+    parser.add_argument('--minscore', type=int, default=30, help='''
+        The lowest score from 0 to 100 of a match to write.''' +
+                        if_not_sphinx(''' The default is 30.''',
+                                      calledfromsphinx))
+    parser.add_argument('--skiprows', type=int, default=0, help='''
+        The number of rows to skip before the heading row.''')
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary information.
+        2 prints the best match of each row.''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    return args
+
+
+calledfromsphinx = True
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 10)
+    calledfromsphinx = False
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    n_rows, n_matched = main()
+    trace(1, 'End fuzzy_match. {} rows, {} matched. Elapsed: {:5.2f} '
+          'seconds.', n_rows, n_matched, time.perf_counter() - t1)
@@ -5,6 +5,9 @@ row in the first table in the HTML file will be taken as the CSV field names.
 
 Input: full path to the HTML file
 Output: full path to the output CSV file.
+
+The rows are written as they are parsed by utl.htmltables so the whole file
+isn't held in memory.
 """
 
 import argparse
@@ -14,11 +17,11 @@ import os.path
 import re
 import sys
 
-from bs4 import BeautifulSoup as Bs
+from utl.htmltables import CELL_PAT, TableParser, cell_text
 
 DEFAULT_HTML_ENCODING = 'utf-8-sig'  # insert BOM at front
 
-td_or_th_pat = re.compile('(td)|(th)')
+WHITESPACE_PAT = re.compile(r'\s')
 
 
 def trace(level, template, *args):
@@ -33,48 +36,26 @@ def opencsvwriter(filename):
 
 
 def handle_one_row(row):
-    csvrow = []
-    details = row.find_all(td_or_th_pat)
-    for td in details:
-        paras = td.find_all('p')
-        detail = ''
-        for para in paras:
-            # replace whitespace with a single space
-            text = ' '.join(para.text.split())
-            detail += text + ' '
-
-        if not detail:  # if there were no <p> tag(s)
-            detail = td.text
-        detail = detail.strip()  # remove trailing NL
-        csvrow.append(detail)
-
+    csvrow = [cell_text(cell) for cell in row.cells]
     if not csvrow:
         return 1, csvrow
     if not _args.inhibit_upper:
-        try:
-            csvrow[0] = csvrow[0].upper()
-            csvrow[0] = re.sub(r'\s', '', csvrow[0])
-        except IndexError:
-            return 2, csvrow
-    # print(csvrow)
+        csvrow[0] = WHITESPACE_PAT.sub('', csvrow[0].upper())
     return 0, csvrow
 
 
-def one_table(table, outcsv):
-    global rowcount, tablenumber, outrowcount
-    rows = table.find_all('tr')
-    trace(1, 'table {}, rows: {}', tablenumber, len(rows))
-    for row in rows:
-        rowcount += 1
-        error, outrow = handle_one_row(row)
-        # ignore empty rows and title rows
-        if not error:
-            outrowcount += 1
-            outcsv.writerow(outrow)
-            trace(2, 'row {}, outrow {}', outrowcount, outrow)
-        else:  # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
-            trace(1, '----error {}: table {}, row {}, len={} {}',
-                  error, tablenumber, rowcount, len(outrow), outrow)
+def one_row(row, outcsv):
+    global rowcount, outrowcount
+    rowcount += 1
+    error, outrow = handle_one_row(row)
+    # ignore empty rows and title rows
+    if not error:
+        outrowcount += 1
+        outcsv.writerow(outrow)
+        trace(2, 'row {}, outrow {}', outrowcount, outrow)
+    else:  # elif not (len(outrow) == 1 and not outrow[0]):  # skip if just ['']
+        trace(1, '----error {}: table {}, row {}, len={} {}',
+              error, row.table, rowcount, len(outrow), outrow)
 
 
 def main():
@@ -84,14 +65,21 @@ def main():
     outcsv = opencsvwriter(_args.outfile)
     trace(1, 'Output: {}', _args.outfile)
     trace(1, "Encoding: {}", _args.encoding)
-    soup = Bs(htmlfile, 'html.parser')  # , 'html5lib')
-    tables = soup.find_all('table')
-    for table in tables:
-        tablenumber += 1
-        # print(f'_args.table: {_args.table}, tablenumber: {tablenumber}')
-        if _args.table and _args.table != tablenumber:
+    parser = TableParser(CELL_PAT)
+    tablerows = 0
+    for row in parser.rows(htmlfile):
+        # print(f'_args.table: {_args.table}, tablenumber: {row.table}')
+        if _args.table and _args.table != row.table:
             continue
-        one_table(table, outcsv)
+        if row.table != tablenumber:
+            if tablenumber:
+                trace(1, 'table {}, rows: {}', tablenumber, tablerows)
+            tablenumber = row.table
+            tablerows = 0
+        tablerows += 1
+        one_row(row, outcsv)
+    if tablenumber:
+        trace(1, 'table {}, rows: {}', tablenumber, tablerows)
     htmlfile.close()
 
 
@@ -6,6 +6,10 @@ The HTML file was created by saving a DOCX file as HTML.
 
 Input: full path to the HTML file
 Output: full path to the output CSV file.
+
+Each table is one record. The accession number is in the first paragraph of
+the first cell of the first row and the old and new locations are in the
+first two cells of the fourth row.
 """
 
 import argparse
@@ -13,11 +17,15 @@ import codecs
 import csv
 import re
 
-from bs4 import BeautifulSoup as Bs
+from utl.htmltables import TableParser
 
 DEFAULT_HTML_ENCODING = 'utf-8-sig'  # insert BOM at front
+ACCESSION_ROW = 0
+LOCATION_ROW = 3
 
-td_or_th_pat = re.compile('(td)|(th)')
+ACCESSION_PAT = re.compile(r'Accession\s+number')
+OLD_LOCATION_PAT = re.compile(r'Old\s+location')
+NEW_LOCATION_PAT = re.compile(r'New\s+location')
 
 
 def trace(level, template, *args):
@@ -31,30 +39,33 @@ def opencsvwriter(filename):
     return outcsv
 
 
-def one_table(table, outcsv):
-    global tablenumber, outrowcount
-    rows = table.find_all('tr')
-    trace(2, 'table {}, rows: {}', tablenumber, len(rows))
-
-    tds = rows[0].find_all('td')
-    field = tds[0].p.get_text()  # Accession number JB437
-    # print(f'field: "{field}"')
-    if 'Accession' not in field:
+def one_row(row, objectids, outcsv):
+    """
+    :param row: a Row from TableParser
+    :param objectids: a dict mapping the table number to the accession number
+                      found in the table's ACCESSION_ROW
+    """
+    global outrowcount
+    if row.number == ACCESSION_ROW:
+        field = row.cells[0].paras[0]  # Accession number JB437
+        # print(f'field: "{field}"')
+        if 'Accession' in field:
+            objectids[row.table] = ACCESSION_PAT.sub('', field).strip()
+        return
+    if row.number != LOCATION_ROW or row.table not in objectids:
         return
-    objectid = re.sub(r'Accession\s+number', '', field).strip()
+    objectid = objectids.pop(row.table)
     # print(f'objectid: "{objectid}"')
+    field = row.cells[0].paras[0]
+    oldloc = OLD_LOCATION_PAT.sub('', field).strip()
 
-    tds = rows[3].find_all('td')
-    field = tds[0].p.get_text()
-    oldloc = re.sub(r'Old\s+location', '', field).strip()
-
-    field = tds[1].p.get_text()
-    newloc = re.sub(r'New\s+location', '', field).strip()
+    field = row.cells[1].paras[0]
+    newloc = NEW_LOCATION_PAT.sub('', field).strip()
 
     outrow = [objectid, oldloc, newloc]
     outcsv.writerow(outrow)
     outrowcount += 1
-    trace(2, 'table {}, outrow {}', tablenumber, outrow)
+    trace(2, 'table {}, outrow {}', row.table, outrow)
 
 
 def main():
@@ -63,17 +74,22 @@ def main():
     trace(1, 'Input: {}', _args.infile)
     outcsv = opencsvwriter(_args.outfile)
     trace(1, 'Output: {}', _args.outfile)
-    soup = Bs(htmlfile, 'html.parser')  # , 'html5lib')
-    tables = soup.find_all('table')
-    for table in tables:
-        tablenumber += 1
-        trace(3, '_args.table: {}, tablenumber: {}', _args.table, tablenumber)
-        if _args.table and _args.table != tablenumber:
+    parser = TableParser('td')
+    objectids = {}
+    for row in parser.rows(htmlfile):
+        if row.number > LOCATION_ROW:
+            continue
+        if row.number == 0:
+            trace(3, '_args.table: {}, tablenumber: {}', _args.table,
+                  row.table)
+        if _args.table and _args.table != row.table:
             continue
-        if _args.skiptable >= tablenumber:
-            trace(2, 'Skipping tablenumber: {}', tablenumber)
+        if _args.skiptable >= row.table:
+            if row.number == 0:
+                trace(2, 'Skipping tablenumber: {}', row.table)
             continue
-        one_table(table, outcsv)
+        one_row(row, objectids, outcsv)
+    tablenumber = parser.ntables
     htmlfile.close()
 
 
@@ -1,62 +1,271 @@
 # -*- coding: utf-8 -*-
 """
-    Examine an XML file and report which tags contain text.
+    Profile the elements of the records in an XML file and write the result
+    as JSON.
+
+    For each full element path within a record, like
+    "Object/Identification/Title", and for each attribute, like
+    "Object/@elementtype", the profile has:
+
+        present:  the number of elements with this path
+        empty:    the number of them without text, only for elements
+                  without children
+        distinct: the estimated number of distinct values
+        minlen:   the length of the shortest value, stripped of leading and
+                  trailing whitespace
+        maxlen:   the length of the longest value
+        top:      the most frequent values as [value, count, error], where
+                  the true count is between count - error and count. Values
+                  longer than MAX_VALUE_LEN characters are truncated.
+
+    The distinct values and the most frequent values are kept in sketches of
+    a fixed size (see utl/sketch.py) so the memory used depends on the
+    number of paths and not on the size of the file. Without --jobs, each
+    record is profiled as it is found. With --jobs, the file is split into
+    shards of consecutive records that are profiled in parallel and the
+    profiles are merged, which needs a list of the positions of all the
+    records.
 """
 import argparse
-from collections import defaultdict
+import json
 import sys
+import time
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 
+from utl.colors import Fore, Style
+from utl.normalize import if_not_sphinx
+from utl.profiler import add_profile_arguments, start_profile
+from utl.sketch import HyperLogLog, SpaceSaving
+from utl.xmlscan import object_ranges, read_source, shards, source_encoding
+
+DEFAULT_TOPK = 10
+CAPACITY_FACTOR = 4  # the values counted for each of the top values reported
+MAX_VALUE_LEN = 100
+SHARDS_PER_JOB = 4
+
+_sources = {}  # filename -> the source, read once by each worker process
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+class PathStats:
+    """
+    The statistics of the elements or attributes with one path.
+    """
+    __slots__ = ('present', 'empty', 'minlen', 'maxlen', 'distinct', 'top')
+
+    def __init__(self, topk: int):
+        self.present = self.empty = 0
+        self.minlen = self.maxlen = None
+        self.distinct = HyperLogLog()
+        self.top = SpaceSaving(topk * CAPACITY_FACTOR)
+
+    def add(self, text: str | None):
+        """
+        :param text: the text of an element without children or the value
+                     of an attribute
+        """
+        self.present += 1
+        text = text.strip() if text else ''
+        if not text:
+            self.empty += 1
+            return
+        length = len(text)
+        if self.minlen is None or length < self.minlen:
+            self.minlen = length
+        if self.maxlen is None or length > self.maxlen:
+            self.maxlen = length
+        self.distinct.add(text)
+        self.top.add(text[:MAX_VALUE_LEN])
+
+    def merge(self, other: 'PathStats'):
+        self.present += other.present
+        self.empty += other.empty
+        for attr, choose in (('minlen', min), ('maxlen', max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr))
+                      if v is not None]
+            setattr(self, attr, choose(values) if values else None)
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+
+    def report(self, topk: int) -> dict:
+        nvalues = self.present - self.empty
+        return {'present': self.present, 'empty': self.empty,
+                'distinct': min(self.distinct.count(), nvalues),
+                'minlen': self.minlen, 'maxlen': self.maxlen,
+                'top': [list(t) for t in self.top.top(topk)]}
+
 
-def one_object(elt):
-    typecount[elt.attrib['elementtype']] +=1
-    for e in elt.iter():
-        if e.tag == 'Description':
-            try:
-                description_type_count[e.attrib['elementtype']] += 1
-            except KeyError:
-                pass
+def profile_record(elem, profile: dict, topk: int):
+    """
+    Add the elements and attributes of a record to the profile.
 
-        if e.text is not None:
-            tagcount[e.tag] += 1
+    :param elem: the record element
+    :param profile: a dict of path -> PathStats
+    :param topk: the number of most frequent values to report
+    """
+    pending = [(elem, elem.tag)]
+    while pending:
+        elem, path = pending.pop()
+        stats = profile.get(path)
+        if stats is None:
+            stats = profile[path] = PathStats(topk)
+        if len(elem):
+            stats.present += 1
+            pending.extend((child, f'{path}/{child.tag}')
+                           for child in reversed(elem))
+        else:
+            stats.add(elem.text)
+        for name, value in elem.attrib.items():
+            attrpath = f'{path}/@{name}'
+            stats = profile.get(attrpath)
+            if stats is None:
+                stats = profile[attrpath] = PathStats(topk)
+            stats.add(value)
+
+
+def profile_shard(task):
+    """
+    Profile a shard of the records in an XML file. This is the unit of work
+    handed to each process so it must not refer to the _args global.
+
+    :param task: a tuple of the filename, its encoding, the number of top
+                 values and a list of (start, end) as returned by
+                 object_ranges
+    :return: a tuple of the number of records and a dict of path -> PathStats
+    """
+    filename, encoding, topk, ranges = task
+    if filename not in _sources:
+        _sources[filename] = read_source(filename)
+    buf = _sources[filename]
+    profile = {}
+    for start, end in ranges:
+        elem = ET.fromstring(bytes(buf[start:end]).decode(encoding))
+        profile_record(elem, profile, topk)
+    return len(ranges), profile
+
+
+def profile_serial(buf, encoding: str) -> tuple[int, dict]:
+    """
+    Profile the records one at a time as they are found so that the memory
+    used doesn't grow with the number of records.
+
+    :return: a tuple of the number of records and a dict of path -> PathStats
+    """
+    nrecords = 0
+    profile = {}
+    for start, end in object_ranges(buf, _args.record):
+        elem = ET.fromstring(bytes(buf[start:end]).decode(encoding))
+        profile_record(elem, profile, _args.topk)
+        nrecords += 1
+    return nrecords, profile
+
+
+def profile_parallel(buf, encoding: str) -> tuple[int, dict]:
+    """
+    Split the records into shards and profile them in worker processes. The
+    list of record ranges is needed to make the shards.
+
+    :return: a tuple of the number of records and a dict of path -> PathStats
+    """
+    ranges = list(object_ranges(buf, _args.record))
+    tasks = [(_args.infile, encoding, _args.topk, shard)
+             for shard in shards(ranges, _args.jobs * SHARDS_PER_JOB)]
+    trace(2, '{} records in {} shards.', len(ranges), len(tasks))
+    del ranges
+    if len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # slow to import
+        executor = ProcessPoolExecutor(max_workers=_args.jobs)
+        results = executor.map(profile_shard, tasks)
+    else:
+        executor = None
+        results = map(profile_shard, tasks)
+    nrecords = 0
+    profile = {}
+    for count, shardprofile in results:
+        nrecords += count
+        for path, stats in shardprofile.items():
+            if path in profile:
+                profile[path].merge(stats)
+            else:
+                profile[path] = stats
+    if executor:
+        executor.shutdown()
+    return nrecords, profile
 
 
 def main():
-    for event, obj in ET.iterparse(infile):
-        if obj.tag != 'Object':
-            continue
-        one_object(obj)
-    for tag, count in sorted(tagcount.items()):
-        print(tag, count)
-    print('\n---elementtypes:')
-    for typ, count in sorted(typecount.items()):
-        print(typ, count)
-    print('\n---description_type_count:')
-    for typ, count in sorted(description_type_count.items()):
-        print(typ, count)
-
-
-def getargs():
+    buf = read_source(_args.infile)
+    encoding = source_encoding(buf)
+    if _args.jobs > 1:
+        nrecords, profile = profile_parallel(buf, encoding)
+    else:
+        nrecords, profile = profile_serial(buf, encoding)
+    del buf
+    report = {'infile': _args.infile, 'record': _args.record,
+              'records': nrecords,
+              'paths': {path: profile[path].report(_args.topk)
+                        for path in sorted(profile)}}
+    with open(_args.outfile, 'w', encoding='utf-8') as outfile:
+        json.dump(report, outfile, indent=2, ensure_ascii=False)
+    trace(1, '{} paths in {} records written to {}', len(profile), nrecords,
+          _args.outfile)
+    return nrecords
+
+
+def getparser():  # called either by getargs or sphinx
     parser = argparse.ArgumentParser(description='''
-        Scan an XML file and report which tags have text.
+        Profile the element paths and values of the records in an XML file
+        and write the profile as JSON.
         ''')
     parser.add_argument('infile', help='''
-        The XML file to scan.''')
-    # parser.add_argument('outfile', help='''
-    #     The output report file.''')
+        The XML file to scan. It may be compressed.''')
+    parser.add_argument('outfile', help='''
+        The JSON file to write.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of processes profiling records.''' +
+                        if_not_sphinx(''' The default is 1.''',
+                                      calledfromsphinx))
+    parser.add_argument('-k', '--topk', type=int, default=DEFAULT_TOPK,
+                        help='''
+        The number of most frequent values to report for each path.''' +
+                        if_not_sphinx(f''' The default is {DEFAULT_TOPK}.''',
+                                      calledfromsphinx))
+    parser.add_argument('-r', '--record', default='Object', help='''
+        The tag of the top level records.''' +
+                        if_not_sphinx(''' The default is "Object".''',
+                                      calledfromsphinx))
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
-    args = parser.parse_args()
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
     return args
 
 
+calledfromsphinx = True
+
 if __name__ == '__main__':
-    assert sys.version_info >= (3, 6)
-    description_type_count = defaultdict(int)
-    tagcount = defaultdict(int)
-    typecount = defaultdict(int)
-    _args = getargs()
-    infile = open(_args.infile)
-    main()
+    assert sys.version_info >= (3, 10)
+    calledfromsphinx = False
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'inventoryxml')
+    trace(1, 'Begin inventoryxml.', color=Fore.GREEN)
+    profiler.stop(main())
+    trace(1, 'End inventoryxml. Elapsed: {:5.2f} seconds.',
+          time.perf_counter() - t1, color=Fore.GREEN)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+    Check a Modes XML export before it is imported into Modes.
+
+    The structure of each Object is checked against the templates. The
+    templates folder contains files like those saved by Modes, each with a
+    template for one type of object. The schema is derived from them: the
+    Object elementtypes, the paths of the elements in each type of Object and
+    the elementtype attributes allowed on each path. The codes reported are:
+
+        E01  the Object isn't well-formed XML
+        E02  the Object has no accession number
+        E03  the accession number can't be normalized
+        E04  the accession number is a duplicate of an earlier Object
+        E05  the Object's elementtype isn't the type of any template
+        E06  a date is not in Modes format d.m.yyyy, m.yyyy or yyyy
+        W01  an element isn't in any template
+        W02  an element isn't in the template for the Object's elementtype
+        W03  an element's elementtype isn't in any template for its path
+
+    The export is split into shards of consecutive Objects without being
+    parsed, by the same scan that filter_xml.py and modes2sqlite.py use, and
+    with --jobs the shards are checked in parallel. Only the Objects are
+    parsed, not the text between them.
+
+    The exit status is 1 if there are any errors, or any warnings with
+    --strict.
+"""
+import argparse
+from collections import Counter
+import csv
+import json
+import os
+import sys
+import time
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+from xml.parsers.expat import ErrorString
+
+from utl.colors import Fore, Style
+from utl.normalize import datefrommodes, normalize_id, DEFAULT_MDA_CODE
+from utl.normalize import if_not_sphinx, sphinxify
+from utl.profiler import add_profile_arguments, start_profile
+from utl.xmlscan import read_source, scan_objects, shards, source_encoding
+
+DEFAULT_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'templates', 'pretty')
+ELEMENTTYPE = 'elementtype'
+DATE_TAGS = ('Date', 'DateBegin', 'DateEnd')
+# Date text that is allowed although it isn't a date.
+UNKNOWN_DATES = ('nk',)
+# Elementtype values written by the scripts but not found in the templates.
+EXTRA_ELEMENTTYPES = {'ObjectLocation': ('previous location',)}
+SHARDS_PER_JOB = 4
+ERRORS = {'E01': 'not well-formed', 'E02': 'missing accession number',
+          'E03': 'invalid accession number',
+          'E04': 'duplicate accession number', 'E05': 'unknown elementtype',
+          'E06': 'malformed date', 'W01': 'unknown element',
+          'W02': 'element not in template',
+          'W03': 'unknown element elementtype'}
+
+_sources = {}  # filename -> the source, read once by each worker process
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+def load_schema(templatedir: str) -> dict:
+    """
+    :param templatedir: the folder containing the template XML files
+    :return: a dict of:
+
+                 types:    the Object elementtype -> the set of the paths of
+                           the elements in the template, like
+                           "Identification/Title"
+                 paths:    the set of the paths in all of the templates
+                 subtypes: a path -> the set of the elementtype attributes
+                           of the elements with that path
+    """
+    types = {}
+    subtypes = {}
+    for filename in sorted(os.listdir(templatedir)):
+        if not filename.lower().endswith('.xml'):
+            continue
+        root = ET.parse(os.path.join(templatedir, filename)).getroot()
+        for obj in root.iter('Object'):
+            paths = types.setdefault(obj.get(ELEMENTTYPE), set())
+            pending = [(child, child.tag) for child in obj]
+            while pending:
+                elem, path = pending.pop()
+                paths.add(path)
+                if (elementtype := elem.get(ELEMENTTYPE)) is not None:
+                    subtypes.setdefault(path, set()).add(elementtype)
+                pending.extend((child, f'{path}/{child.tag}')
+                               for child in elem)
+    for path, elementtypes in EXTRA_ELEMENTTYPES.items():
+        subtypes.setdefault(path, set()).update(elementtypes)
+    return {'types': types, 'paths': set().union(*types.values()),
+            'subtypes': subtypes}
+
+
+def object_errors(idnum, elem, schema: dict, mdacode=DEFAULT_MDA_CODE) -> list:
+    """
+    Check the accession number, elementtypes, elements and dates of an
+    Object. Each problem is reported once for each path in the Object.
+
+    :param idnum: the accession number found by scan_objects or None
+    :param elem: the Object element
+    :param schema: the dict returned by load_schema
+    :param mdacode: the MDA code used in normalizing the accession number
+    :return: a list of (code, message) tuples, empty if the Object is valid
+    """
+    errors = []
+    if not idnum or not idnum.strip():
+        errors.append(('E02', 'No ObjectIdentity/Number'))
+    else:
+        try:
+            normalize_id(idnum.strip(), mdacode, verbose=0)
+        except ValueError:
+            errors.append(('E03', f'Invalid accession number: "{idnum}"'))
+    objecttype = elem.get(ELEMENTTYPE)
+    typepaths = schema['types'].get(objecttype)
+    if typepaths is None:
+        errors.append(('E05', f'Unknown Object elementtype: "{objecttype}"'))
+        typepaths = schema['paths']
+    allpaths = schema['paths']
+    subtypes = schema['subtypes']
+    reported = set()
+    # The elements within an element that is reported aren't checked.
+    pending = [(child, child.tag, True) for child in reversed(elem)]
+    while pending:
+        child, path, check = pending.pop()
+        if check and path not in typepaths:
+            if path in allpaths:
+                problem = ('W02', f'Element not in the "{objecttype}" '
+                                  f'template: {path}')
+            else:
+                problem = ('W01', f'Unknown element: {path}')
+            if problem not in reported:
+                reported.add(problem)
+                errors.append(problem)
+            check = False
+        pending.extend((grandchild, f'{path}/{grandchild.tag}', check)
+                       for grandchild in reversed(child))
+        elementtype = child.get(ELEMENTTYPE)
+        if (elementtype is not None and path in allpaths
+                and elementtype not in subtypes.get(path, ())):
+            problem = ('W03', f'Unknown elementtype of {path}: '
+                              f'"{elementtype}"')
+            if problem not in reported:
+                reported.add(problem)
+                errors.append(problem)
+        if child.tag in DATE_TAGS and len(child) == 0:
+            text = (child.text or '').strip()
+            if text and text not in UNKNOWN_DATES:
+                try:
+                    datefrommodes(text)
+                except ValueError:
+                    errors.append(('E06', f'Malformed date in {path}: '
+                                          f'"{text}"'))
+    return errors
+
+
+def lint_shard(task):
+    """
+    Check a shard of the Objects in an XML file. This is the unit of work
+    handed to each process so it must not refer to the _args global.
+
+    :param task: a tuple of the filename, its encoding, the schema, the MDA
+                 code and a list of (idnum, start, end) as returned by
+                 scan_objects
+    :return: a list of (idnum, line number, errors) in the same order as the
+             Objects, where the line number is that of the start of the
+             Object
+    """
+    filename, encoding, schema, mdacode, objects = task
+    if filename not in _sources:
+        _sources[filename] = read_source(filename)
+    buf = _sources[filename]
+    results = []
+    lineno = 1
+    pos = 0
+    for idnum, start, end in objects:
+        # Count the lines only as far as needed, one Object at a time.
+        lineno += bytes(buf[pos:start]).count(b'\n')
+        pos = start
+        chunk = bytes(buf[start:end])
+        try:
+            elem = ET.fromstring(chunk.decode(encoding))
+        except ET.ParseError as e:
+            line, column = e.position
+            results.append((idnum, lineno, [(
+                'E01', f'{ErrorString(e.code)}: line {lineno + line - 1}, '
+                       f'column {column}')]))
+            continue
+        except UnicodeDecodeError as e:
+            results.append((idnum, lineno, [('E01', str(e))]))
+            continue
+        results.append((idnum, lineno,
+                        object_errors(idnum, elem, schema, mdacode)))
+    return results
+
+
+def write_report(reportname, report: dict, counts: Counter):
+    """
+    Write the problems found as in location.py's validate command: a JSON
+    file with the totals, the count of each code and the problems of each
+    object if the filename ends with ".json" or otherwise a CSV file with
+    one row per problem.
+    """
+    if reportname.lower().endswith('.json'):
+        with open(reportname, 'w') as reportfile:
+            json.dump({'infile': _args.infile,
+                       'total_objects': counts['objects'],
+                       'total_failed': len(report),
+                       'counts': {code: counts[code] for code in ERRORS
+                                  if counts[code]},
+                       'objects': {key: [{'code': code, 'message': message}
+                                         for code, message in errors]
+                                   for key, errors in report.items()}},
+                      reportfile, indent=4)
+    else:
+        with open(reportname, 'w', newline='') as reportfile:
+            writer = csv.writer(reportfile)
+            writer.writerow(['Serial', 'Code', 'Message'])
+            for key, errors in report.items():
+                for code, message in errors:
+                    writer.writerow([key, code, message])
+    trace(1, 'Report written to: {}', reportname)
+
+
+def main():
+    schema = load_schema(_args.templates)
+    trace(2, '{} templates with {} element paths.', len(schema['types']),
+          len(schema['paths']))
+    buf = read_source(_args.infile)
+    encoding = source_encoding(buf)
+    objects = list(scan_objects(buf, encoding=encoding))
+    del buf
+    tasks = [(_args.infile, encoding, schema, _args.mdacode, shard)
+             for shard in shards(objects, _args.jobs * SHARDS_PER_JOB)]
+    trace(2, '{} objects in {} shards.', len(objects), len(tasks))
+    if _args.jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # slow to import
+        executor = ProcessPoolExecutor(max_workers=_args.jobs)
+        results = executor.map(lint_shard, tasks)
+    else:
+        executor = None
+        results = map(lint_shard, tasks)
+    counts = Counter()
+    report = {}  # "idnum" or "line n" -> errors
+    seen = {}  # normalized accession number -> line number
+    for shard in results:
+        for idnum, lineno, errors in shard:
+            counts['objects'] += 1
+            if idnum and idnum.strip():
+                try:
+                    nidnum = normalize_id(idnum.strip(), _args.mdacode,
+                                          verbose=0)
+                except ValueError:  # reported as E03
+                    nidnum = idnum.strip()
+                if nidnum in seen:
+                    errors.append(('E04', f'Duplicate of the Object at line '
+                                          f'{seen[nidnum]}'))
+                else:
+                    seen[nidnum] = lineno
+            if not errors:
+                continue
+            key = idnum.strip() if idnum and idnum.strip() else f'line {lineno}'
+            if key in report:
+                key = f'{key} (line {lineno})'
+            report[key] = errors
+            for code, message in errors:
+                counts[code] += 1
+                trace(1 if code.startswith('E') else 2, '{}: {} {}', key,
+                      code, message,
+                      color=Fore.RED if code.startswith('E') else None)
+    if executor:
+        executor.shutdown()
+    for code, description in ERRORS.items():
+        if counts[code]:
+            trace(1, '{} {}: {}', code, description, counts[code])
+    if _args.report:
+        write_report(_args.report, report, counts)
+    nerrors = sum(n for code, n in counts.items() if code.startswith('E'))
+    nwarnings = sum(n for code, n in counts.items() if code.startswith('W'))
+    return counts['objects'], nerrors, nwarnings
+
+
+def getparser():  # called either by getargs or sphinx
+    parser = argparse.ArgumentParser(description='''
+    Check the structure of the Objects in a Modes XML file against the
+    templates and check the accession numbers, elementtypes and dates.
+        ''')
+    parser.add_argument('infile', help='''
+        The XML file saved from Modes. It may be compressed.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of processes checking objects.''' +
+                        if_not_sphinx(''' The default is 1.''',
+                                      calledfromsphinx))
+    parser.add_argument('-m', '--mdacode', default=DEFAULT_MDA_CODE, help='''
+        Specify the MDA code, used in normalizing the accession number.''' +
+                        if_not_sphinx(f''' The default is
+                        "{DEFAULT_MDA_CODE}".''', calledfromsphinx))
+    parser.add_argument('--report', help='''
+        Write every problem found in every object to this file. If the
+        filename ends with ".json" the report is in JSON format including a
+        count of each code; otherwise it is a CSV file.
+        ''')
+    parser.add_argument('--strict', action='store_true', help='''
+        Exit with status 1 if there are warnings as well as if there are
+        errors.''')
+    parser.add_argument('-t', '--templates', default=DEFAULT_TEMPLATES,
+                        help=sphinxify('''
+        The folder containing the template XML files.''' + if_not_sphinx('''
+        The default is the templates/pretty folder of this repository.''',
+                                          calledfromsphinx), calledfromsphinx))
+    add_profile_arguments(parser)
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints the errors and a
+        summary. Set to 2 to also print the warnings.
+        ''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    return args
+
+
+calledfromsphinx = True
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 10)
+    calledfromsphinx = False
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'lint_xml')
+    trace(1, 'Begin lint_xml.', color=Fore.GREEN)
+    nobjects, n_errors, n_warnings = main()
+    profiler.stop(nobjects)
+    trace(1, 'End lint_xml. {} objects, {} errors, {} warnings. '
+          'Elapsed: {:5.2f} seconds.', nobjects, n_errors, n_warnings,
+          time.perf_counter() - t1, color=Fore.GREEN)
+    sys.exit(1 if n_errors or (_args.strict and n_warnings) else 0)
@@ -7,7 +7,8 @@
            CSV  Heading is required. The first column is the serial number
                 and the second column is the location. Typically, this was
                 produced by filtering the database by some prior criterion.
-        2. Optional output CSV file. If omitted, output is to STDOUT.
+        2. Optional output file. If omitted, output is to STDOUT. If the
+           name ends with ".xlsx", an XLSX file is written.
 """
 import argparse
 from collections import defaultdict
@@ -23,6 +24,7 @@ from utl.excel_cols import col2num
 from utl.normalize import normalize_id, denormalize_id
 from utl.normalize import sphinxify, if_not_sphinx
 from utl.readers import object_reader
+from utl.xlsxout import SheetWriter
 
 
 def pad_loc(loc):
@@ -97,6 +99,18 @@ def writerow(row):
         print(' '.join(row), file=outfile)
 
 
+def write_xlsx_box(box):
+    if xlsx.nrows:
+        xlsx.writerow([])
+    xlsx.writerow(['Box', unpad_loc(box)], style='heading')
+    for nnum in sorted(boxdict[box]):
+        title, briefdes = titledict[nnum]
+        row = [denormalize_id(nnum)]
+        if image_set:
+            row.append('scanned' if nnum in image_set else '')
+        xlsx.writerow(row + [title, briefdes])
+
+
 def main():
     scanned = 'scanned'
     notscanned = ' ' * len(scanned)
@@ -105,6 +119,9 @@ def main():
     else:
         handle_xml()
     for box in sorted(boxdict.keys()):
+        if xlsx:
+            write_xlsx_box(box)
+            continue
         writerow([''])
         writerow([''])
         writerow(['Box', unpad_loc(box)])
@@ -118,6 +135,8 @@ def main():
                          scanned if nnum in image_set else notscanned, comment])
             else:
                 writerow([f'{denormalize_id(nnum):15}', comment])
+    if xlsx:
+        xlsx.close()
 
 
 def getparser() -> argparse.ArgumentParser:
@@ -151,9 +170,9 @@ def getparser() -> argparse.ArgumentParser:
         The number of rows to skip at the front of the include file.''' +
                                                                     if_not_sphinx(f''' The default is 0.
         ''', called_from_sphinx))
-    parser.add_argument('-o', '--outfile', type=argparse.FileType('w'),
-                        default='-', help='''
-        The output CSV file.''')
+    parser.add_argument('-o', '--outfile', help='''
+        The output CSV or text file, or an XLSX file if the name ends with
+        ".xlsx". If omitted, the output is to STDOUT.''')
     parser.add_argument('-s', '--short', action='store_true', help='''
         Only process one object. For debugging.''')
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
@@ -193,8 +212,15 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
-    outfile = _args.outfile
-    if _args.outcsv:
+    xlsx = None
+    if _args.outfile and _args.outfile.lower().endswith('.xlsx'):
+        xlsx = SheetWriter(_args.outfile, widths=[15, 10, 50, 50])
+    elif _args.outfile:
+        outfile = open(_args.outfile, 'w', newline='' if _args.outcsv
+                       else None)
+    else:
+        outfile = sys.stdout
+    if _args.outcsv and not xlsx:
         writer = csv.writer(outfile)
     boxdict = defaultdict(list)
     titledict = dict()
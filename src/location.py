@@ -9,8 +9,10 @@ Exception: When updating a current location, a previous location element is
 created (unless the ``--patch`` option is selected).
 """
 import argparse
+import csv
+import json
 import time
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 from datetime import date
 import sys
 # noinspection PyPep8Naming
@@ -18,6 +20,9 @@ import xml.etree.ElementTree as ET
 import utl.normalize as nd
 from utl.cfgutil import expand_idnum
 from utl.readers import row_dict_reader
+from utl.profiler import add_profile_arguments, start_profile
+from utl.xmlscan import VerbatimWriter
+from utl.zipmagic import COMPRESSIONS, open_output, openfile, output_name
 
 NORMAL_LOCATION = 'normal location'
 CURRENT_LOCATION = 'current location'
@@ -174,15 +179,21 @@ def handle_diff(idnum, elem):
                 trace(1, '     {}: Moving from normal location ({})', idnum, norm_loctext)
 
 
-def validate_locations(idnum, elem, strict=True):
+def location_errors(idnum, elem, strict=True):
     """
+    Check the ObjectLocation elements of an Object, collecting every error
+    found instead of stopping at the first one.
+
     :param idnum:
     :param elem: The Object element
     :param strict: If False, allow gaps in the dates of the current and
     previous locations
-    :return: True if valid, False otherwise
+    :return: a list of (code, message) tuples, empty if the locations are
+             valid. The code is "E01" through "E14".
     """
+    errors = []
     numnormal = numcurrent = 0
+    current_ok = True  # False if the current location's date is unusable
     objlocs = elem.findall('./ObjectLocation')
     #
     # locationdates will contain tuples of Date objects of (begindate, enddate)
@@ -191,97 +202,128 @@ def validate_locations(idnum, elem, strict=True):
     for ol in objlocs:
         datebeginelt = ol.find('./Date/DateBegin')
         dateendelt = ol.find('./Date/DateEnd')
+        datebegintext = datebeginelt.text if datebeginelt is not None else None
         loctype = ol.get(ELEMENTTYPE)
         if loctype == NORMAL_LOCATION:
             numnormal += 1
         elif loctype == CURRENT_LOCATION:
             loc = ol.find('./Location')
             if loc is None:
-                trace(1, 'E10 {}: Missing ObjectLocation/Location element',
-                      idnum)
-                return False
+                numcurrent += 1
+                current_ok = False
+                errors.append(('E14', f'{idnum}: Missing ObjectLocation/'
+                                      f'Location element'))
+                continue
             # Skip the validation if the current location is empty. This can
             # happen after adding a new object.
             if not loc.text:
-                return True
+                return errors
             numcurrent += 1
-            if datebeginelt is None or datebeginelt.text is None:
-                trace(1, 'E01 {}: No DateBegin for current location', idnum)
-                return False
+            if datebegintext is None:
+                errors.append(('E01', f'{idnum}: No DateBegin for current '
+                                      f'location'))
+                current_ok = False
+                continue
             try:
-                datebegindate, _ = nd.datefrommodes(datebeginelt.text)
+                datebegindate, _ = nd.datefrommodes(datebegintext)
             except (ValueError, TypeError):
-                trace(1,
-                      'E02 {}: Invalid DateBegin for current location: "{}".',
-                      idnum, datebeginelt.text)
-                return False
+                errors.append(('E02', f'{idnum}: Invalid DateBegin for current '
+                                      f'location: "{datebegintext}".'))
+                current_ok = False
+                continue
             if dateendelt is not None and dateendelt.text:
-                trace(1,
-                      'E03 {}: DateEnd not allowed for current location: "{}".',
-                      idnum, dateendelt.text)
-                return False
+                errors.append(('E03', f'{idnum}: DateEnd not allowed for '
+                                      f'current location: "{dateendelt.text}".'))
+                current_ok = False
+                continue
             # None indicates this is current:
             locationdates.append((datebegindate, None))
         elif loctype == PREVIOUS_LOCATION:
             try:
-                datebegindate, _ = nd.datefrommodes(datebeginelt.text)
+                datebegindate, _ = nd.datefrommodes(datebegintext)
             except (ValueError, TypeError):
-                trace(1,
-                      'E04 {}: Invalid DateBegin for previous location: "{}".',
-                      idnum, datebeginelt.text)
-                return False
+                errors.append(('E04', f'{idnum}: Invalid DateBegin for previous'
+                                      f' location: "{datebegintext}".'))
+                continue
             if dateendelt is None or not dateendelt.text:
-                trace(1, 'E05 {}: Missing DateEnd for previous location.',
-                      idnum)
-                return False
+                errors.append(('E05', f'{idnum}: Missing DateEnd for previous '
+                                      f'location.'))
+                continue
             try:
                 dateenddate, _ = nd.datefrommodes(dateendelt.text)
             except (ValueError, TypeError):
-                trace(1,
-                      'E06 {}: Invalid DateEnd for previous location: "{}".',
-                      idnum, dateendelt.text)
-                return False
+                errors.append(('E06', f'{idnum}: Invalid DateEnd for previous '
+                                      f'location: "{dateendelt.text}".'))
+                continue
             locationdates.append((datebegindate, dateenddate))
         else:
-            trace(1, 'E07 {}: Unexpected ObjectLocation elementtype = "{}".',
-                  idnum, loctype)
-            return False
+            errors.append(('E07', f'{idnum}: Unexpected ObjectLocation '
+                                  f'elementtype = "{loctype}".'))
     if numnormal != 1:
-        trace(1, 'E08 {}: Expected one normal location, got {}',
-              idnum, numnormal)
-        return False
+        errors.append(('E08', f'{idnum}: Expected one normal location, got '
+                              f'{numnormal}'))
     if numcurrent != 1:
-        trace(1, 'E09 {}: Expected one current location, got {}',
-              idnum, numcurrent)
-        return False
-    if len(locationdates) == 1:
-        return True  # There are no previous locations
+        errors.append(('E09', f'{idnum}: Expected one current location, got '
+                              f'{numcurrent}'))
+        # The date checks below assume exactly one open-ended location.
+        return errors
+    if not current_ok:
+        # The current location has no date to compare with the others.
+        return errors
+    if len(locationdates) <= 1:
+        return errors  # There are no previous locations
 
     # Check that the youngest date is the current location and that there is
     # no overlap.
     locationdates.sort(key=lambda x: x[0], reverse=True)
     if locationdates[0][1] is not None:  # should not have an end date
-        trace(1, 'E10 {}: current location is not the youngest.', idnum)
-        return False
+        errors.append(('E10', f'{idnum}: current location is not the '
+                              f'youngest.'))
+        return errors
     prevbegin, prevend = locationdates[0]
     for nxtbegin, nxtend in locationdates[1:]:
         if nxtend < nxtbegin:
-            trace(1, 'E11 {}: end date {} is younger than begin date {}.',
-                  idnum, nxtbegin.isoformat(), nxtend.isoformat())
-            return False
+            errors.append(('E11', f'{idnum}: end date {nxtbegin.isoformat()} '
+                                  f'is younger than begin date '
+                                  f'{nxtend.isoformat()}.'))
         if nxtend != prevbegin:
             if strict:
-                trace(1, 'E12 {}: begin date "{}" not equal to previous end '
-                         'date "{}".',
-                      idnum, str(prevbegin), str(nxtend))
-                return False
+                errors.append(('E12', f'{idnum}: begin date "{prevbegin}" not '
+                                      f'equal to previous end date '
+                                      f'"{nxtend}".'))
             elif nxtend > prevbegin:
-                trace(1, 'E13 {}: Younger begin date "{}" overlaps with end '
-                         'date. "{}".',
-                      idnum, str(prevbegin), str(nxtend))
-                return False
+                errors.append(('E13', f'{idnum}: Younger begin date '
+                                      f'"{prevbegin}" overlaps with end date. '
+                                      f'"{nxtend}".'))
         prevbegin = nxtbegin
-    return True
+    return errors
+
+
+def validate_locations(idnum, elem, strict=True):
+    """
+    :param idnum:
+    :param elem: The Object element
+    :param strict: If False, allow gaps in the dates of the current and
+    previous locations
+    :return: True if valid, False otherwise
+    """
+    errors = location_errors(idnum, elem, strict)
+    for code, message in errors:
+        trace(1, '{} {}', code, message)
+    return not errors
+
+
+def validate_batch(batch):
+    """
+    Run location_errors over a batch of serialized Object elements. This is
+    the unit of work handed to each process by validate_parallel() so it must
+    not refer to the _args global.
+
+    :param batch: a list of (idnum, bytes) tuples
+    :return: a list of (idnum, errors) tuples in the same order as the input
+    """
+    return [(idnum, location_errors(idnum, ET.fromstring(objstr)))
+            for idnum, objstr in batch]
 
 
 def update_normal_location(ol, idnum):
@@ -522,7 +564,7 @@ def handle_update(idnum, elem):
     """
 
     global total_updated, total_written
-    updated = False
+    updated = modified = False
     nidnum = nd.normalize_id(idnum)
     if nidnum in newlocs:  # newlocs: list returned by loadcsv()
         if not validate_locations(idnum, elem):
@@ -540,6 +582,7 @@ def handle_update(idnum, elem):
         if _args.delete_previous:
             delete_previous(elem, idnum)
         del newlocs[nidnum]
+        modified = True  # Possibly changed so never copy the source bytes.
     else:
         if _args.warn:
             trace(1, '{}: Not in CSV file', idnum)
@@ -547,32 +590,105 @@ def handle_update(idnum, elem):
         trace(1, 'Failed post-update validation.')
         sys.exit(1)
     if outfile:
-        outfile.write(ET.tostring(elem, encoding='utf-8'))
+        objwriter.write(elem, modified)
     if updated:
         if deltafile:
             deltafile.write(ET.tostring(elem, encoding='utf-8'))
         total_written += 1
 
 
-def handle_validate(idnum, elem):
+def record_errors(idnum, errors):
+    """
+    Accumulate the errors found in one object for the --report file and the
+    final summary.
+    """
     global total_failed, total_objects
     total_objects += 1
-    valid = validate_locations(idnum, elem)
-    if not valid:
-        total_failed += 1
+    if not errors:
+        return
+    total_failed += 1
+    for code, message in errors:
+        trace(1, '{} {}', code, message)
+        error_counts[code] = error_counts.get(code, 0) + 1
+    object_errors[idnum] = errors
+
+
+def handle_validate(idnum, elem):
+    record_errors(idnum, location_errors(idnum, elem))
+
+
+def validate_parallel():
+    """
+    Serialize the objects into batches and run location_errors over the
+    batches in --jobs processes. The results are returned in input order so
+    the report is the same as a single process run.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # slow to import
+    batches = []
+    batch = []
+    for event, elem in ET.iterparse(infile):
+        if elem.tag != 'Object':
+            continue
+        idelem = elem.find('./ObjectIdentity/Number')
+        idnum = idelem.text.upper() if idelem is not None else None
+        batch.append((idnum, ET.tostring(elem, encoding='utf-8')))
+        elem.clear()
+        if len(batch) >= _args.batchsize:
+            batches.append(batch)
+            batch = []
+        if _args.short:
+            break
+    if batch:
+        batches.append(batch)
+    trace(2, 'Validating {} batches in {} processes.', len(batches),
+          _args.jobs)
+    with ProcessPoolExecutor(max_workers=_args.jobs) as executor:
+        for results in executor.map(validate_batch, batches):
+            for idnum, errors in results:
+                record_errors(idnum, errors)
+
+
+def write_report(reportname):
+    """
+    Write the errors found by the validate command. If the filename ends with
+    ".json", write a dictionary with the totals, the count of each error code,
+    and the list of errors for each object. Otherwise write a CSV file with
+    one row per error. Nothing time dependent is written so that reports from
+    successive runs can be compared with diff.
+    """
+    if reportname.lower().endswith('.json'):
+        report = {'infile': _args.infile,
+                  'total_objects': total_objects,
+                  'total_failed': total_failed,
+                  'counts': dict(sorted(error_counts.items())),
+                  'objects': {idnum: [{'code': code, 'message': message}
+                                      for code, message in errors]
+                              for idnum, errors in object_errors.items()}}
+        with open(reportname, 'w') as reportfile:
+            json.dump(report, reportfile, indent=4)
+    else:
+        with open(reportname, 'w', newline='') as reportfile:
+            writer = csv.writer(reportfile)
+            writer.writerow(['Serial', 'Code', 'Message'])
+            for idnum, errors in object_errors.items():
+                for code, message in errors:
+                    writer.writerow([idnum, code, message])
+    trace(1, 'Report written to: {}', reportname)
 
 
 def handle_select(idnum, elem):
     if idnum in newlocs:  # newlocs: list returned by loadcsv()
         del newlocs[idnum]
-        outfile.write(ET.tostring(elem, encoding='utf-8'))
+        objwriter.write(elem, modified=False)
+    else:
+        objwriter.skip()
     return
 
 
 def main():
     if _args.infile:
         trace(1, 'Input XML file: {}', _args.infile)
-    if _args.mapfile:
+    if not is_validate and _args.mapfile:
         trace(1, 'Input data file: {}', _args.mapfile)
     if outfile:
         trace(1, 'Output XML file: {}', _args.outfile)
@@ -580,6 +696,9 @@ def main():
     if deltafile:
         deltafile.write(b'<?xml version="1.0" encoding="utf-8"?><Interchange>\n')
         trace(1, 'Delta XML file: {}', _args.outfile)
+    if is_validate and _args.jobs > 1:
+        validate_parallel()
+        return
     for event, elem in ET.iterparse(infile):
         if elem.tag != 'Object':
             continue
@@ -590,10 +709,13 @@ def main():
         _args.func(idnum, elem)
         if _args.short:
             break
+    # Close explicitly so that a compressed file is complete.
     if outfile:
         outfile.write(b'</Interchange>')
+        outfile.close()
     if deltafile:
         deltafile.write(b'</Interchange>')
+        deltafile.close()
     if not _args.short:  # Skip warning if only processing one object.
         for nidnum in newlocs:
             trace(1, '{}: In CSV but not XML, ignored.', nd.denormalize_id(nidnum))
@@ -622,6 +744,11 @@ def add_arguments(parser, command):
     if is_select:
         parser.add_argument('-o', '--outfile', required=True, help='''
             The output XML file containing all objects.''')
+    if is_update or is_select:
+        parser.add_argument('--compress', choices=COMPRESSIONS, help='''
+            Compress the output files with this method, adding the suffix to
+            the filename if it isn't there. The default is to compress if the
+            filename ends with .gz, .bz2, .xz or .zst.''')
     if is_update or is_diff:
         parser.add_argument('--col_acc', type=str, default='Serial', help='''
         The heading of the column containing the accession number of the
@@ -698,6 +825,20 @@ def add_arguments(parser, command):
         ''')
     parser.add_argument('--encoding', default='utf-8', help='''
         Set the input encoding. Default is utf-8. Output is always utf-8.
+        The input file may be compressed with zip, gzip, bzip2, xz or zstd.
+        ''')
+    if is_validate:
+        parser.add_argument('--batchsize', type=int, default=500, help='''
+        The number of objects sent to a process at a time if --jobs is
+        greater than one. The default is 500.
+        ''')
+        parser.add_argument('--jobs', type=int, default=1, help='''
+        Validate the objects using this many processes. The default is 1.
+        ''')
+        parser.add_argument('--report', help='''
+        Write every error found in every object to this file. If the filename
+        ends with ".json" the report is in JSON format including a count of
+        each error code; otherwise it is a CSV file.
         ''')
     if is_update:
         parser.add_argument('-f', '--force', action='store_true', help='''
@@ -711,6 +852,12 @@ def add_arguments(parser, command):
         If a new date to be applied to a current location is older than the
         existing date, the date will be applied instead of causing a fatal error.
         ''')
+    if is_update or is_select:
+        parser.add_argument('--verbatim', action='store_true', help='''
+        Copy objects that are not modified to the output file exactly as they
+        are in the input file instead of re-serializing them. This is faster
+        when only a few objects are updated.
+        ''')
     if is_update or is_diff or is_select:
         map_group = parser.add_mutually_exclusive_group(required=True)
         map_group.add_argument('-j', '--object', help=nd.sphinxify('''
@@ -780,6 +927,7 @@ def add_arguments(parser, command):
         Only process a single object. For debugging.''')
     parser.add_argument('-s', '--skiprows', type=int, default=0, help='''
         Number of lines to skip at the start of the CSV file''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -812,7 +960,8 @@ def getparser():
     validate_parser = subparsers.add_parser('validate', description='''
     Run the validate_locations function against the input file. This validates
     all locations and ignores the -c, -n, and -p options. This checks that
-    dates exist and do not overlap.
+    dates exist and do not overlap. All of the errors in each object are
+    reported, not just the first.
     ''')
     diff_parser.set_defaults(func=handle_diff)
     select_parser.set_defaults(func=handle_select)
@@ -863,6 +1012,7 @@ if __name__ == '__main__':
     is_update = sys.argv[1] == 'update'
     is_validate = sys.argv[1] == 'validate'
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'location')
     verbose = _args.verbose
     if is_update:
         new_loc_date, _ = nd.datefrommodes(_args.date)
@@ -884,13 +1034,18 @@ if __name__ == '__main__':
     total_in_csvfile = len(newlocs)
     total_updated = total_written = total_diff = 0
     total_failed = total_objects = 0  # validate only
-    infile = open(_args.infile, encoding=_args.encoding)
+    error_counts = {}  # validate only: error code -> count
+    object_errors = {}  # validate only: idnum -> list of (code, message)
+    infile = openfile(_args.infile, encoding=_args.encoding)
     outfile = deltafile = None
-    if _args.outfile:
-        outfile = open(_args.outfile, 'wb')
+    if (is_update or is_select) and _args.outfile:
+        _args.outfile = output_name(_args.outfile, _args.compress)
+        outfile = open_output(_args.outfile)
         trace(1, 'Creating output file: {}', _args.outfile)
-    if _args.deltafile:
-        deltafile = open(_args.deltafile, 'wb')
+        objwriter = VerbatimWriter(_args.infile, outfile, _args.verbatim)
+    if is_update and _args.deltafile:
+        _args.deltafile = output_name(_args.deltafile, _args.compress)
+        deltafile = open_output(_args.deltafile)
         trace(1, 'Creating delta file: {}', _args.deltafile)
     main()
     if is_update:
@@ -898,8 +1053,13 @@ if __name__ == '__main__':
               f'Total Written: {total_written}')
     elif is_validate:
         print(f'Total failed: {total_failed}/{total_objects}.')
+        for errcode in sorted(error_counts):
+            print(f'    {errcode}: {error_counts[errcode]}')
+        if _args.report:
+            write_report(_args.report)
     elif is_diff:
         print(f'Total different: {total_diff}/{total_in_csvfile}')
     elapsed = time.perf_counter() - t1
     trace(1, 'End location {}.  Elapsed: {:5.2f} seconds.', _args.subp,
           elapsed, color=Fore.GREEN)
+    profiler.stop(total_objects if is_validate else total_written)
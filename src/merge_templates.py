@@ -4,29 +4,16 @@
 
 """
 import argparse
-from inspect import getframeinfo, stack
 import os.path
 import sys
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
-from colorama import Fore, Style
+from utl.colors import Fore
+from utl.trace import RunStats, add_stats_argument, trace_sub
 
 
 def trace(level, template, *args, color=None):
-    if _args.verbose >= level:
-        if _args.verbose > 1:
-            caller = getframeinfo(stack()[1][0])
-            print(f'{os.path.basename(caller.filename)} line {caller.lineno}: ', end='')
-        if color:
-            if len(args) == 0:
-                print(f'{color}{template}{Style.RESET_ALL}')
-            else:
-                print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
-        else:
-            if len(args) == 0:
-                print(template)
-            else:
-                print(template.format(*args))
+    trace_sub(level, _args.verbose, template, color, args)
 
 
 def main():
@@ -37,13 +24,19 @@ def main():
         if not filename.lower().endswith('.xml'):
             continue
         infile = open(os.path.join(_args.indir, filename))
-        roottree = ET.parse(infile)
+        with stats.phase('parse'):
+            roottree = ET.parse(infile)
         templates = roottree.getroot()
         if templates.tag != 'templates':
             print(f'Unexpected root tag: {templates.tag} in file {filename}')
             sys.exit(1)
+        stats.count('files')
         for template in templates.findall('./template'):
-            outfile.write(ET.tostring(template, encoding=_args.encoding))
+            with stats.phase('serialize'):
+                xml = ET.tostring(template, encoding=_args.encoding)
+            with stats.phase('write'):
+                outfile.write(xml)
+            stats.count('templates')
             template.clear()
         templates.clear()
         infile.close()
@@ -62,6 +55,7 @@ def getargs():
     parser.add_argument('-e', '--encoding', default='utf-8', help='''
         Set the output encoding. The default is "utf-8".
         ''')
+    add_stats_argument(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -76,5 +70,7 @@ if __name__ == '__main__':
     _args = getargs()
     trace(1, "Begin {}.", os.path.basename(sys.argv[0]), color=Fore.GREEN)
     outfile = open(_args.outfile, 'wb')
+    stats = RunStats()
     main()
     trace(1, "End {}.", os.path.basename(sys.argv[0]), color=Fore.GREEN)
+    stats.report(_args.stats)
@@ -3,34 +3,22 @@
     Merge two XML files.
 """
 import argparse
-from inspect import getframeinfo, stack
-import os.path
 import sys
 import time
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 
-from colorama import Fore, Style
+from utl.colors import Fore
 
 from utl.cfgutil import Config
 from utl.normalize import normalize_id
+from utl.trace import RunStats, add_stats_argument, trace_sub
+from utl.xmlscan import read_source, scan_objects, source_encoding
+from utl.xmlscan import VERBATIM_ENCODINGS
 
 
 def trace(level, template, *args, color=None):
-    if _args.verbose >= level:
-        if _args.verbose > 1:
-            caller = getframeinfo(stack()[1][0])
-            print(f'{os.path.basename(caller.filename)} line {caller.lineno}: ', end='')
-        if color:
-            if len(args) == 0:
-                print(f'{color}{template}{Style.RESET_ALL}')
-            else:
-                print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
-        else:
-            if len(args) == 0:
-                print(template)
-            else:
-                print(template.format(*args))
+    trace_sub(level, _args.verbose, template, color, args)
 
 
 def onefile(infile):
@@ -61,12 +49,44 @@ def onefile(infile):
             sys.exit(1)
         iddict[nidnum] = idnum
         trace(2, 'Creating iddict[{}] = {}, des = {}', nidnum, idnum, des)
-        outfile.write(ET.tostring(oldobject, encoding=_args.encoding))
+        with stats.phase('serialize'):
+            xml = ET.tostring(oldobject, encoding=_args.encoding)
+        with stats.phase('write'):
+            outfile.write(xml)
         written += 1
         oldobject.clear()
     return written
 
 
+def onefile_verbatim(filename):
+    """
+    Copy the Objects in one file without parsing them. Only a duplicate
+    Object is parsed, to report its BriefDescription.
+    """
+    written = 0
+    buf = read_source(filename)
+    if source_encoding(buf) not in VERBATIM_ENCODINGS:
+        raise ValueError(f'--verbatim requires utf-8 input: {filename}')
+    for idnum, start, end in scan_objects(buf, cfg.record_tag,
+                                          cfg.record_id_xpath):
+        if not idnum:
+            raise ValueError('Empty accession ID; aborting. Check output file for last'
+                             ' good record.')
+        nidnum = normalize_id(idnum)
+        if nidnum in iddict:
+            des = ET.fromstring(buf[start:end]).find('Identification/BriefDescription')
+            des = des.text if des is not None else "***Missing BriefDescription***"
+            print(f'Duplicate ID: original: iddict[{nidnum}] = {idnum}, {des=}')
+            print('Aborting.')
+            sys.exit(1)
+        iddict[nidnum] = idnum
+        trace(2, 'Creating iddict[{}] = {}', nidnum, idnum)
+        with stats.phase('write'):
+            outfile.write(buf[start:end])
+        written += 1
+    return written
+
+
 def s(i: int):
     return '' if i == 1 else 's'
 
@@ -78,11 +98,16 @@ def main():
     outfile.write(b'<Interchange>\n')
     total = 0
     for nfile, filename in enumerate(_args.infile, start=1):
-        infile = open(filename)
-        count = onefile(infile)
-        infile.close()
+        with stats.phase('parse'):
+            if _args.verbatim:
+                count = onefile_verbatim(filename)
+            else:
+                infile = open(filename)
+                count = onefile(infile)
+                infile.close()
         print(f'{count} object{s(count)} from file {nfile}: {filename}')
         total += count
+        stats.count('objects', count)
 
     outfile.write(b'</Interchange>')
     elapsed = time.perf_counter() - t1
@@ -101,10 +126,17 @@ def getargs():
     parser.add_argument('-e', '--encoding', default='utf-8', help='''
         Set the output encoding. The default is "utf-8".
         ''')
+    parser.add_argument('--verbatim', action='store_true', help='''
+        Copy the objects exactly as they are in the input files instead of
+        re-serializing them. This is much faster. The input files and the
+        output encoding must be utf-8 or ASCII.''')
+    add_stats_argument(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
     args = parser.parse_args()
+    if args.verbatim and args.encoding.lower() not in VERBATIM_ENCODINGS:
+        parser.error('--verbatim requires utf-8 output.')
     return args
 
 
@@ -118,5 +150,7 @@ if __name__ == '__main__':
     iddict = {}
     cfg = Config()
     outfile = open(_args.outfile, 'wb')
+    stats = RunStats()
     main()
     trace(1, f'End merge_xml', color=Fore.GREEN)
+    stats.report(_args.stats)
@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+"""
+    Answer queries about a Modes XML file from a long-running server so that
+    the file is parsed once instead of once per query.
+
+    ``modes.py serve`` loads the XML file into memory and listens on a local
+    TCP port or a Unix socket. It checks the file every few seconds and
+    reloads it if it has changed. The other commands are a thin client that
+    sends one query to the server and prints or writes the result:
+
+    where:  list the locations of objects
+    box:    list the objects in a current or normal location
+    export: write a CSV file as xml2csv.py does
+    select: write the selected objects to an XML file as "location.py select"
+    status: show the file being served
+    stop:   stop the server
+
+    The client and server talk HTTP with JSON requests. Only the server
+    imports the modules needed to parse XML and read configs.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from utl.colors import Fore, Style
+from utl.normalize import sphinxify, if_not_sphinx, DEFAULT_MDA_CODE
+
+DEFAULT_PORT = 8765
+XML_HEADER = b'<?xml version="1.0" encoding="utf-8"?><Interchange>\n'
+XML_TRAILER = b'</Interchange>'
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+# ---------------------------------------------------------------------------
+# Server
+
+
+def expand_ids(index, idnums: list[str]) -> list[str]:
+    """
+    :param index: the CollectionIndex
+    :param idnums: accession numbers, which may be ranges like JB001-002
+    :return: the normalized accession numbers, without duplicates
+    """
+    from utl.cfgutil import expand_idnum
+    nidnums = {}
+    for idnum in idnums:
+        for objid in expand_idnum(idnum):
+            nidnums[index.normalize(objid)] = None
+    return list(nidnums)
+
+
+def get_config(server, cfgfile):
+    """
+    Configs are built once and kept until the file is modified.
+
+    :param server: the QueryServer whose config cache is used
+    :param cfgfile: the absolute path of the YAML config or None
+    :return: the Config
+    """
+    from utl.cfgutil import Config
+    mtime = os.stat(cfgfile).st_mtime_ns if cfgfile else None
+    cached = server.configs.get(cfgfile)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    Config.reset_config()
+    if cfgfile:
+        with open(cfgfile) as yamlfile:
+            config = Config(yamlfile, verbos=0)
+    else:
+        config = Config(verbos=0)
+    server.configs[cfgfile] = (mtime, config)
+    trace(1, 'Config loaded: {}', cfgfile)
+    return config
+
+
+def query_where(server, request):
+    from utl.cfgutil import expand_idnum
+    index = server.index
+    return {objid: index.locations(objid)
+            for idnum in request['ids'] for objid in expand_idnum(idnum)}
+
+
+def query_box(server, request):
+    from utl.collectionindex import NORMAL_LOCATION, CURRENT_LOCATION
+    loctype = NORMAL_LOCATION if request.get('normal') else CURRENT_LOCATION
+    return server.index.objects_at(request['location'], loctype)
+
+
+def query_export(server, request):
+    from utl.cfgutil import yaml_fieldnames
+    from xml2csv import object_row, sort_rows
+    index = server.index
+    config = get_config(server, request.get('cfgfile'))
+    exclude = request.get('exclude', False)
+    missing = []
+    if request.get('ids') is None:
+        includes = None
+        nidnums = index.objects
+    else:
+        includes = dict.fromkeys(expand_ids(index, request['ids']))
+        if exclude:
+            nidnums = index.objects
+        else:
+            nidnums = [nidnum for nidnum in includes
+                       if nidnum in index.objects]
+            missing = [index.denormalize(nidnum) for nidnum in includes
+                       if nidnum not in index.objects]
+    rows = []
+    notfound = 0
+    for nidnum in nidnums:
+        elem = index.element(nidnum)
+        if not config.select(elem, includes, exclude=exclude):
+            continue
+        data, missingcols = object_row(config, elem, nidnum, index.mdacode)
+        notfound += len(missingcols)
+        if data is not None:
+            rows.append(data)
+    sort_rows(config, rows, index.mdacode)
+    return {'titles': yaml_fieldnames(config),
+            'delimiter': config.delimiter,
+            'rows': rows,
+            'nobjects': len(nidnums),
+            'notfound': notfound,
+            'missing': missing}
+
+
+def query_select(server, request):
+    """
+    :return: the XML document as bytes, with the objects in the order in the
+             XML file.
+    """
+    index = server.index
+    nidnums = [nidnum for nidnum in expand_ids(index, request['ids'])
+               if nidnum in index.objects]
+    nidnums.sort(key=lambda n: index.objects[n][1])
+    return b''.join([XML_HEADER] + [index.object_bytes(nidnum)
+                                    for nidnum in nidnums] + [XML_TRAILER])
+
+
+def query_status(server, _request):
+    index = server.index
+    return {'infile': index.filename,
+            'objects': len(index),
+            'duplicates': len(index.duplicates),
+            'loaded': time.strftime('%Y-%m-%d %H:%M:%S',
+                                    time.localtime(server.loadtime)),
+            'loadseconds': round(server.loadseconds, 2),
+            'queries': server.nqueries}
+
+
+def query_stop(server, _request):
+    import threading
+    # shutdown() waits for serve_forever() to return so it can't be called
+    # from the thread handling the request.
+    threading.Thread(target=server.shutdown).start()
+    return {'stopped': True}
+
+
+QUERIES = {'where': query_where,
+           'box': query_box,
+           'export': query_export,
+           'select': query_select,
+           'status': query_status,
+           'stop': query_stop}
+
+
+def make_handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            query = self.path.strip('/')
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                self.reply(400, {'error': f'Invalid request: {e}'})
+                return
+            if not isinstance(request, dict):
+                self.reply(400, {'error': 'Invalid request: not a JSON '
+                                          'object'})
+                return
+            func = QUERIES.get(query)
+            if func is None:
+                self.reply(404, {'error': f'Unknown query: {query}'})
+                return
+            t1 = time.perf_counter()
+            try:
+                result = func(self.server, request)
+            except (KeyError, OSError, TypeError, ValueError) as e:
+                # Most likely a request with a missing or wrongly typed value.
+                self.reply(400, {'error': f'{type(e).__name__}: {e}'})
+                return
+            except Exception as e:  # noqa: reply rather than drop the connection
+                self.reply(500, {'error': f'{type(e).__name__}: {e}'})
+                return
+            self.server.nqueries += 1
+            self.reply(200, result)
+            trace(1, '{}: {:.1f} ms', query,
+                  (time.perf_counter() - t1) * 1000)
+
+        def reply(self, code, result):
+            if isinstance(result, bytes):
+                body = result
+                ctype = 'application/xml'
+            else:
+                body = json.dumps(result).encode('utf-8')
+                ctype = 'application/json'
+            self.send_response(code)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # The default uses the client address, which is empty for a Unix
+            # socket.
+            trace(2, '{}', format % args)
+
+    return QueryHandler
+
+
+def make_server(handler):
+    """
+    :return: a server listening on the Unix socket or the local port given
+             by the --socket or --port option
+    """
+    if _args.socket:
+        import socketserver
+
+        if os.path.exists(_args.socket):
+            os.remove(_args.socket)  # left by a server that was killed
+
+        class QueryServer(socketserver.UnixStreamServer):
+            pass
+
+        server = QueryServer(_args.socket, handler)
+    else:
+        from http.server import HTTPServer
+
+        class QueryServer(HTTPServer):
+            pass
+
+        server = QueryServer(('127.0.0.1', _args.port), handler)
+    server.configs = {}
+    server.nqueries = 0
+    return server
+
+
+def load_index(server):
+    from utl.collectionindex import CollectionIndex
+    t1 = time.perf_counter()
+    index = CollectionIndex(_args.infile, _args.mdacode)
+    server.loadtime = time.time()
+    server.loadseconds = time.perf_counter() - t1
+    server.index = index
+    trace(1, 'Loaded {} objects from {} in {:.2f} seconds.', len(index),
+          _args.infile, server.loadseconds)
+    if index.duplicates:
+        trace(1, '{} duplicate accession numbers ignored, the first is {}.',
+              len(index.duplicates), index.duplicates[0], color=Fore.YELLOW)
+
+
+def watch(server):
+    """
+    Reload the XML file when it changes. The new index replaces the old one
+    only when it is complete so queries are answered from the old one in the
+    meantime.
+    """
+    from xml.etree.ElementTree import ParseError
+    while True:
+        time.sleep(_args.interval)
+        if not server.index.changed():
+            continue
+        try:
+            load_index(server)
+        except (OSError, ParseError) as e:
+            # The file may be partly written. Try again next time.
+            trace(1, 'Reload failed: {}', e, color=Fore.YELLOW)
+
+
+def serve():
+    import threading
+    server = make_server(make_handler())
+    load_index(server)
+    threading.Thread(target=watch, args=(server,), daemon=True).start()
+    address = _args.socket or f'http://127.0.0.1:{_args.port}'
+    trace(1, 'Serving {} on {}', _args.infile, address, color=Fore.GREEN)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    if _args.socket and os.path.exists(_args.socket):
+        os.remove(_args.socket)
+    trace(1, 'End serve. {} queries answered.', server.nqueries,
+          color=Fore.GREEN)
+
+
+# ---------------------------------------------------------------------------
+# Client
+
+
+def send(query, request=None):
+    """
+    :param query: one of the keys of QUERIES
+    :param request: a dict to send as JSON
+    :return: the decoded JSON reply or the bytes of an XML reply. Exit if the
+             server can't be reached or returns an error.
+    """
+    import http.client
+    if _args.socket:
+        import socket
+
+        class UnixHTTPConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(self.timeout)
+                self.sock.connect(_args.socket)
+
+        conn = UnixHTTPConnection('localhost', timeout=_args.timeout)
+        address = _args.socket
+    else:
+        conn = http.client.HTTPConnection('127.0.0.1', _args.port,
+                                          timeout=_args.timeout)
+        address = f'port {_args.port}'
+    body = json.dumps(request or {}).encode('utf-8')
+    try:
+        conn.request('POST', '/' + query, body,
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        data = response.read()
+    except (ConnectionRefusedError, FileNotFoundError):
+        trace(0, 'No server is listening on {}. Start one with '
+                 '"modes.py serve".', address, color=Fore.RED)
+        sys.exit(1)
+    finally:
+        conn.close()
+    if response.getheader('Content-Type') == 'application/xml':
+        return data
+    result = json.loads(data)
+    if response.status != 200:
+        trace(0, 'Error: {}', result['error'], color=Fore.RED)
+        sys.exit(1)
+    return result
+
+
+def requested_ids():
+    """
+    :return: the accession numbers given by the -j or --include option or
+             None if neither was given
+    """
+    if _args.object:
+        return _args.object.split(',')
+    if _args.include:
+        from utl.readers import read_include_dict
+        from utl.excel_cols import col2num
+        includes = read_include_dict(_args.include,
+                                     col2num(_args.include_column),
+                                     _args.include_skip, _args.verbose,
+                                     allow_blanks=_args.allow_blanks)
+        return list(includes)
+    return None
+
+
+def client_where():
+    result = send('where', {'ids': _args.idnums})
+    if _args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for idnum, locations in result.items():
+        if locations is None:
+            trace(0, '{}: not found', idnum, color=Fore.YELLOW)
+            continue
+        for loc in locations:
+            dates = ' - '.join(d for d in (loc['datebegin'], loc['dateend'])
+                               if d)
+            print(f'{idnum}\t{loc["type"]}\t{loc["location"]}\t{dates}'
+                  f'\t{loc["reason"]}'.rstrip())
+
+
+def client_box():
+    result = send('box', {'location': _args.location,
+                          'normal': _args.normal})
+    if _args.json:
+        print(json.dumps(result))
+    else:
+        for idnum in result:
+            print(idnum)
+    trace(1, '{} objects.', len(result))
+
+
+def client_export():
+    import csv
+    cfgfile = os.path.abspath(_args.cfgfile) if _args.cfgfile else None
+    result = send('export', {'cfgfile': cfgfile,
+                             'ids': requested_ids(),
+                             'exclude': _args.exclude})
+    encoding = 'utf-8-sig' if _args.bom else 'utf-8'
+    with open(_args.outfile, 'w', encoding=encoding, newline='') as csvfile:
+        outcsv = csv.writer(csvfile, delimiter=result['delimiter'],
+                            lineterminator=_args.lineterminator)
+        if _args.heading:
+            outcsv.writerow(result['titles'])
+        outcsv.writerows(result['rows'])
+    for idnum in result['missing']:
+        trace(1, '{}: In include list but not XML.', idnum)
+    trace(1, '{}/{} lines written to {}.', len(result['rows']),
+          result['nobjects'], _args.outfile)
+
+
+def client_select():
+    ids = requested_ids()
+    if ids is None:
+        trace(0, 'Specify -j or --include.', color=Fore.RED)
+        sys.exit(1)
+    result = send('select', {'ids': ids})
+    with open(_args.outfile, 'wb') as xmlfile:
+        xmlfile.write(result)
+    trace(1, 'Written to {}.', _args.outfile)
+
+
+def client_status():
+    result = send('status')
+    if _args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f'{key}: {value}')
+
+
+def client_stop():
+    send('stop')
+    trace(1, 'Server stopped.')
+
+
+def add_arguments(parser, command):
+    if command == 'box':
+        parser.add_argument('location', help='''
+        The location to look up. Case is ignored.''')
+        parser.add_argument('-n', '--normal', action='store_true', help='''
+        List the objects whose normal location this is. The default is to
+        list the objects whose current location it is.''')
+    elif command == 'export':
+        parser.add_argument('outfile', help='''
+        The output CSV file.''')
+    elif command == 'select':
+        parser.add_argument('outfile', help='''
+        The output XML file.''')
+    elif command == 'serve':
+        parser.add_argument('infile', help='''
+        The XML file saved from Modes. It may be compressed.''')
+    elif command == 'where':
+        parser.add_argument('idnums', nargs='+', help='''
+        The accession numbers of the objects. A range like JB001-003 may be
+        given.''')
+    if command in ('export', 'select'):
+        parser.add_argument('--allow_blanks', action='store_true', help='''
+        Skip rows in the include CSV file with blank accession numbers.''')
+    if command == 'export':
+        parser.add_argument('-b', '--bom', action='store_true', help='''
+        Insert a byte order mark (BOM) at the front of the output CSV
+        file.''')
+        parser.add_argument('-c', '--cfgfile', help='''
+        The config file describing the columns to extract, as for
+        xml2csv.py. The file is read by the server, which rereads it when it
+        changes.''')
+        parser.add_argument('--heading', action='store_true', help='''
+        Write a row at the front of the CSV file containing the field
+        names.''')
+    if command in ('export', 'select'):
+        parser.add_argument('--include', help='''
+        A CSV file specifying the accession numbers of objects to be
+        processed.''')
+        parser.add_argument('--include_column', default='0', help='''
+        The column number or spreadsheet-style letter containing the
+        accession number in the file specified by the --include option.''' +
+                            if_not_sphinx(''' The default is 0, the first
+                            column.''', calledfromsphinx))
+        parser.add_argument('--include_skip', type=int, default=0, help='''
+        The number of rows to skip at the front of the include file.''')
+    if command == 'serve':
+        parser.add_argument('--interval', type=float, default=2, help='''
+        The number of seconds between checks for changes to the XML
+        file.''' + if_not_sphinx(''' The default is 2.''', calledfromsphinx))
+    if command in ('export', 'select'):
+        parser.add_argument('-j', '--object', help='''
+        The objects to select, separated by commas. Each may be a range like
+        JB001-002.''')
+    if command in ('box', 'status', 'where'):
+        parser.add_argument('--json', action='store_true', help='''
+        Print the reply from the server as JSON.''')
+    if command == 'serve':
+        parser.add_argument('-m', '--mdacode', default=DEFAULT_MDA_CODE,
+                            help='''
+        Specify the MDA code, used in normalizing the accession number.''' +
+                            if_not_sphinx(f''' The default is
+                            "{DEFAULT_MDA_CODE}".''', calledfromsphinx))
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help='''
+        The local TCP port that the server listens on.''' +
+                        if_not_sphinx(f''' The default is {DEFAULT_PORT}.''',
+                                      calledfromsphinx))
+    if command == 'export':
+        parser.add_argument('-t', '--lineterminator', default='\r\n',
+                            help=r'''
+        Set the line terminator. The default is "\\r\\n".''')
+    if command != 'serve':
+        parser.add_argument('--timeout', type=float, default=60, help='''
+        The number of seconds to wait for the server to reply.''')
+    parser.add_argument('-u', '--socket', help=sphinxify('''
+        Use this Unix socket instead of the TCP port given by ``--port``.
+        ''', calledfromsphinx))
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary
+        information.''')
+    if command == 'export':
+        parser.add_argument('-x', '--exclude', action='store_true', help='''
+        Treat the include list as an exclude list.''')
+
+
+COMMANDS = {'serve': (serve, '''
+    Load the XML file and answer queries until stopped.'''),
+            'where': (client_where, '''
+    List the locations of the objects.'''),
+            'box': (client_box, '''
+    List the objects in a location.'''),
+            'export': (client_export, '''
+    Write a CSV file of the objects selected by the config as xml2csv.py
+    does.'''),
+            'select': (client_select, '''
+    Write the objects given by -j or --include to an XML file.'''),
+            'status': (client_status, '''
+    Show the XML file that is being served.'''),
+            'stop': (client_stop, '''
+    Stop the server.''')}
+
+
+def getparser():  # called either by getargs or sphinx
+    parser = argparse.ArgumentParser(description=sphinxify('''
+    Query a Modes XML file held in memory by a server. Start the server with
+    ``serve`` and then use the other commands. For further details, specify
+    ``-h`` after the command name.
+        ''', calledfromsphinx))
+    subparsers = parser.add_subparsers(dest='subp')
+    for command, (func, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, description=description)
+        subparser.set_defaults(func=func)
+        add_arguments(subparser, command)
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    if args.subp is None:
+        parser.print_help()
+        sys.exit(1)
+    return args
+
+
+calledfromsphinx = True
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    calledfromsphinx = False
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    _args.func()
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+    Mirror a Modes XML file in an SQLite database so that reports can be
+    written as SQL queries instead of by walking the XML.
+
+    The tables are those defined in utl/flatten.py: objects, locations,
+    exhibitions, items, production and measurements. Rows are keyed by
+    "sortkey", the normalized accession number, and for the repeating groups
+    by "seq", the position within the Object. Dates are stored as ISO format
+    text, which sorts and compares correctly, with the original text in the
+    column with the suffix "_text". The items table has the ListNumber and
+    Title of each Item and a JSON object of all of its fields.
+
+    The table objects_fts is an FTS5 index of the title, brief description
+    and description, for example::
+
+        SELECT serial, objects.title FROM objects JOIN objects_fts
+            ON objects.rowid = objects_fts.rowid
+            WHERE objects_fts MATCH 'golf' ORDER BY rank;
+
+    The views replace some of the reports that read the XML file:
+
+    box_contents:     the objects in each current location, as
+                      list_by_box.py
+    stocktake:        the columns written by stocktake.py
+    exhibition_list:  one row per exhibition of each object, as
+                      report_exhibition.py
+    exhibition_count: the number of exhibitions of each object
+    completion:       the number and percent of objects with each field of
+                      the objects table populated, as report_completion.py
+
+    Refreshing an existing database is incremental. A hash of the source
+    bytes of each Object is stored and only new or changed objects are
+    parsed and written. Objects no longer in the XML file are deleted. If the
+    table definitions have changed, the database is rebuilt.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.colors import Fore, Style
+from utl.flatten import TABLES, object_rows
+from utl.normalize import normalize_id, DEFAULT_MDA_CODE
+from utl.normalize import if_not_sphinx
+from utl.xmlscan import read_source, scan_objects, source_encoding
+
+SQLTYPES = {'string': 'TEXT', 'int': 'INTEGER', 'date': 'TEXT'}
+# The columns of the objects table counted in the completion view.
+COMPLETION_EXCLUDE = ('sortkey', 'serial', 'hash', 'current_location_key')
+
+VIEWS = {
+    'box_contents': '''
+        SELECT COALESCE(current_location_key, 'unknown') AS box_key,
+               COALESCE(current_location, 'unknown') AS box,
+               serial, sortkey, title, briefdescription
+        FROM objects
+        ORDER BY box_key, sortkey''',
+    'stocktake': '''
+        SELECT COALESCE(current_location_key, 'unknown') AS box_key,
+               COALESCE(current_location, 'unknown') AS box,
+               serial, sortkey,
+               COALESCE(normal_location, 'unknown') AS normal,
+               COALESCE(substr(title, 1, 50), 'unknown') AS title,
+               '' AS condition
+        FROM objects
+        ORDER BY box_key, sortkey''',
+    'exhibition_list': '''
+        SELECT o.sortkey, o.serial, o.title, e.seq,
+               CASE WHEN e.place IS NULL OR e.place = 'HRM' THEN e.name
+                    ELSE e.name || ' (' || e.place || ')' END AS exhibition,
+               e.datebegin, e.dateend
+        FROM objects o JOIN exhibitions e ON o.sortkey = e.sortkey
+        WHERE e.name IS NOT NULL
+        ORDER BY o.sortkey, e.seq''',
+    'exhibition_count': '''
+        SELECT sortkey, serial, title, count(*) AS nexhibitions,
+               group_concat(exhibition, '|') AS exhibitions
+        FROM exhibition_list
+        GROUP BY sortkey
+        ORDER BY nexhibitions DESC, sortkey''',
+}
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+def table_columns(name) -> list[tuple[str, str]]:
+    """
+    :param name: a table name in TABLES
+    :return: a list of (column name, SQL type) in the order of the table
+    """
+    group_xpath, columns = TABLES[name]
+    sqlcolumns = [('sortkey', 'TEXT NOT NULL'), ('serial', 'TEXT NOT NULL')]
+    if group_xpath is None:
+        sqlcolumns += [('hash', 'TEXT NOT NULL'),
+                       ('current_location_key', 'TEXT')]
+    else:
+        sqlcolumns.append(('seq', 'INTEGER NOT NULL'))
+    if columns is None:  # items
+        return sqlcolumns + [('listnumber', 'INTEGER'), ('title', 'TEXT'),
+                             ('fields', 'TEXT')]
+    for colname, (_, coltype) in columns.items():
+        sqlcolumns.append((colname, SQLTYPES[coltype]))
+        if coltype == 'date':
+            sqlcolumns.append((colname + '_text', 'TEXT'))
+    return sqlcolumns
+
+
+def schema() -> list[str]:
+    """
+    :return: the statements that create the tables, indexes and views
+    """
+    statements = []
+    for name, (group_xpath, _) in TABLES.items():
+        coldefs = ', '.join(f'{col} {sqltype}'
+                            for col, sqltype in table_columns(name))
+        key = 'sortkey' if group_xpath is None else 'sortkey, seq'
+        statements.append(f'CREATE TABLE {name} ({coldefs}, '
+                          f'PRIMARY KEY ({key}))')
+    statements += [
+        'CREATE INDEX objects_serial ON objects (serial)',
+        'CREATE INDEX objects_current ON objects (current_location_key)',
+        'CREATE INDEX objects_normal ON objects (normal_location)',
+        'CREATE INDEX locations_location ON locations (location, type)',
+        'CREATE INDEX exhibitions_name ON exhibitions (name)',
+        'CREATE VIRTUAL TABLE objects_fts USING fts5(title, '
+        'briefdescription, description)',
+        'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)']
+    for name, select in VIEWS.items():
+        statements.append(f'CREATE VIEW {name} AS {select}')
+    fields = [col for col, _ in table_columns('objects')
+              if col not in COMPLETION_EXCLUDE
+              and not col.endswith('_text')]
+    selects = [f"SELECT '{col}' AS field, count({col}) AS populated, "
+               f"count(*) AS total, "
+               f"count({col}) * 100 / max(count(*), 1) AS percent "
+               f"FROM objects" for col in fields]
+    statements.append('CREATE VIEW completion AS ' +
+                      ' UNION ALL '.join(selects))
+    return statements
+
+
+def schema_hash() -> str:
+    """
+    :return: a hash of the schema and of the xpaths that fill it so that a
+             database made by a different version of this script is rebuilt
+    """
+    h = hashlib.sha1()
+    for statement in schema():
+        h.update(statement.encode())
+    h.update(repr(TABLES).encode())
+    return h.hexdigest()
+
+
+def create_schema(conn):
+    cur = conn.cursor()
+    # The FTS table's shadow tables are dropped with it.
+    for kind, name in cur.execute("SELECT type, name FROM sqlite_master "
+                                  "WHERE type IN ('table', 'view') AND "
+                                  "name NOT LIKE 'objects_fts_%' AND "
+                                  "name NOT LIKE 'sqlite_%'").fetchall():
+        cur.execute(f'DROP {kind.upper()} IF EXISTS {name}')
+    for statement in schema():
+        cur.execute(statement)
+    cur.execute("INSERT INTO meta VALUES ('schema', ?)", (schema_hash(),))
+
+
+def open_database(dbfile, rebuild=False):
+    """
+    :return: a connection to the database, which is created or rebuilt if
+             it doesn't have the current schema
+    """
+    conn = sqlite3.connect(dbfile)
+    conn.execute('PRAGMA journal_mode = WAL')
+    try:
+        current = conn.execute("SELECT value FROM meta WHERE key = 'schema'"
+                               ).fetchone()
+    except sqlite3.OperationalError:  # no meta table
+        current = None
+    if rebuild or current is None or current[0] != schema_hash():
+        trace(1, 'Creating the tables in {}', dbfile)
+        with conn:
+            create_schema(conn)
+    return conn
+
+
+def pad_loc(loc):
+    """
+    Pad the number part of a location like "S1" so that it sorts correctly
+    and convert the letter part to upper case. This must stay the same as
+    pad_loc in list_by_box.py, stocktake.py and stocktake2docx.py so that
+    box_key sorts the boxes in the same order as their reports.
+
+    :param loc: location
+    :return: padded location
+    """
+    m = re.match(r'(\D+)(\d+)', loc)
+    if m:
+        g1 = m.group(1).upper()
+        g2 = int(m.group(2))
+        return f'{g1}{g2:03}'
+    else:
+        return loc
+
+
+def delete_object(cur, sortkey):
+    rowid = cur.execute('SELECT rowid FROM objects WHERE sortkey = ?',
+                        (sortkey,)).fetchone()[0]
+    cur.execute('DELETE FROM objects_fts WHERE rowid = ?', (rowid,))
+    for name in TABLES:
+        cur.execute(f'DELETE FROM {name} WHERE sortkey = ?', (sortkey,))
+
+
+def insert_object(cur, rows, objhash, insert_sql):
+    """
+    :param rows: the dict returned by object_rows
+    :param objhash: the hash of the source bytes of the Object
+    :param insert_sql: a dict of table name -> (INSERT statement, columns)
+    """
+    objrow = rows['objects'][0]
+    sortkey = objrow['sortkey']
+    objrow['hash'] = objhash
+    location = objrow['current_location']
+    objrow['current_location_key'] = pad_loc(location) if location else None
+    for name, tablerows in rows.items():
+        sql, columns = insert_sql[name]
+        for row in tablerows:
+            row['sortkey'] = sortkey
+            if TABLES[name][1] is None:  # items
+                fields = {key: value for key, value in row.items()
+                          if key not in ('sortkey', 'serial', 'seq')}
+                row['fields'] = json.dumps(fields, ensure_ascii=False)
+            values = []
+            for col in columns:
+                value = row.get(col)
+                if hasattr(value, 'isoformat'):
+                    value = value.isoformat()
+                values.append(value)
+            cur.execute(sql, values)
+            if name == 'objects':
+                cur.execute('INSERT INTO objects_fts (rowid, title, '
+                            'briefdescription, description) '
+                            'VALUES (?, ?, ?, ?)',
+                            (cur.lastrowid, objrow['title'],
+                             objrow['briefdescription'],
+                             objrow['description']))
+
+
+def refresh(conn, infilename, mdacode=DEFAULT_MDA_CODE):
+    """
+    Bring the database up to date with the XML file.
+
+    :return: a dict of counts: new, changed, deleted, unchanged, duplicate
+             and noid
+    """
+    insert_sql = {}
+    for name in TABLES:
+        columns = [col for col, _ in table_columns(name)]
+        insert_sql[name] = (f'INSERT INTO {name} ({", ".join(columns)}) '
+                            f'VALUES ({", ".join("?" * len(columns))})',
+                            columns)
+    counts = dict.fromkeys(('new', 'changed', 'deleted', 'unchanged',
+                            'duplicate', 'noid'), 0)
+    buf = read_source(infilename)
+    encoding = source_encoding(buf)
+    old = dict(conn.execute('SELECT sortkey, hash FROM objects'))
+    seen = set()
+    with conn:
+        cur = conn.cursor()
+        for idnum, start, end in scan_objects(buf, encoding=encoding):
+            if not idnum or not idnum.strip():
+                counts['noid'] += 1
+                continue
+            sortkey = normalize_id(idnum.strip(), mdacode, verbose=0,
+                                   strict=False)
+            if sortkey in seen:
+                trace(1, 'Duplicate accession number ignored: {}', idnum,
+                      color=Fore.YELLOW)
+                counts['duplicate'] += 1
+                continue
+            seen.add(sortkey)
+            chunk = bytes(buf[start:end])
+            objhash = hashlib.sha1(chunk).hexdigest()
+            oldhash = old.get(sortkey)
+            if oldhash == objhash:
+                counts['unchanged'] += 1
+                continue
+            if oldhash is None:
+                counts['new'] += 1
+            else:
+                counts['changed'] += 1
+                delete_object(cur, sortkey)
+            trace(3, 'Writing {}', idnum)
+            elem = ET.fromstring(chunk.decode(encoding))
+            rows = object_rows(elem, mdacode)
+            insert_object(cur, rows, objhash, insert_sql)
+        for sortkey in old.keys() - seen:
+            delete_object(cur, sortkey)
+            counts['deleted'] += 1
+        cur.execute("INSERT OR REPLACE INTO meta VALUES ('infile', ?)",
+                    (infilename,))
+        cur.execute("INSERT OR REPLACE INTO meta VALUES ('refreshed', ?)",
+                    (time.strftime('%Y-%m-%d %H:%M:%S'),))
+    return counts
+
+
+def main():
+    conn = open_database(_args.dbfile, _args.rebuild)
+    counts = refresh(conn, _args.infile, _args.mdacode)
+    conn.close()
+    trace(1, '{new} new, {changed} changed, {deleted} deleted, {unchanged} '
+             'unchanged objects.'.format(**counts))
+    if counts['noid']:
+        trace(1, '{} objects without an accession number ignored.',
+              counts['noid'], color=Fore.YELLOW)
+
+
+def getparser():  # called either by getargs or sphinx
+    parser = argparse.ArgumentParser(description='''
+    Create or refresh an SQLite database containing the objects in a Modes
+    XML file. Only objects that have changed since the last refresh are
+    written.
+        ''')
+    parser.add_argument('infile', help='''
+        The XML file saved from Modes. It may be compressed.''')
+    parser.add_argument('dbfile', help='''
+        The SQLite database. It is created if it doesn't exist.''')
+    parser.add_argument('-m', '--mdacode', default=DEFAULT_MDA_CODE, help='''
+        Specify the MDA code, used in normalizing the accession number.''' +
+                        if_not_sphinx(f''' The default is
+                        "{DEFAULT_MDA_CODE}".''', calledfromsphinx))
+    parser.add_argument('-r', '--rebuild', action='store_true', help='''
+        Delete the contents of the database and load all objects.''')
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary information.
+        ''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    return args
+
+
+calledfromsphinx = True
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 10)
+    calledfromsphinx = False
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    trace(1, 'Begin modes2sqlite.', color=Fore.GREEN)
+    main()
+    trace(1, 'End modes2sqlite. Elapsed: {:5.2f} seconds.',
+          time.perf_counter() - t1, color=Fore.GREEN)
@@ -8,10 +8,11 @@ element if option -n is specified.
 import argparse
 import sys
 import time
-import xml.dom.minidom as minidom
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET  # PEP8 doesn't like two uppercase chars
 
+from utl.xmlutil import pretty_tostring
+
 
 def main():
     nlines = 0
@@ -40,17 +41,10 @@ def main():
                 e.text = ' '.join(e.text.strip().split())
             if e.tail:
                 e.tail = ' '.join(e.tail.strip().split())
-        xmlstring = ET.tostring(elem, encoding=_args.output_encoding,
-                                xml_declaration=False)
         if _args.pretty:
-            reparsed = minidom.parseString(xmlstring)
-            prettyxml = reparsed.toprettyxml(indent="\t",
-                                             encoding=_args.output_encoding)
-            # toprettyxml inserts '<?xml....' at the front. Remove it.
-            prettyxml = prettyxml.split(b'\n', 1)[1]
-            # minidom converts '"' to '&quot' so let elementtree redo it
-            etparsed = ET.fromstring(prettyxml)
-            xmlstring = ET.tostring(etparsed, encoding=_args.output_encoding,
+            xmlstring = pretty_tostring(elem, _args.output_encoding)
+        else:
+            xmlstring = ET.tostring(elem, encoding=_args.output_encoding,
                                     xml_declaration=False)
         outfile.write(xmlstring)
         nlines += 1
@@ -9,11 +9,10 @@ input and output file paths given.
 
 import argparse
 import sys
-import xml.dom.minidom as minidom
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET  # PEP8 doesn't like two uppercase chars
 
-from utl.xmlutil import get_record_tag
+from utl.xmlutil import get_record_tag, pretty_tostring
 
 
 def main():
@@ -45,14 +44,9 @@ def main():
                 e.text = ' '.join(e.text.strip().split())
             if e.tail:
                 e.tail = ' '.join(e.tail.strip().split())
-        xmlstring = ET.tostring(elem, encoding=_args.output_encoding,
-                                xml_declaration=False)
-        reparsed = minidom.parseString(xmlstring)
-        prettyxml = reparsed.toprettyxml(indent="\t",
-                                         encoding=_args.output_encoding)
-        # toprettyxml inserts '<?xml....' at the front. Remove it.
-        prettyxml = prettyxml.split(b'\n', 1)[1]
-        outfile.write(prettyxml)
+        outfile.write(pretty_tostring(elem, _args.output_encoding,
+                                      minidom_style=True))
+        outfile.write(b'\n')
         nlines += 1
         if _args.short:
             break
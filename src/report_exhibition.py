@@ -6,7 +6,7 @@ import codecs
 from collections import namedtuple, defaultdict
 import csv
 import sys
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 from utl.cfgutil import Stmt
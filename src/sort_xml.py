@@ -7,8 +7,6 @@ Report and discard any records with duplicate accession numbers.
 """
 
 import argparse
-from inspect import getframeinfo, stack
-import os.path
 import sys
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET  # PEP8 doesn't like two uppercase chars
@@ -18,25 +16,14 @@ import psutil
 
 from utl.normalize import normalize_id, denormalize_id, DEFAULT_MDA_CODE
 from utl.readers import row_dict_reader
+from utl.profiler import add_profile_arguments, start_profile
 
-from colorama import Fore, Style
+from utl.colors import Fore
+from utl.trace import RunStats, add_stats_argument, trace_sub
 
 
 def trace(level, template, *args, color=None):
-    if _args.verbose >= level:
-        if _args.verbose > 1:
-            caller = getframeinfo(stack()[1][0])
-            print(f'{os.path.basename(caller.filename)} line {caller.lineno}: ', end='')
-        if color:
-            if len(args) == 0:
-                print(f'{color}{template}{Style.RESET_ALL}')
-            else:
-                print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
-        else:
-            if len(args) == 0:
-                print(template)
-            else:
-                print(template.format(*args))
+    trace_sub(level, _args.verbose, template, color, args)
 
 
 def read_renumber():
@@ -62,24 +49,26 @@ def main():
     objdict = {}
     outfile.write(b'<?xml version="1.0" encoding="utf-8"?><Interchange>\n')
     seq = 0
-    for event, elem in ET.iterparse(infile):
-        if elem.tag != 'Object':
-            continue
-        seq += 1
-        num = elem.find('./ObjectIdentity/Number').text
-        numn = normalize_id(num, _args.mdacode)
-        if _args.verbose > 1:
-            print(f'{seq:4}. {num}')
-        if numn in objdict:
-            if _args.nostrict:
-                trace(1, f'**** seq {seq}, ID {num} is a duplicate, '
-                         f'ignored.', color=Fore.LIGHTYELLOW_EX)
+    with stats.phase('parse'):
+        for event, elem in ET.iterparse(infile):
+            if elem.tag != 'Object':
                 continue
-            trace(0, f'**** seq {seq}, ID {num} is a duplicate, aborting. Set '
-                  f'--nostrict to allow duplicates which will be discarded.',
-                  color=Fore.RED)
-            sys.exit(1)
-        objdict[numn] = elem
+            seq += 1
+            num = elem.find('./ObjectIdentity/Number').text
+            numn = normalize_id(num, _args.mdacode)
+            if _args.verbose > 1:
+                print(f'{seq:4}. {num}')
+            if numn in objdict:
+                if _args.nostrict:
+                    trace(1, f'**** seq {seq}, ID {num} is a duplicate, '
+                             f'ignored.', color=Fore.LIGHTYELLOW_EX)
+                    continue
+                trace(0, f'**** seq {seq}, ID {num} is a duplicate, aborting. Set '
+                      f'--nostrict to allow duplicates which will be discarded.',
+                      color=Fore.RED)
+                sys.exit(1)
+            objdict[numn] = elem
+    stats.count('objects', seq)
     if not outfile:
         return
     dupfound = False
@@ -100,7 +89,10 @@ def main():
         del objdict[oldnum]
         objdict[newnum] = elem
     for numn in sorted(objdict):
-        outfile.write(ET.tostring(objdict[numn], encoding='utf-8').strip())
+        with stats.phase('serialize'):
+            xml = ET.tostring(objdict[numn], encoding='utf-8').strip()
+        with stats.phase('write'):
+            outfile.write(xml)
     outfile.write(b'\n')
     outfile.write(b'</Interchange>')
     return len(objdict)
@@ -130,9 +122,11 @@ def getparser():
         The access numbers will be changed accordingly. The program will abort
         if you try to  create a duplicate accession number.
         ''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
+    add_stats_argument(parser)
     return parser
 
 
@@ -147,10 +141,12 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'sort_xml')
     trace(1, 'Begin sort_xml.', color=Fore.GREEN)
     infile = open(_args.infile, encoding=_args.encoding)
     outfile = open(_args.outfile, 'wb') if _args.outfile else None
     renumdict, newnumset = read_renumber()
+    stats = RunStats()
     # tracemalloc.start()
     numobjs = main()
     # tm = tracemalloc.get_traced_memory()
@@ -159,3 +155,5 @@ if __name__ == '__main__':
           color=Fore.GREEN)
     process = psutil.Process()
     print(f'Max memory usage (bytes): {process.memory_info().rss:,}')
+    stats.report(_args.stats)
+    profiler.stop(numobjs)
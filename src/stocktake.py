@@ -2,9 +2,16 @@
 """
     Create a report of box contents with columns for the stocktake.
     Parameters:
-        1. Input XML file. This is a Modes database.
+        1. Input XML file or SQLite database. The XML file is a Modes
+           database. The SQLite database is made by modes2sqlite.py and is
+           recognized by the extension ".db" or ".sqlite".
         2. Output CSV or XLSX file depending on the file extension of the output
            file.
+
+    The rows are written one at a time. From an SQLite database they are read
+    already sorted from the stocktake view so nothing is held in memory. From
+    an XML file only the cells of each row are kept until the file has been
+    read and sorted.
 """
 import argparse
 import codecs
@@ -14,13 +21,12 @@ import io
 import re
 import sys
 
-import openpyxl.cell.cell
-from openpyxl.styles import Font, Alignment
-from openpyxl.workbook import Workbook
-
 from utl.cfgutil import Config, Stmt, Cmd
 from utl.normalize import sphinxify, normalize_id
 from utl.readers import object_reader
+from utl.xlsxout import SheetWriter
+
+DB_SUFFIXES = ('.db', '.sqlite')
 
 CFG_STRING = """
 cmd: column
@@ -88,47 +94,59 @@ def one_xml_object(elt):
     boxdict[location].append(row)
 
 
-def main(config):
+def xml_boxes(config):
+    """
+    :return: an iterator of (padded box, rows) in box order, each row a list
+             of the serial number and the column values.
+    """
     for _, elt in object_reader(_args.infile, config=config):
         one_xml_object(elt)
         elt.clear()
-    nrow = -1
+        if _args.short:
+            break
     for box in sorted(boxdict.keys()):
+        yield box, sorted(boxdict[box], key=lambda x: normalize_id(x[0]))
+
+
+def db_boxes():
+    """
+    Read the rows from the stocktake view of a database made by
+    modes2sqlite.py. The view is sorted by box and accession number, so each
+    box's rows are yielded as soon as the next box starts.
+
+    :return: an iterator of (padded box, rows) as from xml_boxes()
+    """
+    import itertools
+    import sqlite3
+    conn = sqlite3.connect(f'file:{_args.infile}?mode=ro', uri=True)
+    cursor = conn.execute('SELECT box_key, serial, normal, title '
+                          'FROM stocktake')
+    for box, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+        yield box, (list(row[1:]) for row in rows)
+    conn.close()
+
+
+def main(config):
+    if _args.infile.lower().endswith(DB_SUFFIXES):
+        boxes = db_boxes()
+    else:
+        boxes = xml_boxes(config)
+    titles = [doc['title'] for doc in cfg.col_docs]
+    for box, rows in boxes:
         if is_xlsx:
-            nrow += 2
-            cell = ws.cell(row=nrow, column=1, value=unpad_loc(box))
-            cell.data_type = openpyxl.cell.cell.TYPE_STRING
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-            ncol = 1
-            for doc in cfg.col_docs:
-                ncol += 1
-                cell = ws.cell(row=nrow, column=ncol, value=doc['title'])
-                cell.data_type = openpyxl.cell.cell.TYPE_STRING
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal='center')
+            if writer.nrows:
+                writer.writerow([])
+            writer.writerow([unpad_loc(box)] + titles, style='heading')
+            for row in rows:
+                writer.writerow(row)
         else:
             writer.writerow([''])
-            writer.writerow([f'Box {unpad_loc(box)}'] + [doc['title'] for doc in cfg.col_docs])
-        for row in sorted(boxdict[box], key=lambda x: normalize_id(x[0])):
-            if is_xlsx:
-                nrow += 1
-                for ncol, val in enumerate(row, start=1):
-                    cell = ws.cell(row=nrow, column=ncol, value=val)
-                    cell.data_type = openpyxl.cell.cell.TYPE_STRING
-            else:
-                writer.writerow(row)
+            writer.writerow([f'Box {unpad_loc(box)}'] + titles)
+            writer.writerows(rows)
     if is_xlsx:
-        ws.column_dimensions["A"].width = 15  # Serial
-        ws.column_dimensions["B"].width = 8  # Normal location
-        ws.column_dimensions["C"].width = 50  # Title
-        ws.column_dimensions["D"].width = 40  # Condition
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.oddHeader.center.text = _args.header
-        ws.evenHeader.center.text = _args.header
-        ws.oddFooter.left.text = "Page &P of &N"
-        ws.evenFooter.left.text = "Page &P of &N"
-        wb.save(_args.outfile)
+        writer.close()
+    else:
+        csvfile.close()
 
 
 def getparser() -> argparse.ArgumentParser:
@@ -140,7 +158,8 @@ def getparser() -> argparse.ArgumentParser:
         Create a report of box contents with columns for the stocktake. The
         script uses a configuration file embedded in the Python code.''')
     parser.add_argument('infile', help=sphinxify('''
-        Modes XML database file.
+        Modes XML database file or an SQLite database made by modes2sqlite.py
+        with the extension ".db" or ".sqlite".
         ''', called_from_sphinx))
     parser.add_argument('outfile', help='''
         The output CSV or XLSX file.''')
@@ -173,14 +192,15 @@ if __name__ == '__main__':
     cfg = Config(cfg_file, dump=_args.verbose > 1)
     is_xlsx = _args.outfile.lower().endswith('.xlsx')
     if is_xlsx:
-        wb = Workbook()
-        del wb[wb.sheetnames[0]]  # remove the default sheet
-        ws = wb.create_sheet('Sheet1')
+        # The widths are of the serial number, normal location, title and
+        # condition columns.
+        writer = SheetWriter(_args.outfile, widths=[15, 8, 50, 40],
+                             landscape=True, header=_args.header,
+                             footer='Page &P of &N')
     else:
         encoding = 'utf-8-sig'
         csvfile = codecs.open(_args.outfile, 'w', encoding)
-        outcsv = csv.writer(csvfile, delimiter=',')
-        writer = csv.writer(outcsv)
+        writer = csv.writer(csvfile, delimiter=',')
 
     boxdict = defaultdict(list)
     main(cfg)
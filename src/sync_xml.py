@@ -27,6 +27,10 @@ above as "current" is specified by the command line argument --subdir.
     The corresponding files in the pretty folder are in the form:
         2022-01-01_title_pretty.xml
 
+    Either file may be compressed, for example 2022-01-01_title.xml.gz. The
+    output file is compressed in the same way as the input file unless
+    --compress is given.
+
 """
 
 import argparse
@@ -34,11 +38,12 @@ import os
 import os.path as op
 import sys
 import time
-import xml.dom.minidom as minidom
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET  # PEP8 doesn't like two uppercase chars
 
-from utl.xmlutil import get_record_tag
+from utl.xmlutil import get_record_tag, pretty_tostring
+from utl.profiler import add_profile_arguments, start_profile
+from utl.zipmagic import COMPRESSIONS, SUFFIXES, open_output, openfile
 
 
 def trace(level, template, *args):
@@ -65,8 +70,8 @@ def onefile(infile_name: str, outfile_name: str, mtime: float,
     is_template = True if record_tag == 'template' else False
     trace(1, 'file {}, record_tag={}', infile_name, record_tag)
 
-    infile = open(infile_name, encoding=_args.input_encoding)
-    outfile = open(outfile_name, 'wb')
+    infile = openfile(infile_name, encoding=_args.input_encoding)
+    outfile = open_output(outfile_name)
     if is_template:
         declaration = '<templates application="Object">'
     else:
@@ -94,17 +99,10 @@ def onefile(infile_name: str, outfile_name: str, mtime: float,
                 e.text = ' '.join(e.text.strip().split())
             if e.tail:
                 e.tail = ' '.join(e.tail.strip().split())
-        xmlstring = ET.tostring(elem, encoding=_args.output_encoding,
-                                xml_declaration=False)
         if make_pretty:
-            reparsed = minidom.parseString(xmlstring)
-            prettyxml = reparsed.toprettyxml(indent="\t",
-                                             encoding=_args.output_encoding)
-            # toprettyxml inserts '<?xml....' at the front. Remove it.
-            prettyxml = prettyxml.split(b'\n', 1)[1]
-            # minidom converts '"' to '&quot' so let elementtree redo it
-            etparsed = ET.fromstring(prettyxml)
-            xmlstring = ET.tostring(etparsed, encoding=_args.output_encoding,
+            xmlstring = pretty_tostring(elem, _args.output_encoding)
+        else:
+            xmlstring = ET.tostring(elem, encoding=_args.output_encoding,
                                     xml_declaration=False)
         outfile.write(xmlstring)
         nlines += 1
@@ -129,25 +127,41 @@ def onefile(infile_name: str, outfile_name: str, mtime: float,
               f'written in {elapsed:.3f} seconds')
 
 
-def get_mtime(subpath: str) -> (dict[str, float], str):
+def get_mtime(subpath: str) -> (dict[str, float], str, dict[str, str]):
     """
     For each file in the folder formed by parent/subpath, make an entry in a
     dict with keys being the common part of the file and containing the last
     modified time.
     :param subpath: either 'normal' or 'pretty'
-    :return: dictionary of file basenames -> mtime, joined parent/subpath
+    :return: dictionary of file basenames -> mtime, joined parent/subpath,
+             dictionary of file basenames -> filename
     """
     path = op.join(_args.parent_dir, subpath, _args.subdir)
     mtime = {}
+    filenames = {}
+    compsuffixes = tuple(SUFFIXES.values())
     for fn in sorted(os.listdir(path)):
         fn = str(fn)  # might be bytes. PyCharm whines.
-        if not fn.endswith('.xml'):
+        xmlfn = op.splitext(fn)[0] if fn.endswith(compsuffixes) else fn
+        if not xmlfn.endswith('.xml'):
             continue
-        basefn = os.path.splitext(fn)[0]
+        basefn = os.path.splitext(xmlfn)[0]
         basefn = basefn.removesuffix('_pretty')
         fullfn = op.join(path, fn)
         mtime[basefn] = op.getmtime(fullfn)
-    return mtime, path
+        filenames[basefn] = fn
+    return mtime, path, filenames
+
+
+def compressed_suffix(filename: str) -> str:
+    """
+    :return: the suffix for the --compress option or else the compression
+             suffix of the input filename, possibly ''.
+    """
+    if _args.compress:
+        return SUFFIXES[_args.compress]
+    suffix = op.splitext(filename)[1]
+    return suffix if suffix in SUFFIXES.values() else ''
 
 
 def select(source_mtime: dict[str, float], dest_mtime: dict[str, float]):
@@ -177,21 +191,23 @@ def select(source_mtime: dict[str, float], dest_mtime: dict[str, float]):
 
 
 def main():
-    normal_mtime, normal_path = get_mtime('normal')
-    pretty_mtime, pretty_path = get_mtime('pretty')
+    normal_mtime, normal_path, normal_names = get_mtime('normal')
+    pretty_mtime, pretty_path, pretty_names = get_mtime('pretty')
 
     trace(1, '\nNormal to Pretty:')
     to_pretty = select(normal_mtime, pretty_mtime)
     for fn in to_pretty:
-        from_file = op.join(normal_path, fn + '.xml')
-        to_file = op.join(pretty_path, fn + '_pretty.xml')
+        from_file = op.join(normal_path, normal_names[fn])
+        to_file = op.join(pretty_path, fn + '_pretty.xml' +
+                          compressed_suffix(from_file))
         onefile(from_file, to_file, mtime=normal_mtime[fn], make_pretty=True)
 
     trace(1, '\nPretty to Normal:')
     to_normal = select(pretty_mtime, normal_mtime)
     for fn in to_normal:
-        from_file = op.join(pretty_path, fn + '_pretty.xml')
-        to_file = op.join(normal_path, fn + '.xml')
+        from_file = op.join(pretty_path, pretty_names[fn])
+        to_file = op.join(normal_path, fn + '.xml' +
+                          compressed_suffix(from_file))
         onefile(from_file, to_file, mtime=pretty_mtime[fn], make_pretty=False)
 
 
@@ -207,6 +223,10 @@ def getparser():
     parser.add_argument('parent_dir', help='''
         The parent folder containing subfolders "normal" and "pretty" ''')
 
+    parser.add_argument('--compress', choices=COMPRESSIONS, help='''
+        Compress the output files with this method, adding the suffix to the
+        filename. The default is to compress in the same way as the input.
+        ''')
     parser.add_argument('-d', '--dryrun', action='store_true', help='''
         Print logs but do not process files.
         ''')
@@ -222,6 +242,7 @@ def getparser():
         If present, this directory is a sub-directory under both the normal and
         pretty directories. 
         ''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -248,4 +269,6 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'sync_xml')
     main()
+    profiler.stop()
@@ -0,0 +1,13 @@
+"""
+    The tests build configs, which are cached as described in
+    utl/cfgutil.py. Point the cache at a temporary folder, inherited by the
+    scripts run as subprocesses, so the tests don't leave files in the
+    user's cache folder.
+"""
+import atexit
+import os
+import tempfile
+
+_cachedir = tempfile.TemporaryDirectory(prefix='modes-test-cache-')
+os.environ['MODES_CACHE_DIR'] = _cachedir.name
+atexit.register(_cachedir.cleanup)
@@ -0,0 +1,70 @@
+"""
+    Test that a config read from the cache is the same as one read from YAML.
+"""
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from utl.cfgutil import Config, config_cache_dir
+
+CFG = '''cmd: global
+template_title: Type
+template_dir: /tmp/templates
+templates:
+    Book: book.csv
+    Coin: coin.csv
+---
+cmd: column
+xpath: ./ObjectIdentity/Number
+title: Serial
+---
+cmd: ifeq
+xpath: ./Identification/Title
+value: Ship
+---
+cmd: attrib
+xpath: ./Object
+attribute: elementtype
+'''
+
+
+def make_config():
+    Config.reset_config()
+    return Config(io.StringIO(CFG), verbos=0)
+
+
+class TestCfgCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ,
+                                  {'MODES_CACHE_DIR': self.tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        Config.reset_config()
+        self.tmpdir.cleanup()
+
+    def test_cached(self):
+        uncached = vars(make_config())
+        cachedir = config_cache_dir()
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+        cached = vars(make_config())
+        self.assertEqual(cached, uncached)
+        self.assertEqual(cached['templates'],
+                         {'book': 'book.csv', 'coin': 'coin.csv'})
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ, {'MODES_CACHE_DIR': ''}):
+            self.assertIsNone(config_cache_dir())
+            make_config()
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+    Test the naming and the manifest of web/derivatives.py. Making the images
+    is only tested if Pillow is installed.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from web import derivatives
+from web.imgcatalog import ImageCatalog, parse_filename
+
+FILES = ['collection_JB001.jpg',
+         'sub1/collection_JB002-001-1A.jpg',
+         'sub1/collection_JB002-001-1B.jpg',
+         'sub1/collection_JB002-001-2A.jpg',
+         'sub1/JB002-001-01A.jpg',  # the same thumbnail as the first
+         'sub2/notes.txt']
+
+
+class TestNames(unittest.TestCase):
+
+    def test_modes_name(self):
+        for filename, expected in (('collection_JB1202-001.jpg', 'JB1202.1.jpg'),
+                                   ('JB1202.jpg', 'JB1202.jpg'),
+                                   ('JB1202-001A.jpg', 'JB1202.1.jpg'),
+                                   ('JB1202-001B.jpg', None),
+                                   ('JB1202-001-01A.jpg', 'JB1202.1.jpg'),
+                                   ('JB1202-001-2A.jpg', None),
+                                   ('SH12-003-1.jpg', 'SH12.3.jpg')):
+            self.assertEqual(derivatives.modes_name(parse_filename(filename)),
+                             expected, filename)
+
+    def test_derivative_names(self):
+        filename = 'collection_JB2-001-2.png'
+        names = derivatives.derivative_names(
+            filename, parse_filename(filename), derivatives.DERIVATIVES)
+        self.assertEqual([(d.name, name) for d, name in names],
+                         [('web', 'collection_JB2-001-2.jpg'),
+                          ('preview', 'collection_JB2-001-2.jpg')])
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.indir = os.path.join(self.tempdir.name, 'in')
+        self.outdir = os.path.join(self.tempdir.name, 'out')
+        for f in FILES:
+            path = os.path.join(self.indir, f)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as imgfile:
+                imgfile.write(f)
+        self.setargs()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def setargs(self, *args):
+        derivatives._args = derivatives.getargs(
+            ['', self.indir, self.outdir, '-v', '0', *args])
+
+    def get_tasks(self, sources):
+        ders = derivatives.get_derivatives()
+        params = derivatives.params_key(ders, derivatives._args.quality)
+        return derivatives.get_tasks(ImageCatalog(self.indir), sources,
+                                     ders, params)
+
+    def fake_run(self, tasks, entries, sources):
+        # Record the tasks as done without decoding the fake images.
+        for task in tasks:
+            for _, outpath in task.targets:
+                os.makedirs(os.path.dirname(outpath), exist_ok=True)
+                open(outpath, 'w').close()
+            with open(task.srcpath, 'rb') as srcfile:
+                sha1 = hashlib.sha1(srcfile.read()).hexdigest()
+            sources[task.relpath] = entries[task.relpath] | {'sha1': sha1}
+
+    def test_tasks(self):
+        sources = {'gone.jpg': {}}
+        tasks, entries, nskipped = self.get_tasks(sources)
+        self.assertEqual(sources, {})
+        self.assertEqual(nskipped, 0)
+        self.assertEqual([t.relpath for t in tasks],
+                         ['collection_JB001.jpg']
+                         + [os.path.join('sub1', f) for f in (
+                             'JB002-001-01A.jpg', 'collection_JB002-001-1A.jpg',
+                             'collection_JB002-001-1B.jpg',
+                             'collection_JB002-001-2A.jpg')])
+        self.assertEqual(entries[tasks[1].relpath]['outputs'],
+                         [os.path.join('web', 'JB002-001-01A.jpg'),
+                          os.path.join('preview', 'JB002-001-01A.jpg'),
+                          os.path.join('modes', 'JB002.1.jpg')])
+        # The duplicate thumbnail goes to the first source in the walk.
+        self.assertEqual(entries[tasks[2].relpath]['outputs'],
+                         [os.path.join('web', 'collection_JB002-001-1A.jpg'),
+                          os.path.join('preview',
+                                       'collection_JB002-001-1A.jpg')])
+
+    def test_up_to_date(self):
+        sources = {}
+        tasks, entries, _ = self.get_tasks(sources)
+        self.fake_run(tasks, entries, sources)
+        manifest = os.path.join(self.outdir, derivatives.MANIFEST)
+        derivatives.save_manifest(manifest, sources)
+        sources = derivatives.load_manifest(manifest)
+        self.assertEqual(self.get_tasks(sources)[0], [])
+
+        # A source touched but not changed is hashed but not decoded.
+        path = os.path.join(self.indir, 'collection_JB001.jpg')
+        os.utime(path, (1, 1))
+        tasks, entries, nskipped = self.get_tasks(sources)
+        self.assertEqual(nskipped, len(FILES) - 2)
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(derivatives._make(tasks[0])[2:], (False, None))
+
+        # A changed source, missing output or new size is made again.
+        with open(path, 'a') as imgfile:
+            imgfile.write('changed')
+        os.remove(os.path.join(self.outdir, 'modes', 'JB002.1.jpg'))
+        tasks = self.get_tasks(sources)[0]
+        self.assertEqual([t.relpath for t in tasks],
+                         ['collection_JB001.jpg',
+                          os.path.join('sub1', 'JB002-001-01A.jpg')])
+        self.assertIsNone(tasks[1].oldhash)
+        self.setargs('-s', 'web,preview=500,modes')
+        self.assertEqual(len(self.get_tasks(sources)[0]), len(FILES) - 1)
+        with open(manifest) as manifestfile:
+            self.assertEqual(json.load(manifestfile)['version'],
+                             derivatives.MANIFEST_VERSION)
+
+
+class TestWriteDerivatives(unittest.TestCase):
+
+    def test_write(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest('PIL is not installed')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, 'JB1.jpg')
+            Image.new('RGB', (1200, 600), 'red').save(src)
+            with open(src, 'rb') as srcfile:
+                data = srcfile.read()
+            targets = [(200, os.path.join(tmpdir, 'modes', 'JB1.jpg')),
+                       (2000, os.path.join(tmpdir, 'web', 'JB1.jpg')),
+                       (600, os.path.join(tmpdir, 'preview', 'JB1.jpg'))]
+            derivatives.write_derivatives(data, targets, 85)
+            sizes = []
+            for _, path in targets:
+                with Image.open(path) as im:
+                    sizes.append(im.size)
+            self.assertEqual(sizes, [(200, 100), (1200, 600), (600, 300)])
+            with open(targets[1][1], 'rb') as webfile:
+                self.assertEqual(webfile.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+    Test applying several mapfiles in one pass with exhibition.py.
+"""
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+XML = '''<?xml version="1.0" encoding="utf-8"?>
+<Interchange>
+<Object><ObjectIdentity><Number>JB1</Number></ObjectIdentity>
+  <Acquisition><Method>gift</Method></Acquisition></Object>
+<Object><ObjectIdentity><Number>JB2</Number></ObjectIdentity>
+  <Acquisition><Method>gift</Method></Acquisition>
+  <Exhibition><ExhibitionName>Bogus</ExhibitionName>
+    <Date><DateBegin>1.1.2000</DateBegin></Date></Exhibition></Object>
+<Object><ObjectIdentity><Number>JB3</Number></ObjectIdentity>
+  <Acquisition><Method>gift</Method></Acquisition></Object>
+</Interchange>
+'''
+FILES = {'in.xml': XML,
+         'advertising.csv': 'Cat,Acc\n1,JB1\n2,JB2\n',
+         'watercolours.csv': 'Title\nAcc,Ex\nJB1-2,14\n',
+         'batch.csv': 'mapfile,exhibition,col_acc,col_ex,col_cat,skiprows\n'
+                      'advertising.csv,6,b,,a,\n'
+                      'watercolours.csv,,0,1,,1\n'}
+
+
+class TestExhibition(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name, text in FILES.items():
+            with open(self.path(name), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def exhibitions(self):
+        root = ET.parse(self.path('out.xml')).getroot()
+        return {obj.find('./ObjectIdentity/Number').text:
+                [(exh.find('ExhibitionName').text,
+                  exh.findtext('CatalogueNumber'))
+                 for exh in obj.findall('./Exhibition')]
+                for obj in root}
+
+    def test_batch(self):
+        result = subprocess.run(
+            [sys.executable, 'exhibition.py', self.path('in.xml'),
+             '-o', self.path('out.xml'), '--batch', self.path('batch.csv'),
+             '--verify'], cwd=SRCDIR, capture_output=True, text=True,
+            check=True)
+        self.assertIn('JB2: invalid exhibition', result.stdout)
+        self.assertIn('1 invalid exhibition found', result.stdout)
+        exhibitions = self.exhibitions()
+        self.assertEqual(exhibitions['JB1'], [
+            ('Heath Robinson Watercolours', None),
+            ('Heath Robinson’s World of Advertising', '1')])
+        self.assertEqual(len(exhibitions['JB2']), 3)
+        self.assertEqual(exhibitions['JB3'], [])
+
+    def test_repeated_mapfile(self):
+        with open(self.path('more.csv'), 'w') as f:
+            f.write('Cat,Acc\n5,JB3\n')
+        subprocess.run(
+            [sys.executable, 'exhibition.py', self.path('in.xml'),
+             '-o', self.path('out.xml'), '-m', self.path('advertising.csv'),
+             '-m', self.path('more.csv'), '-e', '6', '--col_acc', '1',
+             '--col_cat', '0', '-v', '0'], cwd=SRCDIR, check=True)
+        exhibitions = self.exhibitions()
+        self.assertEqual(exhibitions['JB3'],
+                         [('Heath Robinson’s World of Advertising', '5')])
+
+    def test_duplicate(self):
+        result = subprocess.run(
+            [sys.executable, 'exhibition.py', self.path('in.xml'),
+             '-o', self.path('out.xml'), '-m', self.path('advertising.csv'),
+             '-m', self.path('advertising.csv'), '-e', '6', '--col_acc', '1',
+             '-v', '0'], cwd=SRCDIR, capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('Duplicate accession number', result.stderr)
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
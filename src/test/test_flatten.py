@@ -0,0 +1,125 @@
+"""
+    Test flatten_xml.py and the table writer in utl/columnar.py.
+"""
+import csv
+import datetime
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utl.columnar import unique_names, write_table
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+XML = '''<?xml version="1.0" encoding="utf-8"?>
+<Interchange>
+<Object elementtype="ephemera">
+  <ObjectIdentity><Number>LDHRM.2024.24</Number></ObjectIdentity>
+  <NumberOfItems>2</NumberOfItems>
+  <Identification><Title>Postcards</Title></Identification>
+  <Production><Date><DateBegin>1910</DateBegin><DateEnd>circa</DateEnd></Date>
+  </Production>
+  <ObjectLocation elementtype="normal location"><Location>S1</Location>
+  </ObjectLocation>
+  <ObjectLocation elementtype="current location"><Location>G2</Location>
+    <Date><DateBegin>1.2.2023</DateBegin></Date></ObjectLocation>
+  <Exhibition><ExhibitionName>Show</ExhibitionName><Place>Pinner</Place>
+  </Exhibition>
+  <ItemList>
+    <Item><ListNumber>1</ListNumber><Title>The Gadgets</Title></Item>
+    <Item><ListNumber>2</ListNumber><Note>torn</Note></Item>
+  </ItemList>
+</Object>
+<Object><ObjectIdentity><Number>JB1</Number></ObjectIdentity></Object>
+</Interchange>
+'''
+
+
+def read_csv(filename):
+    with open(filename, newline='') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+class TestFlatten(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.outdir = os.path.join(self.tmpdir.name, 'tables')
+        xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        with open(xmlfile, 'w') as f:
+            f.write(XML)
+        subprocess.run([sys.executable, 'flatten_xml.py', xmlfile,
+                        self.outdir, '--format', 'csv', '-v', '0'],
+                       cwd=SRCDIR, check=True)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def table(self, name):
+        return read_csv(os.path.join(self.outdir, name + '.csv'))
+
+    def test_objects(self):
+        objects = self.table('objects')
+        self.assertEqual([row['serial'] for row in objects],
+                         ['LDHRM.2024.24', 'JB1'])
+        self.assertEqual(objects[0]['sortkey'], 'LDHRM.2024.000024')
+        self.assertEqual(objects[0]['production_datebegin'], '1910-01-01')
+        self.assertEqual(objects[0]['production_dateend'], '')
+        self.assertEqual(objects[0]['production_dateend_text'], 'circa')
+        self.assertEqual(objects[0]['current_location'], 'G2')
+
+    def test_groups(self):
+        locations = self.table('locations')
+        self.assertEqual([row['seq'] for row in locations], ['1', '2'])
+        self.assertEqual(locations[1]['datebegin'], '2023-02-01')
+        self.assertEqual(self.table('exhibitions')[0]['place'], 'Pinner')
+        items = self.table('items')
+        self.assertEqual(list(items[0]),
+                         ['serial', 'seq', 'listnumber', 'title', 'note'])
+        self.assertEqual(items[1]['note'], 'torn')
+        self.assertEqual(self.table('measurements'), [])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow is not installed')
+        outdir = os.path.join(self.tmpdir.name, 'parquet')
+        subprocess.run([sys.executable, 'flatten_xml.py',
+                        os.path.join(self.tmpdir.name, 'collection.xml'),
+                        outdir, '--format', 'parquet', '-v', '0'],
+                       cwd=SRCDIR, check=True)
+        items = pq.read_table(os.path.join(outdir, 'items.parquet'))
+        self.assertEqual(str(items.schema.field('listnumber').type), 'int64')
+        self.assertEqual(items.column('listnumber').to_pylist(), [1, 2])
+
+
+class TestColumnar(unittest.TestCase):
+
+    def test_unique_names(self):
+        self.assertEqual(unique_names(['Serial', 'Title', 'Title', 'Title']),
+                         ['Serial', 'Title', 'Title_2', 'Title_3'])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow is not installed')
+        columns = {'serial': ['JB1', 'JB2', 'JB3', 'JB4'],
+                   'location': ['S1', 'S1', 'S1', None],
+                   'seq': [1, 2, None, 4],
+                   'date': [datetime.date(2023, 2, 1), None, None, None]}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'table.parquet')
+            write_table(filename, columns, 'parquet',
+                        {'seq': 'int', 'date': 'date'})
+            table = pq.read_table(filename)
+        self.assertEqual(table.to_pydict(), columns)
+        self.assertEqual(str(table.schema.field('seq').type), 'int64')
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+    Test the trigram index in utl/fuzzyindex.py and fuzzy_match.py.
+"""
+import csv
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utl.fuzzyindex import FuzzyIndex, load_or_build, similarity, trigrams
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+XML = '''<?xml version="1.0" encoding="utf-8"?>
+<Interchange>
+<Object><ObjectIdentity><Number>JB1</Number></ObjectIdentity>
+  <Identification><Title>Harrow School Speech Room</Title>
+  <BriefDescription>Postcard of the speech room</BriefDescription>
+  </Identification></Object>
+<Object><ObjectIdentity><Number>JB2</Number></ObjectIdentity>
+  <Identification><Title>Pinner High Street</Title></Identification>
+</Object>
+<Object><ObjectIdentity><Number>JB3</Number></ObjectIdentity>
+  <Identification><Title>Postcard</Title></Identification></Object>
+<Object><ObjectIdentity><Number>JB4</Number></ObjectIdentity>
+  <Identification><Title>Postcard</Title></Identification></Object>
+</Interchange>
+'''
+
+
+class TestFuzzyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        with open(self.xmlfile, 'w') as f:
+            f.write(XML)
+        self.index = FuzzyIndex.from_xml(self.xmlfile, verbose=0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Ab, c'),
+                         {'  a', ' ab', 'ab ', '  c', ' c '})
+        self.assertEqual(similarity('Pinner', 'pinner!'), 1.)
+        self.assertEqual(similarity('', 'pinner'), 0.)
+
+    def test_query(self):
+        matches = self.index.query('Harow school speech room', k=2)
+        self.assertEqual(matches[0][0], 'JB1')
+        self.assertEqual(matches[0][2], 'title')
+        self.assertEqual(self.index.query('high st pinner')[0][0], 'JB2')
+        self.assertEqual(self.index.query('xyz'), [])
+
+    def test_one_match_per_object(self):
+        # JB1 matches with both its title and its brief description.
+        idnums = [m[0] for m in self.index.query('postcard', k=5,
+                                                  minscore=0.2)]
+        self.assertEqual(sorted(idnums), ['JB1', 'JB3', 'JB4'])
+        self.assertEqual(len(self.index), 4)  # "Postcard" is stored once
+
+    def test_minscore(self):
+        matches = self.index.query('postcard', k=5, minscore=0.9)
+        self.assertEqual(sorted(m[0] for m in matches), ['JB3', 'JB4'])
+
+    def test_save(self):
+        indexfile = os.path.join(self.tmpdir.name, 'index.pickle')
+        load_or_build(self.xmlfile, indexfile, verbose=0)
+        index = FuzzyIndex.load(indexfile)
+        self.assertEqual(index.query('Pinner High St'),
+                         self.index.query('Pinner High St'))
+        with open(self.xmlfile, 'a') as f:
+            f.write('\n')
+        index = load_or_build(self.xmlfile, indexfile, verbose=0)
+        self.assertEqual(index.source[1], os.path.getsize(self.xmlfile))
+
+    def test_fuzzy_match(self):
+        incsv = os.path.join(self.tmpdir.name, 'in.csv')
+        outcsv = os.path.join(self.tmpdir.name, 'out.csv')
+        with open(incsv, 'w', newline='') as f:
+            csv.writer(f).writerows([['Num', 'Name'], ['1', 'Pinner High St'],
+                                     ['2', 'qqq'], ['3']])
+        subprocess.run([sys.executable, 'fuzzy_match.py', self.xmlfile,
+                        incsv, outcsv, '-c', 'Name', '-k', '1', '-v', '0'],
+                       cwd=SRCDIR, check=True)
+        with open(outcsv, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['Num', 'Name', 'Match 1', 'Score 1',
+                                   'Text 1'])
+        self.assertEqual(rows[1][:3], ['1', 'Pinner High St', 'JB2'])
+        self.assertEqual(rows[2], ['2', 'qqq', '', '', ''])
+        self.assertEqual(rows[3][2:], ['', '', ''])
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+    Test utl/htmltables.py and the scripts that use it.
+"""
+import csv
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utl.htmltables import CELL_PAT, TableParser, cell_text
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# As saved by MS Word, with line breaks within paragraphs.
+WORD_HTML = '''<html><head><style>p.MsoNormal {margin:0cm}</style></head>
+<body><table class=MsoTableGrid>
+ <tr>
+  <td valign=top><p class=MsoNormal>jb  1<o:p></o:p></p></td>
+  <td><p class=MsoNormal>Tea &amp;\r\n  cakes</p>
+  <p class=MsoNormal><![if !supportEmptyParas]>&nbsp;<![endif]><o:p></o:p></p></td>
+  <th>Serial &#150; no<br>paragraphs</th>
+ </tr>
+ <tr>
+  <td><p>jb 2</p></td><td><p>Box <b>S1</b><!-- moved --></p></td>
+ </tr>
+ <tr></tr>
+</table>
+<table><tr><td><p>jb3</p></td></tr></table>
+</body></html>
+'''
+OMR_HTML = '''<table>
+<tr><td><p>Accession  number JB437</p></td><td><p>x</p></td></tr>
+<tr><td><p>Date</p></td></tr><tr><td></td></tr>
+<tr><td><p>Old\r\nlocation S1</p></td><td><p>New location <b>S2</b></p></td></tr>
+</table>
+<table><tr><td><p>Not a record</p></td></tr></table>
+'''
+
+
+def parse(html, cellpat='td', chunksize=8):
+    parser = TableParser(cellpat)
+    rows = [(row.table, row.number, [cell_text(cell) for cell in row.cells])
+            for row in parser.rows(io.StringIO(html), chunksize)]
+    return rows, parser.ntables
+
+
+class TestTableParser(unittest.TestCase):
+
+    def test_word_html(self):
+        rows, ntables = parse(WORD_HTML, cellpat=CELL_PAT)
+        self.assertEqual(ntables, 2)
+        self.assertEqual(rows, [
+            (1, 0, ['jb 1', 'Tea & cakes', 'Serial – noparagraphs']),
+            (1, 1, ['jb 2', 'Box S1']),
+            (1, 2, []),
+            (2, 0, ['jb3'])])
+
+    def test_cells(self):
+        parser = TableParser('td')
+        row = next(parser.rows(io.StringIO(
+            '<table><tr><td> a\n<p>b <i>c</i></p><p>\td</p>'
+            '<script>x</script></td></tr></table>')))
+        cell = row.cells[0]
+        self.assertEqual(cell.paras, ['b c', '\td'])
+        self.assertEqual(cell.text, ' a\nb c\td')
+        self.assertEqual(cell_text(cell), 'b c d')
+        self.assertEqual(cell_text(cell, '\n'), 'b c\nd')
+
+    def test_unclosed_cells(self):
+        # A cell that isn't closed contains the cells that follow it.
+        rows, _ = parse('<table><tr><td>a<td>b</tr><tr><td>c</table>')
+        self.assertEqual(rows, [(1, 0, ['ab', 'b']), (1, 1, ['c'])])
+
+    def test_nested_table(self):
+        # The rows of the inner table are also rows of the outer table.
+        rows, ntables = parse('<table><tr><td>a<table><tr><td>b</td></tr>'
+                              '</table></td></tr><tr><td>c</td></tr></table>')
+        self.assertEqual(ntables, 2)
+        self.assertEqual(rows, [(1, 0, ['ab', 'b']), (1, 1, ['b']),
+                                (1, 2, ['c']), (2, 0, ['b'])])
+
+    def test_chunks(self):
+        self.assertEqual(parse(WORD_HTML, chunksize=1),
+                         parse(WORD_HTML, chunksize=1 << 16))
+
+
+class TestHtml2csv(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.outfile = os.path.join(self.tempdir.name, 'out.csv')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_script(self, script, html, *args):
+        infile = os.path.join(self.tempdir.name, 'in.html')
+        with open(infile, 'w', encoding='utf-8', newline='') as f:
+            f.write(html)
+        subprocess.run([sys.executable, script, infile, self.outfile,
+                        '-v', '0', *args], cwd=SRCDIR, check=True,
+                       stdout=subprocess.DEVNULL)
+        with open(self.outfile, encoding='utf-8-sig', newline='') as f:
+            return list(csv.reader(f))
+
+    def test_html2csv(self):
+        self.assertEqual(self.run_script('html2csv.py', WORD_HTML), [
+            ['JB1', 'Tea & cakes', 'Serial – noparagraphs'],
+            ['JB2', 'Box S1'],
+            ['JB3']])
+
+    def test_html2csv_table(self):
+        self.assertEqual(self.run_script('html2csv.py', WORD_HTML, '-u',
+                                         '-t', '2'), [['jb3']])
+
+    def test_html2csv_omr(self):
+        self.assertEqual(self.run_script('html2csv_omr.py', OMR_HTML),
+                         [['JB437', 'S1', 'S2']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+    Test the image catalog used by x053_list_pages.py and list_needed.py.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from web.imgcatalog import ImageCatalog, parse_filename
+
+FILES = ['collection_JB001.jpg',
+         'sub1/collection_JB002-001-1A.jpg',
+         'sub1/collection_JB002-001-2A.jpg',
+         'sub1/deeper/collection_JB003--2.png',
+         'sub1/notes.txt',
+         'sub2/collection_LDHRM.2022.21.jpg',
+         'zz.jpg']
+
+
+def listdir_walk(topdir):
+    # The order in which the scripts used to walk the tree.
+    for name in sorted(os.listdir(topdir)):
+        path = os.path.join(topdir, name)
+        if os.path.isdir(path):
+            yield from listdir_walk(path)
+        else:
+            yield topdir, name
+
+
+class TestImageCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.topdir = self.tmpdir.name
+        for f in FILES:
+            path = os.path.join(self.topdir, f)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+        # The catalog file must not be in the tree or it would change the
+        # top folder's modification time.
+        self.catdir = tempfile.TemporaryDirectory()
+        self.catfile = os.path.join(self.catdir.name, 'catalog.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        self.catdir.cleanup()
+
+    def test_parse_filename(self):
+        self.assertIsNone(parse_filename('notes.txt'))
+        self.assertEqual(parse_filename('collection_JB002-001-1A.jpg'),
+                         ['JB002', '001', '', '1', 'A', 'JB002', 'JB002.1',
+                          'JB000002', 'JB000002.000001'])
+
+    def test_walk_order(self):
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                catalog = ImageCatalog(self.topdir, jobs=jobs)
+                walked = [(d, f) for d, f, _ in catalog.walk()]
+                self.assertEqual(walked, list(listdir_walk(self.topdir)))
+
+    def test_refresh(self):
+        catalog = ImageCatalog(self.topdir, self.catfile)
+        self.assertEqual(catalog.nscanned, 4)
+        self.assertTrue(os.path.exists(self.catfile))
+        catalog = ImageCatalog(self.topdir, self.catfile)
+        self.assertEqual((catalog.nscanned, catalog.nreused), (0, 4))
+        open(os.path.join(self.topdir, 'sub2', 'JB004.jpg'), 'w').close()
+        catalog = ImageCatalog(self.topdir, self.catfile)
+        self.assertEqual((catalog.nscanned, catalog.nreused), (1, 3))
+        self.assertIn('JB004.jpg', [f for _, f, _ in catalog.walk()])
+        self.assertEqual(list(catalog.walk()),
+                         list(ImageCatalog(self.topdir).walk()))
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
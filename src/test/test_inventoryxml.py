@@ -0,0 +1,70 @@
+"""
+    Test the element path profile written by inventoryxml.py.
+"""
+import json
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OBJECT = '''<Object elementtype="{etype}">
+    <ObjectIdentity><Number>{idnum}</Number></ObjectIdentity>
+    <Identification><Title>{title}</Title><BriefDescription /></Identification>
+</Object>
+'''
+OBJECTS = [('letter', 'SH1', 'A letter'), ('letter', 'SH2', 'A letter'),
+           ('book', 'JB1', '  Gadgets  '), ('letter', 'SH3', '')]
+
+
+class TestInventoryXml(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        self.outfile = os.path.join(self.tmpdir.name, 'profile.json')
+        with open(self.xmlfile, 'w') as xmlfile:
+            xmlfile.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                          '<Interchange>\n')
+            for etype, idnum, title in OBJECTS:
+                xmlfile.write(OBJECT.format(etype=etype, idnum=idnum,
+                                            title=title))
+            xmlfile.write('</Interchange>')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def profile(self, *args):
+        subprocess.run([sys.executable, 'inventoryxml.py', self.xmlfile,
+                        self.outfile, '-v', '0', *args], cwd=SRCDIR,
+                       check=True)
+        with open(self.outfile) as profilefile:
+            return json.load(profilefile)
+
+    def test_profile(self):
+        profile = self.profile('-k', '1')
+        self.assertEqual(profile['records'], 4)
+        paths = profile['paths']
+        self.assertEqual(list(paths), [
+            'Object', 'Object/@elementtype', 'Object/Identification',
+            'Object/Identification/BriefDescription',
+            'Object/Identification/Title', 'Object/ObjectIdentity',
+            'Object/ObjectIdentity/Number'])
+        self.assertEqual(paths['Object/Identification/Title'], {
+            'present': 4, 'empty': 1, 'distinct': 2, 'minlen': 7,
+            'maxlen': 8, 'top': [['A letter', 2, 0]]})
+        self.assertEqual(paths['Object/@elementtype']['top'],
+                         [['letter', 3, 0]])
+        self.assertEqual(paths['Object/Identification/BriefDescription'], {
+            'present': 4, 'empty': 4, 'distinct': 0, 'minlen': None,
+            'maxlen': None, 'top': []})
+        self.assertEqual(paths['Object/ObjectIdentity']['present'], 4)
+
+    def test_jobs(self):
+        self.assertEqual(self.profile(), self.profile('-j', '3'))
+
+
+if __name__ == '__main__':
+    unittest.main()
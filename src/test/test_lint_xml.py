@@ -0,0 +1,105 @@
+"""
+    Test lint_xml.py against the templates in templates/pretty.
+"""
+import json
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import lint_xml
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LETTER = '''<Object elementtype="letter">
+    <ObjectIdentity><Number>{idnum}</Number></ObjectIdentity>
+    <Identification><Title>A letter</Title></Identification>
+    <ObjectLocation elementtype="current location">
+        <Location>S1</Location>
+        <Date><DateBegin>{date}</DateBegin></Date>
+    </ObjectLocation>
+    <ObjectLocation elementtype="previous location">
+        <Location>S2</Location>
+    </ObjectLocation>
+    <Production><Date>1.1920</Date></Production>
+    {extra}
+</Object>
+'''
+OBJECTS = [
+    LETTER.format(idnum='SH1', date='1.2.2023', extra=''),
+    LETTER.format(idnum='SH2', date='nk', extra='<Description><Measurement><Part />'
+                  '</Measurement></Description><Notes /><Gadget><Part />'
+                  '</Gadget><Gadget />'),
+    LETTER.format(idnum='SH3', date='31.2.2023', extra=''),
+    LETTER.format(idnum='SH01', date='1.2.2023', extra=''),
+    LETTER.format(idnum='', date='', extra='').replace(
+        'elementtype="letter"', 'elementtype="books"'),
+    '<Object elementtype="letter"><ObjectIdentity><Number>SH5</Number>\n'
+    '</ObjectIdentity><Title></Object>\n',
+    LETTER.format(idnum='JB1.2.3', date='', extra='').replace(
+        'elementtype="current location"', 'elementtype="home location"'),
+]
+
+
+class TestLintXml(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        self.report = os.path.join(self.tmpdir.name, 'report.json')
+        with open(self.xmlfile, 'w') as xmlfile:
+            xmlfile.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                          '<Interchange>\n')
+            xmlfile.writelines(OBJECTS)
+            xmlfile.write('</Interchange>')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def lint(self, *args):
+        result = subprocess.run([sys.executable, 'lint_xml.py', self.xmlfile,
+                                 '--report', self.report, '-v', '0', *args],
+                                cwd=SRCDIR)
+        with open(self.report) as reportfile:
+            return result.returncode, json.load(reportfile)
+
+    def test_schema(self):
+        schema = lint_xml.load_schema(lint_xml.DEFAULT_TEMPLATES)
+        self.assertIn('letter', schema['types'])
+        self.assertIn('Production/Person/Role', schema['types']['letter'])
+        self.assertEqual(schema['subtypes']['ObjectLocation'],
+                         {'current location', 'normal location',
+                          'previous location'})
+
+    def lineno(self, text):
+        with open(self.xmlfile) as xmlfile:
+            return xmlfile.read().partition(text)[0].count('\n') + 1
+
+    def test_lint(self):
+        returncode, report = self.lint()
+        self.assertEqual(returncode, 1)
+        self.assertEqual(report['total_objects'], 7)
+        codes = {key: [error['code'] for error in errors]
+                 for key, errors in report['objects'].items()}
+        self.assertEqual(codes, {
+            'SH2': ['W02', 'W01'],
+            'SH3': ['E06'],
+            'SH01': ['E04'],
+            f'line {self.lineno("books")}': ['E02', 'E05'],
+            'SH5': ['E01'],
+            'JB1.2.3': ['E03', 'W03']})
+        self.assertIn('Measurement', report['objects']['SH2'][0]['message'])
+        self.assertIn(f'line {self.lineno("<Title></Object>")}',
+                      report['objects']['SH5'][0]['message'])
+        self.assertEqual(report['counts'], {'E01': 1, 'E02': 1, 'E03': 1,
+                                            'E04': 1, 'E05': 1, 'E06': 1,
+                                            'W01': 1, 'W02': 1, 'W03': 1})
+
+    def test_jobs(self):
+        # Each Object is a shard of its own with four processes.
+        self.assertEqual(self.lint(), self.lint('-j', '4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+    Test the WordPress export parser in web/wxr.py and the reconciliation in
+    web/list_collection.py.
+"""
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from web import list_collection
+from web.wxr import iter_items
+
+WXR = '''<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0" xmlns:wp="http://wordpress.org/export/1.2/">
+<channel>
+  <title>Heath Robinson Museum</title>
+  {items}
+</channel>
+</rss>
+'''
+ITEM = '''<item>
+    <title>{title}</title>
+    <guid isPermaLink="false">https://example.org/?p={post_id}</guid>
+    <wp:post_id>{post_id}</wp:post_id>
+    <wp:post_date_gmt><![CDATA[2024-01-01 10:00:00]]></wp:post_date_gmt>
+    <wp:post_modified_gmt><![CDATA[{modified}]]></wp:post_modified_gmt>
+    <wp:status><![CDATA[publish]]></wp:status>
+    <wp:post_type><![CDATA[{post_type}]]></wp:post_type>
+    <wp:postmeta>
+      <wp:meta_key><![CDATA[{key}]]></wp:meta_key>
+      <wp:meta_value><![CDATA[{value}]]></wp:meta_value>
+    </wp:postmeta>
+  </item>'''
+MODES = '''<?xml version="1.0"?>
+<Interchange>
+{}
+</Interchange>
+'''
+OBJECT = ('<Object><ObjectIdentity><Number>{}</Number></ObjectIdentity>'
+          '</Object>')
+
+
+def wxr(post_type, key, items):
+    return WXR.format(items='\n'.join(
+        ITEM.format(title=value, post_id=n, modified=modified,
+                    post_type=post_type, key=key, value=value)
+        for n, (value, modified) in enumerate(items, start=1)))
+
+
+def write(path, text, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestWxr(unittest.TestCase):
+
+    def test_iter_items(self):
+        text = wxr('collection', 'serial_no',
+                   [('JB1', '2024-02-01 12:00:00'),
+                    ('JB2', '0000-00-00 00:00:00')])
+        items = list(iter_items(io.BytesIO(text.encode())))
+        self.assertEqual([(i.post_id, i.post_type, i.status, i.modified,
+                           i.meta) for i in items],
+                         [('1', 'collection', 'publish', '2024-02-01 12:00:00',
+                           {'serial_no': 'JB1'}),
+                          ('2', 'collection', 'publish', '2024-01-01 10:00:00',
+                           {'serial_no': 'JB2'})])
+        self.assertEqual(items[0].guid, 'https://example.org/?p=1')
+        self.assertEqual(list(iter_items(io.BytesIO(text.encode()),
+                                         'attachment')), [])
+
+
+class TestListCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        top = self.tempdir.name
+        self.downloaddir = os.path.join(top, 'downloads')
+        self.resultsdir = os.path.join(top, 'results')
+        self.imgdir = os.path.join(top, 'images')
+        self.report = os.path.join(top, 'report.csv')
+        name = 'heathrobinsonmuseum.WordPress.2024-03-01.xml'
+        write(os.path.join(self.downloaddir, 'collection_items', name),
+              wxr('collection', 'serial_no',
+                  [('JB2', '2024-02-01 12:00:00'),
+                   ('JB1', '2024-02-02 12:00:00'),
+                   ('JB9', '2024-02-03 12:00:00')]))
+        write(os.path.join(self.downloaddir, 'media_items', name),
+              wxr('attachment', '_wp_attached_file',
+                  [('collection_JB1.jpg', '2024-02-01 12:00:00'),
+                   ('collection_JB2-001.jpg', '2024-02-01 12:00:00'),
+                   ('logo.png', '2024-02-01 12:00:00'),
+                   ('collection_JB8.jpg', '2024-02-01 12:00:00')]))
+        for subdir in ('collection_items', 'media_items'):
+            os.makedirs(os.path.join(self.resultsdir, subdir))
+        self.modesfile = os.path.join(top, 'modes.xml')
+        write(self.modesfile, MODES.format('\n'.join(
+            OBJECT.format(accn) for accn in ('JB1', 'JB2', 'JB3', 'JB4'))))
+        january, june = 1704067200, 1717200000  # 2024-01-01, 2024-06-01 UTC
+        write(os.path.join(self.imgdir, 'a', 'JB1.jpg'), '', january)
+        write(os.path.join(self.imgdir, 'a', 'JB2-001-1.jpg'), '', january)
+        write(os.path.join(self.imgdir, 'b', 'JB2-001-2.jpg'), '', june)
+        write(os.path.join(self.imgdir, 'b', 'JB3.jpg'), '', january)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_main(self, *args):
+        list_collection._args = list_collection.getargs(
+            ['', '--downloaddir', self.downloaddir, '--resultsdir',
+             self.resultsdir, '-v', '0', *args])
+        list_collection.main()
+
+    def read_result(self, subdir):
+        path = os.path.join(self.resultsdir, subdir, 'wordpress.2024-03-01.csv')
+        with open(path) as f:
+            return f.read().splitlines()
+
+    def test_lists(self):
+        self.run_main()
+        self.assertEqual(self.read_result('collection_items'),
+                         ['JB001', 'JB002', 'JB009'])
+        self.assertEqual(self.read_result('media_items'),
+                         ['JB001,collection_JB1.jpg',
+                          'JB002.1,collection_JB2-001.jpg',
+                          'JB008,collection_JB8.jpg'])
+
+    def test_reconcile(self):
+        self.run_main('-m', self.modesfile, '-i', self.imgdir,
+                      '-o', self.report)
+        with open(self.report, newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], list_collection.REPORT_HEADING)
+        newest = os.path.join(self.imgdir, 'b', 'JB2-001-2.jpg')
+        jb3 = os.path.join(self.imgdir, 'b', 'JB3.jpg')
+        self.assertEqual(rows[1:], [
+            ['JB002', 'stale', '2024-02-01 12:00:00', 'collection_JB2-001.jpg',
+             '2024-02-01 12:00:00', newest, '2024-06-01 00:00:00'],
+            ['JB003', 'missing', '', '', '', jb3, '2024-01-01 00:00:00'],
+            ['JB003', 'missing media', '', '', '', jb3, '2024-01-01 00:00:00'],
+            ['JB004', 'missing', '', '', '', '', ''],
+            ['JB008', 'extra media', '', 'collection_JB8.jpg',
+             '2024-02-01 12:00:00', '', ''],
+            ['JB009', 'extra', '2024-02-03 12:00:00', '', '', '', '']])
+
+
+if __name__ == '__main__':
+    unittest.main()
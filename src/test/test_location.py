@@ -6,7 +6,7 @@ import os.path
 import unittest
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
-from location import validate_locations, loc_types
+from location import validate_locations, location_errors, loc_types
 
 
 class Aargs:
@@ -20,6 +20,25 @@ class Aargs:
         self.previous = p
 
 
+PREVIOUS = '''<ObjectLocation elementtype="previous location">
+    <Location>S{n}</Location>
+    <Date><DateBegin>1.{n}.2020</DateBegin><DateEnd>1.{m}.2020</DateEnd></Date>
+</ObjectLocation>'''
+
+
+def make_object(current):
+    """
+    :param current: the current ObjectLocation element as a string
+    :return: an Object element with a normal location, the current location
+             and two previous locations
+    """
+    return ET.fromstring(
+        '<Object><ObjectIdentity><Number>JB1</Number></ObjectIdentity>'
+        '<ObjectLocation elementtype="normal location"><Location>S1'
+        '</Location></ObjectLocation>' + current +
+        PREVIOUS.format(n=2, m=3) + PREVIOUS.format(n=1, m=2) + '</Object>')
+
+
 class TestLocation(unittest.TestCase):
     T = True
     F = False
@@ -53,6 +72,15 @@ class TestLocation(unittest.TestCase):
                                    ' date.'),
     ]
 
+    # location_errors reports every error, not just the first
+    TESTERRORS = [
+        ('location_test01.xml', []),
+        ('location_test04.xml', ['E02']),
+        ('location_test08.xml', ['E07', 'E08']),
+        ('location_test09.xml', ['E08', 'E09']),
+        ('location_test14.xml', ['E11', 'E12']),
+    ]
+
     TESTLOCTYPES = [
 
     ]
@@ -124,6 +152,36 @@ class TestLocation(unittest.TestCase):
                 else:
                     self.assertFalse(result, msg=msg)
 
+    def test_location_errors(self):
+        for filename, expected in TestLocation.TESTERRORS:
+            with self.subTest(filename=filename):
+                testfile = os.path.join(TestLocation.TESTLOCATION, filename)
+                tree = ET.parse(testfile)
+                elem = tree.find('Object')
+                idnum = elem.find('./ObjectIdentity/Number').text
+                errors = location_errors(idnum, elem)
+                self.assertEqual([code for code, _ in errors], expected)
+
+    def test_current_errors(self):
+        # A bad current location is reported once and not also as out of
+        # date order.
+        tests = [
+            ('<Location>S3</Location>', ['E01']),
+            ('<Location>S3</Location><Date><DateBegin>x</DateBegin></Date>',
+             ['E02']),
+            ('<Location>S3</Location><Date><DateBegin>1.3.2020</DateBegin>'
+             '<DateEnd>1.4.2020</DateEnd></Date>', ['E03']),
+            ('<Date><DateBegin>1.3.2020</DateBegin></Date>', ['E14']),
+            ('<Location>S3</Location><Date><DateBegin>1.3.2020</DateBegin>'
+             '</Date>', []),
+        ]
+        for current, expected in tests:
+            with self.subTest(current=current):
+                elem = make_object('<ObjectLocation elementtype="current '
+                                   'location">' + current + '</ObjectLocation>')
+                errors = location_errors('JB1', elem)
+                self.assertEqual([code for code, _ in errors], expected)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+"""
+    Test the folder scan and up to date check in web/merge_letters.py. The
+    assembly of the PDF files isn't tested as it needs img2pdf and pypdf,
+    only the cleanup when it fails.
+"""
+import os
+import tempfile
+import time
+import unittest
+
+from web import merge_letters
+
+
+def touch(path, mtime=None):
+    with open(path, 'wb'):
+        pass
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestMergeLetters(unittest.TestCase):
+
+    def setUp(self):
+        merge_letters._args = merge_letters.getargs(['', 'in', 'out', '-v', '0'])
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.indir = os.path.join(self.tempdir.name, 'in')
+        for subdir, names in (('SH12', ('SH12-001-1.jpg', 'SH12-001-1.pdf',
+                                        'SH12-001-10.pdf', 'SH12-001-2.JPG',
+                                        'SH12-002-1.jpg', 'notes.txt')),
+                              ('SH12_b', ('SH12-001-3.jpg',))):
+            os.makedirs(os.path.join(self.indir, subdir))
+            for name in names:
+                touch(os.path.join(self.indir, subdir, name))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_letters_dict(self):
+        ld = merge_letters.get_letters_dict(self.indir)
+        self.assertEqual(sorted(ld), [('SH12', '001'),
+                                      ('SH12', '002')])
+        pages = ld[('SH12', '001')]
+        self.assertEqual(sorted(pages, key=merge_letters.sortkey),
+                         ['SH12-001-1.jpg', 'SH12-001-2.JPG',
+                          'SH12-001-3.jpg', 'SH12-001-10.pdf'])
+        self.assertEqual(pages['SH12-001-3.jpg'],
+                         os.path.join(self.indir, 'SH12_b', 'SH12-001-3.jpg'))
+
+    def test_up_to_date(self):
+        pages = merge_letters.get_letters_dict(self.indir)[
+            ('SH12', '002')]
+        pagepaths = list(pages.values())
+        outpath = os.path.join(self.tempdir.name, 'SH12.2.pdf')
+        self.assertFalse(merge_letters.is_up_to_date(outpath, pagepaths))
+        touch(outpath, time.time() + 60)
+        self.assertTrue(merge_letters.is_up_to_date(outpath, pagepaths))
+        # A page added to the folder changes the folder's mtime.
+        folder = os.path.dirname(pagepaths[0])
+        os.utime(folder, (time.time() + 120, time.time() + 120))
+        self.assertFalse(merge_letters.is_up_to_date(outpath, pagepaths))
+
+    def test_failed_assembly(self):
+        # A failure while writing the PDF leaves neither file behind.
+        def fail(pdfpath, pagepaths):
+            with open(pdfpath, 'wb') as pdffile:
+                pdffile.write(b'%PDF-')
+            raise ValueError('bad scan')
+
+        outpath = os.path.join(self.tempdir.name, 'SH12.2.pdf')
+        write_pdf = merge_letters._write_pdf
+        merge_letters._write_pdf = fail
+        try:
+            with self.assertRaises(ValueError):
+                merge_letters.assemble_letter(outpath, ['SH12-002-1.jpg'])
+        finally:
+            merge_letters._write_pdf = write_pdf
+        self.assertEqual(os.listdir(self.tempdir.name), ['in'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+    Test the in-memory index in utl/collectionindex.py and the query server
+    in modes.py.
+"""
+import json
+import os.path
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from utl.collectionindex import CollectionIndex, NORMAL_LOCATION
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OBJECT = '''<Object elementtype="Book">
+    <ObjectIdentity><Number>{idnum}</Number></ObjectIdentity>
+    <Identification><Title>Title {idnum}</Title></Identification>
+    <ObjectLocation elementtype="normal location">
+        <Location>{normal}</Location>
+    </ObjectLocation>
+    <ObjectLocation elementtype="current location">
+        <Location>{current}</Location>
+        <Date><DateBegin>1.2.2023</DateBegin></Date>
+    </ObjectLocation>
+</Object>
+'''
+LOCATIONS = {'JB1': ('S1', 'S1'), 'JB2': ('S1', 'G2'), 'JB10': ('S2', 's1'),
+             'JB2A': ('S2', 'S2')}
+
+
+def write_xml(filename, locations=None, duplicate=None):
+    locations = locations or LOCATIONS
+    with open(filename, 'w') as xmlfile:
+        xmlfile.write('<?xml version="1.0" encoding="utf-8"?>\n<Interchange>\n')
+        for idnum, (normal, current) in locations.items():
+            xmlfile.write(OBJECT.format(idnum=idnum, normal=normal,
+                                        current=current))
+        if duplicate:
+            xmlfile.write(OBJECT.format(idnum=duplicate, normal='X',
+                                        current='X'))
+        xmlfile.write('</Interchange>')
+
+
+class TestCollectionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        write_xml(self.xmlfile, duplicate='JB1')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_index(self):
+        index = CollectionIndex(self.xmlfile)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.duplicates, ['JB1'])
+        self.assertIn('jb002', index)
+        self.assertEqual(index.objects_at('s1'), ['JB1', 'JB10'])
+        self.assertEqual(index.objects_at('S1', NORMAL_LOCATION),
+                         ['JB1', 'JB2'])
+        self.assertEqual(index.objects_at('nowhere'), [])
+        locations = index.locations('JB2')
+        self.assertEqual([loc['location'] for loc in locations], ['S1', 'G2'])
+        self.assertEqual(locations[1]['datebegin'], '1.2.2023')
+        self.assertIsNone(index.locations('JB3'))
+        elem = index.element(index.normalize('JB2A'))
+        self.assertEqual(elem.find('./Identification/Title').text,
+                         'Title JB2A')
+
+    def test_changed(self):
+        index = CollectionIndex(self.xmlfile)
+        self.assertFalse(index.changed())
+        write_xml(self.xmlfile, {'JB3': ('S3', 'S3')})
+        os.utime(self.xmlfile, ns=(0, 0))
+        self.assertTrue(index.changed())
+        index.load()
+        self.assertFalse(index.changed())
+        self.assertEqual(index.objects_at('S3'), ['JB3'])
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'Unix sockets are not available.')
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        self.socket = os.path.join(self.tmpdir.name, 'modes.sock')
+        write_xml(self.xmlfile)
+        self.server = subprocess.Popen(
+            [sys.executable, 'modes.py', 'serve', self.xmlfile,
+             '-u', self.socket, '-v', '0'], cwd=SRCDIR)
+        for _ in range(100):
+            if os.path.exists(self.socket):
+                break
+            time.sleep(0.1)
+
+    def tearDown(self):
+        self.client('stop')
+        self.server.wait(10)
+        self.tmpdir.cleanup()
+
+    def client(self, *args):
+        result = subprocess.run([sys.executable, 'modes.py', *args,
+                                 '-u', self.socket, '-v', '0'],
+                                cwd=SRCDIR, capture_output=True, text=True)
+        return result.stdout
+
+    def test_queries(self):
+        where = json.loads(self.client('where', 'JB1-2', '--json'))
+        self.assertEqual(list(where), ['JB1', 'JB2'])
+        self.assertEqual(where['JB2'][1]['location'], 'G2')
+        self.assertEqual(json.loads(self.client('box', 'S1', '--json')),
+                         ['JB1', 'JB10'])
+        csvname = os.path.join(self.tmpdir.name, 'out.csv')
+        self.client('export', csvname, '-j', 'JB10,JB2', '-t', '\n')
+        with open(csvname) as csvfile:
+            self.assertEqual(csvfile.read(), 'JB002\nJB010\n')
+
+    def post(self, query, body):
+        import http.client
+        import socket
+
+        conn = http.client.HTTPConnection('localhost', timeout=10)
+        conn.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.sock.connect(self.socket)
+        conn.request('POST', '/' + query, body,
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        result = response.status, json.loads(response.read())
+        conn.close()
+        return result
+
+    def test_bad_request(self):
+        # A wrongly typed request gets an error reply and the server goes on.
+        for query, body in (('select', b'{"query": "select", "ids": null}'),
+                            ('where', b'[1, 2]')):
+            with self.subTest(body=body):
+                status, reply = self.post(query, body)
+                self.assertEqual(status, 400)
+                self.assertIn('error', reply)
+        status, reply = self.post('status', b'{}')
+        self.assertEqual(status, 200)
+        self.assertEqual(reply['objects'], len(LOCATIONS))
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
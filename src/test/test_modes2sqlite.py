@@ -0,0 +1,103 @@
+"""
+    Test creating and refreshing the SQLite mirror made by modes2sqlite.py.
+"""
+import os.path
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OBJECT = '''<Object elementtype="Book">
+    <ObjectIdentity><Number>{idnum}</Number></ObjectIdentity>
+    <Identification><Title>{title}</Title></Identification>
+    <ObjectLocation elementtype="normal location">
+        <Location>{location}</Location>
+    </ObjectLocation>
+    <ObjectLocation elementtype="current location">
+        <Location>{location}</Location>
+        <Date><DateBegin>1.2.2023</DateBegin></Date>
+    </ObjectLocation>
+    <Exhibition><ExhibitionName>Show</ExhibitionName><Place>Pinner</Place>
+    </Exhibition>
+</Object>
+'''
+OBJECTS = {'JB1': ('A golf course', 'S2'), 'JB2': ('The kitchen', 'S10'),
+           'JB10': ('Gadgets', 'S2')}
+
+
+class TestModes2Sqlite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.xmlfile = os.path.join(self.tmpdir.name, 'collection.xml')
+        self.dbfile = os.path.join(self.tmpdir.name, 'collection.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def refresh(self, objects):
+        with open(self.xmlfile, 'w') as xmlfile:
+            xmlfile.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                          '<Interchange>\n')
+            for idnum, (title, location) in objects.items():
+                xmlfile.write(OBJECT.format(idnum=idnum, title=title,
+                                            location=location))
+            xmlfile.write('</Interchange>')
+        result = subprocess.run([sys.executable, 'modes2sqlite.py',
+                                 self.xmlfile, self.dbfile],
+                                cwd=SRCDIR, capture_output=True, text=True,
+                                check=True)
+        return result.stdout
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.dbfile)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_create(self):
+        self.assertIn('3 new', self.refresh(OBJECTS))
+        self.assertEqual(self.query('SELECT box, serial FROM box_contents'),
+                         [('S2', 'JB1'), ('S2', 'JB10'), ('S10', 'JB2')])
+        self.assertEqual(self.query(
+            "SELECT datebegin FROM locations WHERE sortkey = 'JB000002' AND "
+            "type = 'current location'"), [('2023-02-01',)])
+        self.assertEqual(self.query(
+            "SELECT serial FROM objects JOIN objects_fts ON objects.rowid = "
+            "objects_fts.rowid WHERE objects_fts MATCH 'golf'"), [('JB1',)])
+        self.assertEqual(self.query(
+            "SELECT DISTINCT exhibition FROM exhibition_list"),
+            [('Show (Pinner)',)])
+
+    def test_refresh(self):
+        self.refresh(OBJECTS)
+        objects = dict(OBJECTS, JB2=('A golf club', 'S10'))
+        del objects['JB10']
+        output = self.refresh(objects)
+        self.assertIn('0 new, 1 changed, 1 deleted, 1 unchanged', output)
+        self.assertEqual(self.query(
+            "SELECT serial FROM objects JOIN objects_fts ON objects.rowid = "
+            "objects_fts.rowid WHERE objects_fts MATCH 'golf' "
+            "ORDER BY serial"), [('JB1',), ('JB2',)])
+        self.assertEqual(self.query('SELECT count(*) FROM exhibitions'),
+                         [(2,)])
+
+    def test_pad_loc(self):
+        # box_key must sort the boxes as the report scripts do.
+        import list_by_box
+        import modes2sqlite
+        import stocktake
+        for loc in ('S1', 's10', 'G2A', 'A12.3', 'Attic', ''):
+            with self.subTest(loc=loc):
+                self.assertEqual(modes2sqlite.pad_loc(loc),
+                                 list_by_box.pad_loc(loc))
+                self.assertEqual(modes2sqlite.pad_loc(loc),
+                                 stocktake.pad_loc(loc))
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+    Test pretty_tostring against the minidom round trip it replaces.
+"""
+import sys
+import unittest
+import xml.dom.minidom as minidom
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.xmlutil import pretty_tostring
+
+OBJECTS = ['''<Object elementtype="a &quot;q&quot; &amp; &lt;x&gt;"
+  other="tab&#9;nl&#10;x">
+  <ObjectIdentity><Number>JB001</Number></ObjectIdentity>
+  <Empty/>   <Blank>   </Blank>
+  <Mixed>  lead  text <b>bold "q" &amp; &gt;</b>   tail <i/> more </Mixed>
+  <Uni>café — ünïcode 😀</Uni>
+  <Object elementtype="nested"><Number>JB001.1</Number></Object>
+  <Deep><A><B><C>x</C></B></A></Deep>
+</Object>''',
+           '<Object><Single><Only/></Single></Object>',
+           '<Object/>']
+
+
+def normalized(xml: str):
+    # As in normalize_xml.py
+    elem = ET.fromstring(xml)
+    for e in elem.iter():
+        if e.text:
+            e.text = ' '.join(e.text.strip().split())
+        if e.tail:
+            e.tail = ' '.join(e.tail.strip().split())
+    return elem
+
+
+def minidom_pretty(elem, encoding):
+    xmlstring = ET.tostring(elem, encoding=encoding, xml_declaration=False)
+    prettyxml = minidom.parseString(xmlstring).toprettyxml(
+        indent='\t', encoding=encoding)
+    return prettyxml.split(b'\n', 1)[1]
+
+
+class TestPretty(unittest.TestCase):
+
+    def test_reparsed(self):
+        for n, xml in enumerate(OBJECTS):
+            for encoding in ('UTF-8', 'us-ascii'):
+                with self.subTest(n=n, encoding=encoding):
+                    elem = normalized(xml)
+                    expected = ET.tostring(
+                        ET.fromstring(minidom_pretty(elem, encoding)),
+                        encoding=encoding, xml_declaration=False)
+                    self.assertEqual(pretty_tostring(elem, encoding),
+                                     expected)
+
+    def test_minidom(self):
+        # minidom's escaping changed in Python 3.13; pretty_tostring follows
+        # the running version.
+        for n, xml in enumerate(OBJECTS):
+            with self.subTest(n=n):
+                elem = normalized(xml)
+                self.assertEqual(
+                    pretty_tostring(elem, minidom_style=True) + b'\n',
+                    minidom_pretty(elem, 'utf-8'))
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
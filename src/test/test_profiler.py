@@ -0,0 +1,86 @@
+"""
+    Test the --profile support in utl/profiler.py.
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os.path
+import pstats
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utl.profiler import Profiler, add_profile_arguments, collapse_pstats
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XML = ('<?xml version="1.0" encoding="utf-8"?>\n<Interchange>\n' +
+       ''.join(f'<Object><ObjectIdentity><Number>JB{n}</Number>'
+               f'</ObjectIdentity></Object>\n' for n in range(1, 201)) +
+       '</Interchange>\n')
+
+
+def leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def branch():
+    return leaf(20000) + leaf(40000)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_collapse_pstats(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        branch()
+        profile.disable()
+        folded = collapse_pstats(pstats.Stats(profile).stats)
+        stacks = [stack.split(';') for stack in folded]
+        leaf_stacks = [stack for stack in stacks
+                       if stack[-1].startswith('leaf (')]
+        self.assertTrue(leaf_stacks)
+        for stack in leaf_stacks:
+            self.assertTrue(stack[-2].startswith('branch (test_profiler.py:'))
+
+    def test_not_profiling(self):
+        profiler = Profiler(None, 'none').start()
+        self.assertIsNone(profiler.stop(10))
+
+    def test_arguments(self):
+        # The mode is required so --profile can't take a positional argument.
+        parser = argparse.ArgumentParser()
+        parser.add_argument('infile')
+        add_profile_arguments(parser)
+        args = parser.parse_args(['--profile', 'sample', 'in.xml'])
+        self.assertEqual((args.profile, args.infile), ('sample', 'in.xml'))
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                parser.parse_args(['--profile', 'in.xml'])
+
+    def test_script(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            xmlfile = os.path.join(tmpdir, 'in.xml')
+            with open(xmlfile, 'w') as f:
+                f.write(XML)
+            for mode in ('cprofile', 'sample'):
+                profdir = os.path.join(tmpdir, mode)
+                subprocess.run([sys.executable, 'xml2csv.py', xmlfile,
+                                os.path.join(tmpdir, 'out.csv'), '-v', '0',
+                                '--profile', mode, '--profile_dir', profdir],
+                               cwd=SRCDIR, check=True, capture_output=True)
+                with open(os.path.join(profdir, 'xml2csv.json')) as f:
+                    summary = json.load(f)
+                self.assertEqual(summary['mode'], mode)
+                self.assertEqual(summary['objects'], 200)
+                self.assertTrue(os.path.exists(
+                    os.path.join(profdir, 'xml2csv.folded')))
+                self.assertEqual(os.path.exists(
+                    os.path.join(profdir, 'xml2csv.pstats')),
+                    mode == 'cprofile')
+
+
+if __name__ == '__main__':
+    unittest.main()
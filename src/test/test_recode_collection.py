@@ -0,0 +1,99 @@
+"""
+    Test the CSV file for WordPress written by web/recode_collection.py.
+"""
+import csv
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from web import recode_collection
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The columns written by xml2csv.py using website.yml
+COLUMNS = ['Serial', 'Title', 'Medium', 'ObjectType', 'Order', 'Description',
+           'Production_SummaryText', 'TitleFirstPublished',
+           'PageFirstPublished', 'DateBegin', 'DateEnd', 'Accuracy',
+           'DateFirstPublished', 'Date', 'ExhibitionName', 'ExhibitionPlace',
+           'Dimensions', 'Pages', 'Sender', 'Sender Org', 'Recipient',
+           'Recipient Org', 'Publ Name']
+ROWS = [
+    {'Serial': 'JB1', 'DateBegin': '17.8.1909', 'Dimensions': '300 x 500',
+     'Order': '1'},
+    {'Serial': 'JB2', 'DateBegin': '1925', 'DateEnd': '1934',
+     'Accuracy': 'circa', 'Dimensions': '12mm by 7mm', 'Pages': '4',
+     'Order': '2'},
+    {'Serial': 'JB3', 'DateBegin': '8.1909', 'Order': '1'},
+    {'Serial': 'JB4', 'DateBegin': '1955', 'Order': 'x'},
+]
+
+
+class TestRecodeCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.incsv = self.path('in.csv')
+        with open(self.incsv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, restval='')
+            writer.writeheader()
+            writer.writerows(ROWS)
+        # One image list per batch, each given with its own -g option.
+        with open(self.path('batch1.csv'), 'w', newline='') as f:
+            csv.writer(f).writerows([['JB1', 'jb1.jpg|jb1-2.jpg']])
+        with open(self.path('batch2.csv'), 'w', newline='') as f:
+            csv.writer(f).writerows([['JB3', 'jb3.jpg']])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_recode(self):
+        outcsv = self.path('out.csv')
+        subprocess.run([sys.executable, '-m', 'web.recode_collection',
+                        '-i', self.incsv, '-o', outcsv,
+                        '-g', self.path('batch1.csv'),
+                        '-g', self.path('batch2.csv'), '-v', '0'],
+                       cwd=SRCDIR, check=True)
+        with open(outcsv, encoding='utf-8-sig', newline='') as f:
+            rows = {row['Serial']: row for row in csv.DictReader(f)}
+        self.assertEqual(
+            [(row['HumanDate'], row['IsoDate'], row['Decade'])
+             for row in rows.values()],
+            [('17 Aug 1909', '1909-08-17', '1900s'),
+             ('c. 1925 - 1934', '1925-01-01', '1920s|1930s'),
+             ('Aug 1909', '1909-08-01', '1900s'),
+             ('1955', '1955-01-01', '')])
+        self.assertEqual(rows['JB001']['Dimensions'],
+                         'Width: 500mm<br/>Height: 300mm')
+        self.assertEqual(rows['JB002']['Dimensions'],
+                         'Width: 7mm<br/>Height: 12mm<br/>'
+                         'Number of Pages: 4')
+        self.assertEqual(rows['JB003']['Dimensions'], '')
+        self.assertEqual(rows['JB004']['Order'], '9_JB000004')
+        self.assertEqual((rows['JB001']['Gallery01'], rows['JB001']['Gallery02'],
+                          rows['JB003']['Gallery01']),
+                         ('jb1.jpg', 'jb1-2.jpg', 'jb3.jpg'))
+
+    def test_cached(self):
+        # The cached functions give the same results as the uncached ones,
+        # called again with the same arguments.
+        for datebegin, dateend in (('1909', ''), ('1.1925', '1934'),
+                                   ('1955', ''), ('', '')):
+            for _ in range(2):
+                self.assertEqual(
+                    recode_collection.decade(datebegin, dateend),
+                    recode_collection.decade.__wrapped__(datebegin, dateend))
+                self.assertEqual(
+                    recode_collection.isodate(datebegin),
+                    recode_collection.isodate.__wrapped__(datebegin))
+                self.assertEqual(
+                    recode_collection.humandate(datebegin),
+                    recode_collection.humandate.__wrapped__(datebegin))
+
+
+if __name__ == '__main__':
+    unittest.main()
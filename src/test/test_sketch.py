@@ -0,0 +1,71 @@
+"""
+    Test the HyperLogLog and SpaceSaving sketches in utl/sketch.py.
+"""
+import unittest
+
+from utl.sketch import HyperLogLog, SpaceSaving
+
+
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_count(self):
+        for n in (0, 1, 100, 20000):
+            hll = HyperLogLog()
+            for i in range(n):
+                hll.add(f'JB{i}')
+                hll.add(f'JB{i}')
+            self.assertLessEqual(abs(hll.count() - n), max(1, n * 0.05), n)
+
+    def test_merge(self):
+        whole, part1, part2 = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(5000):
+            whole.add(str(i))
+            (part1 if i % 3 else part2).add(str(i))
+        part1.merge(part2)
+        self.assertEqual(part1.registers, whole.registers)
+        with self.assertRaises(ValueError):
+            part1.merge(HyperLogLog(10))
+
+
+class TestSpaceSaving(unittest.TestCase):
+
+    def test_exact(self):
+        ss = SpaceSaving(4)
+        for value in 'abcabca':
+            ss.add(value)
+        self.assertEqual(ss.top(2), [('a', 3, 0), ('b', 2, 0)])
+
+    def test_heavy_hitters(self):
+        # Frequent values are kept among many values occurring once.
+        ss = SpaceSaving(20)
+        for i in range(1000):
+            ss.add(f'x{i}')
+            if i % 4 == 0:
+                ss.add('often')
+            if i % 10 == 0:
+                ss.add('sometimes')
+        top = ss.top(2)
+        self.assertEqual([value for value, _, _ in top],
+                         ['often', 'sometimes'])
+        for value, count, error in top:
+            true = 250 if value == 'often' else 100
+            self.assertTrue(count - error <= true <= count, top)
+        self.assertEqual(len(ss.counts), 20)
+
+    def test_merge(self):
+        a, b = SpaceSaving(3), SpaceSaving(3)
+        for value in 'aaabbc':
+            a.add(value)
+        for value in 'aaddde':
+            b.add(value)
+        a.merge(b)
+        top = a.top(3)
+        self.assertEqual([value for value, _, _ in top], ['a', 'd', 'b'])
+        self.assertEqual(top[0], ('a', 5, 0))
+        for value, count, error in top:
+            true = 'aaabbcaaddde'.count(value)
+            self.assertTrue(count - error <= true <= count, top)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+    Check that the main scripts start quickly. Each script is run with --help
+    under "python -X importtime" and the total import time is compared with a
+    budget. The modules that are slow to import must not be imported at all
+    unless they are needed.
+
+    The budgets are generous so that the test passes on a loaded machine and
+    when the bytecode cache is disabled. Before openpyxl, ruamel.yaml and
+    colorama were deferred, location.py took about 300 ms.
+"""
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# script -> budget in milliseconds
+BUDGETS = {'csv2xml.py': 150,
+           'exhibition.py': 150,
+           'filter_xml.py': 150,
+           'flatten_xml.py': 100,
+           'location.py': 150,
+           'merge_xml.py': 150,
+           'modes.py': 100,
+           'normalize_xml.py': 100,
+           'sync_xml.py': 100,
+           'update_from_csv.py': 150,
+           'xml2csv.py': 150,
+           'xmldiff.py': 150,
+           }
+SLOW_MODULES = ('colorama', 'concurrent', 'magic', 'openpyxl', 'ruamel',
+                'zipfile')
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIMEPAT = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(script):
+    """
+    :return: the total import time in microseconds and the set of modules
+             imported
+    """
+    env = dict(os.environ, PYTHONPATH=SRCDIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime', script, '-h'],
+                            cwd=SRCDIR, env=env, capture_output=True,
+                            text=True)
+    total = 0
+    modules = set()
+    for m in IMPORTTIMEPAT.finditer(result.stderr):
+        modules.add(m[4])
+        if len(m[3]) == 1:  # top level import
+            total += int(m[2])
+    return total, modules
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_startup(self):
+        for script, budget in BUDGETS.items():
+            with self.subTest(script=script):
+                total, modules = import_times(script)
+                slow = {m for m in modules if m.split('.')[0] in SLOW_MODULES}
+                self.assertFalse(slow, f'{script} imports {sorted(slow)}')
+                self.assertLess(total / 1000, budget)
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
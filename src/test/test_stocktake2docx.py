@@ -0,0 +1,85 @@
+"""
+    Test the tables written by stocktake2docx.py.
+"""
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = '''Serial,Current,Normal,Title,Description,Condition
+JB10,S2,S2,Gadgets & <gizmos>,,
+JB2,S10,S1,,A kitchen,Poor
+JB1,s2,S2,Golf,,Good
+'''
+
+
+class TestStocktake2docx(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import docx
+        except ImportError:
+            self.skipTest('python-docx is not installed')
+        self.docx = docx
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.csvfile = os.path.join(self.tempdir.name, 'stocktake.csv')
+        with open(self.csvfile, 'w') as f:
+            f.write(CSV)
+        self.template = os.path.join(self.tempdir.name, 'template.docx')
+        docx.Document().save(self.template)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_script(self, outfile, *args):
+        subprocess.run([sys.executable, 'stocktake2docx.py', self.csvfile,
+                        outfile, '--header', 'Stocktake', '-t', self.template,
+                        '-v', '0', *args], cwd=SRCDIR, check=True)
+
+    def rows(self, filename):
+        doc = self.docx.Document(filename)
+        return [[[cell.text for cell in row.cells] for row in table.rows]
+                for table in doc.tables]
+
+    def test_one_document(self):
+        outfile = os.path.join(self.tempdir.name, 'stocktake.docx')
+        self.run_script(outfile)
+        heading = ['OK', 'Serial', 'NL', 'Title', 'Condition']
+        self.assertEqual(self.rows(outfile), [
+            [heading, ['', 'JB001', 'S2', 'Golf', 'Good'],
+             ['', 'JB010', '', 'Gadgets & <gizmos>', '']],
+            [heading, ['', 'JB002', 'S1', 'A kitchen', 'Poor']]])
+        doc = self.docx.Document(outfile)
+        self.assertEqual([p.text for p in doc.paragraphs if p.text],
+                         ['Location: S2', 'Location: S10'])
+        table = doc.tables[0]
+        self.assertEqual(table.style.name, 'Table Grid')
+        self.assertEqual(table.rows[0].cells[0].paragraphs[0].style.name,
+                         'Stocktake Heading')
+        self.assertEqual(round(table.rows[1].cells[3].width.cm), 10)
+
+    def test_bybox(self):
+        outdir = os.path.join(self.tempdir.name, 'boxes')
+        self.run_script(outdir, '--bybox', '--jobs', '2')
+        self.assertEqual(sorted(os.listdir(outdir)), ['S10.docx', 'S2.docx'])
+        self.assertEqual(len(self.rows(os.path.join(outdir, 'S2.docx'))[0]),
+                         3)
+
+    def test_write_box(self):
+        # The worker gets everything in its task, as it must in a process
+        # started with spawn where the _args global isn't set.
+        import stocktake2docx
+        self.assertFalse(hasattr(stocktake2docx, '_args'))
+        row = stocktake2docx.RowTuple('S2', 'JB001', 'S2', 'Golf', 'Good')
+        outfile = os.path.join(self.tempdir.name, 'S2.docx')
+        nrows = stocktake2docx._write_box((outfile, 'S2', [row],
+                                           self.template, 'Stocktake'))
+        self.assertEqual(nrows, 1)
+        self.assertEqual(self.docx.Document(outfile).sections[0].header
+                         .paragraphs[0].text, 'Stocktake')
+
+
+if __name__ == '__main__':
+    unittest.main()
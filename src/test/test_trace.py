@@ -0,0 +1,59 @@
+"""
+    Test the tracing and run statistics in utl/trace.py.
+"""
+import contextlib
+import io
+import json
+import unittest
+
+from utl.trace import RunStats, trace_sub
+
+
+def trace(level, verbose, template, *args):
+    trace_sub(level, verbose, template, None, args)
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_trace_sub(self):
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            trace(1, 1, 'a {} {}', 1, 'b')
+            trace(2, 1, 'not printed {}', 1)
+            trace(1, 1, 'no {} args')
+            for _ in range(2):
+                trace(2, 2, 'line')
+        lines = buf.getvalue().splitlines()
+        self.assertEqual(lines[:2], ['a 1 b', 'no {} args'])
+        self.assertRegex(lines[2], r'^test_trace\.py line \d+: line$')
+        self.assertEqual(lines[2], lines[3])
+
+
+class TestRunStats(unittest.TestCase):
+
+    def test_nested_phases(self):
+        stats = RunStats()
+        with stats.phase('parse'):
+            for n in stats.timed('select', range(3)):
+                with stats.phase('transform'):
+                    stats.count('objects')
+        self.assertEqual(list(stats.seconds), ['parse', 'select', 'transform'])
+        self.assertEqual(stats.calls, {'parse': 1, 'select': 4,
+                                       'transform': 3})
+        self.assertTrue(all(seconds >= 0 for seconds in
+                            stats.seconds.values()))
+        buf = io.StringIO()
+        stats.report('json', file=buf)
+        result = json.loads(buf.getvalue())
+        self.assertEqual(result['counters'], {'objects': 3})
+        self.assertLessEqual(sum(phase['seconds'] for phase in
+                                 result['phases'].values()),
+                             result['elapsed'])
+        buf = io.StringIO()
+        stats.report('text', file=buf)
+        self.assertEqual(buf.getvalue().split()[:4],
+                         ['Phase', 'Seconds', '%', 'Calls'])
+
+
+if __name__ == '__main__':
+    unittest.main()
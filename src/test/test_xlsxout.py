@@ -0,0 +1,93 @@
+"""
+    Test the streaming XLSX writer in utl/xlsxout.py and its use by
+    stocktake.py.
+"""
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import openpyxl
+
+from utl.xlsxout import SheetWriter, _column_letter
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OBJECT = '''<Object><ObjectIdentity><Number>{}</Number></ObjectIdentity>
+  <Identification><Title>{}</Title></Identification>
+  <ObjectLocation elementtype="normal location"><Location>S1</Location>
+  </ObjectLocation>
+  <ObjectLocation elementtype="current location"><Location>{}</Location>
+  </ObjectLocation></Object>
+'''
+XML = ('<?xml version="1.0" encoding="utf-8"?>\n<Interchange>\n' +
+       OBJECT.format('JB10', 'Gadgets', 'S2') +
+       OBJECT.format('JB2', '=Kitchen', 'S10') +
+       OBJECT.format('JB1', 'Golf', 'S2') + '</Interchange>\n')
+
+
+class TestSheetWriter(unittest.TestCase):
+
+    def test_column_letter(self):
+        self.assertEqual([_column_letter(n) for n in (0, 25, 26, 701, 702)],
+                         ['A', 'Z', 'AA', 'ZZ', 'AAA'])
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'out.xlsx')
+            with SheetWriter(filename, widths=[15, 50], landscape=True,
+                             header='Stocktake') as writer:
+                writer.writerow(['Serial', 'Title'], style='heading')
+                writer.writerow(['JB1', '=1+1'])
+                writer.writerow([])
+                writer.writerow(['JB2', 3], style='text')
+            ws = openpyxl.load_workbook(filename).active
+        self.assertEqual([[cell.value for cell in row]
+                          for row in ws.iter_rows()],
+                         [['Serial', 'Title'], ['JB1', '=1+1'],
+                          [None, None], ['JB2', 3]])
+        self.assertTrue(ws['A1'].font.b)
+        self.assertEqual(ws['B2'].data_type, 's')
+        self.assertEqual(ws['B4'].number_format, '@')
+        self.assertEqual(ws.column_dimensions['B'].width, 50)
+        self.assertEqual(ws.page_setup.orientation, 'landscape')
+        self.assertEqual(ws.oddHeader.center.text, 'Stocktake')
+
+    def test_abort(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'out.xlsx')
+            with self.assertRaises(ValueError):
+                with SheetWriter(filename) as writer:
+                    writer.writerow(['JB1'])
+                    raise ValueError
+            self.assertFalse(os.path.exists(filename))
+
+
+class TestStocktake(unittest.TestCase):
+
+    def test_xml_and_db(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            xmlfile = os.path.join(tmpdir, 'collection.xml')
+            with open(xmlfile, 'w') as f:
+                f.write(XML)
+            dbfile = os.path.join(tmpdir, 'collection.db')
+            subprocess.run([sys.executable, 'modes2sqlite.py', xmlfile,
+                            dbfile, '-v', '0'], cwd=SRCDIR, check=True)
+            sheets = []
+            for infile in (xmlfile, dbfile):
+                outfile = os.path.join(tmpdir, 'stocktake.xlsx')
+                subprocess.run([sys.executable, 'stocktake.py', infile,
+                                outfile, '-v', '0'], cwd=SRCDIR, check=True)
+                ws = openpyxl.load_workbook(outfile).active
+                sheets.append([[cell.value for cell in row]
+                               for row in ws.iter_rows()])
+        self.assertEqual(sheets[0], sheets[1])
+        self.assertEqual([row[0] for row in sheets[0]],
+                         ['S2', 'JB1', 'JB10', None, 'S10', 'JB2'])
+        self.assertEqual(sheets[0][5][2], '=Kitchen')
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
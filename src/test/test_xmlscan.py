@@ -0,0 +1,78 @@
+"""
+    Test the byte range scanner and VerbatimWriter in utl/xmlscan.py
+"""
+import io
+import os.path
+import tempfile
+import unittest
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+from utl.xmlscan import object_ranges, scan_objects, shards, source_encoding
+from utl.xmlscan import VerbatimWriter
+
+XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<Interchange>
+<Object elementtype="a>b"><ObjectIdentity><Number>JB001</Number></ObjectIdentity>
+<Object><Number>JB001.1</Number></Object>
+</Object>
+<!-- <Object>commented out</Object> -->
+<Object elementtype="c"><ObjectIdentity><Number>JB002</Number></ObjectIdentity>
+<Title>Q &amp; A</Title><Empty/></Object>
+<Object/>
+</Interchange>
+'''
+
+
+class TestXmlScan(unittest.TestCase):
+
+    def test_shards(self):
+        objects = [(None, n * 10, n * 10 + 10) for n in range(10)]
+        result = shards(objects, 3)
+        self.assertEqual([obj for shard in result for obj in shard], objects)
+        self.assertEqual([len(shard) for shard in result], [4, 4, 2])
+        self.assertEqual(shards(list(object_ranges(XML)), 8),
+                         [[r] for r in object_ranges(XML)])
+        self.assertEqual(shards([], 2), [])
+
+    def test_ranges(self):
+        ranges = list(object_ranges(XML))
+        self.assertEqual(len(ranges), 3)
+        start, end = ranges[0]
+        self.assertTrue(XML[start:end].startswith(b'<Object elementtype="a>b">'))
+        self.assertTrue(XML[start:end].endswith(b'</Object>\n'))
+        start, end = ranges[2]
+        self.assertEqual(XML[start:end], b'<Object/>\n')
+
+    def test_scan_objects(self):
+        ids = [idnum for idnum, _, _ in scan_objects(XML)]
+        self.assertEqual(ids, ['JB001', 'JB002', None])
+
+    def test_scan_objects_bad_xpath(self):
+        with self.assertRaises(ValueError):
+            scan_objects(XML, id_xpath='./Identity[@type="x"]')
+
+    def test_encoding(self):
+        self.assertEqual(source_encoding(XML), 'utf-8')
+        self.assertEqual(source_encoding(b'<Interchange/>'), 'utf-8')
+        self.assertEqual(source_encoding(b'<?xml version="1.0" '
+                                         b'encoding="ASCII"?>'), 'ascii')
+
+    def test_writer(self):
+        outfile = io.BytesIO()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            infile = os.path.join(tmpdir, 'test.xml')
+            with open(infile, 'wb') as xmlfile:
+                xmlfile.write(XML)
+            writer = VerbatimWriter(infile, outfile)
+        root = ET.fromstring(XML)
+        objs = root.findall('Object')
+        writer.write(objs[0], modified=True)
+        writer.skip()
+        writer.write(objs[2], modified=False)
+        self.assertEqual(outfile.getvalue(),
+                         ET.tostring(objs[0], encoding='utf-8') + b'<Object/>\n')
+        self.assertEqual((writer.nserialized, writer.ncopied), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+    Test opening compressed files with utl/zipmagic.py.
+"""
+import os.path
+import sys
+import tempfile
+import unittest
+from zipfile import ZipFile
+
+from utl.xmlscan import read_source
+from utl.zipmagic import compression, open_output, openfile, output_name
+
+XML = b'<?xml version="1.0"?><Interchange><Object/></Interchange>'
+
+
+class TestZipMagic(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_compressions(self):
+        for comp, name in ((None, 'a.xml'), ('gzip', 'a.xml.gz'),
+                           ('bz2', 'a.xml.bz2'), ('xz', 'a.xml.xz')):
+            with self.subTest(comp=comp):
+                filename = self.path(name)
+                with open_output(filename) as f:
+                    f.write(XML)
+                self.assertEqual(compression(filename), comp)
+                with openfile(filename, 'rb') as f:
+                    self.assertEqual(f.read(), XML)
+                self.assertEqual(bytes(read_source(filename)), XML)
+
+    def test_compress_option(self):
+        # The suffix is added unless it is already there.
+        for name in ('a.xml', 'b.xml.gz'):
+            with self.subTest(name=name):
+                with open_output(self.path(name), 'gzip') as f:
+                    f.write(XML)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)),
+                         ['a.xml.gz', 'b.xml.gz'])
+        self.assertEqual(compression(self.path('a.xml.gz')), 'gzip')
+        self.assertEqual(output_name('a.xml', 'zstd'), 'a.xml.zst')
+        self.assertEqual(output_name('a.xml'), 'a.xml')
+
+    def test_zip_member(self):
+        filename = self.path('a.zip')
+        with ZipFile(filename, 'w') as myzip:
+            myzip.writestr('first.xml', b'<first/>')
+            myzip.writestr('second.xml', XML)
+        self.assertEqual(compression(filename), 'zip')
+        with openfile(filename) as f:
+            self.assertEqual(f.read(), b'<first/>')
+        for member in ('second.xml', 's*.xml'):
+            with openfile(filename + '::' + member) as f:
+                self.assertEqual(f.read(), XML)
+        with self.assertRaises(ValueError):
+            openfile(filename + '::*.xml')
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 9)
+    unittest.main()
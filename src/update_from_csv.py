@@ -74,7 +74,7 @@
 
 """
 import argparse
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 from datetime import date
 import os
 import sys
@@ -88,6 +88,9 @@ from utl.normalize import if_not_sphinx, DEFAULT_MDA_CODE
 from utl.normalize import modes_person, modesdatefrombritishdate
 import utl.normalize as nd
 from utl.readers import row_dict_reader
+from utl.profiler import add_profile_arguments, start_profile
+from utl.xmlscan import VerbatimWriter
+from utl.zipmagic import COMPRESSIONS, open_output, openfile, output_name
 
 
 def trace(level, template, *args, color=None):
@@ -503,7 +506,10 @@ def main():
         idnum = idelem.text if idelem is not None else None
         nidnum = normalize_id(idnum)
         trace(4, 'idnum: {}', idnum)
-        if nidnum and nidnum in newvals:
+        # Objects in the CSV file may be changed even if not "updated" so
+        # they are never copied verbatim.
+        touched = bool(nidnum and nidnum in newvals)
+        if touched:
             trace(4, 'nidnum: {}', nidnum, color=Fore.GREEN)
             if cfg.subid_parent is not None:
                 one_element_subid_mode(nidnum, elem)
@@ -517,17 +523,20 @@ def main():
                 trace(2, 'Not in CSV file: "{}"', idnum)
         trace(4, 'updated....... {}', updated)
         if outfile:
-            outfile.write(ET.tostring(elem, encoding='utf-8'))
+            objwriter.write(elem, touched)
         if updated:
             if deltafile:
                 deltafile.write(ET.tostring(elem, encoding='utf-8'))
             nwritten += 1
         if updated and _args.short:
             break
+    # Close explicitly so that a compressed file is complete.
     if outfile:
         outfile.write(b'</Interchange>')
+        outfile.close()
     if deltafile:
         deltafile.write(b'</Interchange>')
+        deltafile.close()
     # if it's not subid mode and we're not debugging, then trace the serial
     # numbers in the CSV file that did not result in XML updates.
     if cfg.subid_parent is None and not _args.short:
@@ -544,7 +553,8 @@ def getparser():
         a heading row with column titles matching the ``title`` statements
         in the YAML configuration file.''')
     parser.add_argument('infile', help='''
-        The XML file saved from Modes.''')
+        The XML file saved from Modes. It may be compressed with zip, gzip,
+        bzip2, xz or zstd.''')
     parser.add_argument('-o', '--outfile', help='''
         The output XML file.''')
     parser.add_argument('--deltafile', help='''
@@ -556,6 +566,10 @@ def getparser():
                         type=argparse.FileType(), help='''
         Required. The YAML configuration file describing the column path(s) to
          update''')
+    parser.add_argument('--compress', choices=COMPRESSIONS, help='''
+        Compress the output files with this method, adding the suffix to the
+        filename if it isn't there. The default is to compress if the
+        filename ends with .gz, .bz2, .xz or .zst.''')
     parser.add_argument('-d', '--date', help='''
         If a column in the CSV file contains '{{today}}', use this value for
         the field text. The default is today’s date.
@@ -612,6 +626,12 @@ def getparser():
     parser.add_argument('--skiprows', type=int, default=0, help=sphinxify('''
         Skip rows at the beginning of the CSV file specified by --mapfile.
         ''', called_from_sphinx))
+    parser.add_argument('--verbatim', action='store_true', help='''
+        Copy objects that are not updated to the output file exactly as they
+        are in the input file instead of re-serializing them. This is faster
+        when only a few objects are updated.
+        ''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -677,17 +697,21 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'update_from_csv')
     nupdated = nunchanged = nwritten = nequal = ndeleted = 0
     trace(1, 'Begin update_from_csv.', color=Fore.GREEN)
-    infile = open(_args.infile)
+    infile = openfile(_args.infile)
     trace(1, 'Input file: {}', _args.infile)
     outfile = deltafile = None
     if _args.outfile:
-        outfile = open(_args.outfile, 'wb')
+        _args.outfile = output_name(_args.outfile, _args.compress)
+        outfile = open_output(_args.outfile)
         trace(1, 'Creating output file: {}', _args.outfile)
+        objwriter = VerbatimWriter(_args.infile, outfile, _args.verbatim)
     if _args.deltafile:
-        deltafile = open(_args.deltafile, 'wb')
-        trace(1, 'Creating delta file: {}', _args.outfile)
+        _args.deltafile = output_name(_args.deltafile, _args.compress)
+        deltafile = open_output(_args.deltafile)
+        trace(1, 'Creating delta file: {}', _args.deltafile)
     cfg = Config(_args.cfgfile, dump=_args.verbose > 1)
     if errors := check_cfg(cfg):
         trace(1, '{} command{} ignored.', errors, 's' if errors > 1 else '')
@@ -716,3 +740,4 @@ if __name__ == '__main__':
           ndeleted, sq(ndeleted))
     trace(1, 'End update_from_csv. {} objects written.', nwritten,
           color=Fore.GREEN)
+    profiler.stop(nwritten)
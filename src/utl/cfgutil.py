@@ -1,23 +1,25 @@
 # import codecs
 
-from colorama import Fore, Style
+from utl.colors import Fore, Style
+import copy
 # import csv
-# import os
+import os
 import re
 import sys
 
-# import yaml
-from ruamel.yaml import YAML
-import ruamel.yaml.constructor
-
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 
 from utl.normalize import normalize_id, datefrommodes, DEFAULT_MDA_CODE
-from utl.exhibition_list import get_inverted_exhibition_dict, ExhibitionTuple
 # from utl.readers import row_list_reader
 
-yaml = YAML(typ='safe')   # default, if not specfied, is 'rt' (round-trip)
+# ruamel.yaml and the exhibition list are imported when first needed because
+# most commands do not have a config file.
+_yaml = None
+
+# Increment if the format of the cached config changes in a way that the
+# source hash in the cache key would not catch.
+CONFIG_CACHE_VERSION = 1
 
 # The difference between the 'attrib' command and the attribute statement:
 # The 'attrib' command is just like the column command except that the value of
@@ -28,6 +30,80 @@ yaml = YAML(typ='safe')   # default, if not specfied, is 'rt' (round-trip)
 # statement with an appropriate xpath like .[@elementtype="ephemera"].
 
 
+def _get_yaml():
+    """
+    :return: the ruamel.yaml loader, created on the first call.
+    """
+    global _yaml
+    if _yaml is None:
+        from ruamel.yaml import YAML
+        _yaml = YAML(typ='safe')  # default, if not specfied, is 'rt' (round-trip)
+    return _yaml
+
+
+def config_cache_dir():
+    """
+    The validated config documents are cached in the folder given by the
+    environment variable MODES_CACHE_DIR or else in modes under the user's
+    cache folder. Set MODES_CACHE_DIR to an empty string to disable the cache.
+
+    :return: the folder for cached configs or None if caching is disabled.
+    """
+    cachedir = os.environ.get('MODES_CACHE_DIR')
+    if cachedir is None:
+        usercache = (os.environ.get('XDG_CACHE_HOME')
+                     or os.path.expanduser(os.path.join('~', '.cache')))
+        cachedir = os.path.join(usercache, 'modes')
+    return os.path.join(cachedir, 'config') if cachedir else None
+
+
+def _config_cache_file(cfgtext: str, allow_required: bool):
+    """
+    :return: the path of the cache file for this config or None. The name is
+             the hash of the config text and of the source of this module and
+             the exhibition list so that changing any of them misses the
+             cache.
+    """
+    cachedir = config_cache_dir()
+    if cachedir is None:
+        return None
+    import hashlib
+    utldir = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256(f'{CONFIG_CACHE_VERSION} {allow_required}'.encode())
+    for srcname in ('cfgutil.py', 'exhibition_list.py'):
+        with open(os.path.join(utldir, srcname), 'rb') as srcfile:
+            h.update(srcfile.read())
+    h.update(cfgtext.encode('utf-8'))
+    return os.path.join(cachedir, h.hexdigest() + '.pickle')
+
+
+def _read_cached_config(cachefile):
+    """
+    :return: a tuple of (cfglist, templates, exhibition_inv_dict) or None if
+             the config isn't cached or the cache file can't be read.
+    """
+    if cachefile is None or not os.path.exists(cachefile):
+        return None
+    import pickle
+    try:
+        with open(cachefile, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return None
+
+
+def _write_cached_config(cachefile, compiled):
+    import pickle
+    try:
+        os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+        tmpname = f'{cachefile}.{os.getpid()}.tmp'
+        with open(tmpname, 'wb') as f:
+            pickle.dump(compiled, f)
+        os.replace(tmpname, cachefile)
+    except OSError:
+        pass  # the cache is only an optimization
+
+
 def trace(level, verbose, template, *args, color=None):
     if verbose >= level:
         if color:
@@ -250,6 +326,7 @@ class Config:
         """
 
         def set_globals():
+            nonlocal templates
             for stmt in document:
                 if stmt == Stmt.CMD:
                     pass
@@ -280,9 +357,11 @@ class Config:
                 elif stmt == Stmt.TEMPLATE_TITLE:
                     self.template_title = document[stmt]
                 elif stmt == Stmt.TEMPLATES:
-                    templates = yaml.load(document[stmt])
-                    self.templates = {key.lower(): value for key, value in
-                                      templates.items()}
+                    if templates is None:  # not from the cache
+                        templates = _get_yaml().load(document[stmt])
+                        templates = {key.lower(): value for key, value in
+                                     templates.items()}
+                    self.templates = templates
                 else:
                     print(f'Unknown global statement, ignored: {stmt}.')
             if self.templates or self.template_title or self.template_dir:
@@ -316,12 +395,27 @@ class Config:
         self.multiple_delimiter = '|'
         self.mdacode = mdacode
         self.exhibition_inv_dict = None  # will map exhibition tuple to exhib #
-        cfglist = _read_yaml_cfg(yamlcfgfile, dump=dump, logfile=logfile)
-        valid = validate_yaml_cfg(cfglist, allow_required)
-        if not valid:
-            if verbos < 2:
-                sys.tracebacklimit = 0
-            raise ValueError(red('Config failed validation.'))
+        # The validated documents are cached before they are modified by
+        # the command line arguments. When dumping, always read the YAML.
+        if yamlcfgfile is not None and hasattr(yamlcfgfile, 'read'):
+            yamlcfgfile = yamlcfgfile.read()
+        cachefile = None
+        if yamlcfgfile is not None and not dump:
+            cachefile = _config_cache_file(yamlcfgfile, allow_required)
+        snapshot = None  # the newly validated documents to cache
+        compiled = _read_cached_config(cachefile)
+        if compiled:
+            cfglist, templates, exhibition_inv_dict = compiled
+        else:
+            templates = exhibition_inv_dict = None
+            cfglist = _read_yaml_cfg(yamlcfgfile, dump=dump, logfile=logfile)
+            valid = validate_yaml_cfg(cfglist, allow_required)
+            if not valid:
+                if verbos < 2:
+                    sys.tracebacklimit = 0
+                raise ValueError(red('Config failed validation.'))
+            if cachefile:
+                snapshot = copy.deepcopy(cfglist)
         for document in cfglist:
             cmd = document[Stmt.CMD]
             if cmd == Cmd.GLOBAL:
@@ -336,7 +430,10 @@ class Config:
             else:  # not control command
                 self.col_docs.append(document)
             if cmd == Cmd.IFEXHIB:
-                self.exhibition_inv_dict = get_inverted_exhibition_dict()
+                if exhibition_inv_dict is None:  # not from the cache
+                    from utl.exhibition_list import get_inverted_exhibition_dict
+                    exhibition_inv_dict = get_inverted_exhibition_dict()
+                self.exhibition_inv_dict = exhibition_inv_dict
         for doc in self.col_docs:
             if self.subid_parent:
                 xpath = doc[Stmt.XPATH]
@@ -355,6 +452,9 @@ class Config:
                     raise ValueError(msg)
                 doc[Stmt.IF_OTHER_COLUMN] = self.template_title
                 doc[Stmt.IF_OTHER_COLUMN_VALUE] = doc[Stmt.IF_TEMPLATE]
+        if snapshot is not None:
+            _write_cached_config(cachefile, (snapshot, templates,
+                                             exhibition_inv_dict))
         if len(self.ctrl_docs) and verbos:
             print("Config contains filtering commands.")
 
@@ -495,6 +595,7 @@ def select_ifexhib(cfg: Config, objelem, document):
         if place is not None:
             place = place.text
         # print(f'{idnum=}:{datebegin=}')
+        from utl.exhibition_list import ExhibitionTuple
         exhibition = ExhibitionTuple(DateBegin=datebegin,
                                      DateEnd=dateend,
                                      ExhibitionName=exhibname,
@@ -510,6 +611,25 @@ def select_ifexhib(cfg: Config, objelem, document):
     return selected
 
 
+def select_includes(idnum, includes=None, exclude=False) -> bool:
+    """
+    The part of select() that depends only on the accession number.
+
+    :param idnum: the normalized accession number or None
+    :param includes: A set or dict of normalized id numbers or None
+    :param exclude: Treat the includes list as an excludes list.
+    :return: False if the object is rejected by the includes list
+    """
+    if idnum and exclude and includes:
+        if idnum in includes:
+            return False
+    elif includes is not None:
+        if not idnum or idnum not in includes:
+            # print('select return false')
+            return False
+    return True
+
+
 def select(cfg: Config, objelem, includes=None, exclude=False) -> bool:
     """
     :param cfg: the Config instance
@@ -542,13 +662,8 @@ def select(cfg: Config, objelem, includes=None, exclude=False) -> bool:
     idelem = objelem.find(cfg.record_id_xpath)
     idnum = normalize_id(idelem.text) if idelem is not None else None
     # print(f'{idnum=}')
-    if idnum and exclude and includes:
-        if idnum in includes:
-            return False
-    elif includes is not None:
-        if not idnum or idnum not in includes:
-            # print('select return false')
-            return False
+    if not select_includes(idnum, includes, exclude):
+        return False
     for document in cfg.ctrl_docs:
         eltstr = document.get(Stmt.XPATH)
         if eltstr:
@@ -760,9 +875,11 @@ def _read_yaml_cfg(cfgf, dump: bool = False, logfile=sys.stdout):
     """
     if cfgf is None:
         return []
+    yaml = _get_yaml()
+    from ruamel.yaml.constructor import DuplicateKeyError
     try:
         cfg = [c for c in yaml.load_all(cfgf) if c is not None]
-    except ruamel.yaml.constructor.DuplicateKeyError as e:
+    except DuplicateKeyError as e:
         print(e.args)
         sys.exit()
     titles = set()
@@ -0,0 +1,209 @@
+"""
+    Hold a Modes XML file in memory for repeated queries. The source bytes of
+    each top level Object are kept, together with dictionaries from the
+    normalized accession number to the object and from each normal and
+    current location to the objects there. An Object is only parsed when a
+    query needs its elements.
+
+    The index is built once by parsing the whole file. Call changed() to see
+    whether the file has been modified since then; the index does not reload
+    itself.
+"""
+import io
+import os
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.normalize import normalize_id, denormalize_id, DEFAULT_MDA_CODE
+from utl.xmlscan import read_source, source_encoding, object_ranges
+from utl.xmlscan import VERBATIM_ENCODINGS
+
+NORMAL_LOCATION = 'normal location'
+CURRENT_LOCATION = 'current location'
+PREVIOUS_LOCATION = 'previous location'
+LOCATION_TYPES = (NORMAL_LOCATION, CURRENT_LOCATION, PREVIOUS_LOCATION)
+
+
+def _text(elem, path):
+    subelt = elem.find(path)
+    if subelt is None or subelt.text is None:
+        return ''
+    return subelt.text.strip()
+
+
+class CollectionIndex:
+    """
+    The attributes are:
+
+    filename: the XML file, which may be compressed as for zipmagic.openfile
+    data: the Objects, utf-8 encoded
+    objects: a dict mapping the normalized accession number to a tuple of
+             (idnum, start, end) where data[start:end] is the Object and
+             idnum is as in the XML file. The order is the order in the file.
+    normal, current: dicts mapping the upper case location to a list of the
+             normalized accession numbers of the objects there
+    duplicates: accession numbers that occur more than once. Only the first
+             occurrence is indexed.
+    noid: the number of Objects without an accession number
+    """
+
+    def __init__(self, filename: str, mdacode=DEFAULT_MDA_CODE):
+        self.filename = filename
+        self.mdacode = mdacode
+        self.data = b''
+        self.objects = {}
+        self.normal = {}
+        self.current = {}
+        self.duplicates = []
+        self.noid = 0
+        self.stat = None
+        self.load()
+
+    def _stat(self):
+        st = os.stat(self.filename)
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        """
+        Read and index the file, replacing the current contents. An
+        ET.ParseError is raised if the file isn't well-formed, in which case
+        the index is unchanged.
+        """
+        stat = self._stat()
+        buf = read_source(self.filename)
+        data = bytes(buf)
+        if source_encoding(buf) in VERBATIM_ENCODINGS:
+            ranges = object_ranges(data)
+            chunks = None
+        else:
+            # Re-serialize each Object as utf-8 so that all slices of data
+            # can be parsed the same way.
+            ranges = None
+            chunks = []
+            offset = 0
+        objects = {}
+        normal = {}
+        current = {}
+        duplicates = []
+        noid = 0
+        objectlevel = 0
+        for event, elem in ET.iterparse(io.BytesIO(data),
+                                        events=('start', 'end')):
+            if elem.tag != 'Object':
+                continue
+            if event == 'start':
+                objectlevel += 1
+                continue
+            objectlevel -= 1
+            if objectlevel:
+                continue  # It's not a top level Object.
+            if chunks is None:
+                start, end = next(ranges)
+            else:
+                chunk = ET.tostring(elem, encoding='utf-8',
+                                    xml_declaration=False)
+                chunks.append(chunk)
+                start, end = offset, offset + len(chunk)
+                offset = end
+            idnum = _text(elem, './ObjectIdentity/Number')
+            if not idnum:
+                noid += 1
+                elem.clear()
+                continue
+            nidnum = normalize_id(idnum, self.mdacode, verbose=0,
+                                  strict=False)
+            if nidnum in objects:
+                duplicates.append(idnum)
+                elem.clear()
+                continue
+            objects[nidnum] = (idnum, start, end)
+            for ol in elem.findall('./ObjectLocation'):
+                loctype = ol.get('elementtype')
+                location = _text(ol, './Location').upper()
+                if not location:
+                    continue
+                if loctype == NORMAL_LOCATION:
+                    normal.setdefault(location, []).append(nidnum)
+                elif loctype == CURRENT_LOCATION:
+                    current.setdefault(location, []).append(nidnum)
+            elem.clear()
+        if chunks is not None:
+            data = b''.join(chunks)
+        self.data = data
+        self.objects = objects
+        self.normal = normal
+        self.current = current
+        self.duplicates = duplicates
+        self.noid = noid
+        self.stat = stat
+
+    def changed(self) -> bool:
+        """
+        :return: True if the file has been modified or removed since it was
+                 loaded.
+        """
+        try:
+            return self._stat() != self.stat
+        except OSError:
+            return True
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, idnum):
+        return self.normalize(idnum) in self.objects
+
+    def normalize(self, idnum: str) -> str:
+        return normalize_id(idnum, self.mdacode, verbose=0, strict=False)
+
+    def object_bytes(self, nidnum: str) -> bytes:
+        """
+        :param nidnum: a normalized accession number in the index
+        :return: the Object as utf-8 bytes, including the whitespace after it
+        """
+        _, start, end = self.objects[nidnum]
+        return self.data[start:end]
+
+    def element(self, nidnum: str) -> ET.Element:
+        """
+        :param nidnum: a normalized accession number in the index
+        :return: the parsed Object
+        """
+        return ET.fromstring(self.object_bytes(nidnum))
+
+    def locations(self, idnum: str) -> list[dict] | None:
+        """
+        :param idnum: an accession number, normalized or not
+        :return: a list of the object's locations in the order in the XML
+                 file or None if the object isn't in the index. Each location
+                 is a dict with keys type, location, datebegin, dateend and
+                 reason.
+        """
+        nidnum = self.normalize(idnum)
+        if nidnum not in self.objects:
+            return None
+        elem = self.element(nidnum)
+        return [{'type': ol.get('elementtype'),
+                 'location': _text(ol, './Location'),
+                 'datebegin': _text(ol, './Date/DateBegin'),
+                 'dateend': _text(ol, './Date/DateEnd'),
+                 'reason': _text(ol, './Reason')}
+                for ol in elem.findall('./ObjectLocation')]
+
+    def objects_at(self, location: str, loctype=CURRENT_LOCATION) -> list[str]:
+        """
+        :param location: the location, in any case
+        :param loctype: NORMAL_LOCATION or CURRENT_LOCATION
+        :return: the sorted accession numbers, as in the XML file, of the
+                 objects with that location
+        """
+        locations = self.normal if loctype == NORMAL_LOCATION else self.current
+        nidnums = sorted(locations.get(location.strip().upper(), []))
+        return [self.objects[nidnum][0] for nidnum in nidnums]
+
+    def denormalize(self, nidnum: str) -> str:
+        return denormalize_id(nidnum, self.mdacode)
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
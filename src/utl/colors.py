@@ -0,0 +1,29 @@
+"""
+    Stand-ins for colorama's Fore and Style that import colorama the first
+    time a color is used. Importing colorama takes longer than most of our
+    scripts take to parse their arguments and many runs never print in color.
+
+    Usage is the same as colorama:
+
+        from utl.colors import Fore, Style
+        print(f'{Fore.RED}Error{Style.RESET_ALL}')
+"""
+
+
+class _Lazy:
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        import colorama
+        value = getattr(getattr(colorama, self._name), attr)
+        setattr(self, attr, value)  # so __getattr__ isn't called again
+        return value
+
+
+Fore = _Lazy('Fore')
+Style = _Lazy('Style')
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -0,0 +1,108 @@
+"""
+    Write a table held as a dict of columns to a Parquet, Arrow IPC, Feather
+    or CSV file. The columnar formats need the pyarrow package, which is
+    imported only when one of them is written.
+
+    A column's type is given by a name from TYPES. String columns with few
+    distinct values, like location types or parts of a measurement, are
+    dictionary encoded.
+"""
+import csv
+
+FORMATS = ('parquet', 'arrow', 'feather', 'csv')
+SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow', 'feather': '.feather',
+            'csv': '.csv'}
+TYPES = ('string', 'int', 'date')
+# Dictionary encode a string column if the number of distinct values is at
+# most this fraction of the number of rows.
+DICTIONARY_RATIO = 0.5
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError('Parquet, Arrow and Feather output need the pyarrow '
+                         'package.') from None
+    return pyarrow
+
+
+def check_format(fmt: str):
+    """
+    Raise ValueError if fmt isn't one of FORMATS or needs pyarrow and pyarrow
+    isn't installed, so that a script can stop before doing any work.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}')
+    if fmt != 'csv':
+        _pyarrow()
+
+
+def unique_names(names: list[str]) -> list[str]:
+    """
+    :param names: column names, which may repeat
+    :return: the names with "_2", "_3", ... appended to repeats
+    """
+    seen = {}
+    result = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}_{seen[name]}'
+        else:
+            seen[name] = 1
+        result.append(name)
+    return result
+
+
+def _arrow_column(pa, values: list, coltype: str):
+    if coltype == 'int':
+        return pa.array(values, type=pa.int64())
+    if coltype == 'date':
+        return pa.array(values, type=pa.date32())
+    array = pa.array(values, type=pa.string())
+    ndistinct = len(set(values))
+    if values and ndistinct <= len(values) * DICTIONARY_RATIO:
+        array = array.dictionary_encode()
+    return array
+
+
+def write_table(filename: str, columns: dict[str, list], fmt: str,
+                types: dict[str, str] | None = None):
+    """
+    :param filename: the output file
+    :param columns: a dict mapping the column name to the list of values. All
+                    lists must be the same length. None is a null value.
+    :param fmt: one of FORMATS
+    :param types: a dict mapping column names to one of TYPES. Columns not
+                  in the dict are strings.
+    :return: None. A ValueError is raised if pyarrow is needed and not
+             installed.
+    """
+    types = types or {}
+    if fmt == 'csv':
+        with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+        return
+    pa = _pyarrow()
+    table = pa.table({name: _arrow_column(pa, values,
+                                          types.get(name, 'string'))
+                      for name, values in columns.items()})
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, filename)
+    elif fmt == 'feather':
+        import pyarrow.feather as feather
+        feather.write_feather(table, filename)
+    elif fmt == 'arrow':
+        with pa.OSFile(filename, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
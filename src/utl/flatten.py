@@ -0,0 +1,163 @@
+"""
+    Split an Object into rows of flat tables, one table for the Object itself
+    and one for each repeating group. Used by flatten_xml.py and
+    modes2sqlite.py so that both write the same columns.
+
+    Every row has "serial", the accession number as in the XML file. Rows
+    of the objects table have "sortkey", the normalized accession number,
+    and rows of the other tables have "seq", the position of the row within
+    its Object.
+"""
+from utl.normalize import normalize_id, datefrommodes, DEFAULT_MDA_CODE
+
+# Each table is (group xpath, columns) where the columns are a dict of
+# column name -> (xpaths, type). The group xpath is None for the objects
+# table, which has one row per Object. The xpaths are relative to the group
+# element and the first that finds an element with text is used. An xpath
+# starting with "@" is an attribute of the group element. The type is one
+# of utl.columnar.TYPES. A date column is followed by a string column with
+# the suffix "_text" containing the date as in the XML file.
+TABLES = {
+    'objects': (None, {
+        'elementtype': (('@elementtype',), 'string'),
+        'title': (('./Identification/Title',), 'string'),
+        'simplename': (('./Identification/ObjectName[@elementtype='
+                        '"simple name"]/Keyword',), 'string'),
+        'briefdescription': (('./Identification/BriefDescription',),
+                             'string'),
+        'description': (('./Description/SummaryText',), 'string'),
+        'numberofitems': (('./NumberOfItems',), 'int'),
+        'production_datebegin': (('./Production/Date/DateBegin',), 'date'),
+        'production_dateend': (('./Production/Date/DateEnd',), 'date'),
+        'normal_location': (('./ObjectLocation[@elementtype='
+                             '"normal location"]/Location',), 'string'),
+        'current_location': (('./ObjectLocation[@elementtype='
+                              '"current location"]/Location',), 'string'),
+        'acquisition_method': (('./Acquisition/Method',), 'string'),
+        'acquisition_date': (('./Acquisition/Date',), 'date'),
+        'entrynumber': (('./Entry/EntryNumber',), 'string'),
+    }),
+    'locations': ('./ObjectLocation', {
+        'type': (('@elementtype',), 'string'),
+        'location': (('./Location',), 'string'),
+        'datebegin': (('./Date/DateBegin',), 'date'),
+        'dateend': (('./Date/DateEnd',), 'date'),
+        'reason': (('./Reason',), 'string'),
+    }),
+    'exhibitions': ('./Exhibition', {
+        'name': (('./ExhibitionName',), 'string'),
+        'place': (('./Place/PlaceName', './Place'), 'string'),
+        'datebegin': (('./Date/DateBegin',), 'date'),
+        'dateend': (('./Date/DateEnd',), 'date'),
+        'cataloguenumber': (('./CatalogueNumber',), 'string'),
+    }),
+    'items': ('./ItemList/Item', None),  # columns are found in the data
+    'production': ('./Production/Person', {
+        'role': (('./Role',), 'string'),
+        'name': (('./PersonName',), 'string'),
+    }),
+    'measurements': ('./Description/Measurement', {
+        'part': (('./Part',), 'string'),
+        'dimension': (('./Dimension',), 'string'),
+        'reading': (('./Reading',), 'string'),
+    }),
+}
+
+
+def find_text(elem, xpaths) -> str | None:
+    """
+    :return: the stripped text of the first xpath that has text, or None
+    """
+    for xpath in xpaths:
+        if xpath.startswith('@'):
+            text = elem.get(xpath[1:])
+        else:
+            subelt = elem.find(xpath)
+            text = subelt.text if subelt is not None else None
+        if text and text.strip():
+            return text.strip()
+    return None
+
+
+def to_int(text: str | None) -> int | None:
+    """
+    :return: the integer value or None if the text is empty or not a number
+    """
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_date(text: str | None):
+    """
+    :return: the datetime.date of a Modes date or None if it isn't valid.
+             Partial dates like "1910" become the first day of the period.
+    """
+    if not text:
+        return None
+    try:
+        return datefrommodes(text)[0]
+    except (TypeError, ValueError):
+        return None
+
+
+def group_row(elem, columns) -> dict:
+    row = {}
+    for colname, (xpaths, coltype) in columns.items():
+        text = find_text(elem, xpaths)
+        if coltype == 'int':
+            row[colname] = to_int(text)
+        elif coltype == 'date':
+            row[colname] = to_date(text)
+            row[colname + '_text'] = text
+        else:
+            row[colname] = text
+    return row
+
+
+def item_row(item) -> dict:
+    # Use the first occurrence of each tag under the Item.
+    row = {}
+    for child in item:
+        colname = child.tag.lower()
+        if colname in ('serial', 'seq') or colname in row:
+            continue
+        text = child.text.strip() if child.text else None
+        row[colname] = to_int(text) if colname == 'listnumber' else text
+    return row
+
+
+def object_rows(elem, mdacode=DEFAULT_MDA_CODE) -> dict[str, list[dict]]:
+    """
+    :param elem: the Object element
+    :param mdacode: used in normalizing the accession number
+    :return: a dict mapping each table name in TABLES to a list of rows, or
+             None if the Object has no accession number. The objects table
+             always has one row.
+    """
+    idelem = elem.find('./ObjectIdentity/Number')
+    idnum = idelem.text.strip() if idelem is not None and idelem.text else None
+    if not idnum:
+        return None
+    tables = {}
+    for name, (group_xpath, columns) in TABLES.items():
+        if group_xpath is None:
+            row = group_row(elem, columns)
+            row['serial'] = idnum
+            row['sortkey'] = normalize_id(idnum, mdacode, verbose=0,
+                                          strict=False)
+            tables[name] = [row]
+            continue
+        rows = tables[name] = []
+        for seq, group in enumerate(elem.findall(group_xpath), start=1):
+            row = item_row(group) if columns is None else group_row(group,
+                                                                    columns)
+            row['serial'] = idnum
+            row['seq'] = seq
+            rows.append(row)
+    return tables
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -0,0 +1,219 @@
+"""
+    A trigram index of the Title and BriefDescription of the objects in a
+    Modes XML file, used to find the objects whose text is most similar to
+    a title in a spreadsheet without comparing it to every object.
+
+    The text is lower-cased and split into words at anything that is not a
+    letter or digit. Each word is padded with two spaces in front and one
+    behind, as PostgreSQL's pg_trgm does, and split into overlapping
+    three-character trigrams. The similarity of two texts is the number of
+    trigrams they share divided by the number of distinct trigrams in
+    either, from 0 to 1.
+
+    The index maps each trigram to the list of texts that contain it, so a
+    query only looks at the texts that share at least one trigram with it.
+    An index can be saved to a file and reloaded. It records the size and
+    modification time of the XML file so that a stale index is rebuilt.
+"""
+from collections import Counter
+import math
+import os
+import pickle
+import re
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.zipmagic import openfile
+
+# Increment if the saved format changes.
+INDEX_VERSION = 1
+FIELDS = {'title': './Identification/Title',
+          'briefdescription': './Identification/BriefDescription'}
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    :param text: any string
+    :return: the set of trigrams of the words in the text
+    """
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(text1: str, text2: str) -> float:
+    """
+    :return: the trigram similarity of two strings from 0 to 1
+    """
+    grams1, grams2 = trigrams(text1), trigrams(text2)
+    if not grams1 or not grams2:
+        return 0.
+    common = len(grams1 & grams2)
+    return common / (len(grams1) + len(grams2) - common)
+
+
+class FuzzyIndex:
+    """
+    An inverted index from trigrams to the texts containing them. A text is
+    stored once however many objects have it, as often happens with titles
+    like "Postcard", together with the accession numbers and fields it was
+    found in.
+    """
+    def __init__(self):
+        self.texts: list[str] = []
+        self.owners: list[list[tuple[str, str]]] = []  # (idnum, field)
+        self.sizes: list[int] = []  # number of distinct trigrams in the text
+        self.textnums: dict[str, int] = {}  # text -> index in self.texts
+        self.postings: dict[str, list[int]] = {}
+        self.source = None  # (filename, size, mtime) of the XML file
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, idnum: str, text: str, field: str = 'title'):
+        """
+        Add a text to the index. Texts without any letters or digits are
+        ignored.
+        """
+        textnum = self.textnums.get(text)
+        if textnum is not None:
+            self.owners[textnum].append((idnum, field))
+            return
+        grams = trigrams(text)
+        if not grams:
+            return
+        textnum = self.textnums[text] = len(self.texts)
+        self.texts.append(text)
+        self.owners.append([(idnum, field)])
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(textnum)
+
+    def query(self, text: str, k: int = 3, minscore: float = 0.
+              ) -> list[tuple[str, float, str, str]]:
+        """
+        :param text: the text to look for
+        :param k: the maximum number of objects to return
+        :param minscore: the lowest similarity to return, from 0 to 1
+        :return: a list of up to k tuples of (accession number, similarity,
+                 field, text) in order of decreasing similarity. An object is
+                 returned once, with the best matching of its texts.
+        """
+        grams = trigrams(text)
+        if not grams:
+            return []
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))  # counting is done in C
+        nquery = len(grams)
+        sizes = self.sizes
+        # A text with fewer than "need" trigrams in common with the query
+        # can't reach minscore, so most texts are dropped before scoring.
+        need = max(1, math.ceil(minscore * nquery))
+        scores = [(common / (nquery + sizes[textnum] - common), textnum)
+                  for textnum, common in counts.items() if common >= need]
+        scores.sort(reverse=True)
+        matches = []
+        found = set()
+        for score, textnum in scores:
+            if score < minscore or len(matches) >= k:
+                break
+            for idnum, field in self.owners[textnum]:
+                if idnum not in found and len(matches) < k:
+                    found.add(idnum)
+                    matches.append((idnum, score, field, self.texts[textnum]))
+        return matches
+
+    @classmethod
+    def from_xml(cls, filename: str, verbose=1):
+        """
+        :param filename: the Modes XML file, which may be compressed
+        :param verbose: print a count of the objects indexed if >= 1
+        :return: a new FuzzyIndex of the FIELDS of every object
+        """
+        index = cls()
+        nobjects = 0
+        objectlevel = 0
+        with openfile(filename) as infile:
+            for event, elem in ET.iterparse(infile, events=('start', 'end')):
+                if elem.tag != 'Object':
+                    continue
+                if event == 'start':
+                    objectlevel += 1
+                    continue
+                objectlevel -= 1
+                if objectlevel:
+                    continue  # It's not a top level Object.
+                idelem = elem.find('./ObjectIdentity/Number')
+                if idelem is not None and idelem.text and idelem.text.strip():
+                    nobjects += 1
+                    for field, xpath in FIELDS.items():
+                        subelt = elem.find(xpath)
+                        if subelt is not None and subelt.text:
+                            index.add(idelem.text.strip(),
+                                      ' '.join(subelt.text.split()), field)
+                elem.clear()
+        index.source = _source_stat(filename)
+        if verbose >= 1:
+            print(f'{nobjects} objects, {len(index)} distinct texts and '
+                  f'{len(index.postings)} trigrams indexed.')
+        return index
+
+    def save(self, filename: str):
+        tmpname = f'{filename}.{os.getpid()}.tmp'
+        with open(tmpname, 'wb') as f:
+            pickle.dump((INDEX_VERSION, vars(self)), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+
+    @classmethod
+    def load(cls, filename: str):
+        """
+        :return: the FuzzyIndex saved in the file or None if the file doesn't
+                 exist or was saved by a different version of this module
+        """
+        try:
+            with open(filename, 'rb') as f:
+                version, attributes = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        if version != INDEX_VERSION:
+            return None
+        index = cls()
+        vars(index).update(attributes)
+        return index
+
+
+def _source_stat(filename):
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+def load_or_build(xmlfile: str, indexfile: str | None = None,
+                  verbose=1) -> FuzzyIndex:
+    """
+    :param xmlfile: the Modes XML file
+    :param indexfile: where the index is saved or None to not save it
+    :param verbose: print whether the index was loaded or built if >= 1
+    :return: the saved index if it was built from the current XML file,
+             otherwise a new index, which is saved if indexfile is given
+    """
+    if indexfile:
+        index = FuzzyIndex.load(indexfile)
+        if index is not None and index.source == _source_stat(xmlfile):
+            if verbose >= 1:
+                print(f'Index loaded from {indexfile}.')
+            return index
+    index = FuzzyIndex.from_xml(xmlfile, verbose=verbose)
+    if indexfile:
+        index.save(indexfile)
+        if verbose >= 1:
+            print(f'Index saved to {indexfile}.')
+    return index
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -0,0 +1,322 @@
+"""
+    Extract the rows of the tables in an HTML file as they are parsed.
+
+    The scripts that convert HTML tables to CSV used to load the whole file
+    into a BeautifulSoup tree and then search it for tables, rows, cells and
+    paragraphs. TableParser gets the same rows from the events of the
+    standard library's incremental HTML parser, so a large file is read in
+    chunks and only the rows not yet returned are kept in memory:
+
+        parser = TableParser()
+        for row in parser.rows(htmlfile):
+            csvrow = [cell_text(cell) for cell in row.cells]
+
+    The rows are those BeautifulSoup's "html.parser" builder gives for
+    soup.find_all('table'), table.find_all('tr') and row.find_all(cellpat):
+
+    - An end tag closes the most recent open element with that name and any
+      elements opened after it. An end tag without an open element is
+      ignored. No other end tags are implied, so a cell that isn't closed
+      contains the following cells.
+    - The rows of a table include the rows of any table nested in it. The
+      nested table's rows are returned again as its own table, after the
+      rows of the outer table.
+    - The text of a cell or paragraph is all of the text within it except
+      comments, declarations and the contents of the elements in
+      HIDDEN_TAGS.
+    - Text between two tags that is only ASCII whitespace becomes a newline
+      if it contains one and otherwise a space, except within the elements
+      in PRESERVE_TAGS.
+
+    Only nested tables and unclosed rows make the parser hold rows back until
+    the rows before them are complete.
+"""
+from collections import deque, namedtuple
+from html.entities import html5, name2codepoint
+from html.parser import HTMLParser
+import re
+
+# The cells of html2csv.py: any element whose name contains "td" or "th".
+CELL_PAT = re.compile('(td)|(th)')
+CHUNK_SIZE = 1 << 16  # characters read from the file at a time
+# Elements without content.
+VOID_TAGS = frozenset('area base basefont bgsound br col command embed frame '
+                      'hr image img input isindex keygen link menuitem meta '
+                      'nextid param source spacer track wbr'.split())
+# Elements whose text isn't part of the text of the elements containing them.
+HIDDEN_TAGS = frozenset('rp rt script style template'.split())
+# Elements whose whitespace is kept as it is.
+PRESERVE_TAGS = frozenset(('pre', 'textarea'))
+ASCII_SPACES = ' \n\t\x0c\r'
+_CHARREF_PAT = re.compile(r'([0-9]+)(.*)')
+_HEXREF_PAT = re.compile(r'([0-9a-f]+)(.*)')
+# Windows-1252 characters often given as numeric references in HTML saved
+# from MS Word, like "&#150;" for an en dash.
+_WINDOWS_1252 = {n: bytes([n]).decode('cp1252') for n in range(0x80, 0xa0)
+                 if n not in (0x81, 0x8d, 0x8f, 0x90, 0x9d)}
+
+# text: all of the text in the cell
+# paras: the text of each <p> element in the cell
+Cell = namedtuple('Cell', 'text paras')
+# table: the table's number, counting from 1 in the order the tables start
+# number: the row's index within the table, counting from 0
+# cells: a list of Cells
+Row = namedtuple('Row', 'table number cells')
+
+
+def cell_text(cell: Cell, sep: str = ' ') -> str:
+    """
+    :param cell: a Cell returned by TableParser
+    :param sep: the string following the text of each paragraph
+    :return: the text of the cell's paragraphs, each with its whitespace
+             replaced by single spaces and followed by sep, or the cell's
+             text if it has no paragraphs. Leading and trailing whitespace
+             is removed.
+    """
+    detail = ''.join(' '.join(para.split()) + sep for para in cell.paras)
+    if not detail:  # if there were no <p> tag(s)
+        detail = cell.text
+    return detail.strip()
+
+
+def _charref(name: str) -> str:
+    """
+    Convert the name of a numeric character reference as BeautifulSoup does,
+    including a reference that isn't followed by a semicolon.
+    """
+    base, pat = (16, _HEXREF_PAT) if name[:1] in 'xX' else (10, _CHARREF_PAT)
+    if base == 16:
+        name = name[1:]
+    extra = ''
+    try:
+        number = int(name, base)
+    except ValueError:
+        m = pat.match(name)
+        if not m:
+            return name
+        number, extra = int(m.group(1), base), m.group(2)
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return '\ufffd' + extra
+    return (_WINDOWS_1252.get(number) or chr(number)) + extra
+
+
+class _Table:
+    __slots__ = ('number', 'rows', 'closed', 'next')
+
+    def __init__(self, number):
+        self.number = number
+        self.rows = []  # _Rows in the order they start
+        self.closed = False
+        self.next = 0  # the index of the next row to return
+
+
+class _Row:
+    __slots__ = ('cells', 'done')
+
+    def __init__(self):
+        self.cells = []  # [text parts, [paragraph text parts, ...]]
+        self.done = None  # the list of Cells when the row is closed
+
+
+class TableParser(HTMLParser):
+    """
+    Parse an HTML document and return the rows of its tables.
+    """
+    def __init__(self, cellpat=CELL_PAT):
+        """
+        :param cellpat: the elements of a row that are its cells, either a
+                        tag name like "td" or a compiled regular expression
+                        that is searched for in the tag name
+        """
+        super().__init__(convert_charrefs=False)
+        if isinstance(cellpat, str):
+            self._iscell = cellpat.__eq__
+        else:
+            self._iscell = lambda tag: cellpat.search(tag) is not None
+        self._kinds = {'table': 'table', 'tr': 'tr', 'p': 'p'}
+        self._kinds.update(dict.fromkeys(HIDDEN_TAGS, 'hidden'))
+        self._kinds.update(dict.fromkeys(PRESERVE_TAGS, 'preserve'))
+        self.ntables = 0
+        # The open elements as (tag, kind, record). The records are those of
+        # the tables, rows, cells and paragraphs.
+        self._stack = []
+        self._tables = []  # the open _Tables
+        self._rows = []  # the open _Rows
+        self._cells = []  # the open cells as [text parts, paragraphs]
+        self._paras = []  # the text parts of the open paragraphs
+        self._hidden = 0  # the number of open HIDDEN_TAGS elements
+        self._preserve = 0  # the number of open PRESERVE_TAGS elements
+        self._data = []  # the parts of the text since the last tag
+        self._pending = deque()  # the _Tables with rows not yet returned
+        self._ready = []  # the Rows to return
+        self._closed = False  # a row or table was closed
+
+    def rows(self, htmlfile, chunksize: int = CHUNK_SIZE):
+        """
+        :param htmlfile: an HTML file opened in text mode
+        :param chunksize: the number of characters to read at a time
+        :return: an iterator over the Rows of the tables in the order of
+                 the tables and then of the rows within each table
+        """
+        while chunk := htmlfile.read(chunksize):
+            self.feed(chunk)
+            if self._ready:
+                yield from self._ready
+                self._ready.clear()
+        self.close()
+        yield from self._ready
+        self._ready.clear()
+
+    def close(self):
+        super().close()
+        self._end_data()
+        while self._stack:
+            self._pop()
+        self._flush()
+
+    def _kind(self, tag):
+        kind = self._kinds.get(tag, '')
+        if kind == '':
+            kind = self._kinds[tag] = 'cell' if self._iscell(tag) else None
+        return kind
+
+    def handle_starttag(self, tag, attrs):
+        if self._data:
+            self._end_data()
+        if tag in VOID_TAGS:
+            return
+        kind = self._kind(tag)
+        record = None
+        if kind == 'table':
+            self.ntables += 1
+            record = _Table(self.ntables)
+            self._tables.append(record)
+            self._pending.append(record)
+        elif kind == 'tr':
+            record = _Row()
+            for table in self._tables:
+                table.rows.append(record)
+            self._rows.append(record)
+        elif kind == 'cell':
+            record = [[], []]
+            for row in self._rows:
+                row.cells.append(record)
+            self._cells.append(record)
+        elif kind == 'p':
+            record = []
+            for cell in self._cells:
+                cell[1].append(record)
+            self._paras.append(record)
+        elif kind == 'hidden':
+            self._hidden += 1
+        elif kind == 'preserve':
+            self._preserve += 1
+        self._stack.append((tag, kind, record))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._data:
+            self._end_data()
+        stack = self._stack
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == tag:
+                break
+        else:
+            return  # no element to close
+        while len(stack) > i:
+            self._pop()
+        if self._closed:
+            self._flush()
+
+    def _pop(self):
+        tag, kind, record = self._stack.pop()
+        if kind is None:
+            return
+        if kind == 'table':
+            self._tables.pop()
+            record.closed = self._closed = True
+        elif kind == 'tr':
+            self._rows.pop()
+            record.done = [Cell(''.join(text), [''.join(para) for para in paras])
+                           for text, paras in record.cells]
+            record.cells = None
+            self._closed = True
+        elif kind == 'cell':
+            self._cells.pop()
+        elif kind == 'p':
+            self._paras.pop()
+        elif kind == 'hidden':
+            self._hidden -= 1
+        elif kind == 'preserve':
+            self._preserve -= 1
+
+    def _flush(self):
+        # Move the complete rows to self._ready in the order they are
+        # returned by rows().
+        self._closed = False
+        pending = self._pending
+        while pending:
+            table = pending[0]
+            rows = table.rows
+            while table.next < len(rows) and rows[table.next].done is not None:
+                self._ready.append(Row(table.number, table.next,
+                                       rows[table.next].done))
+                rows[table.next] = None  # release the row
+                table.next += 1
+            if not (table.closed and table.next == len(rows)):
+                break
+            pending.popleft()
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def _end_data(self):
+        # Add the text since the last tag to the open cells and paragraphs.
+        data = ''.join(self._data)
+        self._data.clear()
+        if self._hidden or not (self._cells or self._paras) or not data:
+            return
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        for cell in self._cells:
+            cell[0].append(data)
+        for parts in self._paras:
+            parts.append(data)
+
+    def handle_charref(self, name):
+        self._data.append(_charref(name))
+
+    def handle_entityref(self, name):
+        char = html5.get(name + ';')
+        if char is None:
+            codepoint = name2codepoint.get(name)
+            char = chr(codepoint) if codepoint else '&' + name
+        self._data.append(char)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    handle_decl = handle_pi = handle_comment
+
+    def unknown_decl(self, data):
+        # Only the text of a CDATA section is part of the document's text.
+        self._end_data()
+        if data.upper().startswith('CDATA['):
+            self._data.append(data[6:])
+            self._end_data()
+
+
+def iter_rows(htmlfile, cellpat=CELL_PAT):
+    """
+    :param htmlfile: an HTML file opened in text mode
+    :param cellpat: the elements of a row that are its cells, see TableParser
+    :return: an iterator over the Rows of all the tables in the file
+    """
+    return TableParser(cellpat).rows(htmlfile)
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -6,7 +6,7 @@
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 from collections.abc import Callable
-from colorama import Fore
+from utl.colors import Fore
 
 import utl.normalize as nd
 
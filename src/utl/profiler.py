@@ -0,0 +1,273 @@
+"""
+    The --profile option shared by the scripts.
+
+    A script adds the options with add_profile_arguments() and, after parsing
+    its arguments, starts the profiler and stops it at the end of the run:
+
+        profiler = start_profile(_args, 'xml2csv')
+        ...
+        profiler.stop(objects=nobjects)
+
+    If --profile wasn't given, start_profile() returns a profiler that does
+    nothing. Otherwise, when the profiler is stopped, or when the script exits
+    if it isn't, these files are written to --profile_dir:
+
+        <name>.pstats   cProfile statistics, readable by the pstats module or
+                        by viewers like snakeviz. Only with "cprofile".
+        <name>.folded   the collapsed stacks, one line per stack with its
+                        weight, the input expected by flamegraph.pl and
+                        speedscope
+        <name>.json     the elapsed and CPU time, the number of objects and
+                        objects per second, and the peak memory use
+
+    "cprofile" measures every function call, which makes the run slower. The
+    collapsed stacks are reconstructed from cProfile's caller statistics, so
+    when a function is called from several places its callees are divided in
+    proportion. "sample" records the main thread's stack every
+    SAMPLE_INTERVAL seconds of CPU time, which barely slows the run and gives
+    exact stacks but no call counts. Neither mode profiles
+    worker processes started with --jobs.
+"""
+import atexit
+from collections import Counter
+import json
+import os.path
+import sys
+import time
+
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005  # seconds
+MAX_DEPTH = 100  # of a reconstructed cProfile stack
+MIN_TIME = 1e-5  # seconds, smaller parts of a reconstructed stack are dropped
+
+
+def add_profile_arguments(parser):
+    """
+    Add the --profile and --profile_dir options to a script's argparse parser.
+    """
+    parser.add_argument('--profile', choices=PROFILE_MODES, help='''
+        Profile the run with "cprofile" or by sampling the stack with
+        "sample", and write the statistics, collapsed stacks for a flame graph
+        and a summary to the folder given by --profile_dir.''')
+    parser.add_argument('--profile_dir', default='.', help='''
+        The folder for the files written by --profile. The default is the
+        current folder.''')
+
+
+def peak_rss() -> int | None:
+    """
+    :return: the peak resident set size of this process in bytes or None if
+             it isn't available, as on Windows
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _label(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:' \
+           f'{code.co_firstlineno})'
+
+
+def _pstats_label(func) -> str:
+    filename, line, name = func
+    if filename == '~':  # a built-in function
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def collapse_pstats(stats: dict) -> Counter:
+    """
+    Reconstruct the collapsed stacks from cProfile statistics.
+
+    :param stats: the stats attribute of a pstats.Stats object, mapping each
+                  function to (calls, primitive calls, total time, cumulative
+                  time, {caller: (calls, primitive calls, total time,
+                  cumulative time)})
+    :return: a Counter mapping "root;...;function" to microseconds spent in
+             the function itself
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumtime) in callers.items():
+            callees.setdefault(caller, []).append((func, cumtime))
+    folded = Counter()
+
+    def walk(func, stack, fraction, depth):
+        _, _, tottime, cumtime, _ = stats[func]
+        stack = stack + [_pstats_label(func)]
+        key = ';'.join(stack)
+        folded[key] += round(tottime * fraction * 1e6)
+        if depth >= MAX_DEPTH or not cumtime:
+            return
+        for callee, callee_cumtime in callees.get(func, ()):
+            if callee in path:
+                continue  # recursion, already counted in tottime
+            path.add(callee)
+            # The callee's time from this caller, scaled by the share of
+            # this function's time that is on the current stack.
+            callee_fraction = fraction * callee_cumtime / stats[callee][3] \
+                if stats[callee][3] else 0.
+            if callee_fraction * stats[callee][3] >= MIN_TIME:
+                walk(callee, stack, callee_fraction, depth + 1)
+            path.discard(callee)
+
+    path = set()
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:  # a root
+            path.add(func)
+            walk(func, [], 1., 0)
+            path.discard(func)
+    return Counter({key: us for key, us in folded.items() if us > 0})
+
+
+class _Sampler:
+    """
+    Record the main thread's stack every SAMPLE_INTERVAL seconds of CPU time
+    using the SIGPROF timer. Python runs the signal handler in the main thread
+    between bytecodes, so unlike sampling from another thread, the samples
+    aren't biased toward the places where the main thread releases the GIL
+    to read a file. Windows doesn't have SIGPROF so a thread is used there.
+    """
+    def __init__(self):
+        self.folded = Counter()
+        self._labels = {}  # code object -> label
+        self._thread = self._stopping = None
+
+    def record(self, frame):
+        labels = self._labels
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = _label(code)
+            stack.append(label)
+            frame = frame.f_back
+        if stack:
+            self.folded[';'.join(reversed(stack))] += 1
+
+    def _handler(self, signum, frame):
+        self.record(frame)
+
+    def start(self):
+        import signal
+        if hasattr(signal, 'setitimer'):
+            signal.signal(signal.SIGPROF, self._handler)
+            signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL,
+                             SAMPLE_INTERVAL)
+            return
+        import threading
+        thread_id = threading.get_ident()
+        self._stopping = threading.Event()
+
+        def run():
+            while not self._stopping.wait(SAMPLE_INTERVAL):
+                self.record(sys._current_frames().get(thread_id))
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stopping.set()
+            self._thread.join()
+            return
+        import signal
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+
+class Profiler:
+    """
+    Returned by start_profile().
+    """
+    def __init__(self, mode: str | None, name: str, outdir: str = '.'):
+        """
+        :param mode: one of PROFILE_MODES or None to do nothing
+        :param name: the prefix of the files written, normally the script name
+        :param outdir: the folder to write the files to
+        """
+        self.mode = mode
+        self.name = name
+        self.outdir = outdir
+        self.objects = None
+        self._profile = self._sampler = None
+        self._t0 = self._cpu0 = None
+
+    def start(self):
+        if not self.mode:
+            return self
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        if self.mode == 'cprofile':
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler()
+            self._sampler.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, objects: int | None = None) -> dict | None:
+        """
+        Stop profiling and write the files. Calling stop() again does nothing.
+
+        :param objects: the number of objects processed, for the rate
+        :return: the summary written to the JSON file or None if not profiling
+        """
+        if not self.mode or self._t0 is None:
+            return None
+        elapsed = time.perf_counter() - self._t0
+        cpu = time.process_time() - self._cpu0
+        self._t0 = None
+        atexit.unregister(self.stop)
+        if objects is not None:
+            self.objects = objects
+        os.makedirs(self.outdir, exist_ok=True)
+        prefix = os.path.join(self.outdir, self.name)
+        if self._profile:
+            import pstats  # slow to import
+            self._profile.disable()
+            self._profile.dump_stats(prefix + '.pstats')
+            folded = collapse_pstats(pstats.Stats(self._profile).stats)
+        else:
+            self._sampler.stop()
+            folded = self._sampler.folded
+        with open(prefix + '.folded', 'w') as f:
+            for stack, weight in sorted(folded.items()):
+                print(stack, weight, file=f)
+        summary = {'mode': self.mode, 'elapsed': round(elapsed, 3),
+                   'cpu': round(cpu, 3), 'objects': self.objects,
+                   'objects_per_second': (round(self.objects / elapsed, 1)
+                                          if self.objects and elapsed
+                                          else None),
+                   'peak_rss': peak_rss()}
+        with open(prefix + '.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+        rate = (f', {summary["objects_per_second"]} objects/second'
+                if summary['objects_per_second'] else '')
+        rss = (f', peak RSS {summary["peak_rss"] / 2 ** 20:.1f} MiB'
+               if summary['peak_rss'] else '')
+        print(f'Profile written to {prefix}.*: {elapsed:.2f} seconds, '
+              f'{cpu:.2f} CPU{rate}{rss}.', file=sys.stderr)
+        return summary
+
+
+def start_profile(args, name: str) -> Profiler:
+    """
+    :param args: the parsed arguments including those added by
+                 add_profile_arguments()
+    :param name: the prefix of the files written, normally the script name
+    :return: the started Profiler, which does nothing if --profile wasn't
+             given
+    """
+    return Profiler(args.profile, name, args.profile_dir).start()
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -6,7 +6,6 @@ import csv
 import datetime
 import os
 import sys
-from openpyxl import load_workbook
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 
@@ -96,6 +95,7 @@ def get_heading(filepath: str | None, verbos=1, skiprows=0) -> list | None:
             reader = csv.DictReader(mapfile)
             return list(reader.fieldnames)
     elif suffix.lower() == '.xlsx':
+        from openpyxl import load_workbook  # slow to import
         wb = load_workbook(filename=filepath)
         ws = wb.active
         enumrows = enumerate(ws.iter_rows(values_only=True))
@@ -165,6 +165,7 @@ def row_dict_reader(filename: str | None, verbos=1, skiprows=0,
                     sys.exit(1)
                 yield row
     elif suffix.lower() == '.xlsx':
+        from openpyxl import load_workbook  # slow to import
         wb = load_workbook(filename=filename)
         ws = wb.active
         enumrows = enumerate(ws.iter_rows(values_only=True))
@@ -241,6 +242,7 @@ def row_list_reader(filename: str | None, verbos=1, skiprows=0,
                     sys.exit(1)
                 yield row
     elif suffix.lower() == '.xlsx':
+        from openpyxl import load_workbook  # slow to import
         wb = load_workbook(filename=filename)
         ws = wb.active
         enumrows = enumerate(ws.iter_rows(values_only=True))
@@ -1,34 +1,192 @@
 """
-    Utility subroutine for trace
+    Tracing and run statistics shared by the scripts.
+
+    trace_sub() is called by the trace() function within a script, which
+    passes the script's verbosity:
+
+        def trace(level, template, *args, color=None):
+            trace_sub(level, _args.verbose, template, color, args)
+
+    The template is only formatted if the message is printed. If the
+    verbosity is greater than 1, the message is prefixed by the file name
+    and line number of the call to trace(). These come from the caller's
+    frame and are cached, so unlike inspect.stack() no source files are read.
+
+    RunStats collects the time spent in each phase of a run and counts of
+    anything of interest. Phases nest and each phase's time excludes the time
+    spent in the phases within it, so the phase times add up to the time
+    measured. The usual phases are those in PHASES:
+
+        stats = RunStats()
+        with stats.phase('parse'):
+            for event, elem in ET.iterparse(infile):
+                with stats.phase('transform'):
+                    ...
+                stats.count('objects')
+        stats.report(_args.stats)
+
+    Here "parse" is the time in the loop less the time in "transform".
+    Alternatively, RunStats.timed() times only getting the items from an
+    iterator.
 """
 
-from colorama import Style
-from inspect import getframeinfo, stack
-from os.path import basename
+import json
+import os.path
+import sys
+import time
+from collections import Counter, defaultdict
+
+from utl.colors import Style
+
+PHASES = ('parse', 'select', 'transform', 'serialize', 'write')
+STATS_FORMATS = ('text', 'json')
+_prefixes = {}  # (code object, line number) -> "file line n: "
+
 
+def _caller_prefix(depth: int) -> str:
+    frame = sys._getframe(depth + 1)
+    key = (frame.f_code, frame.f_lineno)
+    prefix = _prefixes.get(key)
+    if prefix is None:
+        prefix = _prefixes[key] = (f'{os.path.basename(frame.f_code.co_filename)}'
+                                   f' line {frame.f_lineno}: ')
+    return prefix
 
-def trace_sub(level: int, verbose: int, template, color, args):
+
+def trace_sub(level: int, verbose: int, template, color, args, file=None):
     """
     This function is intended to be called by a trace() function within another
     file. This is because we look at the 2nd level on the stack.
-    :param level:
-    :param verbose:
-    :param template:
-    :param color:
+    :param level: the lowest verbosity at which the message is printed
+    :param verbose: the verbosity of the run
+    :param template: the message, formatted with args if there are any
+    :param color: None or a colorama color
     :param args: list of arguments
+    :param file: where to print the message, default sys.stdout
     :return: None
     """
-    if verbose >= level:
-        if verbose > 1:
-            caller = getframeinfo(stack()[2][0])
-            print(f'{basename(caller.filename)} line {caller.lineno}: ', end='')
-        if color:
-            if len(args) == 0:
-                print(f'{color}{template}{Style.RESET_ALL}')
-            else:
-                print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
-        else:
-            if len(args) == 0:
-                print(template)
-            else:
-                print(template.format(*args))
+    if verbose < level:
+        return
+    message = template.format(*args) if args else template
+    if color:
+        message = f'{color}{message}{Style.RESET_ALL}'
+    if verbose > 1:
+        message = _caller_prefix(2) + message
+    print(message, file=file)
+
+
+class _Phase:
+    """
+    The context manager returned by RunStats.phase(). One is kept for each
+    phase name so that timing a phase doesn't create an object.
+    """
+    __slots__ = ('stats', 'name')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        # [name, start, time in nested phases]
+        self.stats._stack.append([self.name, time.perf_counter(), 0.])
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stats = self.stats
+        name, start, nested = stats._stack.pop()
+        elapsed = time.perf_counter() - start
+        stats.seconds[name] += elapsed - nested
+        stats.calls[name] += 1
+        if stats._stack:
+            stats._stack[-1][2] += elapsed
+
+
+class RunStats:
+    """
+    Per-phase timers and counters for one run of a script.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+        self._phases = {}
+        self._stack = []
+
+    def phase(self, name: str) -> _Phase:
+        """
+        :param name: the phase, usually one of PHASES
+        :return: a context manager that adds the time spent in the with
+                 statement to the phase
+        """
+        ph = self._phases.get(name)
+        if ph is None:
+            ph = self._phases[name] = _Phase(self, name)
+            self.seconds[name] += 0.  # report the phases in order of use
+        return ph
+
+    def timed(self, name: str, iterable):
+        """
+        Iterate over an iterable adding the time spent getting each item to
+        the phase, for example the time spent reading the rows of a CSV file.
+        """
+        ph = self.phase(name)
+        iterator = iter(iterable)
+        while True:
+            with ph:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def as_dict(self) -> dict:
+        """
+        :return: the elapsed time, the phases in the order first used and the
+                 counters as a dict that can be serialized to JSON
+        """
+        return {'elapsed': round(time.perf_counter() - self.start, 6),
+                'phases': {name: {'seconds': round(seconds, 6),
+                                  'calls': self.calls[name]}
+                           for name, seconds in self.seconds.items()},
+                'counters': dict(self.counters)}
+
+    def report(self, fmt: str | None = 'text', file=None):
+        """
+        Print the statistics.
+
+        :param fmt: "text", "json" or None to print nothing
+        :param file: where to print, default sys.stderr so that the statistics
+                     aren't mixed with output written to stdout
+        """
+        if not fmt:
+            return
+        file = file or sys.stderr
+        stats = self.as_dict()
+        if fmt == 'json':
+            print(json.dumps(stats), file=file)
+            return
+        elapsed = stats['elapsed']
+        print(f'{"Phase":<12}{"Seconds":>10}{"%":>7}{"Calls":>10}', file=file)
+        for name, phase in stats['phases'].items():
+            percent = 100 * phase['seconds'] / elapsed if elapsed else 0.
+            print(f'{name:<12}{phase["seconds"]:>10.3f}{percent:>7.1f}'
+                  f'{phase["calls"]:>10}', file=file)
+        print(f'{"elapsed":<12}{elapsed:>10.3f}', file=file)
+        for name, value in stats['counters'].items():
+            print(f'{name:<12}{value:>10}', file=file)
+
+
+def add_stats_argument(parser):
+    """
+    Add the --stats option to a script's argparse parser.
+    """
+    parser.add_argument('--stats', choices=STATS_FORMATS, help='''
+        At the end of the run, print the time spent in each phase and the
+        counts of objects processed to stderr as a table or as JSON.''')
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
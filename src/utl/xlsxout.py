@@ -0,0 +1,155 @@
+"""
+    Write a single sheet XLSX file one row at a time without keeping the
+    sheet in memory.
+
+    If the xlsxwriter package is installed it is used in constant memory
+    mode, otherwise openpyxl is used in write-only mode. Either way the rows
+    are written to a temporary file as they are added, so memory use doesn't
+    grow with the number of rows and saving doesn't have to serialize the
+    whole sheet at once.
+
+    Because the rows are streamed, the column widths and page layout are
+    given when the writer is created and rows can only be appended. Strings
+    are always written as text, even if they look like formulas or URLs.
+"""
+import os
+
+# The styles that may be given to writerow(), as xlsxwriter format
+# properties. They are converted to named styles for openpyxl.
+STYLES = {'heading': {'bold': True, 'align': 'center'},
+          'text': {'num_format': '@'}}
+
+
+def _column_letter(col: int) -> str:
+    """
+    :param col: the zero-based column number
+    :return: the spreadsheet column letters, "A" for 0
+    """
+    letters = ''
+    col += 1
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+class SheetWriter:
+    """
+    Use as a context manager or call close() to save the file::
+
+        with SheetWriter('out.xlsx', widths=[15, 50]) as writer:
+            writer.writerow(['Serial', 'Title'], style='heading')
+            writer.writerow(['JB001', 'Title'])
+    """
+    def __init__(self, filename: str, sheetname: str = 'Sheet1',
+                 widths: list[float] | None = None, landscape=False,
+                 header: str = '', footer: str = ''):
+        """
+        :param filename: the XLSX file to create
+        :param sheetname: the name of the only sheet
+        :param widths: the widths of the columns starting with column A
+        :param landscape: print in landscape orientation
+        :param header: text centered at the top of each printed page
+        :param footer: text at the bottom left of each printed page. "&P" is
+                       replaced by the page number and "&N" by the number of
+                       pages.
+        """
+        self.filename = filename
+        self.nrows = 0
+        try:
+            import xlsxwriter
+        except ImportError:
+            xlsxwriter = None
+        self._xlsxwriter = xlsxwriter is not None
+        if self._xlsxwriter:
+            self._wb = xlsxwriter.Workbook(filename, {
+                'constant_memory': True, 'strings_to_formulas': False,
+                'strings_to_urls': False, 'strings_to_numbers': False})
+            self._ws = self._wb.add_worksheet(sheetname)
+            self._formats = {name: self._wb.add_format(props)
+                             for name, props in STYLES.items()}
+            for col, width in enumerate(widths or []):
+                self._ws.set_column(col, col, width)
+            if landscape:
+                self._ws.set_landscape()
+            if header:
+                self._ws.set_header('&C' + header)
+            if footer:
+                self._ws.set_footer('&L' + footer)
+            return
+        from openpyxl import Workbook  # slow to import
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Font, NamedStyle
+        self._cell = WriteOnlyCell
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(sheetname)
+        for name, props in STYLES.items():
+            style = NamedStyle(name)
+            if props.get('bold'):
+                style.font = Font(bold=True)
+            if 'align' in props:
+                style.alignment = Alignment(horizontal=props['align'])
+            if 'num_format' in props:
+                style.number_format = props['num_format']
+            self._wb.add_named_style(style)
+        for col, width in enumerate(widths or []):
+            self._ws.column_dimensions[_column_letter(col)].width = width
+        if landscape:
+            self._ws.page_setup.orientation = 'landscape'
+        self._ws.oddHeader.center.text = self._ws.evenHeader.center.text = \
+            header or None
+        self._ws.oddFooter.left.text = self._ws.evenFooter.left.text = \
+            footer or None
+
+    def writerow(self, values, style: str | None = None):
+        """
+        Append a row to the sheet.
+
+        :param values: the cell values. None leaves a cell empty.
+        :param style: None or one of STYLES, applied to every cell in the row
+        """
+        if self._xlsxwriter:
+            self._ws.write_row(self.nrows, 0, values,
+                               self._formats[style] if style else None)
+            self.nrows += 1
+            return
+        cells = []
+        for value in values:
+            # A plain value is faster but a string starting with "=" would
+            # be written as a formula.
+            if style or (isinstance(value, str) and value.startswith('=')):
+                cell = self._cell(self._ws, value)
+                if isinstance(value, str):
+                    cell.data_type = 's'
+                if style:
+                    cell.style = style
+                value = cell
+            cells.append(value)
+        self._ws.append(cells)
+        self.nrows += 1
+
+    def close(self):
+        if self._xlsxwriter:
+            self._wb.close()
+        else:
+            self._wb.save(self.filename)
+
+    def abort(self):
+        """
+        Close the writer and delete the incomplete file.
+        """
+        self.close()
+        os.remove(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -0,0 +1,242 @@
+"""
+    Find the top level Object elements in a Modes XML file as byte ranges of
+    the source file so that objects that are not modified can be copied to the
+    output without being parsed and re-serialized by ElementTree. The
+    accession number can be found without parsing the Object.
+"""
+from html import unescape
+import mmap
+import re
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+from utl.zipmagic import compression, openfile, split_member
+
+# Encodings for which the source bytes can be copied to a utf-8 output file.
+VERBATIM_ENCODINGS = ('utf-8', 'utf8', 'ascii', 'us-ascii')
+ENCODINGPAT = re.compile(rb'<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+
+
+def _tagpat(tag: str):
+    # Comments and CDATA sections are matched so that a record tag inside
+    # them is skipped. Group 1 is None for these. The attribute alternatives
+    # allow ">" inside a quoted attribute value.
+    return re.compile(rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<(/?)'
+                      + tag.encode() +
+                      rb'''(?=[\s/>])(?:[^>"']|"[^"]*"|'[^']*')*>''',
+                      re.DOTALL)
+
+
+def read_source(filename: str):
+    """
+    :param filename: An XML file, which may be compressed as for
+                     zipmagic.openfile.
+    :return: A bytes-like object containing the whole file. An uncompressed
+             file is memory mapped so it is not read until it is accessed.
+    """
+    if compression(split_member(filename)[0]):
+        with openfile(filename, 'rb') as xmlfile:
+            return xmlfile.read()
+    with open(filename, 'rb') as xmlfile:
+        return mmap.mmap(xmlfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def source_encoding(buf) -> str:
+    """
+    :param buf: the XML source
+    :return: the encoding in the XML declaration, lower case, or 'utf-8' if
+             none is declared.
+    """
+    m = ENCODINGPAT.match(buf[:200])
+    return m[1].decode().lower() if m else 'utf-8'
+
+
+def _top_level(buf, tag):
+    """
+    Yield (start, bodystart, bodyend, end) for each top level record where
+    buf[bodystart:bodyend] is the part of the element's content before any
+    nested record and before the end tag.
+    """
+    depth = 0
+    start = bodystart = bodyend = 0
+    for m in _tagpat(tag).finditer(buf):
+        closing = m[1]
+        if closing is None:
+            continue  # comment or CDATA
+        if closing:
+            depth -= 1
+            if depth == 0:
+                if bodyend is None:
+                    bodyend = m.start()
+                end = buf.find(b'<', m.end())
+                yield start, bodystart, bodyend, end if end >= 0 else len(buf)
+        elif m[0].endswith(b'/>'):
+            if depth == 0:
+                end = buf.find(b'<', m.end())
+                yield (m.start(), m.end(), m.end(),
+                       end if end >= 0 else len(buf))
+            elif bodyend is None:
+                bodyend = m.start()
+        else:
+            if depth == 0:
+                start, bodystart, bodyend = m.start(), m.end(), None
+            elif bodyend is None:
+                bodyend = m.start()
+            depth += 1
+
+
+def object_ranges(buf, tag='Object'):
+    """
+    A generator of the byte ranges of the top level record elements in an XML
+    document. Nested elements with the same tag are part of their parent's
+    range.
+
+    Each range includes the whitespace following the end tag, which is what
+    ElementTree writes as the element's tail so that a slice of the source
+    can be substituted for ``ET.tostring(elem)``.
+
+    :param buf: bytes or mmap containing the XML document
+    :param tag: the record tag, normally "Object" but "template" for template
+                files
+    :return: tuples of (start, end) such that buf[start:end] is the element
+    """
+    for start, _, _, end in _top_level(buf, tag):
+        yield start, end
+
+
+def _id_steps(id_xpath: str):
+    """
+    :param id_xpath: A path of child tags like "./ObjectIdentity/Number"
+    :return: a list of compiled patterns, one per step, or raise ValueError if
+             the path contains predicates or other XPath syntax.
+    """
+    steps = id_xpath.removeprefix('./').split('/')
+    if not all(re.fullmatch(r'[A-Za-z_][\w.-]*', step) for step in steps):
+        raise ValueError(f'Only simple paths are supported: {id_xpath}')
+    return [(step.encode(),
+             re.compile(rb'<' + step.encode() +
+                        rb'''(?=[\s/>])(?:[^>"']|"[^"]*"|'[^']*')*?(/?)>'''))
+            for step in steps]
+
+
+def _find_id(buf, pos, limit, steps, encoding):
+    for n, (step, pat) in enumerate(steps):
+        m = pat.search(buf, pos, limit)
+        if m is None:
+            return None
+        last = n == len(steps) - 1
+        if m[1]:  # empty element, <Number/>
+            return '' if last else None
+        pos = m.end()
+        if not last:
+            close = buf.find(b'</' + step + b'>', pos, limit)
+            limit = close if close >= 0 else limit
+    end = buf.find(b'<', pos, limit)
+    if end < 0:
+        end = limit
+    return unescape(bytes(buf[pos:end]).decode(encoding))
+
+
+def scan_objects(buf, tag='Object', id_xpath='./ObjectIdentity/Number',
+                 encoding='utf-8'):
+    """
+    Find the top level records and their accession numbers without building
+    an element tree.
+
+    :param buf: bytes or mmap containing the XML document
+    :param tag: the record tag, normally "Object"
+    :param id_xpath: the path to the element containing the accession number.
+                     Only a path of child tags is supported.
+    :param encoding: the encoding of buf
+    :return: an iterator of tuples of (idnum, start, end) where idnum is None
+             if the Object has no id element and buf[start:end] is as for
+             object_ranges. A ValueError is raised if id_xpath is not a
+             simple path.
+    """
+    steps = _id_steps(id_xpath)  # raise ValueError now, not when iterating
+    return ((_find_id(buf, bodystart, bodyend, steps, encoding), start, end)
+            for start, bodystart, bodyend, end in _top_level(buf, tag))
+
+
+def shards(objects: list, nshards: int) -> list:
+    """
+    Divide the records found by object_ranges or scan_objects into groups of
+    consecutive records to be handled by separate processes.
+
+    :param objects: tuples ending with the start and end of each record
+    :param nshards: the maximum number of shards
+    :return: lists of consecutive tuples, each with about the same total
+             size
+    """
+    if not objects:
+        return []
+    total = objects[-1][-1] - objects[0][-2]
+    target = max(total // nshards, 1)
+    shard = []
+    size = 0
+    result = []
+    for obj in objects:
+        shard.append(obj)
+        size += obj[-1] - obj[-2]
+        if size >= target:
+            result.append(shard)
+            shard = []
+            size = 0
+    if shard:
+        result.append(shard)
+    return result
+
+
+class VerbatimWriter:
+    """
+    Write Object elements to an output file in the order they appear in the
+    input file, copying objects that have not been modified from the source
+    bytes instead of serializing them.
+
+    The write method must be called once for each top level Object in the
+    input file, in document order, because the source ranges are consumed in
+    step with the parser. Objects after the last one written are ignored so
+    that a run may stop early.
+
+    If verbatim is False, or the input file is not utf-8 or ascii, every
+    object is serialized by ElementTree as before.
+    """
+    def __init__(self, infilename: str, outfile, verbatim=True, tag='Object'):
+        self.outfile = outfile
+        self.buf = None
+        self.ranges = None
+        self.ncopied = self.nserialized = 0
+        if verbatim:
+            buf = read_source(infilename)
+            if source_encoding(buf) in VERBATIM_ENCODINGS:
+                self.buf = buf
+                self.ranges = object_ranges(buf, tag)
+
+    def write(self, elem: ET.Element, modified: bool = True):
+        """
+        :param elem: the Object element from the parser
+        :param modified: If False, the source bytes are written.
+        :return: None
+        """
+        if self.ranges is None:
+            self.outfile.write(ET.tostring(elem, encoding='utf-8'))
+            self.nserialized += 1
+            return
+        start, end = next(self.ranges)
+        if modified:
+            self.outfile.write(ET.tostring(elem, encoding='utf-8'))
+            self.nserialized += 1
+        else:
+            self.outfile.write(self.buf[start:end])
+            self.ncopied += 1
+
+    def skip(self):
+        """
+        Consume the source range of an Object that is not to be written.
+        """
+        if self.ranges is not None:
+            next(self.ranges)
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
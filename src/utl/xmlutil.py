@@ -1,6 +1,9 @@
+import sys
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET  # PEP8 doesn't like two uppercase chars
 
+from utl.zipmagic import openfile
+
 
 def get_record_tag(infile):
     """
@@ -8,15 +11,123 @@ def get_record_tag(infile):
     "Object" or "template" and raising a KeyError otherwise.
 
     :param infile: The XML file containing Object or template repeated element
-                   groups.
+                   groups. It may be compressed.
     :return: the tag of the repeated group.
     """
     # Define the two valid root tags and the associated record tags
     recordtags = {'templates': 'template', 'Interchange': 'Object'}
 
-    with open(infile) as xmlfile:
+    with openfile(infile) as xmlfile:
         event, elem = next(ET.iterparse(xmlfile, events=('start',)))
         tag = elem.tag
     return recordtags[tag]  # barf if the root tag is not "templates" or "Interchange"
 
 
+def _escape_text(text: str) -> str:
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def _escape_attrib(text: str, tab='&#09;') -> str:
+    # The same as ElementTree. minidom from Python 3.13 uses '&#9;' for tab.
+    text = _escape_text(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', tab)
+    return text
+
+
+# Before Python 3.13 minidom did not escape whitespace in attribute values so
+# the parser that read the toprettyxml output back replaced it with spaces.
+_ATTRIB_SPACES = str.maketrans('\t\n\r', '   ')
+
+
+def _escape_reparsed_attrib(text: str) -> str:
+    return _escape_attrib(text.replace('\r\n', ' ').translate(_ATTRIB_SPACES))
+
+
+def _escape_minidom_attrib(text: str) -> str:
+    return _escape_attrib(text, '&#9;')
+
+
+def _escape_old_minidom(text: str) -> str:
+    # minidom before Python 3.13 escapes text and attribute values alike.
+    text = _escape_text(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    return text
+
+
+def _pretty(elem, indent: str, parts: list, empty: str, escape_text,
+            escape_attrib):
+    tag = elem.tag
+    parts.append(f'{indent}<{tag}')
+    for name, value in elem.items():
+        parts.append(f' {name}="{escape_attrib(value)}"')
+    text = elem.text
+    if not len(elem):
+        if text:
+            parts.append(f'>{escape_text(text)}</{tag}>\n')
+        else:
+            parts.append(empty)
+        return
+    parts.append('>\n')
+    inner = indent + '\t'
+    if text:
+        parts.append(f'{inner}{escape_text(text)}\n')
+    for child in elem:
+        _pretty(child, inner, parts, empty, escape_text, escape_attrib)
+        if child.tail:
+            parts.append(f'{inner}{escape_text(child.tail)}\n')
+    parts.append(f'{indent}</{tag}>\n')
+
+
+def pretty_tostring(elem: ET.Element, encoding='utf-8',
+                    minidom_style=False) -> bytes:
+    """
+    Serialize an element with each subelement on its own line indented by
+    tabs. The element must already have had its text and tails stripped, as
+    is done by normalize_xml.py, because any text is written on a line of its
+    own unless it is the only content of its element.
+
+    This replaces serializing the element with ET.tostring, parsing it with
+    minidom and calling toprettyxml(indent='\\t'). With minidom_style False
+    the output is the same as parsing the toprettyxml output with ElementTree
+    and serializing it again. With minidom_style True the output is the same
+    as the toprettyxml output itself, which writes empty elements as <tag/>
+    instead of <tag />. As minidom's escaping depends on the Python version,
+    so does this output: before Python 3.13 double quotes in text are
+    escaped and whitespace in attribute values is not.
+
+    Tags with a namespace are not supported.
+
+    :param elem: the element to serialize, normally an Object
+    :param encoding: the output encoding. Characters that cannot be encoded
+                     are written as character references.
+    :param minidom_style: see above
+    :return: the bytes without a trailing newline. toprettyxml ends with a
+             newline so the minidom_style caller must add it.
+    """
+    escape_text = _escape_text
+    if minidom_style and sys.version_info >= (3, 13):
+        empty, escape_attrib = '/>\n', _escape_minidom_attrib
+    elif minidom_style:
+        empty = '/>\n'
+        escape_text = escape_attrib = _escape_old_minidom
+    elif sys.version_info >= (3, 13):
+        empty, escape_attrib = ' />\n', _escape_attrib
+    else:
+        empty, escape_attrib = ' />\n', _escape_reparsed_attrib
+    parts = []
+    _pretty(elem, '', parts, empty, escape_text, escape_attrib)
+    return ''.join(parts)[:-1].encode(encoding, 'xmlcharrefreplace')
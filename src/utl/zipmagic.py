@@ -1,23 +1,173 @@
 """
-    If a file is a zip file, assume it contains exactly one member file.
-    If not a zip file, open the file as normal.
+    Open a file that may be compressed. The compression is recognized from the
+    first bytes of the file, not from its name. Zip, gzip, bzip2 and xz are
+    supported and zstd if Python is 3.14 or later or the zstandard package is
+    installed.
+
+    A zip file may hold more than one member. The member to read can be given
+    after "::" in the filename, for example "export.zip::2024-*.xml", as an
+    exact name or a glob pattern that matches one member. Otherwise the first
+    member is read.
+
+    Output files are compressed if the compression is given or the filename
+    ends with one of the suffixes in SUFFIXES. If the compression is given,
+    its suffix is added to the filename unless it is already there.
 """
+import fnmatch
+import io
+import os.path
+
+# (leading bytes, compression). An empty zip file starts with the end of
+# central directory record.
+MAGIC = ((b'PK\x03\x04', 'zip'),
+         (b'PK\x05\x06', 'zip'),
+         (b'\x1f\x8b', 'gzip'),
+         (b'BZh', 'bz2'),
+         (b'\xfd7zXZ\x00', 'xz'),
+         (b'\x28\xb5\x2f\xfd', 'zstd'))
+COMPRESSIONS = ('gzip', 'bz2', 'xz', 'zstd')
+SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+MEMBER_SEPARATOR = '::'
+# Decompress in large blocks rather than the 16 KiB that iterparse reads.
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def _zstd():
+    try:
+        from compression import zstd  # Python 3.14
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd files need Python 3.14 or the zstandard '
+                         'package.') from None
+    return zstandard
+
+
+def _open_compressed(filename, compression: str, mode: str):
+    # All modules that are slow to import are imported when needed.
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(filename, mode, compresslevel=6)
+    elif compression == 'bz2':
+        import bz2
+        return bz2.open(filename, mode)
+    elif compression == 'xz':
+        import lzma
+        return lzma.open(filename, mode)
+    elif compression == 'zstd':
+        return _zstd().open(filename, mode)
+    raise ValueError(f'Unknown compression: {compression}')
+
+
+def split_member(filename: str):
+    """
+    :param filename: a filename, possibly followed by "::" and the name or
+                     pattern of a zip member
+    :return: a tuple of the filename and the member or None
+    """
+    if MEMBER_SEPARATOR in filename and not os.path.exists(filename):
+        filename, member = filename.rsplit(MEMBER_SEPARATOR, 1)
+        return filename, member
+    return filename, None
+
 
-import magic  # package python-magic
-from zipfile import ZipFile
+def compression(filename) -> str | None:
+    """
+    :param filename: the file to examine, without a zip member
+    :return: "zip", one of COMPRESSIONS, or None for an uncompressed file
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(6)
+    for magic, comp in MAGIC:
+        if head.startswith(magic):
+            return comp
+    return None
 
 
-def openfile(filename, mode='r'):
-    # magic.from_file returns a descriptor string like "Zip archive data..."
-    if magic.from_file(filename).lower().startswith('zip'):
+def is_zip(filename) -> bool:
+    return compression(split_member(filename)[0]) == 'zip'
+
+
+def zip_member(myzip, member: str | None) -> str:
+    """
+    :param myzip: an open ZipFile
+    :param member: a member name or glob pattern or None for the first member
+    :return: the name of the member, raising ValueError unless exactly one
+             member matches.
+    """
+    names = myzip.namelist()
+    if member is None:
+        return names[0]
+    if member in names:
+        return member
+    matches = fnmatch.filter(names, member)
+    if len(matches) != 1:
+        raise ValueError(f'{len(matches)} members of {myzip.filename} match'
+                         f' "{member}"')
+    return matches[0]
+
+
+def openfile(filename, mode='r', encoding=None):
+    """
+    :param filename: the file to open, possibly with a zip member
+    :param mode: "r" or "rb". A compressed file is always opened in binary
+                 mode unless an encoding is given.
+    :param encoding: the encoding of a file opened in text mode
+    :return: a file object
+    """
+    filename, member = split_member(filename)
+    comp = compression(filename)
+    if comp is None:
+        return open(filename, mode, encoding=encoding)
+    if comp == 'zip':
+        from zipfile import ZipFile  # slow to import
         myzip = ZipFile(filename)
-        names = myzip.namelist()
         # noinspection PyTypeChecker
-        file = myzip.open(names[0], mode)
+        file = myzip.open(zip_member(myzip, member), 'r')
     else:
-        file = open(filename, mode)
+        file = io.BufferedReader(_open_compressed(filename, comp, 'rb'),
+                                 READ_BUFFER_SIZE)
+    if encoding:
+        file = io.TextIOWrapper(file, encoding=encoding)
     return file
 
 
+def output_name(filename, compress=None) -> str:
+    """
+    :param filename: the output file as given
+    :param compress: one of COMPRESSIONS or None
+    :return: the filename with the suffix of the compression added if it
+             doesn't already end with it
+    """
+    if compress is None or filename.lower().endswith(SUFFIXES[compress]):
+        return filename
+    return filename + SUFFIXES[compress]
+
+
+def open_output(filename, compress=None):
+    """
+    Open a file for binary output. Call output_name first if the name of the
+    file written is needed.
+
+    :param filename: the output file
+    :param compress: one of COMPRESSIONS or None to compress only if the
+                     filename ends with one of the SUFFIXES. If given, its
+                     suffix is added to the filename as by output_name.
+    :return: a file object
+    """
+    filename = output_name(filename, compress)
+    if compress is None:
+        suffix = os.path.splitext(filename)[1].lower()
+        for comp, compsuffix in SUFFIXES.items():
+            if suffix == compsuffix:
+                compress = comp
+    if compress is None:
+        return open(filename, 'wb')
+    return _open_compressed(filename, compress, 'wb')
+
+
 if __name__ == '__main__':
     print('This module is not callable.')
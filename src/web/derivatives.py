@@ -0,0 +1,377 @@
+"""
+    Make the derivative images for the website, for Modes and for previews
+    from the scans in a folder tree in one pass.
+
+    Each source image is read and decoded once and all of the sizes are made
+    from the decoded image, largest first, each one shrunk from the one
+    before it. A JPEG source is decoded at the smallest scale that is still
+    at least as large as the largest derivative. The sizes are:
+
+        web      the image for the website, with the name of the source
+        preview  a smaller image for browsing, with the name of the source
+        modes    the Modes thumbnail, named by accession number like
+                 "JB1202.1.jpg" as made by modes_thumbs.py. Only the first
+                 page and the A side of an object get a thumbnail.
+
+    The derivatives are written to a subfolder of the output folder for each
+    size. The filenames are parsed by web.webutil.parse_prefix, via
+    web.imgcatalog, and files whose names aren't accession numbers are
+    ignored.
+
+    A manifest in the output folder records for each source its size,
+    modification time and SHA-1 hash and the parameters it was made with. A
+    source whose size and time haven't changed is skipped without being
+    read. If the time has changed but the hash hasn't, the source isn't
+    decoded again. Changing a size or the quality remakes every derivative.
+    Use --force to remake them all anyway.
+
+    The images are decoded and encoded by Pillow.
+"""
+import argparse
+from collections import namedtuple
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+from utl.colors import Fore, Style
+from utl.normalize import if_not_sphinx, sphinxify
+from utl.profiler import add_profile_arguments, start_profile
+from web.imgcatalog import ImageCatalog
+
+MANIFEST = 'derivatives.json'
+MANIFEST_VERSION = 1
+DEFAULT_QUALITY = 85
+# name:      the subfolder of the output folder
+# maxpixels: the maximum height or width
+# byaccn:    True if the derivative is named by accession number
+Derivative = namedtuple('Derivative', 'name maxpixels byaccn')
+DERIVATIVES = (Derivative('web', 1000, False),
+               Derivative('preview', 600, False),
+               Derivative('modes', 200, True))
+# relpath: the path of the source relative to the input folder
+# srcpath: the path of the source
+# targets: a list of (maxpixels, output path)
+# oldhash: the source's hash in the manifest or None
+Task = namedtuple('Task', 'relpath srcpath targets quality oldhash')
+
+
+def trace(level, template, *args, color=None):
+    if _args.verbose >= level:
+        if color:
+            print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
+        else:
+            print(template.format(*args))
+
+
+def modes_name(parsed) -> str | None:
+    """
+    :param parsed: the result of web.imgcatalog.parse_filename
+    :return: the filename of the Modes thumbnail like "JB1202.1.jpg" or None
+             if the file is not the first page or is the B side
+    """
+    accn, subn, subn_ab, page, page_ab, modes_key1, modes_key2 = parsed[:7]
+    if subn_ab == 'B' or page_ab == 'B' or page.lstrip('0') not in ('', '1'):
+        return None
+    return f'{modes_key2 or modes_key1}.jpg'
+
+
+def derivative_names(filename: str, parsed, derivatives) -> list:
+    """
+    :param filename: the name of the source without the folder
+    :param parsed: the result of web.imgcatalog.parse_filename
+    :param derivatives: the Derivatives to make
+    :return: a list of (Derivative, output filename). A Derivative named by
+             accession number is omitted if the source doesn't get one.
+    """
+    prefix = os.path.splitext(filename)[0]
+    names = []
+    for derivative in derivatives:
+        if derivative.byaccn:
+            name = modes_name(parsed)
+            if name is None:
+                continue
+        else:
+            name = prefix + '.jpg'
+        names.append((derivative, name))
+    return names
+
+
+def params_key(derivatives, quality: int) -> str:
+    """
+    :return: a string identifying the parameters the derivatives are made
+             with, saved in the manifest
+    """
+    return ' '.join([f'{d.name}={d.maxpixels}' for d in derivatives]
+                    + [f'q={quality}'])
+
+
+def load_manifest(path: str) -> dict:
+    """
+    :return: a dict of the relative path of each source to a dict of:
+
+                 size:    the size of the source in bytes
+                 mtime:   the source's st_mtime_ns
+                 sha1:    the hex SHA-1 hash of the source
+                 params:  the result of params_key
+                 outputs: a list of the output paths relative to the
+                          output folder
+    """
+    try:
+        with open(path) as manifestfile:
+            manifest = json.load(manifestfile)
+    except FileNotFoundError:
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest['sources']
+
+
+def save_manifest(path: str, sources: dict):
+    manifest = {'version': MANIFEST_VERSION, 'sources': sources}
+    tmpname = path + '.tmp'
+    with open(tmpname, 'w') as manifestfile:
+        json.dump(manifest, manifestfile, indent=1, sort_keys=True)
+    os.replace(tmpname, path)
+
+
+def write_derivatives(data: bytes, targets, quality: int):
+    """
+    Decode the image once and write each target shrunk from the one before
+    it. A target at least as large as the source is a copy of the source if
+    the source is a JPEG file that needs no rotation.
+
+    :param data: the contents of the source file
+    :param targets: a list of (maxpixels, output path)
+    :param quality: the JPEG quality of the output files
+    """
+    from PIL import Image, ImageOps  # slow to import
+    targets = sorted(targets, reverse=True)
+    with Image.open(io.BytesIO(data)) as im:
+        fullsize = max(im.size)
+        isjpeg = im.format == 'JPEG'
+        if isjpeg:
+            # Let the decoder skip the detail that no target needs.
+            largest = targets[0][0]
+            im.draft('RGB', (largest, largest))
+        upright = im.getexif().get(0x0112, 1) == 1  # the orientation tag
+        img = ImageOps.exif_transpose(im)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        for maxpixels, outpath in targets:
+            os.makedirs(os.path.dirname(outpath), exist_ok=True)
+            tmppath = f'{outpath}.{os.getpid()}.tmp'
+            if fullsize <= maxpixels and isjpeg and upright:
+                with open(tmppath, 'wb') as outfile:
+                    outfile.write(data)
+            else:
+                img.thumbnail((maxpixels, maxpixels), Image.Resampling.LANCZOS)
+                img.save(tmppath, 'JPEG', quality=quality, optimize=True)
+            os.replace(tmppath, outpath)
+
+
+def _make(task: Task):
+    # Catch the exception in the worker so one bad scan doesn't stop the run.
+    # Return the source's hash and whether the derivatives were written.
+    try:
+        with open(task.srcpath, 'rb') as srcfile:
+            data = srcfile.read()
+        sha1 = hashlib.sha1(data).hexdigest()
+        if sha1 == task.oldhash:
+            return task.relpath, sha1, False, None
+        write_derivatives(data, task.targets, task.quality)
+        return task.relpath, sha1, True, None
+    except Exception as e:  # noqa: the message is reported to the user
+        return task.relpath, None, False, f'{type(e).__name__}: {e}'
+
+
+def get_tasks(catalog: ImageCatalog, sources: dict, derivatives, params: str):
+    """
+    Compare the images in the catalog with the manifest.
+
+    :param catalog: the ImageCatalog of the input folder
+    :param sources: the manifest returned by load_manifest. The entries of
+                    sources that no longer exist are removed.
+    :param derivatives: the Derivatives to make
+    :param params: the result of params_key
+    :return: a list of the Tasks for the new or changed sources, a dict of
+             the relative path of each of those sources to its new manifest
+             entry without the hash, and the number of sources up to date
+    """
+    tasks = []
+    entries = {}
+    nskipped = 0
+    claimed = set()  # output paths, for sources named by accession number
+    found = set()
+    for dirpath, filename, parsed in catalog.walk():
+        if parsed is None:
+            trace(2, 'Ignored: {}', os.path.join(dirpath, filename))
+            continue
+        srcpath = os.path.join(dirpath, filename)
+        relpath = os.path.relpath(srcpath, catalog.topdir)
+        found.add(relpath)
+        outputs = []
+        for derivative, name in derivative_names(filename, parsed,
+                                                 derivatives):
+            output = os.path.join(derivative.name, name)
+            if output in claimed:
+                trace(1, 'Duplicate {} ignored: {}', output, relpath,
+                      color=Fore.YELLOW)
+                continue
+            claimed.add(output)
+            outputs.append((derivative.maxpixels, output))
+        if not outputs:
+            continue
+        st = os.stat(srcpath)
+        entry = {'size': st.st_size, 'mtime': st.st_mtime_ns,
+                 'params': params, 'outputs': [o for _, o in outputs]}
+        old = sources.get(relpath)
+        current = (not _args.force and old is not None
+                   and old['params'] == params
+                   and old['outputs'] == entry['outputs']
+                   and all(os.path.exists(os.path.join(_args.outdir, o))
+                           for o in entry['outputs']))
+        if current and (old['size'], old['mtime']) == (st.st_size,
+                                                       st.st_mtime_ns):
+            nskipped += 1
+            continue
+        targets = [(maxpixels, os.path.join(_args.outdir, output))
+                   for maxpixels, output in outputs]
+        tasks.append(Task(relpath, srcpath, targets, _args.quality,
+                          old['sha1'] if current else None))
+        entries[relpath] = entry
+    for relpath in set(sources) - found:
+        trace(2, 'No longer exists: {}', relpath)
+        del sources[relpath]
+    return tasks, entries, nskipped
+
+
+def get_derivatives() -> list:
+    """
+    :return: the Derivatives selected by --sizes with their sizes
+    """
+    derivatives = {d.name: d for d in DERIVATIVES}
+    selected = []
+    for spec in _args.sizes.split(','):
+        name, _, maxpixels = spec.strip().partition('=')
+        if name not in derivatives:
+            raise ValueError(f'Unknown size "{name}" in --sizes.')
+        derivative = derivatives[name]
+        if maxpixels:
+            derivative = derivative._replace(maxpixels=int(maxpixels))
+        selected.append(derivative)
+    return selected
+
+
+def main():
+    derivatives = get_derivatives()
+    params = params_key(derivatives, _args.quality)
+    manifestpath = os.path.join(_args.outdir, MANIFEST)
+    sources = load_manifest(manifestpath)
+    catalog = ImageCatalog(_args.indir, _args.catalog)
+    tasks, entries, nskipped = get_tasks(catalog, sources, derivatives,
+                                         params)
+    trace(1, '{} images to process, {} up to date.', len(tasks), nskipped)
+    if _args.dryrun:
+        for task in tasks:
+            trace(1, '{}', task.relpath)
+        return 0, 0, nskipped, 0
+    os.makedirs(_args.outdir, exist_ok=True)
+    if _args.jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # slow to import
+        executor = ProcessPoolExecutor(max_workers=_args.jobs)
+        results = executor.map(_make, tasks, chunksize=4)
+    else:
+        executor = None
+        results = map(_make, tasks)
+    nwritten = nunchanged = nerrors = 0
+    try:
+        for relpath, sha1, written, error in results:
+            if error:
+                trace(0, '{}: {}', relpath, error, color=Fore.RED)
+                nerrors += 1
+                sources.pop(relpath, None)
+                continue
+            sources[relpath] = entries[relpath] | {'sha1': sha1}
+            if written:
+                trace(2, 'Written: {}', relpath)
+                nwritten += 1
+            else:
+                trace(2, 'Unchanged: {}', relpath)
+                nunchanged += 1
+    finally:
+        # Keep the work done so far if the run is interrupted.
+        save_manifest(manifestpath, sources)
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return nwritten, nunchanged, nskipped, nerrors
+
+
+def getparser():
+    parser = argparse.ArgumentParser(description='''
+        Make the web, preview and Modes thumbnail images from the images in a
+        folder tree, decoding each image once. Only new or changed images are
+        processed.''')
+    parser.add_argument('indir', help='''
+        Folder containing images or subfolders containing images. The
+        filenames are accession numbers with optional subnumbers and page
+        numbers.''')
+    parser.add_argument('outdir', help=f'''
+        Output folder. It contains a subfolder for each size and the manifest
+        file "{MANIFEST}".''')
+    parser.add_argument('--catalog', help='''
+        A file to save the catalog of the input folder. If it exists, only
+        the subfolders that have changed since the last run are read.''')
+    parser.add_argument('--dryrun', action='store_true', help='''
+        List the images that would be processed but don't process them.''')
+    parser.add_argument('--force', action='store_true', help='''
+        Process every image even if its derivatives are up to date.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of processes making derivatives.''' +
+                        if_not_sphinx(''' The default is 1.''',
+                                      called_from_sphinx))
+    parser.add_argument('-q', '--quality', type=int, default=DEFAULT_QUALITY,
+                        help='''
+        The JPEG quality of the derivatives.''' +
+                        if_not_sphinx(f''' The default is {DEFAULT_QUALITY}.''',
+                                      called_from_sphinx))
+    sizes = ','.join(f'{d.name}={d.maxpixels}' for d in DERIVATIVES)
+    parser.add_argument('-s', '--sizes', default=sizes, help=sphinxify(f'''
+        A comma separated list of the derivatives to make from "web",
+        "preview" and "modes", each optionally followed by "=" and the
+        maximum height or width in pixels.''' + if_not_sphinx(f'''
+        The default is "{sizes}".''', called_from_sphinx),
+                                                             called_from_sphinx))
+    add_profile_arguments(parser)
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary information.
+        ''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    return args
+
+
+called_from_sphinx = True
+
+
+if __name__ == '__main__':
+    called_from_sphinx = False
+    assert sys.version_info >= (3, 11)
+    t1 = time.perf_counter()
+    if len(sys.argv) == 1:
+        sys.argv.append('-h')
+    _args = getargs(sys.argv)
+    if not os.path.isdir(_args.indir):
+        raise ValueError(f'{_args.indir} is not a directory.')
+    profiler = start_profile(_args, 'derivatives')
+    n_written, n_unchanged, n_skipped, n_errors = main()
+    profiler.stop(n_written)
+    trace(1, 'End derivatives. {} written, {} unchanged, {} up to date, '
+          '{} failed. Elapsed: {:5.2f} seconds.', n_written, n_unchanged,
+          n_skipped, n_errors, time.perf_counter() - t1)
@@ -0,0 +1,163 @@
+"""
+    A catalog of the image files in a folder tree, shared by the scripts that
+    need to find the images we already have.
+
+    The tree is read with os.scandir and the subfolders of the top folder can
+    be read in parallel. Each image filename is parsed by parse_prefix once
+    and the result is kept in the catalog. If a catalog file is given, the
+    catalog is saved and on the next run only the folders whose modification
+    time has changed are read again. Adding, removing or renaming a file
+    changes the modification time of the folder containing it. The time is
+    compared exactly so a filesystem with a coarse timestamp may miss a change
+    made within the same tick; delete the catalog file to force a full scan.
+    Keep the catalog file outside the image folder or saving it will change
+    the modification time of the top folder.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+from utl.normalize import normalize_id
+from web.webutil import parse_prefix
+
+CATALOG_VERSION = 1
+IMGFILES = ('.jpg', '.jpeg', '.png')
+
+
+def parse_filename(filename: str):
+    """
+    :param filename: the name of a file without the folder
+    :return: None if the file is not an image or the name cannot be parsed,
+             otherwise a list of the seven fields returned by parse_prefix
+             followed by modes_key1 and modes_key2 normalized. The normalized
+             modes_key2 is None if there is no subnumber.
+    """
+    prefix, suffix = os.path.splitext(filename)
+    if suffix.lower() not in IMGFILES:
+        return None
+    try:
+        parsed = list(parse_prefix(prefix))
+        modes_key1, modes_key2 = parsed[5], parsed[6]
+        parsed.append(normalize_id(modes_key1))
+        parsed.append(normalize_id(modes_key2) if modes_key2 else None)
+    except ValueError:
+        return None
+    return parsed
+
+
+class ImageCatalog:
+    """
+    The catalog is a dict with a key of the path of a folder relative to the
+    top folder ('' for the top folder itself) and a value of a dict:
+
+        mtime:   the folder's st_mtime_ns when it was read
+        subdirs: a sorted list of the names of the subfolders
+        files:   a dict of filename -> the result of parse_filename
+    """
+    def __init__(self, topdir: str, catalogfile: str = None, jobs: int = 1):
+        """
+        Read the catalog file if it exists, bring it up to date with the
+        folder tree, and save it.
+
+        :param topdir: the folder containing images and subfolders
+        :param catalogfile: a JSON file to persist the catalog or None
+        :param jobs: the number of threads reading subfolders of topdir
+        """
+        self.topdir = topdir
+        self.catalogfile = catalogfile
+        self.jobs = jobs
+        self.dirs = {}
+        self.nscanned = self.nreused = 0
+        if catalogfile and os.path.exists(catalogfile):
+            self.load()
+        self.refresh()
+        if catalogfile:
+            self.save()
+
+    def load(self):
+        with open(self.catalogfile) as catfile:
+            catalog = json.load(catfile)
+        if (catalog.get('version') == CATALOG_VERSION
+                and catalog.get('topdir') == os.path.abspath(self.topdir)):
+            self.dirs = catalog['dirs']
+
+    def save(self):
+        catalog = {'version': CATALOG_VERSION,
+                   'topdir': os.path.abspath(self.topdir),
+                   'dirs': self.dirs}
+        tmpname = self.catalogfile + '.tmp'
+        with open(tmpname, 'w') as catfile:
+            json.dump(catalog, catfile)
+        os.replace(tmpname, self.catalogfile)
+
+    def _scan_dir(self, relpath: str, olddirs: dict) -> dict:
+        path = os.path.join(self.topdir, relpath)
+        mtime = os.stat(path).st_mtime_ns
+        old = olddirs.get(relpath)
+        if old and old['mtime'] == mtime:
+            return old
+        oldfiles = old['files'] if old else {}
+        subdirs = []
+        files = {}
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.name in oldfiles:
+                    files[entry.name] = oldfiles[entry.name]
+                else:
+                    files[entry.name] = parse_filename(entry.name)
+        return {'mtime': mtime, 'subdirs': sorted(subdirs), 'files': files}
+
+    def _walk_tree(self, relpath: str, olddirs: dict) -> dict:
+        newdirs = {}
+        pending = [relpath]
+        while pending:
+            relpath = pending.pop()
+            newdirs[relpath] = d = self._scan_dir(relpath, olddirs)
+            pending.extend(os.path.join(relpath, s) for s in d['subdirs'])
+        return newdirs
+
+    def refresh(self):
+        """
+        Re-read the folders that have changed since the catalog was built and
+        drop the folders that no longer exist.
+        """
+        olddirs = self.dirs
+        top = self._scan_dir('', olddirs)
+        newdirs = {'': top}
+        if self.jobs > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for subtree in executor.map(
+                        lambda s: self._walk_tree(s, olddirs), top['subdirs']):
+                    newdirs.update(subtree)
+        else:
+            for subdir in top['subdirs']:
+                newdirs.update(self._walk_tree(subdir, olddirs))
+        self.nreused = sum(1 for relpath, d in newdirs.items()
+                           if olddirs.get(relpath) is d)
+        self.nscanned = len(newdirs) - self.nreused
+        self.dirs = newdirs
+
+    def walk(self, relpath: str = ''):
+        """
+        Yield the files in the same order as a recursive walk of the tree
+        using sorted(os.listdir(...)) where each subfolder is walked at its
+        place in the sorted list of names.
+
+        :return: tuples of (dirpath, filename, parsed) where dirpath is the
+                 topdir joined with the relative path of the folder and parsed
+                 is the result of parse_filename
+        """
+        d = self.dirs[relpath]
+        subdirs = set(d['subdirs'])
+        dirpath = os.path.join(self.topdir, relpath) if relpath else self.topdir
+        for name in sorted(d['subdirs'] + list(d['files'])):
+            if name in subdirs:
+                yield from self.walk(os.path.join(relpath, name))
+            else:
+                yield dirpath, name, d['files'][name]
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
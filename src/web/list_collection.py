@@ -21,12 +21,35 @@
     However, some of them are not complete or are otherwise not correct. The
     "<guid>" element seems to be the most reliable.
 
+    If a Modes XML file is given with --modesfile, the website is also
+    reconciled with the Modes export and, with --imgdir, with the images we
+    have. Each source is sorted by normalized accession number and the sources
+    are merged in one pass. The report is a CSV file with a row for each
+    accession number that needs attention:
+
+        missing        in Modes but not a collection item on the website
+        extra          a collection item on the website but not in Modes
+        missing media  in Modes with an image but no image on the website
+        extra media    an image on the website but not in Modes
+        stale          an image we have is newer than the one on the website
+
+    The times are UTC, from the WordPress export and from the modification
+    time of the image files.
 """
+import argparse
+import csv
+import heapq
+from itertools import groupby
+from operator import itemgetter
 import os
 import re
 import sys
+import time
 
+from utl.list_objects import list_objects
 from utl.normalize import normalize_id, denormalize_id
+from web.imgcatalog import ImageCatalog
+from web.wxr import iter_items
 
 DOWNLOAD_DIR = '/Users/mlg/Cloud/hrm_downloads/collection'
 COLLECTION_SUBDIR = 'collection_items'
@@ -34,112 +57,294 @@ MEDIA_SUBDIR = 'media_items'
 RESULTS_DIR = '/Users/mlg/pyprj/hrm/results/collection'
 DOWNLOADPREFIX = 'heathrobinsonmuseum.WordPress.'
 RESULTSPREFIX = 'wordpress.'
-FILENAMEPAT = r'heathrobinsonmuseum\.WordPress\.(\d{4}-\d\d-\d\d).xml'
+FILENAMEPAT = re.compile(r'heathrobinsonmuseum\.WordPress\.(\d{4}-\d\d-\d\d).xml')
+MEDIAPAT = re.compile(r'collection_([^-]*)(-.*)?\.((jpeg)|(jpg))')
+SUBNUMPAT = re.compile(r'-(\d+)(A|B)?')
+SERIAL_KEY = 'serial_no'
+ATTACHED_FILE_KEY = '_wp_attached_file'
+TIMEFORMAT = '%Y-%m-%d %H:%M:%S'
+REPORT_HEADING = ['Serial', 'Status', 'Website Modified', 'Media File',
+                  'Media Modified', 'Image File', 'Image Modified']
+# The sources merged by reconcile(), in the order of their flag bits.
+MODES, COLLECTION, MEDIA, IMAGES = 1, 2, 4, 8
+
+
+def trace(level, template, *args):
+    if _args.verbose >= level:
+        print(template.format(*args))
 
 
 def get_files(subdir):
-    downloaddir = os.path.join(DOWNLOAD_DIR, subdir)
-    resultsdir = os.path.join(RESULTS_DIR, subdir)
+    downloaddir = os.path.join(_args.downloaddir, subdir)
+    resultsdir = os.path.join(_args.resultsdir, subdir)
     newest_downloaded = ''
     for filename in os.listdir(downloaddir):
-        if m := re.match(FILENAMEPAT, filename):
+        if m := FILENAMEPAT.match(filename):
             candidate_date = m.group(1)
             if candidate_date > newest_downloaded:
                 newest_downloaded = candidate_date
     if newest_downloaded:
         download_path = os.path.join(downloaddir, DOWNLOADPREFIX
                                      + newest_downloaded + '.xml')
-        infile = open(download_path)
-        print(f'{infile.name=}')
+        infile = open(download_path, 'rb')
+        trace(1, 'infile.name={!r}', infile.name)
         results_path = os.path.join(resultsdir, RESULTSPREFIX
                                     + newest_downloaded + '.csv')
         outfile = open(results_path, 'w')
-        print(f'{outfile.name=}')
+        trace(1, 'outfile.name={!r}', outfile.name)
         return infile, outfile
     else:
         print('No match for filename pattern')
         sys.exit()
 
 
-def collection_subdir(subdir):
+def media_accn(filename: str) -> tuple[str, str] | None:
+    """
+    :param filename: the value of _wp_attached_file, like
+                     "collection_JB001-002A.jpg"
+    :return: a tuple of the accession number including the subnumber if there
+             is one and the accession number without it, or None if the file
+             isn't an image of a collection item
+    """
+    if 'collection_' not in filename:
+        return None
+    m = MEDIAPAT.match(filename)
+    if not m:
+        print(f'Match failed on {filename}')
+        return None
+    accn = parent = m[1]
+    subnum = m[2]
+    # suffix = m[3]
+    if subnum and len(subnum) > 1:  # if '-' followed by number and possibly A|B
+        m = SUBNUMPAT.match(subnum)
+        if m:
+            subnum = m[1]
+            accn += '.' + subnum
+        else:
+            print('nomatch', subnum, 'filename:', filename)
+    return accn, parent
+
+
+def collection_subdir(subdir) -> dict:
+    """
+    :return: a dict mapping the normalized accession number of each
+             collection item to its time modified
+    """
     infile, outfile = get_files(subdir)
-    accns = set()
-    nline = 0
-    for line in infile:
-        if '[CDATA[serial_no]]' in line:
-            sline = next(infile)
-            m = re.search(r'CDATA\[(.*)\]\]', sline)
-            if not m:
-                print(sline, 'fails pattern match')
-                continue
-            try:
-                naccn = normalize_id(m.group(1))
-            except (ValueError, AssertionError) as err:
-                print(f'Line {nline}:', str(err))
-                continue
-            if naccn in accns:
-                print(f'Duplicate: {m.group(1)}')
-            accns.add(naccn)
+    accns = {}
+    for item in iter_items(infile):
+        serial = item.meta.get(SERIAL_KEY)
+        if serial is None:
+            continue
+        try:
+            naccn = normalize_id(serial)
+        except (ValueError, AssertionError) as err:
+            print(f'Post {item.post_id}:', str(err))
+            continue
+        if naccn in accns:
+            print(f'Duplicate: {serial}')
+            accns[naccn] = max(accns[naccn], item.modified)
+        else:
+            accns[naccn] = item.modified
     for naccn in sorted(accns):
         print(denormalize_id(naccn), file=outfile)
-    print(f'{len(accns)} accession numbers in {subdir}')
+    trace(1, '{} accession numbers in {}', len(accns), subdir)
     infile.close()
     outfile.close()
+    return accns
 
 
-def media_subdir(subdir):
+def media_subdir(subdir) -> dict:
+    """
+    :return: a dict mapping the normalized accession number of each image
+             to a tuple of the first filename found, its time modified and
+             the normalized accession number without the subnumber
+    """
     infile, outfile = get_files(subdir)
     accns = {}
-    nline = 0
-    for line in infile:
-        nline += 1
-        if '[CDATA[_wp_attached_file]]' in line:
-            sline = next(infile)
-            m = re.search(r'CDATA\[(.*)\]\]', sline)
-            if m:
-                filename = m[1]
-            else:
-                print(sline, 'fails pattern match')
-                continue
-            if 'collection_' not in filename:
-                continue
-            m = re.match(r'collection_([^-]*)(-.*)?\.((jpeg)|(jpg))', filename)
-            if not m:
-                print(f'Match failed on {filename}')
-                continue
-            accn = m[1]
-            subnum = m[2]
-            # suffix = m[3]
-            if subnum and len(subnum) > 1:  # if '-' followed by number and possibly A|B
-                m = re.match(r'-(\d+)(A|B)?', subnum)
-                if m:
-                    subnum = m[1]
-                    accn += '.' + subnum
-                else:
-                    print('nomatch', subnum, 'filename:', filename)
-            try:
-                naccn = normalize_id(accn)
-            except (ValueError, AssertionError) as err:
-                print(f'Line {nline}:', str(err))
-                continue
-            if naccn not in accns:
-                accns[naccn] = filename
+    for item in iter_items(infile):
+        filename = item.meta.get(ATTACHED_FILE_KEY)
+        if filename is None:
+            continue
+        accns_tuple = media_accn(filename)
+        if accns_tuple is None:
+            continue
+        try:
+            naccn = normalize_id(accns_tuple[0])
+            nparent = normalize_id(accns_tuple[1])
+        except (ValueError, AssertionError) as err:
+            print(f'Post {item.post_id}:', str(err))
+            continue
+        if naccn not in accns:
+            accns[naccn] = (filename, item.modified, nparent)
     for accnkey in sorted(accns):
-        print(f'{denormalize_id(accnkey)},{accns[accnkey]}', file=outfile)
-    print(f'{len(accns)} files in {subdir}')
+        print(f'{denormalize_id(accnkey)},{accns[accnkey][0]}', file=outfile)
+    trace(1, '{} files in {}', len(accns), subdir)
     infile.close()
     outfile.close()
+    return accns
+
+
+def modes_key(naccn: str, nparent: str, modeskeys: set) -> str:
+    """
+    :param naccn: the normalized accession number of an image, including the
+                  subnumber if there is one
+    :param nparent: naccn without the subnumber
+    :param modeskeys: the normalized accession numbers in the Modes export
+    :return: the accession number to reconcile the image by. This is naccn
+             unless only the object without the subnumber is in Modes.
+    """
+    if naccn in modeskeys or nparent not in modeskeys:
+        return naccn
+    return nparent
+
+
+def media_by_modes_key(media: dict, modeskeys: set) -> dict:
+    """
+    :param media: the dict returned by media_subdir
+    :return: a dict mapping the key returned by modes_key to a tuple of the
+             filename and time modified of the first image in sorted order
+    """
+    bykey = {}
+    for naccn in sorted(media):
+        filename, modified, nparent = media[naccn]
+        bykey.setdefault(modes_key(naccn, nparent, modeskeys),
+                         (filename, modified))
+    return bykey
+
+
+def local_images(imgdir: str, modeskeys: set) -> dict:
+    """
+    :return: a dict mapping the key returned by modes_key to a list of the
+             paths of the images
+    """
+    catalog = ImageCatalog(imgdir, _args.catalog, _args.jobs)
+    trace(2, '{} folders read, {} unchanged.', catalog.nscanned,
+          catalog.nreused)
+    images = {}
+    for dirpath, filename, parsed in catalog.walk():
+        if parsed is None:
+            continue
+        # parsed[8] and parsed[7] are the normalized modes_key2 and modes_key1
+        naccn = modes_key(parsed[8] or parsed[7], parsed[7], modeskeys)
+        images.setdefault(naccn, []).append(os.path.join(dirpath, filename))
+    return images
+
+
+def _keys(source: int, naccns):
+    for naccn in naccns:
+        yield naccn, source
+
+
+def utctime(path: str) -> str:
+    return time.strftime(TIMEFORMAT, time.gmtime(os.stat(path).st_mtime))
+
+
+def reconcile(modes, collection: dict, media: dict, images: dict):
+    """
+    Merge the sorted sources and compare them for each accession number.
+
+    :param modes: the sorted normalized accession numbers in the Modes export
+    :param collection: the dict returned by collection_subdir
+    :param media: the dict returned by media_by_modes_key
+    :param images: the dict returned by local_images
+    :return: an iterator over the rows of the report
+    """
+    merged = heapq.merge(_keys(MODES, modes),
+                         _keys(COLLECTION, sorted(collection)),
+                         _keys(MEDIA, sorted(media)),
+                         _keys(IMAGES, sorted(images)), key=itemgetter(0))
+    for naccn, group in groupby(merged, key=itemgetter(0)):
+        present = 0
+        for _, source in group:
+            present |= source
+        statuses = []
+        if present & MODES:
+            if not present & COLLECTION:
+                statuses.append('missing')
+            if present & IMAGES and not present & MEDIA:
+                statuses.append('missing media')
+        else:
+            if present & COLLECTION:
+                statuses.append('extra')
+            if present & MEDIA:
+                statuses.append('extra media')
+        mediafile, mediatime = media.get(naccn, ('', ''))
+        imagefile = imagetime = ''
+        # Only stat the images that are reported or compared.
+        if present & IMAGES and (statuses or present & MEDIA):
+            # The newest of the object's images.
+            imagetime, imagefile = max((utctime(path), path)
+                                       for path in images[naccn])
+            if present & MEDIA and mediatime and imagetime > mediatime:
+                statuses.append('stale')
+        for status in statuses:
+            yield [denormalize_id(naccn), status, collection.get(naccn, ''),
+                   mediafile, mediatime, imagefile, imagetime]
 
 
 def main():
-    collection_subdir(COLLECTION_SUBDIR)
-    media_subdir(MEDIA_SUBDIR)
+    collection = collection_subdir(COLLECTION_SUBDIR)
+    media = media_subdir(MEDIA_SUBDIR)
+    if not _args.modesfile:
+        return
+    modes = [obj.normalized for obj in list_objects(_args.modesfile)]
+    modeskeys = set(modes)
+    media = media_by_modes_key(media, modeskeys)
+    images = local_images(_args.imgdir, modeskeys) if _args.imgdir else {}
+    outfile = open(_args.outfile, 'w', newline='') if _args.outfile \
+        else sys.stdout
+    writer = csv.writer(outfile)
+    writer.writerow(REPORT_HEADING)
+    counts = {}
+    for row in reconcile(modes, collection, media, images):
+        writer.writerow(row)
+        counts[row[1]] = counts.get(row[1], 0) + 1
+    if outfile is not sys.stdout:
+        outfile.close()
+    for status, count in sorted(counts.items()):
+        trace(1, '{}: {}', status, count)
+
+
+def getparser():
+    parser = argparse.ArgumentParser(description='''
+    List the accession numbers of the collection items and images on the
+    website from the newest WordPress exports. Optionally, report the
+    differences between the website, the Modes export and the images we
+    have.''')
+    parser.add_argument('--catalog', help='''
+        A file to save the catalog of the image folder. If it exists, only
+        the subfolders that have changed since the last run are read.''')
+    parser.add_argument('--downloaddir', default=DOWNLOAD_DIR, help=f'''
+        The folder containing the {COLLECTION_SUBDIR} and {MEDIA_SUBDIR}
+        folders of WordPress exports. The default is "{DOWNLOAD_DIR}".''')
+    parser.add_argument('-i', '--imgdir', help='''
+        Folder containing images or subfolders containing images we already
+        have. If omitted, the images are not reconciled.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of subfolders of the image folder to read in parallel.
+        The default is 1.''')
+    parser.add_argument('-m', '--modesfile', help='''
+        The Modes XML file of the objects that should be on the website. If
+        omitted, only the lists of accession numbers are written.''')
+    parser.add_argument('-o', '--outfile', help='''
+        The CSV file for the reconciliation report. Default is sys.stdout''')
+    parser.add_argument('--resultsdir', default=RESULTS_DIR, help=f'''
+        The folder containing the {COLLECTION_SUBDIR} and {MEDIA_SUBDIR}
+        folders for the lists. The default is "{RESULTS_DIR}".''')
+    parser.add_argument('-v', '--verbose', type=int, default=1, help='''
+        Set the verbosity. The default is 1 which prints summary information.
+        ''')
+    return parser
+
+
+def getargs(argv):
+    parser = getparser()
+    args = parser.parse_args(args=argv[1:])
+    return args
 
 
 if __name__ == '__main__':
     assert sys.version_info >= (3, 11)
-    if len(sys.argv) > 1:
-        print('No parameters allowed. All values are hard-coded.')
-        print('No action taken.')
-        sys.exit(-1)
+    _args = getargs(sys.argv)
     main()
@@ -13,6 +13,7 @@ import sys
 
 from utl.excel_cols import col2num
 from utl.normalize import normalize_id
+from web.imgcatalog import ImageCatalog
 
 
 def trace(level, template, *args):
@@ -34,6 +35,9 @@ def getparser():
     Include filenames even if they are not valid accession numbers. This is
     useful in the case of multiple partial scans of a single picture. They
     would appear as, for example, ''')
+    parser.add_argument('--catalog', help='''
+        A file to save the catalog of the image folder. If it exists, only
+        the subfolders that have changed since the last run are read.''')
     parser.add_argument('--col_exclude', type=str, default='0', help='''
     The zero-based column containing the accession number of the
     object to be excluded. The default is column zero. The column can be a
@@ -44,6 +48,9 @@ def getparser():
     output list.''')
     parser.add_argument('-f', '--list_files', action='store_true', help='''
     Output the filename in addition to the accession number.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of subfolders of the image folder to read in parallel.
+        The default is 1.''')
     parser.add_argument('-o', '--outfile', help='''
         Output file for the list of files. Default is sys.stdout. The warning
         messages are always written to sys.stdout.''')
@@ -66,7 +73,7 @@ def handle_folder(img_ids: dict, imgdir: str):
     images.
     :return: The set of normalized numbers.
     """
-    def onefile(imgf: str):
+    def onefile(imgf: str, dirpath: str):
         global nexcluded
         m = re.match(r'(collection_)?(.*)', imgf)
         imgf2 = m.group(2)  # remove optional leading 'collection_'
@@ -92,15 +99,14 @@ def handle_folder(img_ids: dict, imgdir: str):
         else:
             img_ids[nid] = (imgf2, dirpath)
 
-    for subfile in sorted(os.listdir(imgdir)):
-        dirpath = os.path.join(imgdir, subfile)
-        if os.path.isdir(dirpath):
-            if _args.list_files:
-                trace(0, 'Folder {}', dirpath)
-            handle_folder(img_ids, dirpath)
-        else:
-            onefile(subfile)
-            continue
+    catalog = ImageCatalog(imgdir, _args.catalog, _args.jobs)
+    folder = None
+    for folder_path, subfile, _ in catalog.walk():
+        if folder_path != folder:
+            folder = folder_path
+            if _args.list_files and folder != imgdir:
+                trace(0, 'Folder {}', folder)
+        onefile(subfile, os.path.join(folder_path, subfile))
     return img_ids
 
 
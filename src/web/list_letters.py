@@ -16,7 +16,7 @@ import sys
 from collections import defaultdict
 import re
 
-from colorama import Style, Fore
+from utl.colors import Style, Fore
 
 
 def trace(level, template, *args, color=None):
@@ -12,6 +12,7 @@ from utl.excel_cols import col2num
 from utl.list_objects import list_objects
 from utl.normalize import normalize_id, denormalize_id
 from utl.readers import row_dict_reader, row_list_reader
+from web.imgcatalog import ImageCatalog
 
 
 def trace(level, template, *args):
@@ -26,6 +27,9 @@ def getparser():
     parser.add_argument('imgdir', help='''
         Folder containing images or subfolders containing images we already
         have. Only one level of subfolder is examined.''')
+    parser.add_argument('--catalog', help='''
+        A file to save the catalog of the image folder. If it exists, only
+        the subfolders that have changed since the last run are read.''')
     parser.add_argument('-c', '--candidatefile',  help='''
         CSV file containing the list of new objects or a directory containing
         jpg files with names consisting of the accession numbers. If omitted
@@ -37,6 +41,9 @@ def getparser():
         can be a number or a spreadsheet-style letter.''')
     parser.add_argument('-i', '--invert', action='store_true', help='''
         Report if the image **IS** in the folder.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of subfolders of the image folder to read in parallel.
+        The default is 1.''')
     parser.add_argument('-m', '--modesfile', required=True, help='''
         File to search for valid accession numbers.''')
     parser.add_argument('-r', '--reportfile', help='''
@@ -70,7 +77,7 @@ def build_img_dict(img_ids: dict, imgdir: str):
     :return: A dict with key of the normalized id and value a tuple of the file
              name without possible leading "collection_" and the path.
     """
-    def onefile(imgf: str):
+    def onefile(imgf: str, dirpath: str):
         imgf2 = imgf.removeprefix('collection_')
         prefix, suffix = os.path.splitext(imgf2)
         if suffix.lower() not in ('.jpg', '.jpeg', '.png'):
@@ -93,14 +100,15 @@ def build_img_dict(img_ids: dict, imgdir: str):
         else:
             img_ids[nid] = (imgf2, dirpath)
 
-    for subfile in sorted(os.listdir(imgdir)):
-        dirpath = os.path.join(imgdir, subfile)
-        if os.path.isdir(dirpath):
-            trace(2, 'Folder {}', dirpath)
-            build_img_dict(img_ids, dirpath)
-        else:
-            onefile(subfile)
-            continue
+    catalog = ImageCatalog(imgdir, _args.catalog, _args.jobs)
+    trace(2, '{} folders read, {} unchanged.', catalog.nscanned,
+          catalog.nreused)
+    folder = None
+    for folder_path, subfile, _ in catalog.walk():
+        if folder_path != folder:
+            folder = folder_path
+            trace(2, 'Folder {}', folder)
+        onefile(subfile, os.path.join(folder_path, subfile))
     return
 
 
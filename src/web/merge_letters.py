@@ -8,21 +8,35 @@
     is documented in the file *Scanning Notes rev.4.docx* in the ../letters
     directory.
 
-    For each letter, merge its pages, each of which is in its own PDF image, into a single PDF file.
-    The PDF files, one per page, were created by ../src/web/img2pdf.py.
+    For each letter, merge its pages into a single PDF file. A page is either
+    a JPEG scan or a PDF file made from one. JPEG pages are embedded in the
+    PDF without being decoded so the separate step of converting each scan
+    to a PDF file is not needed. If a page has both a JPEG and a PDF file,
+    the JPEG file is used.
 
+    A letter is only assembled again if its output file is older than one of
+    its pages or than one of the folders containing them, so a page that was
+    added, edited or removed causes the letter to be rebuilt. Use --force to
+    rebuild every letter. With --jobs, letters are assembled in parallel.
+
+    JPEG pages need the img2pdf package. Merging PDF pages needs the pypdf
+    package, or PyPDF2 if pypdf isn't installed.
 """
 import argparse
 import os
 import sys
 from collections import defaultdict
 import re
-from PyPDF2 import PdfFileMerger
-from colorama import Style, Fore
+import time
 
+from utl.colors import Style, Fore
 from utl.normalize import normalize_id, sphinxify, if_not_sphinx
 from utl.readers import row_dict_reader
 
+# accession number prefix, letter number, anything, suffix
+PAGEPAT = re.compile(r'(\w+)-(\d{3}).*\.(pdf|jpe?g)', re.IGNORECASE)
+JPEGSUFFIXES = ('.jpg', '.jpeg')
+
 
 def trace(level, template, *args, color=None):
     if _args.verbose >= level:
@@ -32,46 +46,50 @@ def trace(level, template, *args, color=None):
             print(template.format(*args))
 
 
-def _onedir(ld, fd, subdirname: str, subdirpath: str):
-    fnpat = r'(\w+)-(\d{3}).*\.pdf'
-    for fn in os.listdir(subdirpath):
-        trace(2, '    filename {}', fn)
-        m = re.match(fnpat, fn)
-        if m:
+def _onedir(ld, subdirname: str, subdirpath: str):
+    with os.scandir(subdirpath) as entries:
+        for entry in entries:
+            fn = entry.name
+            trace(2, '    filename {}', fn)
+            m = PAGEPAT.fullmatch(fn)
+            if not m or not entry.is_file():
+                trace(1, 'Ignored: {}/{}', subdirname, fn)
+                continue
             an = m.group(1)  # accession #
             seq = m.group(2)
-            if fn in ld[(an, seq)]:
-                trace(1, 'Duplicate filename {}', fn,
-                      color=Fore.RED)
-            ld[(an, seq)].add(fn)
-            fd[(an, seq)] = subdirpath
-        # elif fn != '.DS_Store':
-        else:
-            trace(1, 'Ignored: {}/{}', subdirname, fn)
+            pages = ld[(an, seq)]
+            if fn in pages:
+                trace(1, 'Duplicate filename {}', fn, color=Fore.RED)
+            pages[fn] = entry.path
 
 
 def get_letters_dict(indirname):
     """
     Called by main() below or callable from an external program.
     :param indirname: root folder containing subfolders
-    :return: tuple containing:
-                (1) dictionary mapping item number to its set of JPEG files
-                    containing scans of the document's pages
-                (2) dictionary mapping item number to its folder path. Needed
-                    because not all images for an accession number are in the
-                    same folder.
+    :return: dictionary mapping the tuple (accession number prefix, letter
+             number) to a dict of the filenames of the letter's pages to their
+             paths. The pages of a letter need not all be in the same folder.
+             If a page has both a JPEG and a PDF file, only the JPEG file is
+             included.
     """
-    ld = defaultdict(set)
-    fd = {}  # map accession number to its folder path
-    for subdirname in os.listdir(indirname):
-        trace(2, 'Subdirname: {}', subdirname)
-        subdirpath = os.path.join(indirname, subdirname)
-        if os.path.isdir(subdirpath):
-            _onedir(ld, fd, subdirname, subdirpath)
-        elif subdirname != '.DS_Store':
-            trace(1, 'Ignored: {}', subdirname,
-                  color=Fore.YELLOW)
-    return ld, fd
+    ld = defaultdict(dict)
+    with os.scandir(indirname) as entries:
+        for entry in entries:
+            trace(2, 'Subdirname: {}', entry.name)
+            if entry.is_dir():
+                _onedir(ld, entry.name, entry.path)
+            elif entry.name != '.DS_Store':
+                trace(1, 'Ignored: {}', entry.name, color=Fore.YELLOW)
+    for pages in ld.values():
+        stems = {os.path.splitext(fn)[0] for fn in pages
+                 if fn.lower().endswith(JPEGSUFFIXES)}
+        for fn in list(pages):
+            stem, suffix = os.path.splitext(fn)
+            if suffix.lower() == '.pdf' and stem in stems:
+                trace(2, 'Using the JPEG file instead of {}', fn)
+                del pages[fn]
+    return ld
 
 
 def sortkey(s):
@@ -91,21 +109,129 @@ def sortkey(s):
     return f'{parts[0]}-{parts[1]}-{p3i}{suffix}'
 
 
-def main():
-    ld, fd = get_letters_dict(_args.indir)
+def is_up_to_date(outputpath, pagepaths) -> bool:
+    """
+    :return: True if the output file exists and is newer than all of the
+             pages and the folders containing them
+    """
+    try:
+        outmtime = os.stat(outputpath).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    folders = {os.path.dirname(path) for path in pagepaths}
+    return all(os.stat(path).st_mtime_ns <= outmtime
+               for path in list(pagepaths) + list(folders))
+
+
+def _pdf_writer():
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        from PyPDF2 import PdfReader, PdfWriter
+    return PdfReader, PdfWriter
+
+
+def assemble_letter(outputpath, pagepaths) -> int:
+    """
+    Write the pages to a new PDF file. The file is written under a temporary
+    name and renamed when complete so an interrupted run doesn't leave a
+    truncated letter that looks up to date.
+
+    Called in a worker process when --jobs is greater than one.
+
+    :param outputpath: the PDF file to create
+    :param pagepaths: the paths of the JPEG or PDF pages in order
+    :return: the number of pages written
+    """
+    tmppath = f'{outputpath}.{os.getpid()}.tmp'
+    try:
+        _write_pdf(tmppath, pagepaths)
+        os.replace(tmppath, outputpath)
+    finally:
+        # Don't leave the partial file behind if img2pdf or pypdf failed.
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+    return len(pagepaths)
+
+
+def _write_pdf(pdfpath, pagepaths):
+    jpegs = [path.lower().endswith(JPEGSUFFIXES) for path in pagepaths]
+    if all(jpegs):
+        # The common case of a letter that is all scans needs only img2pdf.
+        import img2pdf
+        with open(pdfpath, 'wb') as pdffile:
+            img2pdf.convert(pagepaths, outputstream=pdffile)
+        return
+    import io
+    PdfReader, PdfWriter = _pdf_writer()
+    writer = PdfWriter()
+    for path, jpeg in zip(pagepaths, jpegs):
+        if jpeg:
+            import img2pdf
+            reader = PdfReader(io.BytesIO(img2pdf.convert(path)))
+        else:
+            reader = PdfReader(path)
+        for page in reader.pages:
+            writer.add_page(page)
+    with open(pdfpath, 'wb') as pdffile:
+        writer.write(pdffile)
+
+
+def _assemble(task):
+    # Catch the exception in the worker so one bad scan doesn't stop the run.
+    anum, outputpath, pagepaths = task
+    try:
+        return anum, assemble_letter(outputpath, pagepaths), None
+    except Exception as e:  # noqa: the message is reported to the user
+        return anum, 0, f'{type(e).__name__}: {e}'
+
+
+def get_tasks(ld):
+    """
+    :return: a list of (accession number, output path, page paths) of the
+             letters to assemble and the number skipped as up to date
+    """
+    tasks = []
+    nskipped = 0
     for anum_tuple, pages in sorted(ld.items()):
-        trace(2, 'tuple = {}, pages = {}', anum_tuple, pages)
+        trace(2, 'tuple = {}, pages = {}', anum_tuple, sorted(pages))
         anum = f'{anum_tuple[0]}.{int(anum_tuple[1])}'
         nanum = normalize_id(anum)
         if filterset and nanum not in filterset:
             continue
-        pages = sorted(pages, key=sortkey)
-        output = PdfFileMerger()
-        subdirpath = fd[anum_tuple]
-        for page in pages:
-            output.append(str(os.path.join(subdirpath, page)))
+        pagepaths = [pages[fn] for fn in sorted(pages, key=sortkey)]
         outputpath = os.path.join(_args.outdir, anum + '.pdf')
-        output.write(outputpath)
+        if not _args.force and is_up_to_date(outputpath, pagepaths):
+            trace(2, 'Up to date: {}', anum)
+            nskipped += 1
+            continue
+        tasks.append((anum, outputpath, pagepaths))
+    return tasks, nskipped
+
+
+def main():
+    ld = get_letters_dict(_args.indir)
+    os.makedirs(_args.outdir, exist_ok=True)
+    tasks, nskipped = get_tasks(ld)
+    trace(1, '{} letters to assemble, {} up to date.', len(tasks), nskipped)
+    if _args.jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # slow to import
+        executor = ProcessPoolExecutor(max_workers=_args.jobs)
+        results = executor.map(_assemble, tasks, chunksize=4)
+    else:
+        executor = None
+        results = map(_assemble, tasks)
+    nwritten = nerrors = 0
+    for anum, npages, error in results:
+        if error:
+            trace(0, '{}: {}', anum, error, color=Fore.RED)
+            nerrors += 1
+        else:
+            trace(2, '{}: {} pages', anum, npages)
+            nwritten += 1
+    if executor:
+        executor.shutdown()
+    return nwritten, nskipped, nerrors
 
 
 def get_filterset():
@@ -128,10 +254,11 @@ def get_filterset():
 
 def getparser():
     parser = argparse.ArgumentParser(description='''
-
+    Merge the JPEG or PDF pages of each letter into one PDF file per letter.
+    Letters whose PDF file is newer than all of their pages are skipped.
     ''')
     parser.add_argument('indir', help='''
-        Folder containing subfolders containing PDF files.''')
+        Folder containing subfolders containing JPEG or PDF files.''')
     parser.add_argument('outdir', help='''
         Output folder containing merged PDF files''')
     defval = if_not_sphinx(''' The default is "Type".''',
@@ -147,6 +274,12 @@ def getparser():
     parser.add_argument('--filter_text', default='letter', help='''
         The text of the contents of the filter column indicating that this object is
         included. The comparison is case insensitive.''' + defval)
+    parser.add_argument('--force', action='store_true', help='''
+        Assemble every letter even if its PDF file is up to date.''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of processes assembling letters.''' +
+                        if_not_sphinx(''' The default is 1.''',
+                                      called_from_sphinx))
     parser.add_argument('--skiprows', type=int, default=0, help=sphinxify('''
         Skip rows at the beginning of the CSV file specified by --filter.
         ''', called_from_sphinx))
@@ -168,6 +301,7 @@ called_from_sphinx = True
 if __name__ == '__main__':
     called_from_sphinx = False
     assert sys.version_info >= (3, 11)
+    t1 = time.perf_counter()
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
@@ -175,5 +309,8 @@ if __name__ == '__main__':
         raise ValueError(f'{_args.indir} is not a directory.')
     if _args.verbose < 2:
         sys.tracebacklimit = 0
-    filterset = get_filterset() if _args.filter else None
-    main()
+    filterset = get_filterset() if _args.filter_file else None
+    n_written, n_skipped, n_errors = main()
+    trace(1, 'End merge_letters. {} written, {} up to date, {} failed. '
+          'Elapsed: {:5.2f} seconds.', n_written, n_skipped, n_errors,
+          time.perf_counter() - t1)
@@ -2,7 +2,7 @@
     For each file in a directory, remove the prefix "collection_".
 """
 import argparse
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 import os.path
 import sys
 import time
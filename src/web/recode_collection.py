@@ -14,16 +14,16 @@
 import argparse
 import codecs
 import csv
-import os
+from functools import lru_cache
 import re
 import sys
-from inspect import getframeinfo, stack
 
-from colorama import Fore, Style
+from utl.colors import Fore
 
 from utl.normalize import britishdatefrommodes, normalize_id, denormalize_id
 from utl.normalize import isoformatfrommodesdate
 from utl.normalize import sphinxify
+from utl.trace import RunStats, add_stats_argument, trace_sub
 
 DEFAULT_EXHIBITION_PLACE = 'HRM'
 PROD_SUMMARYTEXT = 'Production_SummaryText'
@@ -39,28 +39,21 @@ GALLERY_LIST = [f'Gallery{n:02}' for n in range(1, NUM_GALLERY_ITEMS + 1)]
 FIELDS = 'Serial Title Medium Exhibition HumanDate IsoDate Decade'
 FIELDS += ' Description Dimensions Order'
 FIELDS += ' ' + ' '.join(GALLERY_LIST)
+# The year is the last four characters of a Modes date.
+YEARPAT = re.compile(r'(\d{4})$')
+# The field is like "300 x 500" as height x width in mm.
+DIMENSIONSPAT = re.compile(r'(\d+)\D+(\d+)')
 
 
 def trace(level, template, *args, color=None):
-    if _args.verbose >= level:
-        if _args.verbose > 1:
-            caller = getframeinfo(stack()[1][0])
-            print(f'{os.path.basename(caller.filename)} line {caller.lineno}: ', end='')
-        if color:
-            if len(args) == 0:
-                print(f'{color}{template}{Style.RESET_ALL}')
-            else:
-                print(f'{color}{template.format(*args)}{Style.RESET_ALL}')
-        else:
-            if len(args) == 0:
-                print(template)
-            else:
-                print(template.format(*args))
+    trace_sub(level, _args.verbose, template, color, args)
 
 
+@lru_cache(maxsize=None)
 def decade(datebegin, dateend):
-    matbegin = re.match(r'.*(\d{4})$', datebegin)
-    matend = re.match(r'.*(\d{4})$', dateend)
+    # Many objects share the same dates so the result is cached.
+    matbegin = YEARPAT.search(datebegin)
+    matend = YEARPAT.search(dateend)
     dec = ''
     if matbegin:
         year = int(matbegin.group(1))
@@ -73,10 +66,20 @@ def decade(datebegin, dateend):
         else:
             decend = decbegin
         dec = '|'.join([str(d) + 's' for d in range(decbegin, decend + 10, 10)])
-    trace(3, f'{datebegin=} {dateend=} {dec=}')
     return dec
 
 
+@lru_cache(maxsize=None)
+def isodate(datebegin):
+    try:
+        return isoformatfrommodesdate(datebegin)
+    except ValueError:
+        return ''
+
+
+humandate = lru_cache(maxsize=None)(britishdatefrommodes)
+
+
 def clean(s):
     if NEEDS_CLEANING:
         s = s.replace(REPLACE_FROM, REPLACE_TO)
@@ -84,15 +87,21 @@ def clean(s):
 
 
 def read_img_csv_file() -> dict[list]:
+    """
+    Read the files given by --imgcsvfile. If several files are given, the
+    lists for all of the batches are loaded once and an accession number in a
+    later file replaces the list from an earlier file.
+    """
     img_dict = {}
     if not _args.imgcsvfile:
         trace(1, 'Warning: no images loaded.', color=Fore.YELLOW)
         return img_dict
-    with codecs.open(_args.imgcsvfile, encoding='utf-8-sig') as imgcsvfile:
-        reader = csv.reader(imgcsvfile)
-        for row in reader:
-            n_serial = normalize_id(row[0])
-            img_dict[n_serial] = row[1].split('|')
+    for filename in _args.imgcsvfile:
+        with codecs.open(filename, encoding='utf-8-sig') as imgcsvfile:
+            reader = csv.reader(imgcsvfile)
+            for row in reader:
+                n_serial = normalize_id(row[0])
+                img_dict[n_serial] = row[1].split('|')
     return img_dict
 
 
@@ -161,19 +170,17 @@ def onerow(oldrow):
     if not datebegin:
         # Maybe it's a book, get the publication date
         datebegin = oldrow['Date']
-    newrow['HumanDate'] = britishdatefrommodes(datebegin)
+    newrow['HumanDate'] = humandate(datebegin)
     if use_published_date:
         newrow['HumanDate'] += ' (Date Published)'
     if accuracy == 'circa':
         newrow['HumanDate'] = 'c. ' + newrow['HumanDate']
         if dateend:
-            newrow['HumanDate'] += ' - ' + britishdatefrommodes(dateend)
-    try:
-        newrow['IsoDate'] = isoformatfrommodesdate(datebegin)
-    except ValueError:
-        newrow['IsoDate'] = ''
+            newrow['HumanDate'] += ' - ' + humandate(dateend)
+    newrow['IsoDate'] = isodate(datebegin)
     newrow['Decade'] = decade(datebegin, dateend)
-    trace(3, f'{newrow["Decade"]=}')
+    trace(3, 'datebegin={} dateend={} Decade={}', datebegin, dateend,
+          newrow['Decade'])
 
     # ------------------------- Exhibitions ----------------------------------
 
@@ -195,8 +202,7 @@ def onerow(oldrow):
 
     # ------------------------- Dimensions ----------------------------------
 
-    # The field is like "300 x 500" as height x width in mm.
-    m = re.search(r'(\d+)\D+(\d+)', oldrow['Dimensions'])
+    m = DIMENSIONSPAT.search(oldrow['Dimensions'])
     newrow['Dimensions'] = ''
     if m:
         height = m.group(1) + 'mm'
@@ -276,15 +282,20 @@ def main():
     writer = csv.DictWriter(outfile, fieldnames=FIELDS.split())
     writer.writeheader()
     n_rows = 0
-    for reader in readers:
-        for oldrow in reader:
-            if len(oldrow) > n_input_fields:
-                print(f"Error: row {n_rows + 1} longer than heading: {oldrow}")
-                return
-            newrow = onerow(oldrow)
-            if newrow:
-                writer.writerow(newrow)
-            n_rows += 1
+    with stats.phase('parse'):
+        for reader in readers:
+            for oldrow in reader:
+                if len(oldrow) > n_input_fields:
+                    print(f"Error: row {n_rows + 1} longer than heading: {oldrow}")
+                    return
+                with stats.phase('transform'):
+                    newrow = onerow(oldrow)
+                if newrow:
+                    with stats.phase('write'):
+                        writer.writerow(newrow)
+                    stats.count('written')
+                n_rows += 1
+    stats.count('rows', n_rows)
     return n_rows
 
 
@@ -316,16 +327,19 @@ def getparser() -> argparse.ArgumentParser:
         This is used in case we want to upload an image that is not contained in Modes.''')
     parser.add_argument('-o', '--outfile', help='''
         The output CSV file.''')
-    parser.add_argument('-g', '--imgcsvfile', required=False,
+    parser.add_argument('-g', '--imgcsvfile', required=False, action='append',
                         help=sphinxify('''
         This file contains two columns, the Serial number and a vertial bar
-        separated list of image files. This file is created by ``x053_list_pages.py``.       
+        separated list of image files. This file is created by ``x053_list_pages.py``.
+        You may specify multiple ``-g`` parameters, for example one per batch
+        when regenerating the whole site, in which case the lists are merged.
         ''', called_from_sphinx))
     parser.add_argument('-s', '--short', action='store_true', help='''
         Only process one object. For debugging.''')
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary
         information.''')
+    add_stats_argument(parser)
     return parser
 
 
@@ -353,6 +367,7 @@ if __name__ == '__main__':
         addendum = codecs.open(_args.addendum, encoding='utf-8-sig')
         trace(1, '    Input addendum file: {}', _args.addendum)
     trace(1, '    Creating file: {}', _args.outfile)
+    stats = RunStats()
     imgdict = read_img_csv_file()
     nrows = main()
     if len(imgdict):
@@ -361,3 +376,4 @@ if __name__ == '__main__':
         trace(2, '{}: images not used.', denormalize_id(str(serial)))
     trace(1, 'End recode_collection. {} row{} written.', nrows,
           '' if nrows == 1 else 's', color=Fore.GREEN)
+    stats.report(_args.stats)
@@ -15,11 +15,12 @@ from shutil import copy2
 import subprocess
 import sys
 
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 
 from utl.cfgutil import expand_idnum
 from utl.normalize import if_not_sphinx, sphinxify, normalize_id
 from utl.readers import object_reader, row_list_reader
+from utl.profiler import add_profile_arguments, start_profile
 from web.webutil import parse_prefix
 
 DEFAULT_MAXPIXELS = 1000
@@ -81,6 +82,7 @@ def getparser():
                         File to write trace
                         output to, to avoid confusion with output from sips. Implies --nocolor. 
                         Use this to avoid mixing output from sips with debug output.''', calledfromsphinx))
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -229,6 +231,7 @@ def main():
         print(f'{indir=}, {filename=}')
         onefile()
     trace(1, '{} copied\n{} shrunk', ncopied, nshrunk)
+    return ncopied + nshrunk
 
 
 def set_one_reading(idnum, readingtext: str | None, elementtype: str | None):
@@ -299,6 +302,7 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs()
+    profiler = start_profile(_args, 'shrinkjpg')
     trace(0, 'Begin shrinkjpg.py {}', datetime.now())
     isdir = False
     if os.path.isdir(_args.indir):
@@ -311,4 +315,4 @@ if __name__ == '__main__':
         get_readings_from_xml()
     if _args.incsv:
         get_readings_from_csv()
-    main()
+    profiler.stop(main())
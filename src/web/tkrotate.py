@@ -1,8 +1,37 @@
 """
+    Display the images in a folder one at a time and accept commands to
+    rotate them. Each image is written to the output folder with its
+    rotation when the next image is displayed.
 
+    Keys:
+        Left    rotate 90 degrees counterclockwise
+        Right   rotate 90 degrees clockwise
+        Down    rotate 180 degrees
+        space   save this image and display the next one
+
+    The images are shown from previews at the size of the canvas. The
+    previews of the next few images are made by background threads while
+    the current one is displayed, decoding a JPEG file at a reduced scale.
+    Previews are saved in a cache folder and reused as long as the image's
+    size and modification time haven't changed, so reviewing a folder a
+    second time doesn't decode the scans again.
+
+    Rotating only changes the preview. The image is written to the output
+    folder by a background thread: unchanged if it wasn't rotated, by
+    jpegtran without decoding it if it is a JPEG file that can be rotated
+    losslessly and jpegtran is installed, and otherwise by Pillow. The
+    preview shows the pixels as they are stored, ignoring any EXIF
+    Orientation tag, so the tag is set to 1 in the output to make it look
+    the same as the preview. Other metadata is kept.
 """
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os.path
+import shutil
+import struct
+import subprocess
 from tkinter import *
 
 import PIL
@@ -12,6 +41,129 @@ import sys
 
 # The canvas must be square
 CANVAS_SIZE = 800
+PREVIEW_SIZE = CANVAS_SIZE - 100
+DEFAULT_CACHEDIR = os.path.join(os.path.expanduser('~'), '.cache', 'tkrotate')
+DEFAULT_PREFETCH = 4
+JPEGTRAN = shutil.which('jpegtran')
+ORIENTATION = 0x0112  # the EXIF tag
+# Pillow rotates counterclockwise and jpegtran clockwise.
+TRANSPOSE = {90: Image.Transpose.ROTATE_90,
+             180: Image.Transpose.ROTATE_180,
+             270: Image.Transpose.ROTATE_270}
+
+
+def preview_path(inpath: str) -> str:
+    """
+    :return: the path of the cached preview of the image, which changes if
+             the image's size or modification time changes
+    """
+    st = os.stat(inpath)
+    key = f'{os.path.abspath(inpath)} {st.st_size} {st.st_mtime_ns} {PREVIEW_SIZE}'
+    return os.path.join(args.cachedir,
+                        hashlib.sha1(key.encode()).hexdigest() + '.jpg')
+
+
+def load_preview(inpath: str):
+    """
+    Called in a prefetch thread.
+
+    :return: the preview of the image as a PIL Image or None if the file
+             isn't an image
+    """
+    cachepath = preview_path(inpath) if args.cachedir else None
+    if cachepath and os.path.exists(cachepath):
+        try:
+            with Image.open(cachepath) as preview:
+                preview.load()
+                return preview.copy()
+        except OSError as e:  # a corrupt or truncated file, made again below
+            print(f'Bad preview of {inpath} in the cache: {e}')
+    try:
+        img = Image.open(inpath)
+    except PIL.UnidentifiedImageError:
+        return None
+    with img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+        img.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+        preview = img.convert('RGB')  # a copy that outlives the file
+    if cachepath:
+        os.makedirs(args.cachedir, exist_ok=True)
+        tmppath = f'{cachepath}.{os.getpid()}.tmp'
+        preview.save(tmppath, 'JPEG', quality=90)
+        os.replace(tmppath, cachepath)
+    return preview
+
+
+def reset_jpeg_orientation(path: str):
+    """
+    Set the EXIF Orientation tag of a JPEG file to 1 in place, without
+    decoding the image. Nothing is changed if the file has no such tag.
+    """
+    with open(path, 'r+b') as jpeg:
+        data = jpeg.read(0x10000)  # the EXIF segment is at most 64 KiB
+        pos = 2  # after the SOI marker
+        while pos + 4 <= len(data) and data[pos] == 0xFF:
+            marker = data[pos + 1]
+            seglen = struct.unpack_from('>H', data, pos + 2)[0]
+            if marker == 0xDA:  # the image data follows
+                return
+            if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\0\0':
+                break
+            pos += 2 + seglen
+        else:
+            return
+        tiff = pos + 10
+        order = '<' if data[tiff:tiff + 2] == b'II' else '>'
+        ifd = tiff + struct.unpack_from(order + 'I', data, tiff + 4)[0]
+        if ifd + 2 > len(data):
+            return
+        for n in range(struct.unpack_from(order + 'H', data, ifd)[0]):
+            entry = ifd + 2 + 12 * n
+            if entry + 12 > len(data):
+                return
+            tag, = struct.unpack_from(order + 'H', data, entry)
+            if tag == ORIENTATION:
+                if struct.unpack_from(order + 'H', data, entry + 8)[0] != 1:
+                    jpeg.seek(entry + 8)
+                    jpeg.write(struct.pack(order + 'H', 1))
+                return
+
+
+def save_rotated(inpath: str, outpath: str, degrees: int):
+    """
+    Called in the writer thread. The output's EXIF Orientation tag, if any,
+    is set to 1 because the rotation was chosen from the pixels as stored.
+
+    :param degrees: the counterclockwise rotation, 0, 90, 180 or 270
+    """
+    if inpath.lower().endswith(('.jpg', '.jpeg')):
+        if degrees == 0:
+            shutil.copy2(inpath, outpath)
+            reset_jpeg_orientation(outpath)
+            return
+        if JPEGTRAN:
+            # -perfect fails rather than drop the partial blocks at the edges.
+            result = subprocess.run([JPEGTRAN, '-perfect', '-copy', 'all',
+                                     '-rotate', str(360 - degrees),
+                                     '-outfile', outpath, inpath],
+                                    stderr=subprocess.DEVNULL)
+            if result.returncode == 0:
+                reset_jpeg_orientation(outpath)
+                return
+    with Image.open(inpath) as img:
+        exif = img.getexif()
+        if degrees == 0 and exif.get(ORIENTATION, 1) == 1:
+            shutil.copy2(inpath, outpath)
+            return
+        if ORIENTATION in exif:
+            exif[ORIENTATION] = 1
+        options = {'quality': 100}
+        if exif:
+            options['exif'] = exif
+        if degrees:
+            img = img.transpose(TRANSPOSE[degrees])
+        img.save(outpath, **options)
 
 
 class Rotate:
@@ -25,10 +177,16 @@ class Rotate:
                              height=CANVAS_SIZE)
         self.canvas.grid()
         self.infiles = iter(sorted(os.listdir(indirname)))
+        # Decoding mostly releases the GIL so threads can run in parallel.
+        self.loader = ThreadPoolExecutor(max_workers=args.jobs)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = deque()  # (filename, future of its preview)
+        self.writes = []  # (filename, future of the output file)
         # init vars here to stop PyCharm whining
         self.activefile = None
         self.inpath = self.outpath = None
-        self.img = self.display_img = self.photoimg = None
+        self.preview = self.photoimg = None
+        self.degrees = 0
         self.init_img()
         self.root.bind('<Down>', lambda e: self.rotate180())
         self.root.bind('<Left>', lambda e: self.rotate90())
@@ -36,34 +194,50 @@ class Rotate:
         self.root.bind('<space>', lambda e: self.nextimg())
         self.root.mainloop()
 
+    def prefetch(self):
+        # Keep the previews of the next few images loading.
+        while len(self.pending) < args.prefetch:
+            try:
+                filename = next(self.infiles)
+            except StopIteration:
+                return
+            inpath = os.path.join(indirname, filename)
+            self.pending.append((filename, self.loader.submit(load_preview,
+                                                              inpath)))
+
     def init_img(self):
         """
         Iterate over the files in the input directory until we find one we
         can open.
-        :return: self.img contains the new image. If none is found, exit.
+        :return: self.preview contains the new image. If none is found, exit.
         """
         while True:
-            try:
-                self.activefile = next(self.infiles)
-            except StopIteration:
-                print('Exiting.')
-                sys.exit()
+            self.prefetch()
+            if not self.pending:
+                self.finish()
+            self.activefile, future = self.pending.popleft()
             self.inpath = os.path.join(indirname, self.activefile)
             self.outpath = os.path.join(outdirname, self.activefile)
             try:
-                self.img = Image.open(self.inpath)
-            except PIL.UnidentifiedImageError:
+                self.preview = future.result()
+            except Exception as e:  # noqa: the image is skipped
+                print(f'Skipping: {self.inpath}: {e}')
+                continue
+            if self.preview is None:
                 print('Skipping:', self.inpath)
                 continue
+            self.prefetch()
+            self.degrees = 0
             self.rotate_n(0)
             break
 
     def rotate_n(self, degrees):
-        if degrees:  # degrees == 0 if called from __init__
-            self.img = self.img.rotate(degrees, expand=True)
-        self.display_img = self.img.copy()
-        self.display_img.thumbnail((CANVAS_SIZE - 100, CANVAS_SIZE - 100))
-        self.photoimg = ImageTk.PhotoImage(image=self.display_img)
+        self.degrees = (self.degrees + degrees) % 360
+        display_img = self.preview
+        if self.degrees:
+            display_img = display_img.transpose(TRANSPOSE[self.degrees])
+        self.photoimg = ImageTk.PhotoImage(image=display_img)
+        self.canvas.delete('all')
         self.canvas.create_image(10, 10, image=self.photoimg, anchor='nw')
 
     def rotate180(self):
@@ -80,11 +254,25 @@ class Rotate:
         Save the current image and load the next one.
         :return: Image loaded and displayed or exit if no more images
         """
-        self.img.save(self.outpath, quality=100)  # , subsampling=0)
+        self.writes.append((self.activefile, self.writer.submit(
+            save_rotated, self.inpath, self.outpath, self.degrees)))
         self.canvas.delete('all')
         print(f'nextimg: {self.activefile}')
         self.init_img()
 
+    def finish(self):
+        """
+        Wait for the images to be written and exit.
+        """
+        print('Finishing writing images.')
+        self.writer.shutdown()
+        self.loader.shutdown(cancel_futures=True)
+        for filename, future in self.writes:
+            if future.exception():
+                print(f'Error writing {filename}: {future.exception()}')
+        print('Exiting.')
+        sys.exit()
+
 
 def getargs():
     parser = argparse.ArgumentParser(description='''
@@ -94,6 +282,15 @@ def getargs():
         The input directory''')
     parser.add_argument('outdir', help='''
         The output directory to contain the (possibly) rotated image.''')
+    parser.add_argument('--cachedir', default=DEFAULT_CACHEDIR, help=f'''
+        The folder to save the previews in. Set to "" to not save them.
+        The default is "{DEFAULT_CACHEDIR}".''')
+    parser.add_argument('-j', '--jobs', type=int, default=2, help='''
+        The number of threads making previews. The default is 2.''')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help=f'''
+        The number of images to make previews of ahead of the one displayed.
+        The default is {DEFAULT_PREFETCH}.''')
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -102,11 +299,12 @@ def getargs():
         raise ValueError('First parameter must be the input directory.')
     if not os.path.isdir(_args.outdir):
         raise ValueError('Second parameter must be the output directory.')
+    _args.prefetch = max(1, _args.prefetch)
     return _args
 
 
 if __name__ == '__main__':
-    assert sys.version_info >= (3, 6)
+    assert sys.version_info >= (3, 9)
     args = getargs()
     indirname = args.indir
     outdirname = args.outdir
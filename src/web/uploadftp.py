@@ -14,7 +14,7 @@ from ftplib import FTP
 import os.path
 import sys
 import time
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 
 from web.webutil import COLLECTION_PREFIX
 
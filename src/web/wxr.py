@@ -0,0 +1,84 @@
+"""
+    Read the items of a WordPress export (WXR) file one at a time.
+
+    The file is the RSS document written by the WordPress tools/export
+    function. Each <item> element is a post, collection item or media
+    attachment. It is parsed with ElementTree's iterparse and removed from
+    the tree as soon as it has been read, so the memory needed doesn't grow
+    with the size of the export. Elements are matched by their local name so
+    the WXR version in the "wp" namespace URI doesn't matter.
+"""
+from collections import namedtuple
+# noinspection PyPep8Naming
+import xml.etree.ElementTree as ET
+
+# post_id:  the WordPress post ID
+# post_type: "collection", "attachment", ...
+# status:   "publish", "draft", "inherit", ...
+# guid:     the item's permanent URL
+# modified: the time the item was last changed as "yyyy-mm-dd hh:mm:ss" UTC
+#           or '' if the export doesn't include it
+# meta:     a dict of the item's post meta keys and values. If a key occurs
+#           more than once, the first value is kept.
+WxrItem = namedtuple('WxrItem', 'post_id post_type status guid modified meta')
+# The timestamps of an item in order of preference. WordPress writes zeros
+# for a time that isn't set.
+_TIMESTAMPS = ('post_modified_gmt', 'post_date_gmt')
+_NOTIME = '0000-00-00 00:00:00'
+
+
+def _localname(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def _item(elem) -> WxrItem:
+    fields = {}
+    meta = {}
+    for child in elem:
+        name = _localname(child.tag)
+        if name == 'postmeta':
+            key = value = None
+            for kv in child:
+                kvname = _localname(kv.tag)
+                if kvname == 'meta_key':
+                    key = kv.text
+                elif kvname == 'meta_value':
+                    value = kv.text or ''
+            if key is not None:
+                meta.setdefault(key, value)
+        elif name not in fields:
+            fields[name] = (child.text or '').strip()
+    modified = ''
+    for name in _TIMESTAMPS:
+        if fields.get(name, _NOTIME) != _NOTIME:
+            modified = fields[name]
+            break
+    return WxrItem(fields.get('post_id', ''), fields.get('post_type', ''),
+                   fields.get('status', ''), fields.get('guid', ''),
+                   modified, meta)
+
+
+def iter_items(infile, post_type: str = None):
+    """
+    :param infile: the filename or a file object of a WXR file opened in
+                   binary mode
+    :param post_type: if given, only the items of this type are returned
+    :return: an iterator over the WxrItems in the order of the file
+    """
+    channel = None
+    for event, elem in ET.iterparse(infile, events=('start', 'end')):
+        if event == 'start':
+            if channel is None and _localname(elem.tag) == 'channel':
+                channel = elem
+            continue
+        if _localname(elem.tag) != 'item':
+            continue
+        item = _item(elem)
+        if channel is not None:
+            del channel[:]  # the items read so far and nothing still open
+        if post_type is None or item.post_type == post_type:
+            yield item
+
+
+if __name__ == '__main__':
+    print('This module is not callable.')
@@ -6,55 +6,43 @@ import argparse
 import os.path
 import sys
 
-import openpyxl.cell.cell
-from openpyxl import Workbook
+import openpyxl
 
 from utl.normalize import sphinxify, normalize_id
+from utl.xlsxout import SheetWriter
 
 
-def onefile(filename, ws, prefix):
-    global out_row_num, sheet
+def onefile(filename, prefix):
+    global heading
     # print(f'{filename=}')
     infilepath = os.path.join(_args.indir, filename)
-    wb1 = openpyxl.load_workbook(infilepath)
+    wb1 = openpyxl.load_workbook(infilepath, read_only=True)
     ws1 = wb1.active
-    in_row_num = 0
-    for row in ws1.iter_rows():
-        # Print the first heading row but skip the remaining ones.
-        if not in_row_num:
-            if not out_row_num:
-                ws.append((cell.value for cell in row))
-            in_row_num += 1
+    rows = ws1.iter_rows(values_only=True)
+    # Keep the first heading row but skip the remaining ones.
+    first = next(rows, None)
+    if heading is None:
+        heading = first
+    for row in rows:
+        if not row or not row[0]:
             continue
-        out_row_num += 1
-        # row = [cell.value for cell in row]
-        if not row[0].value:
-            continue
-        row[0].value = f'{prefix}.{row[0].value}'
-        # print(f'{row[0].value=}')
-        sheet.append((normalize_id(row[0].value), row))
-
-    return
-
+        row = (f'{prefix}.{row[0]}',) + row[1:]
+        # print(f'{row[0]=}')
+        sheet.append((normalize_id(row[0]), row))
+    wb1.close()
 
-def put_ws(wb, ws):
-    sheet.sort()
-    for row_num, row in enumerate(sheet, start=2):
-        for col_num, c in enumerate(row[1], start=1):
-            cell = ws.cell(row=row_num, column=col_num, value=c.value)
-            # cell.data_type = openpyxl.cell.cell.TYPE_STRING
-            cell.number_format = openpyxl.styles.numbers.FORMAT_TEXT
 
-    # for row in sheet:
-    #     out_row_num += 1
-    #     ws.append(row[1])
-    wb.save(_args.outfile)
+def put_ws():
+    sheet.sort(key=lambda x: x[0])
+    with SheetWriter(_args.outfile) as writer:
+        if heading is not None:
+            writer.writerow(heading)
+        for _, row in sheet:
+            writer.writerow(row, style='text')
 
 
 def main():
     infiles = os.listdir(_args.indir)
-    workbook = Workbook()
-    worksheet = workbook.active
     for infile in infiles:
         prefix, suffix = os.path.splitext(infile)
         if prefix.startswith('~'):
@@ -63,11 +51,10 @@ def main():
         if suffix.lower() != '.xlsx' or prefix.lower() == 'template':
             print(f'Skipping {infile}')
             continue
-        onefile(infile, worksheet, prefix)
+        onefile(infile, prefix)
         if _args.short:
-            put_ws(workbook, worksheet)
-            return
-    put_ws(workbook, worksheet)
+            break
+    put_ws()
 
 
 def getparser():
@@ -100,7 +87,7 @@ calledfromsphinx = True
 if __name__ == '__main__':
     calledfromsphinx = False
     assert sys.version_info >= (3, 9)
-    out_row_num = 0
+    heading = None
     sheet = []
     if len(sys.argv) == 1:
         sys.argv.append('-h')
@@ -43,13 +43,12 @@ import argparse
 import os
 import sys
 from collections import defaultdict
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 
-from utl.normalize import normalize_id, denormalize_id
+from utl.normalize import denormalize_id
+from web.imgcatalog import IMGFILES, ImageCatalog
 from web.webutil import COLLECTION_PREFIX, parse_prefix
 
-IMGFILES = ('.jpg', '.jpeg', '.png')
-
 
 def pad_page_number(prefix, suffix, accn, subnum, subnum_ab, pagenum, pagenum_ab):
     # Pad the page number to three digits
@@ -82,7 +81,7 @@ def unpad_page_number(filename: str):
     return COLLECTION_PREFIX + denormed_filename + suffix
 
 
-def one_file(filename):
+def one_file(filename, parsed):
     """
     Extract the accession number with or without a subnumber from the filename and update `accndict`
     with the key as the accession number of an object and the value as the list of
@@ -107,6 +106,9 @@ def one_file(filename):
         --      Indicates that an object with an accession number but not a
                 subnumber has multiple pages
 
+    :param parsed: the filename parsed by parse_filename in imgcatalog.py,
+                   None if the name failed to match
+
     :return: None
     """
 
@@ -119,14 +121,12 @@ def one_file(filename):
     if not prefix.startswith(COLLECTION_PREFIX) and not _args.force:
         print(f'File "{filename}" doesn’t start with {COLLECTION_PREFIX}. Ignored.')
         return
-    try:
-        accn, subn, subn_ab, page, page_ab, modes_key1, modes_key2 = parse_prefix(prefix)
-    except ValueError:
+    if parsed is None:
         print(f'Filename failed match: {filename}')
         num_failed_match += 1
         return
-    n_modes_key1 = normalize_id(modes_key1)
-    n_modes_key2 = normalize_id(modes_key2)
+    (accn, subn, subn_ab, page, page_ab, modes_key1, modes_key2,
+     n_modes_key1, n_modes_key2) = parsed
     # Pad the page number in the filename so the pages are sorted so they appear
     # on the website in order.
     padded_filename = pad_page_number(prefix, suffix, accn, subn, subn_ab, page, page_ab)
@@ -140,12 +140,9 @@ def main(indir):
     #
     #   Create accndict containing accn --> list of files
     #
-    for file in os.listdir(indir):
-        filepath = os.path.join(indir, file)
-        if os.path.isdir(filepath):
-            main(filepath)  # recursively walk subdirectory
-        else:
-            one_file(file)
+    catalog = ImageCatalog(indir, _args.catalog, _args.jobs)
+    for _, file, parsed in catalog.walk():
+        one_file(file, parsed)
 
     listlen = 0
     longest = None
@@ -172,9 +169,15 @@ def getparser():  # called either by getargs or sphinx
         The folder containing the images.''')
     parser.add_argument('outfile',  help='''
         The output CSV file.''')
+    parser.add_argument('-c', '--catalog', help='''
+        A file to save the catalog of the image folder. If it exists, only
+        the subfolders that have changed since the last run are read.''')
     parser.add_argument('-f', '--force', action='store_true', help=f'''
         process a file even if the collection prefix "{COLLECTION_PREFIX}"
         is not specified,''')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='''
+        The number of subfolders of the image folder to read in parallel.
+        The default is 1.''')
     parser.add_argument('-m', '--mode', choices=('item', 'subnum'),
                         default='subnum',
                         help='''If the mode is "item", pictures will be grouped
@@ -9,7 +9,7 @@
     a description of the YAML file.
 """
 import argparse
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 import codecs
 import csv
 import sys
@@ -19,10 +19,13 @@ import xml.etree.ElementTree as ET
 
 from utl.cfgutil import Cmd, Stmt, yaml_fieldnames, expand_idnum
 from utl.cfgutil import Config
+from utl.columnar import FORMATS, check_format, unique_names, write_table
 from utl.readers import read_include_dict
 from utl.excel_cols import col2num
 from utl.normalize import normalize_id, denormalize_id, DEFAULT_MDA_CODE
 from utl.normalize import if_not_sphinx
+from utl.profiler import add_profile_arguments, start_profile
+from utl.trace import RunStats, add_stats_argument
 from utl.zipmagic import openfile
 
 
@@ -42,7 +45,18 @@ def opencsvwriter(filename, delimiter):
     return outcsv, csvfile
 
 
-def one_document(document, parent):
+def write_columnar(filename, titles, rows):
+    """
+    Write the rows as a table in the format given by --format. The titles
+    are the column names and all columns are strings.
+    """
+    names = unique_names(titles)
+    columns = {name: [row[n] for row in rows] for n, name in enumerate(names)}
+    write_table(filename, columns, _args.format)
+    trace(1, 'Output: {}', filename)
+
+
+def one_document(document, parent, mdacode=DEFAULT_MDA_CODE):
     command = document[Stmt.CMD]
     eltstr = document.get(Stmt.XPATH)
     text = None
@@ -77,15 +91,77 @@ def one_document(document, parent):
     else:
         text = element.text.strip()
     if Stmt.NORMALIZE in document:
-        text = normalize_id(text, _args.mdacode)
+        text = normalize_id(text, mdacode)
     if Stmt.WIDTH in document:
         text = text[:int(document[Stmt.WIDTH])]
     return text, command
 
 
+def object_row(config, elem, norm_idnum, mdacode=DEFAULT_MDA_CODE):
+    """
+    Extract the columns defined by the config from an Object that has been
+    selected.
+
+    :param config: The Config
+    :param elem: The Object element
+    :param norm_idnum: The normalized accession number
+    :param mdacode: Used in normalizing the accession number
+    :return: a tuple of the row, or None if there is nothing to display, and a
+             list of (command, title) tuples for the columns whose element
+             was not found.
+    """
+    data = []
+    missing = []
+    # We have selected the id but only write the row if there is something
+    # to display. There will always be at least the ID number in the first
+    # column unless skip_number was specified in the config.
+    if config.skip_number:
+        writerow = False
+    else:
+        # Insert the ID number as the first column.
+        data.append(norm_idnum)
+        writerow = True
+
+    for document in config.col_docs:
+        text, command = one_document(document, elem, mdacode)
+        # print(f'{command=}')
+        if text is None:
+            missing.append((command, document[Stmt.TITLE]))
+            text = ''
+        if text:
+            writerow = True
+        data.append(text)
+    return (data if writerow else None), missing
+
+
+def sort_rows(config, rows, mdacode=DEFAULT_MDA_CODE):
+    """
+    Sort the rows returned by object_row and de-normalize the columns that
+    need it, in place.
+    """
+    if config.sort_numeric:
+        rows.sort(key=lambda x: int(x[0]))
+    else:
+        rows.sort()
+    # Create a list of flags indicating whether the value needs to be
+    # de-normalized.
+    denorm = []
+    if not config.skip_number:
+        denorm.append(True)  # for the Serial number
+    for doc in config.col_docs:
+        denorm.append(Stmt.DENORMALIZE in doc)
+    lennorm = len(denorm)
+    for row in rows:
+        for n, cell in enumerate(row[:lennorm]):
+            if denorm[n]:
+                row[n] = denormalize_id(cell, mdacode)
+
+
 def main(argv):  # can be called either by __main__ or test_xml2csv
-    global _args, _logfile
+    global _args, _logfile, _stats, _profiler
     _args = getargs(argv)
+    _stats = RunStats()
+    _profiler = start_profile(_args, 'xml2csv')
     trace(1, 'Begin xml2csv.', color=Fore.GREEN)
     infilename = _args.infile
     outfilename = _args.outfile
@@ -104,11 +180,16 @@ def main(argv):  # can be called either by __main__ or test_xml2csv
         trace(1, 'Warning: Config file omitted. Only accession numbers will be output.')
     config = Config(cfgfile, dump=_args.verbose >= 2, logfile=_logfile,
                     verbos=_args.verbose)
-    outcsv, outfile = opencsvwriter(outfilename, config.delimiter)
+    if _args.format == 'csv':
+        outcsv, outfile = opencsvwriter(outfilename, config.delimiter)
+    else:
+        outcsv = outfile = None  # written at the end by write_columnar
     outlist = []
     titles = yaml_fieldnames(config)
     trace(1, 'Columns: {}', ', '.join(titles))
-    if _args.heading:
+    if outcsv is None:
+        pass  # the titles are the column names
+    elif _args.heading:
         outcsv.writerow(titles)
     else:
         trace(1, 'Heading row not written.')
@@ -123,87 +204,65 @@ def main(argv):  # can be called either by __main__ or test_xml2csv
                                      allow_blanks=_args.allow_blanks)
     normids = {}
     objectlevel = 0
-    for event, elem in ET.iterparse(infile, events=('start', 'end')):
-        # print(event)
-        if event == 'start':
-            # print(elem.tag)
-            if elem.tag == config.record_tag:
-                objectlevel += 1
-            continue
-        # It's an "end" event.
-        if elem.tag != config.record_tag:  # default: Object
-            continue
-        objectlevel -= 1
-        if objectlevel:
-            continue  # It's not a top level Object.
-        data = []
-        idelem = elem.find(config.record_id_xpath)
-        idnum = idelem.text if idelem is not None else ''
-        trace(3, 'idnum: {}', idnum)
-        nlines += 1
-
-        norm_idnum = normalize_id(idnum, _args.mdacode, verbose=_args.verbose)
-        if norm_idnum in normids:
-            print(f'Duplicate id: {norm_idnum}. Old id: {normids[norm_idnum]},'
-                  f' New id: {idnum}')
-            print('Program aborted.')
-            sys.exit(-1)
-        normids[norm_idnum] = idnum
-        writerow = config.select(elem, includes, exclude=_args.exclude)
-        # print(f'{writerow=}')
-        if not writerow:
-            continue
-        # We have selected the id but only write the row if there is something
-        # to display. There will always be at least the ID number in the first
-        # column unless skip_number was specified in the config.
-        if config.skip_number:
-            writerow = False
-        else:
-            # Insert the ID number as the first column.
-            data.append(norm_idnum)
+    with _stats.phase('parse'):
+        for event, elem in ET.iterparse(infile, events=('start', 'end')):
+            # print(event)
+            if event == 'start':
+                # print(elem.tag)
+                if elem.tag == config.record_tag:
+                    objectlevel += 1
+                continue
+            # It's an "end" event.
+            if elem.tag != config.record_tag:  # default: Object
+                continue
+            objectlevel -= 1
+            if objectlevel:
+                continue  # It's not a top level Object.
+            idelem = elem.find(config.record_id_xpath)
+            idnum = idelem.text if idelem is not None else ''
+            trace(3, 'idnum: {}', idnum)
+            nlines += 1
 
-        for document in config.col_docs:
-            text, command = one_document(document, elem)
-            # print(f'{command=}')
-            if text is None:
+            norm_idnum = normalize_id(idnum, _args.mdacode, verbose=_args.verbose)
+            if norm_idnum in normids:
+                print(f'Duplicate id: {norm_idnum}. Old id: {normids[norm_idnum]},'
+                      f' New id: {idnum}')
+                print('Program aborted.')
+                sys.exit(-1)
+            normids[norm_idnum] = idnum
+            with _stats.phase('select'):
+                selected = config.select(elem, includes, exclude=_args.exclude)
+            # print(f'{selected=}')
+            if not selected:
+                continue
+            with _stats.phase('transform'):
+                data, missing = object_row(config, elem, norm_idnum, _args.mdacode)
+            for command, title in missing:
                 notfound += 1
                 trace(2, '{}: cmd: {}, "{}" is not found in XML.', idnum, command,
-                      document[Stmt.TITLE])
-                text = ''
-            if text:
-                writerow = True
-            data.append(text)
-
-        if writerow:
-            nwritten += 1
-            outlist.append(data)
-            trace(3, '{} written.', idnum)
-        elem.clear()
-        if includes and not _args.exclude:
-            includes.pop(norm_idnum)
-        if _args.short:
-            break
-    if config.sort_numeric:
-        outlist.sort(key=lambda x: int(x[0]))
-    else:
-        outlist.sort()
-    # Create a list of flags indicating whether the value needs to be
-    # de-normalized.
-    denorm = []
-    if not config.skip_number:
-        denorm.append(True)  # for the Serial number
-    for doc in config.col_docs:
-        denorm.append(Stmt.DENORMALIZE in doc)
-    lennorm = len(denorm)
-    for row in outlist:
-        for n, cell in enumerate(row[:lennorm]):
-            if denorm[n]:
-                row[n] = denormalize_id(cell, _args.mdacode)
-        outcsv.writerow(row)
+                      title)
+            if data is not None:
+                nwritten += 1
+                outlist.append(data)
+                trace(3, '{} written.', idnum)
+            elem.clear()
+            if includes and not _args.exclude:
+                includes.pop(norm_idnum)
+            if _args.short:
+                break
+    _stats.count('objects', nlines)
+    _stats.count('written', nwritten)
+    with _stats.phase('transform'):
+        sort_rows(config, outlist, _args.mdacode)
+    with _stats.phase('write'):
+        if outcsv is None:
+            write_columnar(outfilename, titles, outlist)
+        else:
+            outcsv.writerows(outlist)
+            outfile.close()
     infile.close()
     if cfgfile:
         cfgfile.close()
-    outfile.close()
     if includes and len(includes):
         trace(1, '{} items in include list not in XML.', len(includes))
         if _args.verbose > 0:
@@ -239,6 +298,13 @@ def getparser():  # called either by getargs or sphinx
         only the accession numbers will be output.''')
     parser.add_argument('-f', '--force', action='store_true', help='''
         Write output even if none of the columns is populated.''')
+    parser.add_argument('--format', choices=FORMATS,
+                        default='csv', help='''
+        Write the output in this format. Parquet, Arrow and Feather files
+        need the pyarrow package. Their column names are the titles and all
+        columns are strings. The --bom, --heading and --lineterminator
+        options apply only to CSV.''' + if_not_sphinx(''' The default
+        is csv.''', calledfromsphinx))
     parser.add_argument('--heading', action='store_true', help='''
         Write a row at the front of the CSV file containing the field names.
         These are defined by the "title" statements in the config or inferred
@@ -272,9 +338,11 @@ def getparser():  # called either by getargs or sphinx
                                       calledfromsphinx))
     parser.add_argument('-s', '--short', action='store_true', help='''
         Only process one object. For debugging.''')
+    add_stats_argument(parser)
     parser.add_argument('-t', '--lineterminator', help=r'''
     Set the line terminator. The default is "\\r\\n". If the output is to be processed on a Unix-like
     system by a program like sed or awk you may wish to set this to "\\n".''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -293,6 +361,12 @@ def getargs(argv):
     # Set the default here because Sphinx can't display \r\n.
     if args.lineterminator is None:
         args.lineterminator = '\r\n'
+    if args.format != 'csv':
+        try:
+            check_format(args.format)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
     return args
 
 
@@ -311,3 +385,5 @@ if __name__ == '__main__':
         trace(1, 'Warning: {} elements not found in XML.', not_found)
     trace(1, 'End xml2csv. {}/{} lines written to {}. Elapsed: {:5.2f} seconds.',
           n_written, n_lines, _args.outfile, elapsed, color=Fore.GREEN)
+    _stats.report(_args.stats)
+    _profiler.stop(n_lines)
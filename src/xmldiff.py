@@ -25,12 +25,13 @@ import argparse
 import os.path
 import sys
 import time
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 from utl.cfgutil import Config, DEFAULT_MDA_CODE
 from utl.normalize import normalize_id, sphinxify
 from utl.normalize import if_not_sphinx
+from utl.profiler import add_profile_arguments, start_profile
 
 
 def trace(level, template, *args, color=None):
@@ -192,6 +193,7 @@ def getparser():
         if the element in the new file is different.''')
     parser.add_argument('-s', '--short', action='store_true', help='''
         Only process one object.''')
+    add_profile_arguments(parser)
     parser.add_argument('-v', '--verbose', type=int, default=1, help='''
         Set the verbosity. The default is 1 which prints summary information.
         ''')
@@ -218,6 +220,7 @@ if __name__ == '__main__':
     if len(sys.argv) == 1:
         sys.argv.append('-h')
     _args = getargs(sys.argv)
+    profiler = start_profile(_args, 'xmldiff')
     #
     # Global variables
     #
@@ -246,3 +249,4 @@ if __name__ == '__main__':
     elapsed = time.perf_counter() - t1
     trace(1, 'End {}. Elapsed: {:5.3f} seconds.', basename.split(".")[0],
           elapsed, color=Fore.GREEN)
+    profiler.stop(objcount[1] + objcount[2])
@@ -18,7 +18,7 @@ import argparse
 import os.path
 import sys
 import time
-from colorama import Fore, Style
+from utl.colors import Fore, Style
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as ET
 